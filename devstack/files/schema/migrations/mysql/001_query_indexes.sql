@@ -0,0 +1,47 @@
+/*
+* Copyright 2017 Hewlett Packard Enterprise Development LP
+*
+* Licensed under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License.
+* You may obtain a copy of the License at
+*
+*    http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software
+* distributed under the License is distributed on an "AS IS" BASIS,
+* WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+* implied.
+* See the License for the specific language governing permissions and
+* limitations under the License.
+*/
+
+/*
+ * Indexes of the queries listing and counting alarms, alarm definitions
+ * and notification methods.
+ *
+ * The prefixes of the varchar columns keep each indexed column within the
+ * 767 bytes mysql allows without innodb_large_prefix.
+ */
+
+USE `mon`;
+
+ALTER TABLE `alarm`
+  ADD KEY `alarm_alarm_definition_id_state` (`alarm_definition_id`,`state`,`lifecycle_state`);
+
+ALTER TABLE `alarm_action`
+  ADD KEY `alarm_action_alarm_state` (`alarm_state`,`alarm_definition_id`,`action_id`);
+
+ALTER TABLE `alarm_definition`
+  ADD KEY `alarm_definition_tenant_id_deleted_at` (`tenant_id`,`deleted_at`);
+
+ALTER TABLE `metric_definition`
+  ADD KEY `metric_definition_name` (`name`(191));
+
+ALTER TABLE `metric_dimension`
+  ADD KEY `metric_dimension_name_value` (`name`(127),`value`(127));
+
+ALTER TABLE `notification_method`
+  ADD KEY `notification_method_tenant_id` (`tenant_id`);
+
+ALTER TABLE `sub_alarm_definition_dimension`
+  ADD KEY `sub_alarm_definition_dimension_name_value` (`dimension_name`(95),`value`(95));
@@ -0,0 +1,82 @@
+/*
+* Copyright 2017 Hewlett Packard Enterprise Development LP
+*
+* Licensed under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License.
+* You may obtain a copy of the License at
+*
+*    http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software
+* distributed under the License is distributed on an "AS IS" BASIS,
+* WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+* implied.
+* See the License for the specific language governing permissions and
+* limitations under the License.
+*/
+
+/*
+ * Inverted indexes of the dimensions of the alarms and alarm definitions,
+ * filled with the alarms and alarm definitions of the database.
+ *
+ * Stop the threshold engine while applying this script, so that no alarm
+ * metric is written between the creation of the triggers and the copy.
+ */
+
+USE `mon`;
+
+CREATE TABLE `alarm_metric_dimension` (
+  `tenant_id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `dimension_name` varchar(255) COLLATE utf8_unicode_ci NOT NULL,
+  `value` varchar(255) COLLATE utf8_unicode_ci NOT NULL,
+  `alarm_id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `metric_definition_dimensions_id` binary(20) NOT NULL,
+  KEY `alarm_metric_dimension_tenant_id_name_value` (`tenant_id`,`dimension_name`(95),`value`(95)),
+  KEY `alarm_metric_dimension_alarm_id` (`alarm_id`,`metric_definition_dimensions_id`),
+  CONSTRAINT `fk_alarm_metric_dimension_alarm_id` FOREIGN KEY (`alarm_id`) REFERENCES `alarm` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE `alarm_definition_dimension` (
+  `tenant_id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `dimension_name` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `value` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `alarm_definition_id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `sub_alarm_definition_id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL,
+  KEY `alarm_definition_dimension_tenant_id_name_value` (`tenant_id`,`dimension_name`(75),`value`(75)),
+  KEY `alarm_definition_dimension_alarm_definition_id` (`alarm_definition_id`),
+  CONSTRAINT `fk_alarm_definition_dimension_sad_id` FOREIGN KEY (`sub_alarm_definition_id`) REFERENCES `sub_alarm_definition` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TRIGGER `alarm_metric_insert_dimensions` AFTER INSERT ON `alarm_metric`
+FOR EACH ROW
+  INSERT INTO `alarm_metric_dimension`
+    (`tenant_id`, `dimension_name`, `value`, `alarm_id`, `metric_definition_dimensions_id`)
+  SELECT `ad`.`tenant_id`, `md`.`name`, `md`.`value`, NEW.`alarm_id`, NEW.`metric_definition_dimensions_id`
+  FROM `alarm` `a`
+  JOIN `alarm_definition` `ad` ON `ad`.`id` = `a`.`alarm_definition_id`
+  JOIN `metric_definition_dimensions` `mdd` ON `mdd`.`id` = NEW.`metric_definition_dimensions_id`
+  JOIN `metric_dimension` `md` ON `md`.`dimension_set_id` = `mdd`.`metric_dimension_set_id`
+  WHERE `a`.`id` = NEW.`alarm_id`;
+
+CREATE TRIGGER `alarm_metric_delete_dimensions` AFTER DELETE ON `alarm_metric`
+FOR EACH ROW
+  DELETE FROM `alarm_metric_dimension`
+  WHERE `alarm_id` = OLD.`alarm_id`
+  AND `metric_definition_dimensions_id` = OLD.`metric_definition_dimensions_id`;
+
+INSERT INTO `alarm_metric_dimension`
+  (`tenant_id`, `dimension_name`, `value`, `alarm_id`, `metric_definition_dimensions_id`)
+SELECT `ad`.`tenant_id`, `md`.`name`, `md`.`value`, `am`.`alarm_id`, `am`.`metric_definition_dimensions_id`
+FROM `alarm_metric` `am`
+JOIN `alarm` `a` ON `a`.`id` = `am`.`alarm_id`
+JOIN `alarm_definition` `ad` ON `ad`.`id` = `a`.`alarm_definition_id`
+JOIN `metric_definition_dimensions` `mdd` ON `mdd`.`id` = `am`.`metric_definition_dimensions_id`
+JOIN `metric_dimension` `md` ON `md`.`dimension_set_id` = `mdd`.`metric_dimension_set_id`;
+
+INSERT INTO `alarm_definition_dimension`
+  (`tenant_id`, `dimension_name`, `value`, `alarm_definition_id`, `sub_alarm_definition_id`)
+SELECT `ad`.`tenant_id`, `sadd`.`dimension_name`, `sadd`.`value`, `sad`.`alarm_definition_id`, `sadd`.`sub_alarm_definition_id`
+FROM `sub_alarm_definition_dimension` `sadd`
+JOIN `sub_alarm_definition` `sad` ON `sad`.`id` = `sadd`.`sub_alarm_definition_id`
+JOIN `alarm_definition` `ad` ON `ad`.`id` = `sad`.`alarm_definition_id`
+WHERE `sadd`.`value` IS NOT NULL AND `ad`.`deleted_at` IS NULL;
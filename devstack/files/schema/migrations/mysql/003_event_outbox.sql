@@ -0,0 +1,32 @@
+/*
+* Copyright 2017 Hewlett Packard Enterprise Development LP
+*
+* Licensed under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License.
+* You may obtain a copy of the License at
+*
+*    http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software
+* distributed under the License is distributed on an "AS IS" BASIS,
+* WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+* implied.
+* See the License for the specific language governing permissions and
+* limitations under the License.
+*/
+
+/*
+ * Outbox of the events of the changes of alarms and alarm definitions.
+ */
+
+USE `mon`;
+
+CREATE TABLE `event_outbox` (
+  `id` bigint NOT NULL AUTO_INCREMENT,
+  `topic` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `message` mediumtext COLLATE utf8mb4_unicode_ci NOT NULL,
+  `created_at` datetime NOT NULL,
+  `claimed_by` varchar(36) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `claimed_until` datetime DEFAULT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
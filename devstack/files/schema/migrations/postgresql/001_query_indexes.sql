@@ -0,0 +1,22 @@
+---
+-- # Copyright 2017 Hewlett Packard Enterprise Development LP
+---
+
+---
+-- Indexes of the queries listing and counting alarms, alarm definitions
+-- and notification methods, and of the foreign keys the joins of these
+-- queries follow, which postgresql does not index on its own.
+---
+
+CREATE INDEX alarm_definition_id ON alarm USING btree (alarm_definition_id);
+CREATE INDEX fk_sub_alarm ON sub_alarm USING btree (alarm_id);
+CREATE INDEX fk_sub_alarm_expr ON sub_alarm USING btree (sub_expression_id);
+CREATE INDEX fk_sub_alarm_definition ON sub_alarm_definition USING btree (alarm_definition_id);
+CREATE INDEX fk_sub_alarm_definition_dimension ON sub_alarm_definition_dimension USING btree (sub_alarm_definition_id);
+CREATE INDEX alarm_alarm_definition_id_state ON alarm USING btree (alarm_definition_id, state, lifecycle_state);
+CREATE INDEX alarm_action_alarm_state ON alarm_action USING btree (alarm_state, alarm_definition_id, action_id);
+CREATE INDEX alarm_definition_tenant_id_deleted_at ON alarm_definition USING btree (tenant_id, deleted_at);
+CREATE INDEX metric_definition_name ON metric_definition USING btree (name);
+CREATE INDEX metric_dimension_name_value ON metric_dimension USING btree (name, value);
+CREATE INDEX notification_method_tenant_id ON notification_method USING btree (tenant_id);
+CREATE INDEX sub_alarm_definition_dimension_name_value ON sub_alarm_definition_dimension USING btree (dimension_name, value);
@@ -0,0 +1,85 @@
+---
+-- # Copyright 2017 Hewlett Packard Enterprise Development LP
+---
+
+---
+-- Inverted indexes of the dimensions of the alarms and alarm definitions,
+-- filled with the alarms and alarm definitions of the database.
+--
+-- Stop the threshold engine while applying this script, so that no alarm
+-- metric is written between the creation of the triggers and the copy.
+---
+
+CREATE TABLE alarm_metric_dimension (
+    tenant_id character varying(36) NOT NULL,
+    dimension_name character varying(255) NOT NULL,
+    value character varying(255) NOT NULL,
+    alarm_id character varying(36) NOT NULL,
+    metric_definition_dimensions_id bytea NOT NULL
+);
+
+CREATE TABLE alarm_definition_dimension (
+    tenant_id character varying(36) NOT NULL,
+    dimension_name character varying(255) NOT NULL,
+    value character varying(255) NOT NULL,
+    alarm_definition_id character varying(36) NOT NULL,
+    sub_alarm_definition_id character varying(36) NOT NULL
+);
+
+CREATE INDEX alarm_metric_dimension_tenant_id_name_value ON alarm_metric_dimension USING btree (tenant_id, dimension_name, value);
+CREATE INDEX alarm_metric_dimension_alarm_id ON alarm_metric_dimension USING btree (alarm_id, metric_definition_dimensions_id);
+CREATE INDEX alarm_definition_dimension_tenant_id_name_value ON alarm_definition_dimension USING btree (tenant_id, dimension_name, value);
+CREATE INDEX alarm_definition_dimension_alarm_definition_id ON alarm_definition_dimension USING btree (alarm_definition_id);
+CREATE INDEX alarm_definition_dimension_sad_id ON alarm_definition_dimension USING btree (sub_alarm_definition_id);
+
+ALTER TABLE ONLY alarm_metric_dimension
+    ADD CONSTRAINT fk_alarm_metric_dimension_alarm_id FOREIGN KEY (alarm_id) REFERENCES alarm(id) ON DELETE CASCADE;
+
+ALTER TABLE ONLY alarm_definition_dimension
+    ADD CONSTRAINT fk_alarm_definition_dimension_sad_id FOREIGN KEY (sub_alarm_definition_id) REFERENCES sub_alarm_definition(id) ON DELETE CASCADE;
+
+CREATE FUNCTION alarm_metric_insert_dimensions() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO alarm_metric_dimension
+        (tenant_id, dimension_name, value, alarm_id, metric_definition_dimensions_id)
+    SELECT ad.tenant_id, md.name, md.value, NEW.alarm_id, NEW.metric_definition_dimensions_id
+    FROM alarm a
+    JOIN alarm_definition ad ON ad.id = a.alarm_definition_id
+    JOIN metric_definition_dimensions mdd ON mdd.id = NEW.metric_definition_dimensions_id
+    JOIN metric_dimension md ON md.dimension_set_id = mdd.metric_dimension_set_id
+    WHERE a.id = NEW.alarm_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION alarm_metric_delete_dimensions() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM alarm_metric_dimension
+    WHERE alarm_id = OLD.alarm_id
+    AND metric_definition_dimensions_id = OLD.metric_definition_dimensions_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER alarm_metric_insert_dimensions AFTER INSERT ON alarm_metric
+    FOR EACH ROW EXECUTE PROCEDURE alarm_metric_insert_dimensions();
+
+CREATE TRIGGER alarm_metric_delete_dimensions AFTER DELETE ON alarm_metric
+    FOR EACH ROW EXECUTE PROCEDURE alarm_metric_delete_dimensions();
+
+INSERT INTO alarm_metric_dimension
+  (tenant_id, dimension_name, value, alarm_id, metric_definition_dimensions_id)
+SELECT ad.tenant_id, md.name, md.value, am.alarm_id, am.metric_definition_dimensions_id
+FROM alarm_metric am
+JOIN alarm a ON a.id = am.alarm_id
+JOIN alarm_definition ad ON ad.id = a.alarm_definition_id
+JOIN metric_definition_dimensions mdd ON mdd.id = am.metric_definition_dimensions_id
+JOIN metric_dimension md ON md.dimension_set_id = mdd.metric_dimension_set_id;
+
+INSERT INTO alarm_definition_dimension
+  (tenant_id, dimension_name, value, alarm_definition_id, sub_alarm_definition_id)
+SELECT ad.tenant_id, sadd.dimension_name, sadd.value, sad.alarm_definition_id, sadd.sub_alarm_definition_id
+FROM sub_alarm_definition_dimension sadd
+JOIN sub_alarm_definition sad ON sad.id = sadd.sub_alarm_definition_id
+JOIN alarm_definition ad ON ad.id = sad.alarm_definition_id
+WHERE sadd.value IS NOT NULL AND ad.deleted_at IS NULL;
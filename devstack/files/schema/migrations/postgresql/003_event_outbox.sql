@@ -0,0 +1,17 @@
+---
+-- # Copyright 2017 Hewlett Packard Enterprise Development LP
+---
+
+---
+-- Outbox of the events of the changes of alarms and alarm definitions.
+---
+
+CREATE TABLE event_outbox (
+    id bigserial NOT NULL,
+    topic character varying(255) NOT NULL,
+    message text NOT NULL,
+    created_at timestamp without time zone NOT NULL,
+    claimed_by character varying(36),
+    claimed_until timestamp without time zone,
+    CONSTRAINT event_outbox_pkey PRIMARY KEY (id)
+);
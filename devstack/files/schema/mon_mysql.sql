@@ -48,6 +48,7 @@ CREATE TABLE `alarm` (
   `updated_at` datetime NOT NULL,
   PRIMARY KEY (`id`),
   KEY `alarm_definition_id` (`alarm_definition_id`),
+  KEY `alarm_alarm_definition_id_state` (`alarm_definition_id`,`state`,`lifecycle_state`),
   CONSTRAINT `fk_alarm_definition_id` FOREIGN KEY (`alarm_definition_id`) REFERENCES `alarm_definition` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_alarm_alarm_state` FOREIGN KEY (`state`) REFERENCES `alarm_state` (`name`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -57,6 +58,7 @@ CREATE TABLE `alarm_action` (
   `alarm_state` varchar(20) COLLATE utf8mb4_unicode_ci NOT NULL,
   `action_id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL,
   PRIMARY KEY (`alarm_definition_id`,`alarm_state`,`action_id`),
+  KEY `alarm_action_alarm_state` (`alarm_state`,`alarm_definition_id`,`action_id`),
   CONSTRAINT `fk_alarm_action_alarm_definition_id` FOREIGN KEY (`alarm_definition_id`) REFERENCES `alarm_definition` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_alarm_action_notification_method_id` FOREIGN KEY (`action_id`) REFERENCES `notification_method` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_alarm_action_alarm_state` FOREIGN KEY (`alarm_state`) REFERENCES `alarm_state` (`name`)
@@ -77,6 +79,7 @@ CREATE TABLE `alarm_definition` (
   PRIMARY KEY (`id`),
   KEY `tenant_id` (`tenant_id`),
   KEY `deleted_at` (`deleted_at`),
+  KEY `alarm_definition_tenant_id_deleted_at` (`tenant_id`,`deleted_at`),
   CONSTRAINT `fk_alarm_definition_severity` FOREIGN KEY (`severity`) REFERENCES `alarm_definition_severity` (`name`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -94,7 +97,8 @@ CREATE TABLE `metric_definition` (
   `name` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
   `tenant_id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL,
   `region` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT '',
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `metric_definition_name` (`name`(191))
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 CREATE TABLE `metric_definition_dimensions` (
@@ -124,7 +128,8 @@ CREATE TABLE `metric_dimension` (
   `name` varchar(255) COLLATE utf8_unicode_ci NOT NULL DEFAULT '',
   `value` varchar(255) COLLATE utf8_unicode_ci NOT NULL DEFAULT '',
    UNIQUE KEY `metric_dimension_key` (`dimension_set_id`,`name`(252)),
-   KEY `dimension_set_id` (`dimension_set_id`)
+   KEY `dimension_set_id` (`dimension_set_id`),
+   KEY `metric_dimension_name_value` (`name`(127),`value`(127))
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci COMMENT='PRIMARY KEY (`id`)';
 
 CREATE TABLE `notification_method` (
@@ -137,6 +142,7 @@ CREATE TABLE `notification_method` (
   `created_at` datetime NOT NULL,
   `updated_at` datetime NOT NULL,
   PRIMARY KEY (`id`),
+  KEY `notification_method_tenant_id` (`tenant_id`),
   CONSTRAINT `fk_alarm_noticication_method_type` FOREIGN KEY (`type`) REFERENCES `notification_method_type` (`name`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -161,6 +167,7 @@ CREATE TABLE `sub_alarm_definition_dimension` (
   `sub_alarm_definition_id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT '',
   `dimension_name` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT '',
   `value` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  KEY `sub_alarm_definition_dimension_name_value` (`dimension_name`(95),`value`(95)),
   CONSTRAINT `fk_sub_alarm_definition_dimension` FOREIGN KEY (`sub_alarm_definition_id`) REFERENCES `sub_alarm_definition` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -180,6 +187,69 @@ CREATE TABLE `sub_alarm` (
   CONSTRAINT `fk_sub_alarm_expr` FOREIGN KEY (`sub_expression_id`) REFERENCES `sub_alarm_definition` (`id`)
 );
 
+/*
+ * Inverted indexes of the dimensions of the alarms and alarm definitions,
+ * with a row per tenant, dimension and alarm metric or sub alarm definition.
+ * The API filters alarms and alarm definitions by dimensions with them.
+ *
+ * alarm_metric_dimension is filled by triggers on alarm_metric, as the alarms
+ * are created by the threshold engine. The API writes the rows of
+ * alarm_definition_dimension with the sub alarm definitions.
+ */
+CREATE TABLE `alarm_metric_dimension` (
+  `tenant_id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `dimension_name` varchar(255) COLLATE utf8_unicode_ci NOT NULL,
+  `value` varchar(255) COLLATE utf8_unicode_ci NOT NULL,
+  `alarm_id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `metric_definition_dimensions_id` binary(20) NOT NULL,
+  KEY `alarm_metric_dimension_tenant_id_name_value` (`tenant_id`,`dimension_name`(95),`value`(95)),
+  KEY `alarm_metric_dimension_alarm_id` (`alarm_id`,`metric_definition_dimensions_id`),
+  CONSTRAINT `fk_alarm_metric_dimension_alarm_id` FOREIGN KEY (`alarm_id`) REFERENCES `alarm` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE `alarm_definition_dimension` (
+  `tenant_id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `dimension_name` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `value` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `alarm_definition_id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `sub_alarm_definition_id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL,
+  KEY `alarm_definition_dimension_tenant_id_name_value` (`tenant_id`,`dimension_name`(75),`value`(75)),
+  KEY `alarm_definition_dimension_alarm_definition_id` (`alarm_definition_id`),
+  CONSTRAINT `fk_alarm_definition_dimension_sad_id` FOREIGN KEY (`sub_alarm_definition_id`) REFERENCES `sub_alarm_definition` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TRIGGER `alarm_metric_insert_dimensions` AFTER INSERT ON `alarm_metric`
+FOR EACH ROW
+  INSERT INTO `alarm_metric_dimension`
+    (`tenant_id`, `dimension_name`, `value`, `alarm_id`, `metric_definition_dimensions_id`)
+  SELECT `ad`.`tenant_id`, `md`.`name`, `md`.`value`, NEW.`alarm_id`, NEW.`metric_definition_dimensions_id`
+  FROM `alarm` `a`
+  JOIN `alarm_definition` `ad` ON `ad`.`id` = `a`.`alarm_definition_id`
+  JOIN `metric_definition_dimensions` `mdd` ON `mdd`.`id` = NEW.`metric_definition_dimensions_id`
+  JOIN `metric_dimension` `md` ON `md`.`dimension_set_id` = `mdd`.`metric_dimension_set_id`
+  WHERE `a`.`id` = NEW.`alarm_id`;
+
+CREATE TRIGGER `alarm_metric_delete_dimensions` AFTER DELETE ON `alarm_metric`
+FOR EACH ROW
+  DELETE FROM `alarm_metric_dimension`
+  WHERE `alarm_id` = OLD.`alarm_id`
+  AND `metric_definition_dimensions_id` = OLD.`metric_definition_dimensions_id`;
+
+/*
+ * Outbox of the events of the changes of alarms and alarm definitions,
+ * written by the API in the transaction of the change and published to
+ * kafka by the outbox relay of the API processes.
+ */
+CREATE TABLE `event_outbox` (
+  `id` bigint NOT NULL AUTO_INCREMENT,
+  `topic` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `message` mediumtext COLLATE utf8mb4_unicode_ci NOT NULL,
+  `created_at` datetime NOT NULL,
+  `claimed_by` varchar(36) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `claimed_until` datetime DEFAULT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 SET foreign_key_checks = 1;
 
 /* provide data for enum tables */
@@ -173,6 +173,18 @@ CREATE INDEX metric_definition_id ON metric_definition_dimensions USING btree (m
 CREATE UNIQUE INDEX metric_dimension_key ON metric_dimension USING btree (dimension_set_id, name);
 CREATE INDEX metric_dimension_set_id ON metric_definition_dimensions USING btree (metric_dimension_set_id);
 CREATE INDEX tenant_id ON alarm_definition USING btree (tenant_id);
+CREATE INDEX alarm_definition_id ON alarm USING btree (alarm_definition_id);
+CREATE INDEX fk_sub_alarm ON sub_alarm USING btree (alarm_id);
+CREATE INDEX fk_sub_alarm_expr ON sub_alarm USING btree (sub_expression_id);
+CREATE INDEX fk_sub_alarm_definition ON sub_alarm_definition USING btree (alarm_definition_id);
+CREATE INDEX fk_sub_alarm_definition_dimension ON sub_alarm_definition_dimension USING btree (sub_alarm_definition_id);
+CREATE INDEX alarm_alarm_definition_id_state ON alarm USING btree (alarm_definition_id, state, lifecycle_state);
+CREATE INDEX alarm_action_alarm_state ON alarm_action USING btree (alarm_state, alarm_definition_id, action_id);
+CREATE INDEX alarm_definition_tenant_id_deleted_at ON alarm_definition USING btree (tenant_id, deleted_at);
+CREATE INDEX metric_definition_name ON metric_definition USING btree (name);
+CREATE INDEX metric_dimension_name_value ON metric_dimension USING btree (name, value);
+CREATE INDEX notification_method_tenant_id ON notification_method USING btree (tenant_id);
+CREATE INDEX sub_alarm_definition_dimension_name_value ON sub_alarm_definition_dimension USING btree (dimension_name, value);
 
 ---
 -- foreign key constraints
@@ -210,6 +222,83 @@ ALTER TABLE ONLY alarm_definition
 ALTER TABLE ONLY notification_method
     ADD CONSTRAINT fk_alarm_noticication_method_type FOREIGN KEY (type) REFERENCES notification_method_type (name);
 
+---
+-- inverted indexes of the dimensions of the alarms and alarm definitions,
+-- alarm_metric_dimension is filled by the triggers on alarm_metric below
+---
+
+CREATE TABLE alarm_metric_dimension (
+    tenant_id character varying(36) NOT NULL,
+    dimension_name character varying(255) NOT NULL,
+    value character varying(255) NOT NULL,
+    alarm_id character varying(36) NOT NULL,
+    metric_definition_dimensions_id bytea NOT NULL
+);
+
+CREATE TABLE alarm_definition_dimension (
+    tenant_id character varying(36) NOT NULL,
+    dimension_name character varying(255) NOT NULL,
+    value character varying(255) NOT NULL,
+    alarm_definition_id character varying(36) NOT NULL,
+    sub_alarm_definition_id character varying(36) NOT NULL
+);
+
+CREATE INDEX alarm_metric_dimension_tenant_id_name_value ON alarm_metric_dimension USING btree (tenant_id, dimension_name, value);
+CREATE INDEX alarm_metric_dimension_alarm_id ON alarm_metric_dimension USING btree (alarm_id, metric_definition_dimensions_id);
+CREATE INDEX alarm_definition_dimension_tenant_id_name_value ON alarm_definition_dimension USING btree (tenant_id, dimension_name, value);
+CREATE INDEX alarm_definition_dimension_alarm_definition_id ON alarm_definition_dimension USING btree (alarm_definition_id);
+CREATE INDEX alarm_definition_dimension_sad_id ON alarm_definition_dimension USING btree (sub_alarm_definition_id);
+
+ALTER TABLE ONLY alarm_metric_dimension
+    ADD CONSTRAINT fk_alarm_metric_dimension_alarm_id FOREIGN KEY (alarm_id) REFERENCES alarm(id) ON DELETE CASCADE;
+
+ALTER TABLE ONLY alarm_definition_dimension
+    ADD CONSTRAINT fk_alarm_definition_dimension_sad_id FOREIGN KEY (sub_alarm_definition_id) REFERENCES sub_alarm_definition(id) ON DELETE CASCADE;
+
+CREATE FUNCTION alarm_metric_insert_dimensions() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO alarm_metric_dimension
+        (tenant_id, dimension_name, value, alarm_id, metric_definition_dimensions_id)
+    SELECT ad.tenant_id, md.name, md.value, NEW.alarm_id, NEW.metric_definition_dimensions_id
+    FROM alarm a
+    JOIN alarm_definition ad ON ad.id = a.alarm_definition_id
+    JOIN metric_definition_dimensions mdd ON mdd.id = NEW.metric_definition_dimensions_id
+    JOIN metric_dimension md ON md.dimension_set_id = mdd.metric_dimension_set_id
+    WHERE a.id = NEW.alarm_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION alarm_metric_delete_dimensions() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM alarm_metric_dimension
+    WHERE alarm_id = OLD.alarm_id
+    AND metric_definition_dimensions_id = OLD.metric_definition_dimensions_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER alarm_metric_insert_dimensions AFTER INSERT ON alarm_metric
+    FOR EACH ROW EXECUTE PROCEDURE alarm_metric_insert_dimensions();
+
+CREATE TRIGGER alarm_metric_delete_dimensions AFTER DELETE ON alarm_metric
+    FOR EACH ROW EXECUTE PROCEDURE alarm_metric_delete_dimensions();
+
+---
+-- outbox of the events of the changes of alarms and alarm definitions,
+-- published to kafka by the outbox relay of the API processes
+---
+
+CREATE TABLE event_outbox (
+    id bigserial NOT NULL,
+    topic character varying(255) NOT NULL,
+    message text NOT NULL,
+    created_at timestamp without time zone NOT NULL,
+    claimed_by character varying(36),
+    claimed_until timestamp without time zone,
+    CONSTRAINT event_outbox_pkey PRIMARY KEY (id)
+);
+
 ---
 -- data for enum tables
 ---
@@ -23,6 +23,61 @@ _TENANT_ID_PARAM = 'tenant_id'
 """Name of the query-param pointing at project-id (tenant-id)"""
 
 
+class QueryParams(object):
+    """Query params of a request, parsed once
+
+    Values derived from the params, e.g. the dimensions or the start
+    time, are built on first use and kept for the rest of the request,
+    so that the resource and the helpers share them.
+
+    """
+
+    def __init__(self, params):
+        self._params = params
+        self._values = {}
+
+    def __contains__(self, name):
+        return name in self._params
+
+    def __getitem__(self, name):
+        return self._params[name]
+
+    def to_dict(self):
+        """Returns a copy of the raw params which may be modified
+
+        :rtype: dict
+
+        """
+        return dict(self._params)
+
+    def value(self, key, build):
+        """Returns the value stored under key, building it on first use
+
+        Values are not stored if build raises an exception.
+
+        :param key: hashable key of the value, e.g. ('dimensions', 'dimensions')
+        :param build: function building the value from the raw params dict
+
+        """
+        try:
+            return self._values[key]
+        except KeyError:
+            value = self._values[key] = build(self._params)
+            return value
+
+
+def _parse_limit(params):
+    limit = params.get('limit')
+    if isinstance(limit, list):
+        limit = limit[-1]
+    if limit is None:
+        return constants.PAGE_LIMIT
+    if not limit.isdigit():
+        err_msg = 'Limit parameter must be a positive integer'
+        raise exceptions.HTTPUnprocessableEntityError('Invalid limit', err_msg)
+    return min(int(limit), constants.PAGE_LIMIT)
+
+
 class Request(falcon.Request):
     """Variation of falcon.Request with context
 
@@ -34,6 +89,7 @@ class Request(falcon.Request):
     def __init__(self, env, options=None):
         super(Request, self).__init__(env, options)
         self.context = context.RequestContext.from_environ(self.env)
+        self._query_params = None
 
     @property
     def project_id(self):
@@ -91,19 +147,22 @@ class Request(falcon.Request):
         :raise exceptions.HTTPUnprocessableEntityError: if limit is not valid integer
 
         """
-        limit = self.get_param('limit', required=False, default=None)
-        if limit is not None:
-            if limit.isdigit():
-                limit = int(limit)
-                if limit > constants.PAGE_LIMIT:
-                    return constants.PAGE_LIMIT
-                else:
-                    return limit
-            else:
-                err_msg = 'Limit parameter must be a positive integer'
-                raise exceptions.HTTPUnprocessableEntityError('Invalid limit', err_msg)
-        else:
-            return constants.PAGE_LIMIT
+        return self.query_params.value('limit', _parse_limit)
+
+    @property
+    def query_params(self):
+        """Returns the query params of the request
+
+        The query string is parsed by falcon when the request is created,
+        the values derived from it are kept in the returned object.
+
+        :return: query params
+        :rtype: QueryParams
+
+        """
+        if self._query_params is None:
+            self._query_params = QueryParams(self.params)
+        return self._query_params
 
     def __repr__(self):
         return '%s, context=%s' % (self.path, self.context)
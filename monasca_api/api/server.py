@@ -23,6 +23,7 @@ from oslo_log import log
 import paste.deploy
 
 from monasca_api.api.core import request
+from monasca_api.v2.reference import outbox_relay
 
 dispatcher_opts = [cfg.StrOpt('versions', default=None,
                               help='Versions'),
@@ -68,7 +69,8 @@ def launch(conf, config_file="/etc/monasca/api-config.conf"):
              default_config_files=[config_file])
     log.setup(cfg.CONF, 'monasca_api')
 
-    app = falcon.API(request_type=request.Request)
+    app = falcon.API(request_type=request.Request,
+                     middleware=[outbox_relay.RelayStarter()])
 
     versions = simport.load(cfg.CONF.dispatcher.versions)()
     app.add_route("/", versions)
@@ -127,6 +129,7 @@ def launch(conf, config_file="/etc/monasca/api-config.conf"):
     app.add_route("/v2.0/notification-methods/types", notification_method_types)
 
     LOG.debug('Dispatcher drivers have been added to the routes!')
+
     return app
 
 
@@ -0,0 +1,139 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Cache of the metric names, dimension names and dimension values
+
+Dashboards query these catalog endpoints many times per page load, while
+the catalog of a tenant changes rarely. The results of the repository are
+cached for [catalog_cache] ttl seconds, per tenant, region and query
+parameters, in a backend loaded from [catalog_cache] backend:
+
+    monasca_api.common.catalog_cache:InProcessBackend
+        LRU cache of at most max_entries results in each API process
+    monasca_api.common.catalog_cache:MemcachedBackend
+        cache shared by all API processes in memcached_servers
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+import memcache
+from monasca_common.simport import simport
+from oslo_config import cfg
+from oslo_log import log
+
+from monasca_api.common import lru_cache
+from monasca_api.monitoring import client as monitoring_client
+from monasca_api.monitoring.metrics import CATALOG_CACHE_HITS, CATALOG_CACHE_MISSES
+
+LOG = log.getLogger(__name__)
+
+STATSD_CLIENT = monitoring_client.get_client()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the catalog cache shared by all resources of the process
+
+    If the cache is disabled, a cache which always loads the results from
+    the repository is returned.
+    """
+    global _cache
+
+    if not cfg.CONF.catalog_cache.enabled:
+        return CatalogCache(None, 0)
+
+    with _cache_lock:
+        if _cache is None:
+            backend = simport.load(cfg.CONF.catalog_cache.backend)()
+            _cache = CatalogCache(backend, cfg.CONF.catalog_cache.ttl)
+            LOG.info('Caching catalog results in %s for %d seconds',
+                     cfg.CONF.catalog_cache.backend, cfg.CONF.catalog_cache.ttl)
+        return _cache
+
+
+class CatalogCache(object):
+
+    def __init__(self, backend, ttl):
+        self._backend = backend
+        self._ttl = ttl
+        self._statsd_hit_count = STATSD_CLIENT.get_counter(CATALOG_CACHE_HITS)
+        self._statsd_miss_count = STATSD_CLIENT.get_counter(CATALOG_CACHE_MISSES)
+
+    def get(self, resource, tenant_id, region, params, load):
+        """Returns the cached result or loads and caches it
+
+        Cached results are shared between requests, they must not be
+        modified.
+
+        :param resource: name of the catalog resource, e.g. 'metric_names'
+        :param params: dict of the query parameters the result depends on
+        :param load: function loading the result from the repository
+        """
+        if self._backend is None:
+            return load()
+
+        key = self._build_key(resource, tenant_id, region, params)
+
+        result = self._backend.get(key)
+        if result is not None:
+            self._statsd_hit_count.increment(1, dimensions={'resource': resource})
+            return result
+
+        self._statsd_miss_count.increment(1, dimensions={'resource': resource})
+        result = load()
+        self._backend.set(key, result, self._ttl)
+        return result
+
+    @staticmethod
+    def _build_key(resource, tenant_id, region, params):
+        # Hashed to keep the keys short and free of spaces for memcached
+        key = json.dumps([resource, tenant_id, region, params], sort_keys=True)
+        return 'monasca_catalog_' + hashlib.sha1(key).hexdigest()
+
+
+class InProcessBackend(object):
+
+    def __init__(self):
+        # key -> (expiry time, result)
+        self._entries = lru_cache.LRUCache(cfg.CONF.catalog_cache.max_entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            self._entries.pop(key)
+            return None
+        return entry[1]
+
+    def set(self, key, result, ttl):
+        self._entries.set(key, (time.time() + ttl, result))
+
+
+class MemcachedBackend(object):
+
+    def __init__(self):
+        self._client = memcache.Client(cfg.CONF.catalog_cache.memcached_servers)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, result, ttl):
+        if not self._client.set(key, result, time=ttl):
+            LOG.warning('Failed to store catalog result in memcached')
@@ -0,0 +1,98 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Thread safe LRU cache shared by the in-process caches of the API"""
+
+import collections
+import threading
+
+
+class LRUCache(object):
+    """Cache of at most max_entries values, least recently used evicted first
+
+    The cache may be used by several threads at once. Values are loaded
+    outside of the lock, so two threads missing the same key both load it
+    and the last one is kept. None cannot be cached, as it stands for a
+    missing value.
+
+    :param max_entries: maximum number of values kept
+    :param hit_counter: statsd counter incremented by the number of hits
+    :param miss_counter: statsd counter incremented by the number of misses
+    """
+
+    def __init__(self, max_entries, hit_counter=None, miss_counter=None):
+        self.max_entries = max_entries
+        self._hit_counter = hit_counter
+        self._miss_counter = miss_counter
+        # key -> value, least recently used first
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the value of the key, None if it is not cached"""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Returns a dict of the keys which are cached to their values"""
+        values = {}
+        with self._lock:
+            for key in keys:
+                value = self._entries.pop(key, None)
+                if value is not None:
+                    self._entries[key] = value
+                    values[key] = value
+        self._count(len(values), len(keys) - len(values))
+        return values
+
+    def get_or_load(self, key, load):
+        """Returns the value of the key, loading and caching it if missing
+
+        :param load: function returning the value, exceptions it raises
+                     are passed on and nothing is cached
+        """
+        value = self.get(key)
+        if value is None:
+            value = load()
+            self.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def set_many(self, items):
+        """Caches the values of the (key, value) items"""
+        with self._lock:
+            for key, value in items:
+                self._entries.pop(key, None)
+                self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        """Removes the key and returns its value, None if it is not cached"""
+        with self._lock:
+            return self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _count(self, hits, misses):
+        if hits and self._hit_counter is not None:
+            self._hit_counter.increment(hits)
+        if misses and self._miss_counter is not None:
+            self._miss_counter.increment(misses)
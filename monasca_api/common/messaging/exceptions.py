@@ -15,3 +15,7 @@
 
 class MessageQueueException(Exception):
     pass
+
+
+class MessageQueueFullException(MessageQueueException):
+    pass
@@ -11,13 +11,19 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import atexit
+import collections
+import os
+import threading
+import time
+
 from oslo_config import cfg
 from oslo_log import log
 
 from monasca_api.common.messaging import exceptions
 from monasca_api.common.messaging import publisher
 from monasca_api.monitoring import client as monitoring_client
-from monasca_api.monitoring.metrics import KAFKA_PRODUCER_ERRORS
+from monasca_api.monitoring.metrics import KAFKA_PRODUCER_ERRORS, KAFKA_PRODUCER_QUEUE_FULL
 
 import monasca_common.kafka.producer as kafka_producer
 import monasca_common.kafka_lib.common as kafka_common
@@ -26,6 +32,7 @@ LOG = log.getLogger(__name__)
 
 STATSD_CLIENT = monitoring_client.get_client()
 
+
 class KafkaPublisher(publisher.Publisher):
     def __init__(self, topic):
         if not cfg.CONF.kafka.uri:
@@ -50,10 +57,31 @@ class KafkaPublisher(publisher.Publisher):
                                                                            dimensions={'topic': self.topic})
         self._producer = kafka_producer.KafkaProducer(self.uri)
 
+        self._batcher = None
+        if self.async:
+            self._batcher = MessageBatcher(
+                self._publish_batch,
+                max_queue_size=cfg.CONF.kafka.queue_size,
+                max_batch_bytes=cfg.CONF.kafka.batch_max_bytes,
+                linger=cfg.CONF.kafka.batch_linger_ms / 1000.0,
+                retry_after=cfg.CONF.kafka.retry_after,
+                name='kafka-publisher-' + self.topic)
+            atexit.register(self.close)
+
     def close(self):
-        pass
+        if self._batcher is not None:
+            self._batcher.close()
 
     def send_message(self, message):
+        if self._batcher is not None:
+            self._batcher.put(message)
+        else:
+            self._publish(message)
+
+    def send_messages(self, messages):
+        self._publish(messages)
+
+    def _publish(self, message):
         try:
             self._producer.publish(self.topic, message)
 
@@ -66,3 +94,140 @@ class KafkaPublisher(publisher.Publisher):
             LOG.exception('Unknown error.')
             self.statsd_kafka_producer_error_count.increment(1, sample_rate=1.0)
             raise exceptions.MessageQueueException()
+
+    def _publish_batch(self, messages):
+        """Publishes a batch on behalf of the background thread
+
+        There is no request left to report an error to, so the batch is
+        retried max_retry times, waiting wait_time seconds in between,
+        before it is dropped.
+        """
+        for attempt in range(self.max_retry + 1):
+            try:
+                self._publish(messages)
+                return
+            except exceptions.MessageQueueException:
+                if attempt < self.max_retry:
+                    time.sleep(self.wait_time)
+
+        LOG.error('Dropped %d messages for topic %s after %d retries.',
+                  len(messages), self.topic, self.max_retry)
+
+
+class MessageBatcher(object):
+    """Coalesces messages from concurrent requests into batches
+
+    Messages are appended to a bounded in process queue and a background
+    thread hands them to the send function in batches of at most
+    max_batch_bytes. A batch that is not full is sent once the first
+    message in it waited linger seconds.
+
+    The thread is started by the first put of each process, as the thread
+    of a batcher built before the process was forked, e.g. by a server
+    preloading the application, does not run in the child process.
+    """
+
+    def __init__(self, send, max_queue_size, max_batch_bytes, linger,
+                 retry_after, name=None):
+        self._send = send
+        self._max_queue_size = max_queue_size
+        self._max_batch_bytes = max_batch_bytes
+        self._linger = linger
+        self._retry_after = retry_after
+
+        self._queue = collections.deque()
+        self._queue_bytes = 0
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self._statsd_queue_full_count = STATSD_CLIENT.get_counter(KAFKA_PRODUCER_QUEUE_FULL)
+
+        self._name = name
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def put(self, messages):
+        """Queues the messages of a single request
+
+        Either all of the messages are queued or, if they do not fit, none
+        of them and MessageQueueFullException is raised.
+        """
+        if not isinstance(messages, list):
+            messages = [messages]
+
+        if self._pid != os.getpid():
+            self._start()
+
+        with self._condition:
+            if self._closed:
+                raise exceptions.MessageQueueException('Publisher is closed')
+            if len(self._queue) + len(messages) > self._max_queue_size:
+                self._statsd_queue_full_count.increment(len(messages))
+                ex = exceptions.MessageQueueFullException(
+                    'Message queue is full, try again later')
+                ex.retry_after = self._retry_after
+                raise ex
+            self._queue.extend(messages)
+            self._queue_bytes += sum(len(message) for message in messages)
+            self._condition.notify()
+
+    def close(self, timeout=None):
+        """Stops accepting messages and waits until the queue is flushed"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked, the queued messages are sent by the parent process
+                self._queue = collections.deque()
+                self._queue_bytes = 0
+                self._condition = threading.Condition()
+            self._thread = threading.Thread(target=self._run, name=self._name)
+            self._thread.daemon = True
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._send(batch)
+            except Exception:
+                LOG.exception('Error occurred while sending a batch of %d messages.',
+                              len(batch))
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._queue and not self._closed:
+                self._condition.wait()
+
+            if not self._queue:
+                return None
+
+            deadline = time.time() + self._linger
+            while not self._closed and self._queue_bytes < self._max_batch_bytes:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = []
+            batch_bytes = 0
+            while self._queue:
+                message_bytes = len(self._queue[0])
+                if batch and batch_bytes + message_bytes > self._max_batch_bytes:
+                    break
+                batch.append(self._queue.popleft())
+                batch_bytes += message_bytes
+            self._queue_bytes -= batch_bytes
+
+            return batch
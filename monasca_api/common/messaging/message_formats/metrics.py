@@ -13,21 +13,46 @@
 # under the License.
 
 import json
+from json import encoder as json_encoder
 
 from oslo_utils import timeutils
 
 
+def _build_envelope(tenant_id, region):
+    """Pre-encodes the part of the message shared by all metrics of a request
+
+    :return: tuple (prefix, suffix) to put around the json of each metric
+    """
+    suffix = ', "meta": {"tenantId": %s, "region": %s}, "creation_time": %d}' % (
+        _encode_string(tenant_id), _encode_string(region), timeutils.utcnow_ts())
+    return '{"metric": ', suffix
+
+
+def _encode_string(value):
+    # Cheaper than json.dumps for the few scalars of the envelope
+    if value is None:
+        return 'null'
+    return json_encoder.encode_basestring_ascii(value)
+
+
 def transform(metrics, tenant_id, region):
-    transformed_metric = {'metric': {},
-                          'meta': {'tenantId': tenant_id, 'region': region},
-                          'creation_time': timeutils.utcnow_ts()}
+    prefix, suffix = _build_envelope(tenant_id, region)
 
     if isinstance(metrics, list):
-        transformed_metrics = []
-        for metric in metrics:
-            transformed_metric['metric'] = metric
-            transformed_metrics.append(json.dumps(transformed_metric))
-        return transformed_metrics
+        return [prefix + json.dumps(metric) + suffix for metric in metrics]
     else:
-        transformed_metric['metric'] = metrics
-        return [json.dumps(transformed_metric)]
+        return [prefix + json.dumps(metrics) + suffix]
+
+
+def transform_encoded(encoded_metrics, tenant_id, region):
+    """Builds the messages from metrics which are already encoded as JSON
+
+    The JSON of every metric, e.g. the slice of the request body it was
+    parsed from, is spliced into the message as is, without decoding and
+    encoding it again.
+
+    :param encoded_metrics: list of utf-8 encoded JSON objects
+    """
+    prefix, suffix = _build_envelope(tenant_id, region)
+
+    return [prefix + encoded_metric + suffix for encoded_metric in encoded_metrics]
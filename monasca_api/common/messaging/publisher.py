@@ -22,3 +22,13 @@ class Publisher(object):
     @abc.abstractmethod
     def send_message(self, message):
         return
+
+    def send_messages(self, messages):
+        """Sends the messages before returning
+
+        Unlike send_message, which may queue the messages in process,
+        the messages are sent when the method returns, or
+        MessageQueueException is raised.
+        """
+        for message in messages:
+            self.send_message(message)
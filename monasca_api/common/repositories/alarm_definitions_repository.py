@@ -26,7 +26,7 @@ class AlarmDefinitionsRepository(object):
     def create_alarm_definition(self, tenant_id, name, expression,
                                 sub_expr_list, description, severity, match_by,
                                 alarm_actions, undetermined_actions,
-                                ok_action):
+                                ok_action, events=None):
         pass
 
     @abc.abstractmethod
@@ -38,7 +38,8 @@ class AlarmDefinitionsRepository(object):
         pass
 
     @abc.abstractmethod
-    def delete_alarm_definition(self, tenant_id, alarm_definition_id):
+    def delete_alarm_definition(self, tenant_id, alarm_definition_id,
+                                events=None):
         pass
 
     @abc.abstractmethod
@@ -64,5 +65,6 @@ class AlarmDefinitionsRepository(object):
                                          alarm_actions,
                                          ok_actions,
                                          undetermined_actions,
-                                         match_by, severity, patch):
+                                         match_by, severity, patch,
+                                         events=None):
         pass
@@ -33,11 +33,12 @@ class AlarmsRepository(object):
         pass
 
     @abc.abstractmethod
-    def update_alarm(self, tenant_id, alarm_id, state, lifecycle_state, link):
+    def update_alarm(self, tenant_id, alarm_id, state, lifecycle_state, link,
+                     events=None):
         pass
 
     @abc.abstractmethod
-    def delete_alarm(self, tenant_id, id):
+    def delete_alarm(self, tenant_id, id, events=None):
         pass
 
     @abc.abstractmethod
@@ -48,6 +49,10 @@ class AlarmsRepository(object):
     def get_alarms(self, tenant_id, query_parms, offset, limit):
         pass
 
+    @abc.abstractmethod
+    def get_alarm_ids(self, tenant_id, metric_dimensions):
+        pass
+
     @abc.abstractmethod
     def get_alarms_count(self, tenant_id, query_parms, offset, limit):
         pass
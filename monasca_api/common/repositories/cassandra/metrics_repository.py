@@ -16,21 +16,202 @@ import binascii
 from datetime import datetime
 from datetime import timedelta
 import hashlib
+import heapq
 import itertools
 import json
 import urllib
 
 from cassandra.cluster import Cluster
-from cassandra.query import SimpleStatement
+from cassandra.concurrent import execute_concurrent
+from cassandra.policies import DCAwareRoundRobinPolicy
+from cassandra.policies import TokenAwarePolicy
+try:
+    import numpy as np
+except ImportError:
+    np = None
 from oslo_config import cfg
 from oslo_log import log
 from oslo_utils import timeutils
 
+from monasca_api.common import lru_cache
 from monasca_api.common.repositories import exceptions
 from monasca_api.common.repositories import metrics_repository
+from monasca_api.common.repositories import series_cursor
+import monasca_api.monitoring.client as monitoring_client
+from monasca_api.monitoring.metrics import CASSANDRA_STATEMENT_CACHE_HITS
+from monasca_api.monitoring.metrics import CASSANDRA_STATEMENT_CACHE_MISSES
 
 LOG = log.getLogger(__name__)
 
+STATSD_CLIENT = monitoring_client.get_client()
+
+EPOCH = datetime(1970, 1, 1)
+
+# Number of rows aggregated at once when computing statistics
+AGGREGATION_CHUNK_SIZE = 100000
+
+# Number of alarms whose state history is read by a single query
+ALARM_HISTORY_CHUNK_SIZE = 100
+
+# Order of the statistics columns in the results
+_STATISTICS = (u'avg', u'min', u'max', u'count', u'sum')
+
+
+def _millis(dt):
+    # Exact integer arithmetic, total_seconds() may round off a millisecond
+    delta = dt - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000 + delta.microseconds // 1000
+
+
+def _aggregate_statistics(time_stamps, sums, origin_ms, period_ms,
+                          counts=None, mins=None, maxs=None):
+    """Computes count, sum, min and max of the measurements for every period
+
+    The measurements are put in the period (origin_ms + n * period_ms) they
+    fall into by integer division of their epoch milliseconds. Aggregated
+    measurements, like the rows of the rollup table, come with their counts,
+    mins and maxs, raw measurements only with their values. NumPy is used if
+    it is installed, otherwise the statistics are computed in Python.
+
+    :param time_stamps: epoch milliseconds of the measurements
+    :param sums: values of the measurements
+    :return: dict of period number to [count, sum, min, max] of the period,
+             periods without measurements are left out
+    """
+    if np is None:
+        return _aggregate_statistics_python(time_stamps, sums, origin_ms,
+                                            period_ms, counts, mins, maxs)
+    return _aggregate_statistics_numpy(time_stamps, sums, origin_ms,
+                                       period_ms, counts, mins, maxs)
+
+
+def _aggregate_statistics_numpy(time_stamps, sums, origin_ms, period_ms,
+                                counts=None, mins=None, maxs=None):
+    buckets = (np.asarray(time_stamps, dtype=np.int64) - origin_ms) // period_ms
+    sums = np.asarray(sums, dtype=np.float64)
+    mins = sums if mins is None else np.asarray(mins, dtype=np.float64)
+    maxs = sums if maxs is None else np.asarray(maxs, dtype=np.float64)
+    if counts is not None:
+        counts = np.asarray(counts, dtype=np.int64)
+
+    if len(buckets) > 1 and (buckets[1:] < buckets[:-1]).any():
+        order = np.argsort(buckets, kind='mergesort')
+        buckets = buckets[order]
+        sums = sums[order]
+        mins = mins[order]
+        maxs = maxs[order]
+        if counts is not None:
+            counts = counts[order]
+
+    # Index of the first measurement of every period
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+
+    if counts is None:
+        period_counts = np.diff(np.append(starts, len(buckets)))
+    else:
+        period_counts = np.add.reduceat(counts, starts)
+
+    return dict(zip(buckets[starts].tolist(),
+                    map(list, zip(period_counts.tolist(),
+                                  np.add.reduceat(sums, starts).tolist(),
+                                  np.minimum.reduceat(mins, starts).tolist(),
+                                  np.maximum.reduceat(maxs, starts).tolist()))))
+
+
+def _aggregate_statistics_python(time_stamps, sums, origin_ms, period_ms,
+                                 counts=None, mins=None, maxs=None):
+    if counts is None:
+        counts = itertools.repeat(1)
+    if mins is None:
+        mins = sums
+    if maxs is None:
+        maxs = sums
+
+    aggregates = {}
+    for time_stamp, count, total, minimum, maximum in itertools.izip(
+            time_stamps, counts, sums, mins, maxs):
+        bucket = (time_stamp - origin_ms) // period_ms
+        aggregate = aggregates.get(bucket)
+        if aggregate is None:
+            aggregates[bucket] = [count, total, minimum, maximum]
+        else:
+            aggregate[0] += count
+            aggregate[1] += total
+            if minimum < aggregate[2]:
+                aggregate[2] = minimum
+            if maximum > aggregate[3]:
+                aggregate[3] = maximum
+    return aggregates
+
+
+def _aggregate_rows(rows, origin_ms, period_ms, rollups=False):
+    """Aggregates the rows of a query chunk by chunk to bound the memory
+
+    :param rows: (time_stamp, value, ...) rows of the measurements table or
+                 (time_stamp, count, sum, min, max) rows of the rollup table
+    """
+    aggregates = {}
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, AGGREGATION_CHUNK_SIZE))
+        if not chunk:
+            return aggregates
+
+        columns = zip(*chunk)
+        time_stamps = [_millis(time_stamp) for time_stamp in columns[0]]
+        if rollups:
+            _merge_aggregates(aggregates, _aggregate_statistics(
+                time_stamps, columns[2], origin_ms, period_ms,
+                columns[1], columns[3], columns[4]))
+        else:
+            _merge_aggregates(aggregates, _aggregate_statistics(
+                time_stamps, columns[1], origin_ms, period_ms))
+
+
+def _merge_aggregates(aggregates, other_aggregates):
+    for bucket, (count, total, minimum, maximum) in other_aggregates.iteritems():
+        aggregate = aggregates.get(bucket)
+        if aggregate is None:
+            aggregates[bucket] = [count, total, minimum, maximum]
+        else:
+            aggregate[0] += count
+            aggregate[1] += total
+            aggregate[2] = min(aggregate[2], minimum)
+            aggregate[3] = max(aggregate[3], maximum)
+    return aggregates
+
+
+def _statistics(aggregate, statistics):
+    count, total, minimum, maximum = aggregate
+    values = {u'avg': total / count, u'min': minimum, u'max': maximum,
+              u'count': count, u'sum': total}
+    return [values[stat] for stat in statistics]
+
+
+class PreparedStatementCache(object):
+    """LRU cache of the prepared statements of a session
+
+    The statements are keyed on their CQL. All values of the queries built
+    by the repository are bound, so the CQL only depends on the shape of a
+    query: the number of dimension predicates, the length of the IN lists
+    and which of the optional offset, time range and limit clauses are
+    present. Every shape is prepared the first time it is used.
+    """
+
+    def __init__(self, session, max_size):
+        self._session = session
+        self._statements = lru_cache.LRUCache(
+            max_size,
+            STATSD_CLIENT.get_counter(CASSANDRA_STATEMENT_CACHE_HITS),
+            STATSD_CLIENT.get_counter(CASSANDRA_STATEMENT_CACHE_MISSES))
+
+    def get(self, cql):
+        return self._statements.get_or_load(
+            cql, lambda: self._session.prepare(cql))
+
+    def __len__(self):
+        return len(self._statements)
+
 
 class MetricsRepository(metrics_repository.AbstractMetricsRepository):
     def __init__(self):
@@ -39,12 +220,19 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
 
             self.conf = cfg.CONF
 
+            # Route requests to a replica of the partition they read
             self._cassandra_cluster = Cluster(
-                self.conf.cassandra.cluster_ip_addresses.split(','))
+                self.conf.cassandra.cluster_ip_addresses.split(','),
+                load_balancing_policy=TokenAwarePolicy(
+                    DCAwareRoundRobinPolicy()))
 
             self.cassandra_session = self._cassandra_cluster.connect(
                 self.conf.cassandra.keyspace)
 
+            self._statements = PreparedStatementCache(
+                self.cassandra_session,
+                self.conf.cassandra.statement_cache_size)
+
         except Exception as ex:
             LOG.exception(ex)
             raise exceptions.RepositoryException(ex)
@@ -73,7 +261,7 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
 
             if or_dimensions:
                 or_dims_list = list(itertools.product(*or_dimensions))
-                metrics_list = []
+                dimensions_list = []
 
                 for or_dims_tuple in or_dims_list:
                     extracted_dimensions = sub_dimensions.copy()
@@ -82,14 +270,12 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
                         for k, v in dims.iteritems():
                             extracted_dimensions[k] = v
 
-                    metrics = self._list_metrics(tenant_id, region, name,
-                                                 extracted_dimensions, offset,
-                                                 limit, start_timestamp,
-                                                 end_timestamp,
-                                                 include_metric_hash)
-                    metrics_list += metrics
+                    dimensions_list.append(extracted_dimensions)
 
-                return sorted(metrics_list, key=lambda metric: metric['id'])
+                return self._list_metrics_concurrently(tenant_id, region, name,
+                                                       dimensions_list, offset,
+                                                       limit,
+                                                       include_metric_hash)
 
         return self._list_metrics(tenant_id, region, name, dimensions,
                                   offset, limit, start_timestamp,
@@ -101,76 +287,148 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
 
         try:
 
-            select_stmt = """
-              select tenant_id, region, metric_hash, metric_map
-              from metric_map
-              where tenant_id = %s and region = %s
-              """
+            select_stmt, parms = self._build_list_metrics_query(
+                tenant_id, region, name, dimensions, offset, limit)
 
-            parms = [tenant_id.encode('utf8'), region.encode('utf8')]
+            rows = self._execute(select_stmt, parms)
 
-            name_clause = self._build_name_clause(name, parms)
+            return list(self._metrics_from_rows(rows, include_metric_hash))
 
-            dimension_clause = self._build_dimensions_clause(dimensions, parms)
+        except Exception as ex:
+            LOG.exception(ex)
+            raise exceptions.RepositoryException(ex)
 
-            select_stmt += name_clause + dimension_clause
+    def _list_metrics_concurrently(self, tenant_id, region, name,
+                                   dimensions_list, offset, limit,
+                                   include_metric_hash=False):
+        """Lists the metrics matching any of the sets of dimensions
 
-            if offset:
-                select_stmt += ' and metric_hash > %s '
-                parms.append(bytearray(offset.decode('hex')))
+        The queries for all sets of dimensions are sent at once, with at most
+        concurrent_queries of them in flight. Each query returns its metrics
+        sorted by metric hash, so the results are merged in order and reading
+        stops once limit + 1 metrics are found.
+        """
+
+        try:
+
+            statements = []
+            for dimensions in dimensions_list:
+                select_stmt, parms = self._build_list_metrics_query(
+                    tenant_id, region, name, dimensions, offset, limit)
+                statements.append((self._bind(select_stmt, parms), None))
+
+            results = execute_concurrent(
+                self.cassandra_session, statements,
+                concurrency=self.conf.cassandra.concurrent_queries,
+                raise_on_first_error=True)
+
+            metrics = heapq.merge(*[
+                self._keyed_by_id(index, self._metrics_from_rows(
+                    rows, include_metric_hash))
+                for index, (success, rows) in enumerate(results)])
 
             if limit:
-                select_stmt += ' limit %s '
-                parms.append(limit + 1)
+                metrics = itertools.islice(metrics, limit + 1)
 
-            select_stmt += ' allow filtering '
+            return [metric for (metric_id, index, metric) in metrics]
 
-            json_metric_list = []
+        except Exception as ex:
+            LOG.exception(ex)
+            raise exceptions.RepositoryException(ex)
 
-            stmt = SimpleStatement(select_stmt,
-                                   fetch_size=2147483647)
+    @staticmethod
+    def _keyed_by_id(index, metrics):
+        # The index of the query keeps heapq.merge from comparing the dicts
+        for metric in metrics:
+            yield metric[u'id'], index, metric
 
-            rows = self.cassandra_session.execute(stmt, parms)
+    def _build_list_metrics_query(self, tenant_id, region, name, dimensions,
+                                  offset, limit):
 
-            if not rows:
-                return json_metric_list
+        select_stmt = """
+          select tenant_id, region, metric_hash, metric_map
+          from metric_map
+          where tenant_id = %s and region = %s
+          """
 
-            for (tenant_id, region, metric_hash, metric_map) in rows:
+        parms = [tenant_id.encode('utf8'), region.encode('utf8')]
 
-                metric = {}
+        name_clause = self._build_name_clause(name, parms)
 
-                dimensions = {}
+        dimension_clause = self._build_dimensions_clause(dimensions, parms)
 
-                if include_metric_hash:
-                    metric[u'metric_hash'] = metric_hash
+        select_stmt += name_clause + dimension_clause
 
-                for name, value in metric_map.iteritems():
+        if offset:
+            select_stmt += ' and metric_hash > %s '
+            parms.append(bytearray(offset.decode('hex')))
 
-                    if name == '__name__':
+        if limit:
+            select_stmt += ' limit %s '
+            parms.append(limit + 1)
 
-                        name = urllib.unquote_plus(value)
+        select_stmt += ' allow filtering '
 
-                        metric[u'name'] = name
+        return select_stmt, parms
 
-                    else:
+    @staticmethod
+    def _metrics_from_rows(rows, include_metric_hash):
 
-                        name = urllib.unquote_plus(name)
+        for (tenant_id, region, metric_hash, metric_map) in rows:
 
-                        value = urllib.unquote_plus(value)
+            metric = {}
 
-                        dimensions[name] = value
+            dimensions = {}
 
-                metric[u'dimensions'] = dimensions
+            if include_metric_hash:
+                metric[u'metric_hash'] = metric_hash
 
-                metric[u'id'] = binascii.hexlify(bytearray(metric_hash))
+            for name, value in metric_map.iteritems():
 
-                json_metric_list.append(metric)
+                if name == '__name__':
 
-            return json_metric_list
+                    name = urllib.unquote_plus(value)
 
-        except Exception as ex:
-            LOG.exception(ex)
-            raise exceptions.RepositoryException(ex)
+                    metric[u'name'] = name
+
+                else:
+
+                    name = urllib.unquote_plus(name)
+
+                    value = urllib.unquote_plus(value)
+
+                    dimensions[name] = value
+
+            metric[u'dimensions'] = dimensions
+
+            metric[u'id'] = binascii.hexlify(bytearray(metric_hash))
+
+            yield metric
+
+    def _bind(self, select_stmt, parms, paged=True):
+        """Binds parms to the prepared statement of the query
+
+        %s placeholders in the query are replaced by ? placeholders.
+        """
+        stmt = self._statements.get(select_stmt.replace('%s', '?')).bind(parms)
+        stmt.fetch_size = self.conf.cassandra.page_size if paged else None
+        return stmt
+
+    def _execute(self, select_stmt, parms, paged=True):
+        """Executes the query and returns an iterator over the result rows
+
+        The query is executed as a prepared statement, see _bind. The driver
+        fetches the rows page by page, as the iterator advances, so that only
+        one page is held in memory. Queries for a page of the API carry a
+        limit clause of limit + 1, so Cassandra stops reading once the rows
+        needed to decide whether there is a next page are returned.
+
+        Cassandra refuses to page queries with both an IN restriction on the
+        partition key and an order by clause, those are executed with paged
+        set to False and return all their rows at once.
+        """
+        return iter(self.cassandra_session.execute(
+            self._bind(select_stmt, parms, paged)))
 
     def _build_dimensions_clause(self, dimensions, parms):
 
@@ -221,15 +479,13 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
 
             json_measurement_list = []
 
+            # The measurements of all metrics are returned as a single series
+            series_index, offset_timestamp = series_cursor.decode(offset)
+
             rows = self._get_measurements(tenant_id, region, name, dimensions,
                                           start_timestamp, end_timestamp,
-                                          offset, limit, merge_metrics_flag)
-
-            if not rows:
-                return json_measurement_list
-
-            if not merge_metrics_flag:
-                dimensions = self._get_dimensions(tenant_id, region, name, dimensions)
+                                          offset_timestamp, limit,
+                                          merge_metrics_flag)
 
             measurements_list = (
                 [[self._isotime_msec(time_stamp),
@@ -237,9 +493,14 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
                   json.loads(value_meta) if value_meta else {}]
                  for (time_stamp, value, value_meta) in rows])
 
+            if not measurements_list:
+                return json_measurement_list
+
+            if not merge_metrics_flag:
+                dimensions = self._get_dimensions(tenant_id, region, name, dimensions)
+
             measurement = {u'name': name,
-                           # The last date in the measurements list.
-                           u'id': measurements_list[-1][0],
+                           u'id': str(series_index),
                            u'dimensions': dimensions,
                            u'columns': [u'timestamp', u'value', u'value_meta'],
                            u'measurements': measurements_list}
@@ -260,18 +521,12 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
                           start_timestamp, end_timestamp, offset, limit,
                           merge_metrics_flag):
 
-        metric_list = self.list_metrics(tenant_id, region, name,
-                                        dimensions, None, None,
-                                        start_timestamp, end_timestamp,
-                                        include_metric_hash=True)
-        if not metric_list:
-            return None
-
-        if len(metric_list) > 1:
-
-            if not merge_metrics_flag:
-                raise exceptions.MultipleMetricsException(
-                    self.MULTIPLE_METRICS_MESSAGE)
+        metric_hash_list = self._get_metric_hashes(tenant_id, region, name,
+                                                   dimensions, start_timestamp,
+                                                   end_timestamp,
+                                                   merge_metrics_flag)
+        if not metric_hash_list:
+            return iter(())
 
         select_stmt = """
           select time_stamp, value, value_meta
@@ -281,9 +536,6 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
 
         parms = [tenant_id.encode('utf8'), region.encode('utf8')]
 
-        metric_hash_list = [bytearray(metric['metric_hash']) for metric in
-                            metric_list]
-
         place_holders = ["%s"] * len(metric_hash_list)
 
         in_clause = ' and metric_hash in ({}) '.format(",".join(place_holders))
@@ -295,7 +547,8 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
         if offset:
 
             select_stmt += ' and time_stamp > %s '
-            parms.append(offset)
+            offset_dt = timeutils.normalize_time(timeutils.parse_isotime(offset))
+            parms.append(_millis(offset_dt))
 
         elif start_timestamp:
 
@@ -312,11 +565,145 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
             select_stmt += ' limit %s '
             parms.append(limit + 1)
 
-        stmt = SimpleStatement(select_stmt,
-                               fetch_size=2147483647)
-        rows = self.cassandra_session.execute(stmt, parms)
+        # The measurements of several metric hashes are sorted by Cassandra,
+        # which cannot page them, so the limit bounds the rows returned
+        return self._execute(select_stmt, parms, paged=False)
+
+    def _get_metric_hashes(self, tenant_id, region, name, dimensions,
+                           start_timestamp, end_timestamp, merge_metrics_flag):
+
+        metric_list = self.list_metrics(tenant_id, region, name,
+                                        dimensions, None, None,
+                                        start_timestamp, end_timestamp,
+                                        include_metric_hash=True)
+        if not metric_list:
+            return None
+
+        if len(metric_list) > 1:
+
+            if not merge_metrics_flag:
+                raise exceptions.MultipleMetricsException(
+                    self.MULTIPLE_METRICS_MESSAGE)
+
+        return [bytearray(metric['metric_hash']) for metric in metric_list]
+
+    def _get_rollups(self, tenant_id, region, metric_hash_list, granularity,
+                     start_ms, end_ms):
+
+        select_stmt = """
+          select time_stamp, value_count, value_sum, value_min, value_max
+          from measurements_rollup
+          where tenant_id = %s and region = %s
+          """
+
+        parms = [tenant_id.encode('utf8'), region.encode('utf8')]
+
+        place_holders = ["%s"] * len(metric_hash_list)
+
+        select_stmt += ' and metric_hash in ({}) '.format(",".join(place_holders))
+
+        parms.extend(metric_hash_list)
+
+        select_stmt += (' and granularity = %s '
+                        ' and time_stamp >= %s and time_stamp < %s ')
+
+        parms.extend([granularity, start_ms, end_ms])
+
+        return self._execute(select_stmt, parms)
+
+    def _get_raw_measurements(self, tenant_id, region, metric_hash_list,
+                              start_ms, end_ms):
+
+        select_stmt = """
+          select time_stamp, value, value_meta
+          from measurements
+          where tenant_id = %s and region = %s
+          """
+
+        parms = [tenant_id.encode('utf8'), region.encode('utf8')]
+
+        place_holders = ["%s"] * len(metric_hash_list)
+
+        select_stmt += ' and metric_hash in ({}) '.format(",".join(place_holders))
+
+        parms.extend(metric_hash_list)
+
+        select_stmt += ' and time_stamp >= %s and time_stamp <= %s '
+
+        parms.extend([start_ms, end_ms])
+
+        return self._execute(select_stmt, parms)
+
+    def _get_rollup_watermark(self, granularity):
+        """Returns the interval of the complete rollups of the granularity
+
+        :return: (start_ms, end_ms) of the rollup buckets written by the
+                 backfill, or None if the rollups were never backfilled
+        """
+        select_stmt = """
+          select start_time, end_time
+          from measurements_rollup_watermark
+          where granularity = %s
+          """
+
+        for (start_time, end_time) in self._execute(select_stmt, [granularity]):
+            return _millis(start_time), _millis(end_time)
+        return None
+
+    def _aggregate_rollups(self, tenant_id, region, metric_hash_list,
+                           granularity, origin_ms, period_ms, end_ms):
+
+        # Whole rollup buckets within the watermark of the backfill are read
+        # from the rollup table, the rest of the interval, including the
+        # ragged end, from the raw measurements. Measurements stored later
+        # within the watermark are left out until they are backfilled.
+        rollup_start_ms = rollup_end_ms = origin_ms
+        watermark = self._get_rollup_watermark(granularity)
+        if watermark is not None:
+            rollup_start_ms = min(max(origin_ms, watermark[0]), end_ms)
+            rollup_end_ms = min(end_ms - end_ms % (granularity * 1000),
+                                watermark[1])
+
+        buckets = {}
+
+        if rollup_end_ms > rollup_start_ms:
+            rows = self._get_rollups(tenant_id, region, metric_hash_list,
+                                     granularity, rollup_start_ms,
+                                     rollup_end_ms)
+            buckets = _aggregate_rows(rows, origin_ms, period_ms, rollups=True)
+
+            if rollup_start_ms > origin_ms:
+                # Raw measurements before the rollups, the end is inclusive
+                rows = self._get_raw_measurements(tenant_id, region,
+                                                  metric_hash_list, origin_ms,
+                                                  rollup_start_ms - 1)
+                _merge_aggregates(buckets,
+                                  _aggregate_rows(rows, origin_ms, period_ms))
+        else:
+            rollup_end_ms = origin_ms
+
+        rows = self._get_raw_measurements(tenant_id, region, metric_hash_list,
+                                          rollup_end_ms, end_ms)
 
-        return rows
+        return _merge_aggregates(buckets,
+                                 _aggregate_rows(rows, origin_ms, period_ms))
+
+    def _rollup_granularity(self, period, origin_ms):
+        """Returns the largest rollup granularity to compute the statistics
+
+        Every period has to be made of whole rollup buckets, so the period has
+        to be a multiple of the granularity and the periods have to start at
+        the start of a rollup bucket.
+
+        :return: granularity in seconds or None to use the raw measurements
+        """
+        granularities = sorted(
+            (int(granularity) for granularity in
+             self.conf.cassandra.rollup_granularities or []), reverse=True)
+        for granularity in granularities:
+            if period % granularity == 0 and origin_ms % (granularity * 1000) == 0:
+                return granularity
+        return None
 
     def _get_dimensions(self, tenant_id, region, name, dimensions):
         metrics_list = self.list_metrics(tenant_id, region, name,
@@ -342,31 +729,17 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
 
             query += dimension_clause
 
-            stmt = SimpleStatement(query,
-                                   fetch_size=2147483647)
+            rows = self._execute(query, parms)
 
-            rows = self.cassandra_session.execute(stmt, parms)
-
-            json_name_list = []
-
-            if not rows:
-                return json_name_list
+            names = set()
 
             for row in rows:
 
-                metric_map = row.metric_map
-                for name, value in metric_map.iteritems():
-
-                    if name == '__name__':
-                        value = urllib.unquote_plus(value)
-                        metric_name = {u'name': value}
-
-                        if metric_name not in json_name_list:
-                            json_name_list.append(metric_name)
+                name = row.metric_map.get('__name__')
+                if name is not None:
+                    names.add(urllib.unquote_plus(name))
 
-                        break
-
-            return sorted(json_name_list)
+            return [{u'name': metric_name} for metric_name in sorted(names)]
 
         except Exception as ex:
             LOG.exception(ex)
@@ -382,167 +755,76 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
                 period = 300
             period = int(period)
 
+            # The statistics of all metrics are returned as a single series
+            series_index, offset = series_cursor.decode(offset)
             if offset:
-                if '_' in offset:
-                    tmp = datetime.strptime(str(offset).split('_')[1], "%Y-%m-%dT%H:%M:%SZ")
-                    tmp = tmp + timedelta(seconds=int(period))
-                    # Leave out any ID as cassandra doesn't understand it
-                    offset = tmp.isoformat()
-                else:
-                    tmp = datetime.strptime(offset, "%Y-%m-%dT%H:%M:%SZ")
-                    offset = tmp + timedelta(seconds=int(period))
-
-            rows = self._get_measurements(tenant_id, region, name, dimensions,
-                                          start_timestamp, end_timestamp,
-                                          offset, limit, merge_metrics_flag)
+                tmp = datetime.strptime(offset, "%Y-%m-%dT%H:%M:%SZ")
+                offset = tmp + timedelta(seconds=int(period))
 
             json_statistics_list = []
 
-            if not rows:
-                return json_statistics_list
-
             requested_statistics = [stat.lower() for stat in statistics]
 
             columns = [u'timestamp']
+            columns.extend(stat for stat in _STATISTICS
+                           if stat in requested_statistics)
 
-            if 'avg' in requested_statistics:
-                columns.append(u'avg')
-
-            if 'min' in requested_statistics:
-                columns.append(u'min')
-
-            if 'max' in requested_statistics:
-                columns.append(u'max')
-
-            if 'count' in requested_statistics:
-                columns.append(u'count')
-
-            if 'sum' in requested_statistics:
-                columns.append(u'sum')
-
-            first_row = rows[0]
-            stats_count = 0
-            stats_sum = 0
-            stats_max = first_row.value
-            stats_min = first_row.value
-            start_period = first_row.time_stamp
-
-            stats_list = []
+            period_ms = period * 1000
 
             start_datetime = datetime.utcfromtimestamp(start_timestamp)
             if offset and offset > start_datetime:
-                tmp_start_period = offset
+                origin = offset
             else:
-                tmp_start_period = start_datetime
-
-            while start_period >= tmp_start_period + timedelta(seconds=period):
-                stat = [
-                    tmp_start_period.strftime('%Y-%m-%dT%H:%M:%SZ')
-                    .decode('utf8')
-                ]
-                for _statistics in requested_statistics:
-                    stat.append(0)
-                tmp_start_period += timedelta(seconds=period)
-                stats_list.append(stat)
-
-            for (time_stamp, value, value_meta) in rows:
-
-                if (time_stamp - start_period).seconds >= period:
-
-                    stat = [
-                        start_period.strftime('%Y-%m-%dT%H:%M:%SZ').decode(
-                            'utf8')]
-
-                    if 'avg' in requested_statistics:
-                        stat.append(stats_sum / stats_count)
-
-                    if 'min' in requested_statistics:
-                        stat.append(stats_min)
-
-                        stats_min = value
-
-                    if 'max' in requested_statistics:
-                        stat.append(stats_max)
-
-                        stats_max = value
-
-                    if 'count' in requested_statistics:
-                        stat.append(stats_count)
-
-                    if 'sum' in requested_statistics:
-                        stat.append(stats_sum)
-
-                    stats_list.append(stat)
-
-                    tmp_start_period = start_period + timedelta(seconds=period)
-                    while time_stamp > tmp_start_period:
-                        stat = [
-                            tmp_start_period.strftime('%Y-%m-%dT%H:%M:%SZ')
-                            .decode('utf8')
-                        ]
-                        for _statistics in requested_statistics:
-                            stat.append(0)
-                        tmp_start_period += timedelta(seconds=period)
-                        stats_list.append(stat)
-
-                    start_period = time_stamp
-
-                    stats_sum = 0
-                    stats_count = 0
-
-                stats_count += 1
-                stats_sum += value
+                origin = start_datetime
+            origin_ms = _millis(origin)
 
-                if 'min' in requested_statistics:
-
-                    if value < stats_min:
-                        stats_min = value
-
-                if 'max' in requested_statistics:
-
-                    if value > stats_max:
-                        stats_max = value
-
-            if stats_count:
-
-                stat = [start_period.strftime('%Y-%m-%dT%H:%M:%SZ').decode(
-                    'utf8')]
+            if end_timestamp:
+                end_ms = int(end_timestamp * 1000)
+            else:
+                end_ms = _millis(datetime.utcnow())
 
-                if 'avg' in requested_statistics:
-                    stat.append(stats_sum / stats_count)
+            granularity = self._rollup_granularity(period, origin_ms)
 
-                if 'min' in requested_statistics:
-                    stat.append(stats_min)
+            if granularity:
+                metric_hash_list = self._get_metric_hashes(
+                    tenant_id, region, name, dimensions, start_timestamp,
+                    end_timestamp, merge_metrics_flag)
+                if not metric_hash_list:
+                    return json_statistics_list
 
-                if 'max' in requested_statistics:
-                    stat.append(stats_max)
+                buckets = self._aggregate_rollups(tenant_id, region,
+                                                  metric_hash_list,
+                                                  granularity, origin_ms,
+                                                  period_ms, end_ms)
+            else:
+                rows = self._get_measurements(tenant_id, region, name,
+                                              dimensions, start_timestamp,
+                                              end_timestamp, offset, limit,
+                                              merge_metrics_flag)
 
-                if 'count' in requested_statistics:
-                    stat.append(stats_count)
+                buckets = _aggregate_rows(rows, origin_ms, period_ms)
 
-                if 'sum' in requested_statistics:
-                    stat.append(stats_sum)
+            if not buckets:
+                return json_statistics_list
 
-                stats_list.append(stat)
+            # Periods without measurements up to the end of the requested
+            # interval are reported with all statistics set to 0
+            bucket_count = max(max(buckets) + 1,
+                               -(-(end_ms - origin_ms) // period_ms))
+            empty_bucket = [0] * (len(columns) - 1)
 
-                if end_timestamp:
-                    time_stamp = datetime.utcfromtimestamp(end_timestamp)
+            stats_list = []
+            for bucket in xrange(bucket_count):
+                period_start = origin + timedelta(milliseconds=bucket * period_ms)
+                stat = [period_start.strftime('%Y-%m-%dT%H:%M:%SZ').decode('utf8')]
+                if bucket in buckets:
+                    stat.extend(_statistics(buckets[bucket], columns[1:]))
                 else:
-                    time_stamp = datetime.now()
-                tmp_start_period = start_period + timedelta(seconds=period)
-                while time_stamp > tmp_start_period:
-                    stat = [
-                        tmp_start_period.strftime('%Y-%m-%dT%H:%M:%SZ')
-                        .decode('utf8')
-                    ]
-                    for _statistics in requested_statistics:
-                        stat.append(0)
-                    tmp_start_period += timedelta(seconds=period)
-                    stats_list.append(stat)
+                    stat.extend(empty_bucket)
+                stats_list.append(stat)
 
             statistic = {u'name': name.decode('utf8'),
-                         # The last date in the stats list.
-                         u'id': stats_list[-1][0],
+                         u'id': str(series_index),
                          u'dimensions': dimensions,
                          u'columns': columns,
                          u'statistics': stats_list}
@@ -575,47 +857,54 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
               reason, reason_data, sub_alarms, tenant_id
               from alarm_state_history
               where tenant_id = %s
+              and alarm_id in ({})
               """
 
-            parms = [tenant_id.encode('utf8')]
-
-            place_holders = ["%s"] * len(alarm_id_list)
-
-            in_clause = ' and alarm_id in ({}) '.format(
-                ",".join(place_holders))
-
-            select_stmt += in_clause
-
-            parms.extend(alarm_id_list)
+            time_stmt = ''
+            time_parms = []
 
             if offset and offset != '0':
 
-                select_stmt += ' and time_stamp > %s '
+                time_stmt += ' and time_stamp > %s '
                 dt = timeutils.normalize_time(timeutils.parse_isotime(offset))
-                parms.append(self._get_millis_from_timestamp(dt))
+                time_parms.append(self._get_millis_from_timestamp(dt))
 
             elif start_timestamp:
 
-                select_stmt += ' and time_stamp >= %s '
-                parms.append(int(start_timestamp * 1000))
+                time_stmt += ' and time_stamp >= %s '
+                time_parms.append(int(start_timestamp * 1000))
 
             if end_timestamp:
-                select_stmt += ' and time_stamp <= %s '
-                parms.append(int(end_timestamp * 1000))
+                time_stmt += ' and time_stamp <= %s '
+                time_parms.append(int(end_timestamp * 1000))
 
             if limit:
-                select_stmt += ' limit %s '
-                parms.append(limit + 1)
-
-            stmt = SimpleStatement(select_stmt,
-                                   fetch_size=2147483647)
-
-            rows = self.cassandra_session.execute(stmt, parms)
-
-            if not rows:
-                return json_alarm_history_list
+                time_stmt += ' limit %s '
+                time_parms.append(limit + 1)
+
+            # The alarms are queried in chunks of ALARM_HISTORY_CHUNK_SIZE,
+            # so that all full chunks share one prepared statement.
+            statements = []
+            for index in xrange(0, len(alarm_id_list), ALARM_HISTORY_CHUNK_SIZE):
+                alarm_ids = alarm_id_list[index:index + ALARM_HISTORY_CHUNK_SIZE]
+                chunk_stmt = (select_stmt.format(",".join(["%s"] * len(alarm_ids))) +
+                              time_stmt)
+                parms = [tenant_id.encode('utf8')] + alarm_ids + time_parms
+                statements.append((chunk_stmt, parms))
+
+            if len(statements) == 1:
+                rows = self._execute(*statements[0])
+            else:
+                results = execute_concurrent(
+                    self.cassandra_session,
+                    [(self._bind(*statement), None) for statement in statements],
+                    concurrency=self.conf.cassandra.concurrent_queries,
+                    raise_on_first_error=True)
+                rows = itertools.chain(*[chunk_rows for (success, chunk_rows) in results])
 
             sorted_rows = sorted(rows, key=lambda row: row.time_stamp)
+            if limit:
+                sorted_rows = sorted_rows[:limit + 1]
 
             for (alarm_id, time_stamp, metrics, new_state, old_state, reason,
                  reason_data, sub_alarms, tenant_id) in sorted_rows:
@@ -700,10 +989,7 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
 
             select_stmt += ' allow filtering '
 
-            stmt = SimpleStatement(select_stmt,
-                                   fetch_size=2147483647)
-
-            rows = self.cassandra_session.execute(stmt, parms)
+            rows = self._execute(select_stmt, parms)
 
             sha1_id = self._generate_dimension_values_id(metric_name, dimension_name)
             json_dim_vals = {u'id': sha1_id,
@@ -715,9 +1001,6 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
             if metric_name:
                 json_dim_vals[u'metric_name'] = metric_name
 
-            if not rows:
-                return json_dim_vals
-
             dim_vals = set()
 
             for row in rows:
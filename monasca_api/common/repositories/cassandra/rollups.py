@@ -0,0 +1,230 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Builds the measurements_rollup table from the raw measurements
+
+Usage:
+    monasca-cassandra-rollup-backfill --config-file /etc/monasca/api-config.conf
+        --start_time 2017-03-01T00:00:00Z [--end_time 2017-03-02T00:00:00Z]
+        [--tenant_id <tenant id>]
+
+Only rollup buckets which lie entirely within the interval are written.
+Existing rollups are overwritten, so the backfill can be run again over
+the same interval.
+
+The rollups are only written by the backfill, not when measurements are
+stored. A backfill of all tenants records the interval of the complete
+rollups of every granularity in measurements_rollup_watermark, and the
+API reads the raw measurements of the periods outside of it. Run the
+backfill periodically, e.g. from cron with a start time at or before the
+end of the previous run, to keep the rollups in use for recent periods.
+
+Measurements stored after a backfill with timestamps within its interval,
+e.g. sent late by an agent which could not reach the API, are not part of
+the rollups, and so of the statistics, until the interval is backfilled
+again. Starting each run some time before the end of the previous one,
+longer than measurements may be delayed, includes them.
+"""
+
+import sys
+
+from cassandra.cluster import Cluster
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.query import SimpleStatement
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import timeutils
+
+from monasca_api.common.repositories.cassandra import metrics_repository
+import monasca_api.v2.reference  # noqa: registers the cassandra options
+
+LOG = log.getLogger(__name__)
+
+cli_opts = [cfg.StrOpt('start_time', required=True,
+                       help='Start of the interval to backfill, ISO 8601.'),
+            cfg.StrOpt('end_time',
+                       help='End of the interval to backfill, ISO 8601. '
+                            'Defaults to now.'),
+            cfg.StrOpt('tenant_id',
+                       help='Only backfill the metrics of this tenant.')]
+
+SELECT_METRICS_CQL = """
+  select tenant_id, region, metric_hash
+  from metric_map
+  """
+
+SELECT_MEASUREMENTS_CQL = """
+  select time_stamp, value
+  from measurements
+  where tenant_id = %s and region = %s and metric_hash = %s
+  and time_stamp >= %s and time_stamp < %s
+  """
+
+SELECT_WATERMARK_CQL = """
+  select start_time, end_time
+  from measurements_rollup_watermark
+  where granularity = %s
+  """
+
+INSERT_WATERMARK_CQL = """
+  insert into measurements_rollup_watermark (granularity, start_time,
+  end_time)
+  values (%s, %s, %s)
+  """
+
+INSERT_ROLLUP_CQL = """
+  insert into measurements_rollup (tenant_id, region, metric_hash,
+  granularity, time_stamp, value_count, value_sum, value_min, value_max)
+  values (?, ?, ?, ?, ?, ?, ?, ?, ?)
+  """
+
+
+def backfill(session, granularities, start_ms, end_ms, tenant_id=None,
+             page_size=5000):
+    """Computes the rollups of all metrics from the raw measurements
+
+    :param granularities: granularities of the rollups in seconds
+    :param start_ms: start of the interval in epoch milliseconds, inclusive
+    :param end_ms: end of the interval in epoch milliseconds, exclusive
+    :param tenant_id: only backfill the metrics of this tenant, the
+                      watermarks are not updated then
+    :return: number of rollup rows written
+    """
+    insert_rollup = session.prepare(INSERT_ROLLUP_CQL)
+
+    select_stmt = SELECT_METRICS_CQL
+    parms = []
+    if tenant_id:
+        select_stmt += ' where tenant_id = %s allow filtering '
+        parms.append(tenant_id.encode('utf8'))
+
+    metrics = session.execute(SimpleStatement(select_stmt,
+                                              fetch_size=page_size), parms)
+
+    rollup_count = 0
+
+    for (metric_tenant_id, region, metric_hash) in metrics:
+
+        rows = session.execute(
+            SimpleStatement(SELECT_MEASUREMENTS_CQL, fetch_size=page_size),
+            [metric_tenant_id, region, bytearray(metric_hash),
+             start_ms, end_ms])
+
+        time_stamps = []
+        values = []
+        for (time_stamp, value) in rows:
+            time_stamps.append(metrics_repository._millis(time_stamp))
+            values.append(value)
+
+        if not time_stamps:
+            continue
+
+        for granularity in granularities:
+            granularity_ms = granularity * 1000
+
+            # Buckets which lie entirely within the interval
+            first_bucket = -(-start_ms // granularity_ms)
+            end_bucket = end_ms // granularity_ms
+
+            buckets = metrics_repository._aggregate_statistics(
+                time_stamps, values, 0, granularity_ms)
+
+            rollups = [(metric_tenant_id, region, bytearray(metric_hash),
+                        granularity, bucket * granularity_ms,
+                        count, total, minimum, maximum)
+                       for bucket, (count, total, minimum, maximum)
+                       in buckets.iteritems()
+                       if first_bucket <= bucket < end_bucket]
+
+            if rollups:
+                execute_concurrent_with_args(session, insert_rollup, rollups,
+                                             raise_on_first_error=True)
+                rollup_count += len(rollups)
+
+    if not tenant_id:
+        for granularity in granularities:
+            granularity_ms = granularity * 1000
+            _update_watermark(session, granularity,
+                              -(-start_ms // granularity_ms) * granularity_ms,
+                              end_ms // granularity_ms * granularity_ms)
+
+    return rollup_count
+
+
+def _update_watermark(session, granularity, start_ms, end_ms):
+    """Extends the interval of the complete rollups by the backfilled one
+
+    The intervals are only joined if they overlap or are adjacent, a gap
+    between them would hold buckets which were not backfilled.
+    """
+    if end_ms <= start_ms:
+        return
+
+    for (start_time, end_time) in session.execute(SELECT_WATERMARK_CQL,
+                                                  [granularity]):
+        watermark_start_ms = metrics_repository._millis(start_time)
+        watermark_end_ms = metrics_repository._millis(end_time)
+        if start_ms > watermark_end_ms or end_ms < watermark_start_ms:
+            LOG.warning('The backfilled interval of the %d seconds rollups '
+                        'is not adjacent to the interval of complete '
+                        'rollups, backfill the gap to update the watermark',
+                        granularity)
+            return
+        start_ms = min(start_ms, watermark_start_ms)
+        end_ms = max(end_ms, watermark_end_ms)
+
+    session.execute(INSERT_WATERMARK_CQL, [granularity, start_ms, end_ms])
+
+
+def _parse_time(time_string):
+    return metrics_repository._millis(
+        timeutils.normalize_time(timeutils.parse_isotime(time_string)))
+
+
+def main(argv=None):
+    log.register_options(cfg.CONF)
+    cfg.CONF.register_cli_opts(cli_opts)
+    cfg.CONF(args=sys.argv[1:] if argv is None else argv,
+             project='monasca_api',
+             default_config_files=['/etc/monasca/api-config.conf'])
+    log.setup(cfg.CONF, 'monasca_api')
+
+    granularities = [int(granularity) for granularity in
+                     cfg.CONF.cassandra.rollup_granularities]
+    if not granularities:
+        LOG.error('No rollup granularities are configured in the [cassandra] '
+                  'section, nothing to backfill')
+        return 1
+
+    start_ms = _parse_time(cfg.CONF.start_time)
+    if cfg.CONF.end_time:
+        end_ms = _parse_time(cfg.CONF.end_time)
+    else:
+        end_ms = timeutils.utcnow_ts() * 1000
+
+    cluster = Cluster(cfg.CONF.cassandra.cluster_ip_addresses.split(','))
+    try:
+        session = cluster.connect(cfg.CONF.cassandra.keyspace)
+        rollup_count = backfill(session, granularities, start_ms, end_ms,
+                                cfg.CONF.tenant_id,
+                                cfg.CONF.cassandra.page_size)
+    finally:
+        cluster.shutdown()
+
+    LOG.info('Wrote %d rollups', rollup_count)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
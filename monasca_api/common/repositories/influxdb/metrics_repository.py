@@ -16,27 +16,94 @@ import re
 from datetime import datetime
 from datetime import timedelta
 from distutils import version
+import itertools
 import json
+from multiprocessing.pool import ThreadPool
+import os
+import threading
 import monasca_api.monitoring.client as monitoring_client
-import requests
 
-from influxdb import client
 from influxdb.exceptions import InfluxDBClientError
 from oslo_config import cfg
 from oslo_log import log
 from oslo_utils import timeutils
+import simplejson
 
 from monasca_api.common.repositories import exceptions
+from monasca_api.common.repositories.influxdb import transport
 from monasca_api.common.repositories import metrics_repository
+from monasca_api.common.repositories import series_cursor
 from monasca_api.monitoring.metrics import INFLUXDB_QUERY_TIME, TSDB_ERRORS
 
 MEASUREMENT_NOT_FOUND_MSG = "measurement not found"
 
+# Number of series checked for measurements by a single query
+HAS_MEASUREMENTS_CHUNK_SIZE = 500
+
+# Number of alarms whose state history is read by a single query, and
+# number of these queries run at once
+ALARM_HISTORY_CHUNK_SIZE = 500
+ALARM_HISTORY_CONCURRENCY = 8
+
 LOG = log.getLogger(__name__)
 
 STATSD_CLIENT = monitoring_client.get_client()
 STATSD_TIMER = STATSD_CLIENT.get_timer()
 
+EPOCH = datetime(1970, 1, 1)
+
+
+# Thread pool of the alarm history queries, see _get_alarm_history_pool
+_alarm_history_pool = None
+_alarm_history_pool_pid = None
+_alarm_history_pool_lock = threading.Lock()
+
+
+def _get_alarm_history_pool():
+    """Returns the thread pool of the alarm history queries of the process
+
+    The pool is created on first use and shared by all requests. A pool
+    inherited through a fork has no threads, so it is created again in the
+    child process.
+    """
+    global _alarm_history_pool, _alarm_history_pool_pid
+    with _alarm_history_pool_lock:
+        if _alarm_history_pool is None or _alarm_history_pool_pid != os.getpid():
+            _alarm_history_pool = ThreadPool(ALARM_HISTORY_CONCURRENCY)
+            _alarm_history_pool_pid = os.getpid()
+        return _alarm_history_pool
+
+
+# Parts of the time of day of a timestamp, looked up by _format_millis
+_HOURS_MINUTES = ['%02d:%02d:' % divmod(minute, 60) for minute in xrange(1440)]
+_SECONDS = ['%02d' % second for second in xrange(60)]
+_MILLIS = ['.%03dZ' % millis for millis in xrange(1000)]
+
+
+def _format_millis(millis_list, with_millis=True):
+    """Formats integer epoch milliseconds as ISO 8601 UTC timestamps
+
+    The dates are formatted once per day of the list, the times of day
+    are put together from precomputed strings.
+
+    :param with_millis: if False, the milliseconds are left out
+    :return: list of timestamps, e.g. '2017-03-01T00:00:04.250Z'
+    """
+    dates = {}
+    timestamps = []
+    for millis in millis_list:
+        days, millis = divmod(millis, 86400000)
+        date = dates.get(days)
+        if date is None:
+            date = dates[days] = (EPOCH + timedelta(days=days)).isoformat()[:10] + 'T'
+        minutes, millis = divmod(millis, 60000)
+        seconds, millis = divmod(millis, 1000)
+        if with_millis:
+            timestamps.append(date + _HOURS_MINUTES[minutes] + _SECONDS[seconds] + _MILLIS[millis])
+        else:
+            timestamps.append(date + _HOURS_MINUTES[minutes] + _SECONDS[seconds] + 'Z')
+    return timestamps
+
 
 class MetricsRepository(metrics_repository.AbstractMetricsRepository):
     def __init__(self):
@@ -44,10 +111,7 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
 
         try:
             self.conf = cfg.CONF
-            self.influxdb_client = client.InfluxDBClient(
-                self.conf.influxdb.ip_address, self.conf.influxdb.port,
-                self.conf.influxdb.user, self.conf.influxdb.password,
-                self.conf.influxdb.database_name)
+            self._transport = transport.Transport(self.conf.influxdb)
             self._init_serie_builders()
         except Exception as ex:
             LOG.exception(ex)
@@ -90,7 +154,7 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
     def _get_influxdb_version(self):
         '''Determine version from the response to /ping
         '''
-        resp = requests.get("http://"+self.conf.influxdb.ip_address+":"+str(self.conf.influxdb.port)+"/ping")
+        resp = self._transport.ping()
         header_ver = resp.headers.get('x-influxdb-version', '0.0.0')
 
         g = re.match("([0-9.]*)-c([0-9.]*)", header_ver)
@@ -398,6 +462,7 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
         if offset:
             metric_id = int(offset) + 1
 
+        candidate_list = []
         for series in series_names.raw['series']:
 
             for tag_values in series[u'values']:
@@ -408,18 +473,16 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
                     if value and not name.startswith(u'_')
                 }
 
-                if self._has_measurements(tenant_id,
-                                          region,
-                                          series[u'name'],
-                                          dimensions,
-                                          start_timestamp,
-                                          end_timestamp):
-                    metric = {u'id': str(metric_id),
-                              u'name': series[u'name'],
-                              u'dimensions': dimensions}
-                    metric_id += 1
+                candidate_list.append((series[u'name'], dimensions))
+
+        for serie_name, dimensions in self._filter_series_with_measurements(
+                tenant_id, region, candidate_list, start_timestamp, end_timestamp):
+            metric = {u'id': str(metric_id),
+                      u'name': serie_name,
+                      u'dimensions': dimensions}
+            metric_id += 1
 
-                    json_metric_list.append(metric)
+            json_metric_list.append(metric)
 
         return json_metric_list
 
@@ -440,6 +503,7 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
         if offset:
             metric_id = int(offset) + 1
 
+        candidate_list = []
         for series in series_names.raw['series']:
             if 'columns' not in series:
                 continue
@@ -464,18 +528,15 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
                     if tag_key.startswith(u'_'):
                         continue
                     dimensions[tag_key] = tag_value
-                if not self._has_measurements(tenant_id,
-                                              region,
-                                              serie_name,
-                                              dimensions,
-                                              start_timestamp,
-                                              end_timestamp):
-                    continue
-                metric = {u'id': str(metric_id),
-                          u'name': serie_name,
-                          u'dimensions': dimensions}
-                metric_id += 1
-                json_metric_list.append(metric)
+                candidate_list.append((serie_name, dimensions))
+
+        for serie_name, dimensions in self._filter_series_with_measurements(
+                tenant_id, region, candidate_list, start_timestamp, end_timestamp):
+            metric = {u'id': str(metric_id),
+                      u'name': serie_name,
+                      u'dimensions': dimensions}
+            metric_id += 1
+            json_metric_list.append(metric)
 
         return json_metric_list
 
@@ -518,56 +579,58 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
         json_measurement_list = []
 
         try:
-            query = self._build_select_measurement_query(dimensions, name,
-                                                         tenant_id,
-                                                         region,
-                                                         start_timestamp,
-                                                         end_timestamp,
-                                                         offset, group_by,
-                                                         limit)
-
+            metric_dimensions = dimensions
             if not group_by and not merge_metrics_flag:
-                dimensions = self._get_dimensions(tenant_id, region, name, dimensions)
-                query += " slimit 1"
+                metric_dimensions = self._get_dimensions(tenant_id, region, name, dimensions)
 
-            result = self._query_influxdb(query)
-
-            if not result:
-                return json_measurement_list
-
-            offset_id = 0
-            if offset is not None:
-                offset_tuple = offset.split('_')
-                offset_id = int(offset_tuple[0]) if len(offset_tuple) > 1 else 0
-            index = offset_id
-
-            for serie in result.raw['series']:
-
-                if 'values' in serie:
-
-                    measurements_list = []
-                    for point in serie['values']:
-                        value_meta = json.loads(point[2]) if point[2] else {}
-                        timestamp = point[0][:19] + '.' + point[0][20:-1].ljust(3, '0') + 'Z'
-
-                        measurements_list.append([timestamp,
-                                                  point[1],
-                                                  value_meta])
-
-                    measurement = {u'name': serie['name'],
-                                   u'id': str(index),
-                                   u'columns': [u'timestamp', u'value',
-                                                u'value_meta'],
-                                   u'measurements': measurements_list}
-
-                    if not group_by:
-                        measurement[u'dimensions'] = dimensions
-                    else:
-                        measurement[u'dimensions'] = {key: value for key, value in serie['tags'].iteritems()
-                                                      if not key.startswith('_')}
-
-                    json_measurement_list.append(measurement)
-                    index += 1
+            def build_query(offset_timestamp):
+                query = self._build_select_measurement_query(dimensions, name,
+                                                             tenant_id,
+                                                             region,
+                                                             start_timestamp,
+                                                             end_timestamp,
+                                                             offset_timestamp,
+                                                             group_by, limit)
+                if not group_by and not merge_metrics_flag:
+                    query += " slimit 1"
+                return query
+
+            # Only the first limit + 1 measurements are paged, the rest of
+            # the result is not read
+            remaining = limit + 1
+            series = self._query_page_series(build_query, offset, limit, group_by)
+            try:
+                for index, serie, continued in series:
+
+                    if not continued or not json_measurement_list:
+                        measurements_list = []
+                        measurement = {u'name': serie['name'],
+                                       u'id': str(index),
+                                       u'columns': [u'timestamp', u'value',
+                                                    u'value_meta'],
+                                       u'measurements': measurements_list}
+
+                        if not group_by:
+                            measurement[u'dimensions'] = metric_dimensions
+                        else:
+                            measurement[u'dimensions'] = {key: value for key, value in serie['tags'].iteritems()
+                                                          if not key.startswith('_')}
+
+                        json_measurement_list.append(measurement)
+
+                    points = serie['values'][:remaining]
+                    timestamps = _format_millis([point[0] for point in points])
+                    # value_meta is stored as JSON and passed through as is
+                    measurements_list.extend(
+                        [timestamp, point[1],
+                         simplejson.RawJSON(point[2]) if point[2] else {}]
+                        for timestamp, point in itertools.izip(timestamps, points))
+                    remaining -= len(points)
+
+                    if not remaining:
+                        break
+            finally:
+                series.close()
 
             return json_measurement_list
 
@@ -626,59 +689,61 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
         json_statistics_list = []
 
         try:
-            query = self._build_statistics_query(dimensions, name, tenant_id,
-                                                 region, start_timestamp,
-                                                 end_timestamp, statistics,
-                                                 period, offset, group_by, limit)
-
+            metric_dimensions = dimensions
             if not group_by and not merge_metrics_flag:
-                dimensions = self._get_dimensions(tenant_id, region, name, dimensions)
-                query += " slimit 1"
-
-            result = self._query_influxdb(query)
-
-            if not result:
-                return json_statistics_list
-
-            offset_id = 0
-            if offset is not None:
-                offset_tuple = offset.split('_')
-                # If offset_id is given, add 1 since we want the next one
-                if len(offset_tuple) > 1:
-                    offset_id = int(offset_tuple[0]) + 1
-            index = offset_id
-
-            for serie in result.raw['series']:
-
-                if 'values' in serie:
-                    columns = [column.replace('time', 'timestamp').replace('mean', 'avg')
-                               for column in serie['columns']]
-
-                    stats_list = []
-                    for stats in serie['values']:
-                        # remove sub-second timestamp values (period can never be less than 1)
-                        timestamp = stats[0]
-                        if '.' in timestamp:
-                            stats[0] = str(timestamp)[:19] + 'Z'
-                        for stat in stats[1:]:
-                            # Only add row if there is a valid value in the row
-                            if stat is not None:
-                                stats_list.append(stats)
-                                break
-
-                    statistic = {u'name': serie['name'],
-                                 u'id': str(index),
-                                 u'columns': columns,
-                                 u'statistics': stats_list}
-
-                    if not group_by:
-                        statistic[u'dimensions'] = dimensions
-                    else:
-                        statistic[u'dimensions'] = {key: value for key, value in serie['tags'].iteritems()
-                                                    if not key.startswith('_')}
-
-                    json_statistics_list.append(statistic)
-                    index += 1
+                metric_dimensions = self._get_dimensions(tenant_id, region, name, dimensions)
+
+            def build_query(offset_timestamp):
+                query = self._build_statistics_query(dimensions, name, tenant_id,
+                                                     region, start_timestamp,
+                                                     end_timestamp, statistics,
+                                                     period, offset_timestamp,
+                                                     group_by, limit)
+                if not group_by and not merge_metrics_flag:
+                    query += " slimit 1"
+                return query
+
+            # Only the first limit + 1 statistics are paged, the rest of
+            # the result is not read
+            remaining = limit + 1
+            series = self._query_page_series(build_query, offset, limit, group_by)
+            try:
+                for index, serie, continued in series:
+
+                    if not continued or not json_statistics_list:
+                        columns = [column.replace('time', 'timestamp').replace('mean', 'avg')
+                                   for column in serie['columns']]
+
+                        stats_list = []
+                        statistic = {u'name': serie['name'],
+                                     u'id': str(index),
+                                     u'columns': columns,
+                                     u'statistics': stats_list}
+
+                        if not group_by:
+                            statistic[u'dimensions'] = metric_dimensions
+                        else:
+                            statistic[u'dimensions'] = {key: value for key, value in serie['tags'].iteritems()
+                                                        if not key.startswith('_')}
+
+                        json_statistics_list.append(statistic)
+
+                    # Only add rows if there is a valid value in the row
+                    rows = list(itertools.islice(
+                        (stats for stats in serie['values']
+                         if any(stat is not None for stat in stats[1:])),
+                        remaining))
+                    # sub-second timestamp values are left out (period can never be less than 1)
+                    for stats, timestamp in itertools.izip(
+                            rows, _format_millis([stats[0] for stats in rows], False)):
+                        stats[0] = timestamp
+                    stats_list.extend(rows)
+                    remaining -= len(rows)
+
+                    if not remaining:
+                        break
+            finally:
+                series.close()
 
             return json_statistics_list
 
@@ -742,37 +807,74 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
     def _build_limit_clause(self, limit):
         return " limit {} ".format(str(limit + 1))
 
-    def _has_measurements(self, tenant_id, region, name, dimensions,
-                          start_timestamp, end_timestamp):
+    def _filter_series_with_measurements(self, tenant_id, region, candidate_list,
+                                         start_timestamp, end_timestamp):
+        """Keep only the series that have measurements in the time range
+
+        Existence is checked for the whole page of candidate series at once
+        with 'select last(value) ... group by *' queries (one query per
+        chunk of HAS_MEASUREMENTS_CHUNK_SIZE series) and the result is
+        joined back to the candidates in python.
 
-        has_measurements = True
+        :param candidate_list: list of (metric name, dimensions) tuples
+        :return: the candidates that have at least one measurement, in order
+        """
 
         #
         # No need for the additional query if we don't have a start timestamp.
         #
-        if not start_timestamp:
-            return True
+        if not start_timestamp or not candidate_list:
+            return candidate_list
+
+        found_keys = set()
+        for index in xrange(0, len(candidate_list), HAS_MEASUREMENTS_CHUNK_SIZE):
+            chunk = candidate_list[index:index + HAS_MEASUREMENTS_CHUNK_SIZE]
+            query = self._build_has_measurements_query(chunk, tenant_id, region,
+                                                       start_timestamp,
+                                                       end_timestamp)
+            result = self._query_influxdb(query)
 
-        #
-        # We set limit to 1 for the measurement_list call, as we are only
-        # interested in knowing if there is at least one measurement, and
-        # not ask too much of influxdb.
-        #
-        measurements = self.measurement_list(tenant_id,
-                                             region,
-                                             name,
-                                             dimensions,
-                                             start_timestamp,
-                                             end_timestamp,
-                                             None,
-                                             1,
-                                             False,
-                                             None)
-
-        if len(measurements) == 0:
-            has_measurements = False
-
-        return has_measurements
+            if not result or 'series' not in result.raw:
+                continue
+
+            for serie in result.raw['series']:
+                found_keys.add(self._build_serie_key(serie['name'],
+                                                     serie.get('tags', {})))
+
+        return [(name, dimensions) for name, dimensions in candidate_list
+                if self._build_serie_key(name, dimensions) in found_keys]
+
+    def _build_has_measurements_query(self, candidate_list, tenant_id, region,
+                                      start_timestamp, end_timestamp):
+
+        names = sorted(set(name for name, _ in candidate_list))
+        from_clause = ','.join('"{}"'.format(name.replace("'", "\\'").encode('utf8'))
+                               for name in names)
+
+        where_clause = self._build_where_clause(None, None, tenant_id, region,
+                                                start_timestamp, end_timestamp)
+
+        # Series with no dimensions match every series of their measurement,
+        # so the dimension filter can only narrow the query if all of the
+        # candidates have dimensions. Extra series returned by a broader
+        # filter are dropped when joining back to the candidates.
+        if all(dimensions for _, dimensions in candidate_list):
+            dimension_clause_set = set()
+            for _, dimensions in candidate_list:
+                dimension_clause_set.add(' and '.join(
+                    "\"{}\" = '{}'".format(
+                        dimension_name.replace("\'", "\\'").encode('utf8'),
+                        dimension_value.replace("\'", "\\'").encode('utf8'))
+                    for dimension_name, dimension_value in sorted(dimensions.iteritems())))
+            where_clause += ' and (' + ' or '.join(
+                '(' + clause + ')' for clause in sorted(dimension_clause_set)) + ')'
+
+        return 'select last(value) from ' + from_clause + where_clause + ' group by *'
+
+    @staticmethod
+    def _build_serie_key(name, tags):
+        return name, frozenset((key, value) for key, value in tags.iteritems()
+                               if value and not key.startswith(u'_'))
 
     def alarm_history(self, tenant_id, alarm_id_list,
                       offset, limit, start_timestamp=None,
@@ -791,77 +893,111 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
                         "Input from user contains single quote ['] or "
                         "semi-colon [;] characters[ {} ]".format(alarm_id))
 
-            query = """
-              select alarm_id, metrics, new_state, old_state,
-                     reason, reason_data, sub_alarms, tenant_id
-              from alarm_state_history
-              """
+            alarm_id_chunks = [alarm_id_list[i:i + ALARM_HISTORY_CHUNK_SIZE]
+                               for i in xrange(0, len(alarm_id_list),
+                                               ALARM_HISTORY_CHUNK_SIZE)]
 
-            where_clause = (
-                " where tenant_id = '{}' ".format(tenant_id.encode('utf8')))
+            queries = [self._build_alarm_history_query(tenant_id, alarm_ids,
+                                                       offset, limit,
+                                                       start_timestamp,
+                                                       end_timestamp)
+                       for alarm_ids in alarm_id_chunks]
 
-            alarm_id_where_clause_list = (
-                [" alarm_id = '{}' ".format(id.encode('utf8'))
-                 for id in alarm_id_list])
+            if len(queries) == 1:
+                return self._query_alarm_history(queries[0])
 
-            alarm_id_where_clause = " or ".join(alarm_id_where_clause_list)
+            # Each query returns at most limit + 1 points, newest first, so
+            # the newest limit + 1 points of all queries are the page.
+            results = _get_alarm_history_pool().map(self._query_alarm_history,
+                                                    queries)
 
-            where_clause += ' and (' + alarm_id_where_clause + ')'
+            json_alarm_history_list = sorted(itertools.chain(*results),
+                                             key=lambda point: int(point[u'id']),
+                                             reverse=True)
+            if limit:
+                json_alarm_history_list = json_alarm_history_list[:limit + 1]
+
+            return json_alarm_history_list
 
-            time_clause = ''
-            if start_timestamp:
-                time_clause += " and time >= " + str(int(start_timestamp *
-                                                         1000000)) + "u "
+        except Exception as ex:
 
-            if end_timestamp:
-                time_clause += " and time <= " + str(int(end_timestamp *
-                                                         1000000)) + "u "
+            LOG.exception(ex)
 
-            offset_clause = self._build_offset_clause(offset)
+            raise exceptions.RepositoryException(ex)
 
-            order_by_clause = " order by time desc"
+    def _build_alarm_history_query(self, tenant_id, alarm_id_list, offset,
+                                   limit, start_timestamp, end_timestamp):
 
-            limit_clause = self._build_limit_clause(limit)
+        query = """
+          select alarm_id, metrics, new_state, old_state,
+                 reason, reason_data, sub_alarms, tenant_id
+          from alarm_state_history
+          """
 
-            query += where_clause + time_clause + offset_clause + order_by_clause + limit_clause
+        where_clause = (
+            " where tenant_id = '{}' ".format(tenant_id.encode('utf8')))
 
-            result = self._query_influxdb(query)
+        alarm_id_where_clause_list = (
+            [" alarm_id = '{}' ".format(id.encode('utf8'))
+             for id in alarm_id_list])
 
-            if not result:
-                return json_alarm_history_list
+        alarm_id_where_clause = " or ".join(alarm_id_where_clause_list)
 
-            if 'values' in result.raw['series'][0]:
-
-                for point in result.raw['series'][0]['values']:
-                    alarm_point = {u'timestamp': point[0],
-                                   u'alarm_id': point[1],
-                                   u'metrics': json.loads(point[2]),
-                                   u'new_state': point[3],
-                                   u'old_state': point[4],
-                                   u'reason': point[5],
-                                   u'reason_data': point[6],
-                                   u'sub_alarms': json.loads(point[7]),
-                                   u'id': str(self._get_millis_from_timestamp(
-                                       timeutils.parse_isotime(point[0])))}
-
-                    # java api formats these during json serialization
-                    if alarm_point[u'sub_alarms']:
-                        for sub_alarm in alarm_point[u'sub_alarms']:
-                            sub_expr = sub_alarm['sub_alarm_expression']
-                            metric_def = sub_expr['metric_definition']
-                            sub_expr['metric_name'] = metric_def['name']
-                            sub_expr['dimensions'] = metric_def['dimensions']
-                            del sub_expr['metric_definition']
-
-                    json_alarm_history_list.append(alarm_point)
+        where_clause += ' and (' + alarm_id_where_clause + ')'
 
-            return json_alarm_history_list
+        time_clause = ''
+        if start_timestamp:
+            time_clause += " and time >= " + str(int(start_timestamp *
+                                                     1000000)) + "u "
 
-        except Exception as ex:
+        if end_timestamp:
+            time_clause += " and time <= " + str(int(end_timestamp *
+                                                     1000000)) + "u "
 
-            LOG.exception(ex)
+        offset_clause = self._build_offset_clause(offset)
 
-            raise exceptions.RepositoryException(ex)
+        order_by_clause = " order by time desc"
+
+        limit_clause = self._build_limit_clause(limit)
+
+        return query + where_clause + time_clause + offset_clause + order_by_clause + limit_clause
+
+    def _query_alarm_history(self, query):
+
+        json_alarm_history_list = []
+
+        series = self._query_influxdb_series(query)
+        try:
+            points = itertools.chain.from_iterable(
+                serie.get('values', []) for serie in series)
+
+            for point in points:
+                # metrics is stored as JSON and passed through as is
+                alarm_point = {u'timestamp': point[0],
+                               u'alarm_id': point[1],
+                               u'metrics': simplejson.RawJSON(point[2]),
+                               u'new_state': point[3],
+                               u'old_state': point[4],
+                               u'reason': point[5],
+                               u'reason_data': point[6],
+                               u'sub_alarms': json.loads(point[7]),
+                               u'id': str(self._get_millis_from_timestamp(
+                                   timeutils.parse_isotime(point[0])))}
+
+                # java api formats these during json serialization
+                if alarm_point[u'sub_alarms']:
+                    for sub_alarm in alarm_point[u'sub_alarms']:
+                        sub_expr = sub_alarm['sub_alarm_expression']
+                        metric_def = sub_expr['metric_definition']
+                        sub_expr['metric_name'] = metric_def['name']
+                        sub_expr['dimensions'] = metric_def['dimensions']
+                        del sub_expr['metric_definition']
+
+                json_alarm_history_list.append(alarm_point)
+        finally:
+            series.close()
+
+        return json_alarm_history_list
 
     def _get_millis_from_timestamp(self, dt):
         dt = dt.replace(tzinfo=None)
@@ -892,10 +1028,75 @@ class MetricsRepository(metrics_repository.AbstractMetricsRepository):
             LOG.exception(ex)
             raise exceptions.RepositoryException(ex)
 
+    def _query_influxdb_series(self, query, epoch=None):
+        """Yields the series of the result of the query as they are read
+
+        The generator must be closed if it is not read to the end.
+        """
+        try:
+            for serie in self._transport.query_series(query, epoch):
+                yield serie
+        except Exception as ex:
+            self._statsd_tsdb_error_count.increment(1)
+            raise ex
+
+    def _query_page_series(self, build_query, offset, limit, group_by):
+        """Yields (series index, serie, continued) for a page of series
+
+        With group_by, only the series of the page are queried, with SLIMIT
+        and SOFFSET: the series of the offset after the timestamp of the
+        offset, then the following series. A page holds at most limit + 1
+        elements, so at most limit + 1 following series are needed.
+
+        :param build_query: function building the query, given the
+                            timestamp of the offset or None
+        :param offset: offset of the page, see series_cursor
+        """
+        series_index, offset_timestamp = series_cursor.decode(offset)
+
+        if not group_by:
+            queries = [(series_index, build_query(offset_timestamp))]
+        else:
+            queries = []
+            if offset_timestamp:
+                queries.append((series_index,
+                                build_query(offset_timestamp) +
+                                ' slimit 1 soffset {}'.format(series_index)))
+                series_index += 1
+            queries.append((series_index,
+                            build_query(None) +
+                            ' slimit {} soffset {}'.format(limit + 1, series_index)))
+
+        for first_index, query in queries:
+            series = self._query_influxdb_series(query, epoch='ms')
+            try:
+                series_index = first_index - 1
+                for serie, continued in self._series_fragments(series):
+                    if 'values' not in serie:
+                        continue
+                    if not continued:
+                        series_index += 1
+                    yield series_index, serie, continued
+            finally:
+                series.close()
+
+    @staticmethod
+    def _series_fragments(series):
+        """Yields (serie, continued) for the series of a chunked result
+
+        continued is True for the fragments of a serie split over several
+        chunks of the result, except the first one.
+        """
+        previous_key = None
+        for serie in series:
+            key = (serie['name'], serie.get('tags'))
+            yield serie, key == previous_key
+            previous_key = key if serie.get('partial') else None
+
     @STATSD_TIMER.timed(INFLUXDB_QUERY_TIME, sample_rate=0.01)
     def _query_influxdb(self, query):
         try:
-            result = self.influxdb_client.query(query)
+            result = self._transport.query(query)
             return result
         except Exception as ex:
             self._statsd_tsdb_error_count.increment(1)
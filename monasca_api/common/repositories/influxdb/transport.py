@@ -0,0 +1,219 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""HTTP transport of the InfluxDB metrics repository
+
+Each InfluxDBClient holds a requests session which keeps its connections
+to InfluxDB alive. The clients are either kept in a pool of
+[influxdb] pool_size clients shared by the threads of the process
+(session_mode = pool), or created once per thread (session_mode = thread).
+
+SHOW and SELECT queries are idempotent and are retried up to
+[influxdb] max_retries times on connection errors, timeouts and server
+errors, after an exponential backoff with full jitter.
+
+query_series streams the result of a query from a chunked response of
+InfluxDB, so that only a chunk of [influxdb] chunk_size points is held in
+memory at a time.
+"""
+
+import contextlib
+import json
+import random
+import threading
+import time
+
+from influxdb import client
+from influxdb.exceptions import InfluxDBClientError
+from influxdb.exceptions import InfluxDBServerError
+from oslo_log import log
+import requests
+from six.moves import queue
+
+from monasca_api.monitoring import client as monitoring_client
+from monasca_api.monitoring.metrics import INFLUXDB_POOL_IN_USE
+from monasca_api.monitoring.metrics import INFLUXDB_POOL_WAIT_TIME
+from monasca_api.monitoring.metrics import INFLUXDB_QUERY_RETRIES
+
+LOG = log.getLogger(__name__)
+
+STATSD_CLIENT = monitoring_client.get_client()
+
+_IDEMPOTENT_STATEMENTS = ('show', 'select')
+
+
+class Transport(object):
+
+    def __init__(self, conf):
+        """Creates the transport from the [influxdb] options
+
+        :param conf: the [influxdb] option group
+        """
+        self._conf = conf
+        self._timeout = (conf.connect_timeout, conf.read_timeout)
+        self._max_retries = conf.max_retries
+        self._retry_backoff = conf.retry_backoff
+        self._chunk_size = conf.chunk_size
+        self._query_url = 'http://{}:{}/query'.format(conf.ip_address,
+                                                      conf.port)
+
+        self._statsd_pool_in_use = STATSD_CLIENT.get_gauge()
+        self._statsd_pool_wait_timer = STATSD_CLIENT.get_timer()
+        self._statsd_retry_count = STATSD_CLIENT.get_counter(
+            INFLUXDB_QUERY_RETRIES)
+
+        if conf.session_mode == 'thread':
+            self._local = threading.local()
+        else:
+            self._local = None
+            self._pool_size = conf.pool_size
+            # clients are created on first use, None stands for a client
+            # which has not been created yet
+            self._idle_clients = queue.LifoQueue()
+            for _ in xrange(self._pool_size):
+                self._idle_clients.put(None)
+            self._in_use = 0
+            self._in_use_lock = threading.Lock()
+
+    def _create_client(self):
+        influxdb_client = client.InfluxDBClient(
+            self._conf.ip_address, self._conf.port, self._conf.user,
+            self._conf.password, self._conf.database_name,
+            timeout=self._timeout)
+        if not self._conf.gzip:
+            # requests asks for and decodes gzip responses by default
+            influxdb_client._session.headers['Accept-Encoding'] = 'identity'
+        return influxdb_client
+
+    @contextlib.contextmanager
+    def client(self):
+        """Yields an InfluxDBClient used by no other thread meanwhile"""
+        if self._local is not None:
+            influxdb_client = getattr(self._local, 'client', None)
+            if influxdb_client is None:
+                influxdb_client = self._local.client = self._create_client()
+            yield influxdb_client
+            return
+
+        start = time.time()
+        influxdb_client = self._idle_clients.get()
+        self._statsd_pool_wait_timer.timing(INFLUXDB_POOL_WAIT_TIME,
+                                            (time.time() - start) * 1000)
+        self._update_in_use(1)
+        try:
+            if influxdb_client is None:
+                influxdb_client = self._create_client()
+            yield influxdb_client
+        finally:
+            self._update_in_use(-1)
+            self._idle_clients.put(influxdb_client)
+
+    def _update_in_use(self, delta):
+        with self._in_use_lock:
+            self._in_use += delta
+            in_use = self._in_use
+        self._statsd_pool_in_use.send(INFLUXDB_POOL_IN_USE, in_use)
+
+    def query(self, query, epoch=None):
+        """Runs the query, retrying SHOW and SELECT queries on failure
+
+        :param epoch: precision of the timestamps of the result as integer
+                      epoch time, e.g. 'ms', or None for RFC3339 strings
+        """
+        def send():
+            with self.client() as influxdb_client:
+                if epoch:
+                    return influxdb_client.query(query, epoch=epoch)
+                return influxdb_client.query(query)
+
+        return self._send_with_retries(query, send)
+
+    def query_series(self, query, epoch=None):
+        """Yields the series of the result of the query as they are read
+
+        In a chunked response a serie may be split into several
+        consecutive fragments, all but the last of which have
+        'partial': True. Closing the generator before the end of the
+        result closes the response.
+        """
+        if not self._chunk_size:
+            for serie in self.query(query, epoch).raw.get('series', []):
+                yield serie
+            return
+
+        with self.client() as influxdb_client:
+            response = self._send_with_retries(
+                query, lambda: self._get_chunked(influxdb_client, query, epoch))
+            try:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if 'error' in chunk:
+                        raise InfluxDBClientError(chunk['error'])
+                    for result in chunk.get('results', []):
+                        if 'error' in result:
+                            raise InfluxDBClientError(result['error'])
+                        for serie in result.get('series', []):
+                            yield serie
+            finally:
+                response.close()
+
+    def _get_chunked(self, influxdb_client, query, epoch):
+        params = {'q': query, 'db': self._conf.database_name,
+                  'chunked': 'true', 'chunk_size': self._chunk_size}
+        if epoch:
+            params['epoch'] = epoch
+        response = influxdb_client._session.get(
+            self._query_url,
+            params=params,
+            auth=(self._conf.user, self._conf.password),
+            stream=True, timeout=self._timeout)
+        if response.status_code != 200:
+            content = response.content
+            response.close()
+            raise InfluxDBClientError(content, response.status_code)
+        return response
+
+    def _send_with_retries(self, query, send):
+        retries = 0
+        if query.lstrip()[:6].lower().startswith(_IDEMPOTENT_STATEMENTS):
+            retries = self._max_retries
+
+        for attempt in xrange(retries + 1):
+            try:
+                return send()
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout,
+                    InfluxDBServerError) as ex:
+                error = ex
+            except InfluxDBClientError as ex:
+                if ex.code is None or ex.code < 500:
+                    raise
+                error = ex
+
+            if attempt == retries:
+                raise error
+
+            backoff = random.uniform(0, self._retry_backoff * 2 ** attempt)
+            LOG.warning('InfluxDB query failed, retrying in %.3f seconds: %s',
+                        backoff, error)
+            self._statsd_retry_count.increment(1)
+            time.sleep(backoff)
+
+    def ping(self):
+        """Returns the response of InfluxDB to /ping"""
+        with self.client() as influxdb_client:
+            return influxdb_client.request('ping',
+                                           expected_response_code=204)
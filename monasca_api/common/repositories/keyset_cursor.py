@@ -0,0 +1,86 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Offsets of the pages of alarms, alarm definitions and notification methods
+
+The offset of the next page is an opaque cursor holding the values of the
+sort keys of the last element of the page: the sort_by fields followed by
+the id, which makes the order unique. The next page starts with the
+elements sorting after these values, which the database finds with the
+index of the sort keys instead of reading and discarding all elements of
+the previous pages, as it does for a numeric offset.
+
+Numeric offsets, as returned by earlier versions, are still accepted.
+"""
+
+import base64
+import datetime
+import json
+
+_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def sort_keys(sort_by, unique_key):
+    """Returns the sort keys of a sort_by query parameter
+
+    :param sort_by: list of 'field', 'field asc' or 'field desc', or None
+    :param unique_key: field appended to the sort keys unless sorted by
+    :return: list of (field, descending)
+    """
+    keys = []
+    for field in sort_by or []:
+        field_values = field.split()
+        keys.append((field_values[0],
+                     len(field_values) > 1 and field_values[1] == 'desc'))
+    if unique_key not in [field for field, _ in keys]:
+        keys.append((unique_key, False))
+    return keys
+
+
+def encode(row, keys):
+    """Returns the cursor of the page ending with the row
+
+    :param row: dict with a value for each sort key
+    """
+    values = []
+    for field, _ in keys:
+        value = row[field]
+        if isinstance(value, datetime.datetime):
+            value = {'t': value.strftime(_DATETIME_FORMAT)}
+        values.append(value)
+    return base64.urlsafe_b64encode(json.dumps(values)).rstrip('=')
+
+
+def decode(offset, keys):
+    """Returns the values of the sort keys held by the cursor
+
+    :raises ValueError: if the offset is not a cursor of the sort keys
+    """
+    try:
+        offset = str(offset)
+        values = json.loads(base64.urlsafe_b64decode(
+            offset + '=' * (-len(offset) % 4)))
+    except (TypeError, UnicodeError):
+        raise ValueError('Invalid offset {}'.format(offset))
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError('Invalid offset {}'.format(offset))
+
+    for i, value in enumerate(values):
+        if isinstance(value, dict):
+            try:
+                values[i] = datetime.datetime.strptime(value['t'],
+                                                       _DATETIME_FORMAT)
+            except (KeyError, TypeError):
+                raise ValueError('Invalid offset {}'.format(offset))
+    return values
@@ -0,0 +1,47 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Offsets of the pages of measurements and statistics
+
+A page of measurements or statistics may span several series. The offset
+of the next page is '<series index>_<timestamp>', the index of the series
+of the last element of the page, i.e. the id of that series in the
+response, and the timestamp of the last element. The next page continues
+with the elements of this series after the timestamp, followed by the
+elements of the next series.
+
+Offsets made of a timestamp only, as returned by earlier versions, are
+read as offsets into the first series.
+"""
+
+
+def encode(series_index, timestamp):
+    return u'{}_{}'.format(series_index, timestamp)
+
+
+def decode(offset):
+    """Returns the series index and timestamp of the offset
+
+    :return: (series index, timestamp), (0, None) if there is no offset
+    :raises ValueError: if the series index is not an integer
+    """
+    if not offset:
+        return 0, None
+    if '_' not in offset:
+        return 0, offset
+    series_index, timestamp = offset.split('_', 1)
+    series_index = int(series_index)
+    if series_index < 0:
+        raise ValueError('Invalid offset {}'.format(offset))
+    return series_index, timestamp
@@ -19,12 +19,15 @@ from oslo_utils import uuidutils
 
 from monasca_api.common.repositories import alarm_definitions_repository as adr
 from monasca_api.common.repositories import exceptions
+from monasca_api.common.repositories import keyset_cursor
 from monasca_api.common.repositories.model import sub_alarm_definition
+from monasca_api.common.repositories.sqla import dimension_sets
 from monasca_api.common.repositories.sqla import models
+from monasca_api.common.repositories.sqla import outbox_repository
 from monasca_api.common.repositories.sqla import sql_repository
 from sqlalchemy import MetaData, update, delete, insert
 from sqlalchemy import select, text, bindparam, null, literal_column
-from sqlalchemy import or_
+from sqlalchemy import and_, exists, false, func, or_
 
 
 class AlarmDefinitionsRepository(sql_repository.SQLRepository,
@@ -45,12 +48,12 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
         self.sa = models.create_sa_model(metadata)
         self.sad = models.create_sad_model(metadata)
         self.sadd = models.create_sadd_model(metadata)
+        self.add = models.create_add_model(metadata)
         a = self.a
         aa = self.aa
         ad = self.ad
         am = self.am
         nm = self.nm
-        md = self.md
         sa = self.sa
         mdd = self.mdd
         mde = self.mde
@@ -62,7 +65,6 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
         self.ad_s = ad_s
         am_s = am.alias('am')
         nm_s = nm.alias('nm')
-        md_s = md.alias('md')
         sa_s = sa.alias('sa')
         mdd_s = mdd.alias('mdd')
         mde_s = mde.alias('mde')
@@ -97,6 +99,12 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
                                 .outerjoin(aao, aao.c.alarm_definition_id == ad_s.c.id)
                                 .outerjoin(aau, aau.c.alarm_definition_id == ad_s.c.id))
 
+        # An alarm definition is deterministic if all its sub alarm
+        # definitions are, so the expression need not be parsed to tell.
+        sadnd = sad.alias('sadnd')
+        deterministic = ~exists().where(sadnd.c.alarm_definition_id == ad_s.c.id).where(
+            or_(sadnd.c.is_deterministic == false(), sadnd.c.is_deterministic == null()))
+
         self.base_query = (select([ad_s.c.id,
                                    ad_s.c.name,
                                    ad_s.c.description,
@@ -106,7 +114,8 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
                                    ad_s.c.actions_enabled,
                                    aaa.c.alarm_actions,
                                    aao.c.ok_actions,
-                                   aau.c.undetermined_actions]))
+                                   aau.c.undetermined_actions,
+                                   deterministic.label('deterministic')]))
 
         self.get_sub_alarms_query = (select([sa_s.c.id.label('sub_alarm_id'),
                                              sa_s.c.alarm_id,
@@ -117,22 +126,14 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
                                      .where(ad_s.c.id == bindparam('b_id'))
                                      .distinct())
 
-        mdg = (select([md_s.c.dimension_set_id,
-                       models.group_concat([md_s.c.name + text("'='") + md_s.c.value]).label('dimensions')])
-               .select_from(md_s)
-               .group_by(md_s.c.dimension_set_id)
-               .alias('mdg'))
-
         self.get_alarm_metrics_query = (select([a_s.c.id.label('alarm_id'),
                                                 mde_s.c.name,
-                                                mdg.c.dimensions])
+                                                mdd_s.c.metric_dimension_set_id.label('dimension_set_id')])
                                         .select_from(a_s.join(ad_s, ad_s.c.id == a_s.c.alarm_definition_id)
                                                      .join(am_s, am_s.c.alarm_id == a_s.c.id)
                                                      .join(mdd_s, mdd_s.c.id
                                                            == am_s.c.metric_definition_dimensions_id)
-                                                     .join(mde_s, mde_s.c.id == mdd_s.c.metric_definition_id)
-                                                     .outerjoin(mdg, mdg.c.dimension_set_id
-                                                                == mdd_s.c.metric_dimension_set_id))
+                                                     .join(mde_s, mde_s.c.id == mdd_s.c.metric_definition_id))
                                         .where(ad_s.c.tenant_id == bindparam('b_tenant_id'))
                                         .where(ad_s.c.id == bindparam('b_id'))
                                         .order_by(a_s.c.id)
@@ -195,6 +196,21 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
                                                               dimension_name=bindparam('b_dimension_name'),
                                                               value=bindparam('b_value')))
 
+        add = self.add
+        self.insert_add_query = (insert(add)
+                                 .values(
+                                     tenant_id=bindparam('b_tenant_id'),
+                                     dimension_name=bindparam('b_dimension_name'),
+                                     value=bindparam('b_value'),
+                                     alarm_definition_id=bindparam('b_alarm_definition_id'),
+                                     sub_alarm_definition_id=b_sad_id))
+
+        self.delete_add_query = (delete(add)
+                                 .where(add.c.alarm_definition_id == bindparam('b_id')))
+
+        self.delete_add_sad_query = (delete(add)
+                                     .where(add.c.sub_alarm_definition_id == bindparam('b_id')))
+
         self.update_or_patch_alarm_definition_update_ad_query = (update(ad)
                                                                  .where(ad.c.tenant_id == bindparam('b_tenant_id'))
                                                                  .where(ad.c.id == bindparam('b_id')))
@@ -277,37 +293,34 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
 
         with self._db_engine.connect() as conn:
             ad = self.ad_s
-            sad = self.sad.alias('sad')
-            sadd = self.sadd.alias('sadd')
-            query_from = self.base_query_from
+            add = self.add.alias('add')
 
             parms = {'b_tenant_id': tenant_id}
 
-            if dimensions:
-                sadi = sad.c.alarm_definition_id
-                query_from = query_from.join(sad, sadi == ad.c.id)
+            query = (self.base_query
+                     .select_from(self.base_query_from)
+                     .where(ad.c.tenant_id == bindparam('b_tenant_id'))
+                     .where(ad.c.deleted_at == null()))
 
-                i = 0
-                for n, v in dimensions.iteritems():
+            if dimensions:
+                # The sub alarm definitions with every dimension, from the
+                # rows of alarm_definition_dimension of each dimension
+                dimensions_cond = []
+                for i, (n, v) in enumerate(dimensions.iteritems()):
                     bind_dimension_name = 'b_sadd_dimension_name_{}'.format(i)
                     bind_value = 'b_sadd_value_{}'.format(i)
-                    sadd_ = (select([sadd.c.sub_alarm_definition_id])
-                             .select_from(sadd)
-                             .where(sadd.c.dimension_name == bindparam(bind_dimension_name))
-                             .where(sadd.c.value == bindparam(bind_value))
-                             .distinct().alias('saad_{}'.format(i)))
-
-                    sadd_id = sadd_.c.sub_alarm_definition_id
-                    query_from = query_from.join(sadd_, sadd_id == sad.c.id)
+                    dimensions_cond.append(and_(add.c.dimension_name == bindparam(bind_dimension_name),
+                                                add.c.value == bindparam(bind_value)))
                     parms[bind_dimension_name] = n.encode('utf8')
                     parms[bind_value] = v.encode('utf8')
 
-                    i += 1
-
-            query = (self.base_query
-                     .select_from(query_from)
-                     .where(ad.c.tenant_id == bindparam('b_tenant_id'))
-                     .where(ad.c.deleted_at == null()))
+                add_query = (select([add.c.alarm_definition_id])
+                             .select_from(add)
+                             .where(add.c.tenant_id == bindparam('b_tenant_id'))
+                             .where(or_(*dimensions_cond))
+                             .group_by(add.c.alarm_definition_id, add.c.sub_alarm_definition_id)
+                             .having(func.count() == len(dimensions_cond)))
+                query = query.where(ad.c.id.in_(add_query))
 
             if name:
                 query = query.where(ad.c.name == bindparam('b_name'))
@@ -328,7 +341,17 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
             else:
                 order_columns = [ad.c.id]
 
-            if offset:
+            keys = keyset_cursor.sort_keys(sort_by, 'id')
+            for field, _ in keys:
+                # the offset of the next page is built from the sort keys
+                if field not in query.c:
+                    query = query.column(ad.c[field])
+
+            if isinstance(offset, list):
+                query = query.where(sql_repository.keyset_predicate(
+                    [(ad.c[field], descending, None) for field, descending in keys],
+                    offset, conn.dialect))
+            elif offset:
                 query = query.offset(bindparam('b_offset'))
                 parms['b_offset'] = offset
 
@@ -351,12 +374,16 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
     @sql_repository.sql_try_catch_block
     def get_alarm_metrics(self, tenant_id, alarm_definition_id):
         with self._db_engine.connect() as conn:
-            return [dict(row) for row in conn.execute(self.get_alarm_metrics_query,
-                                                      b_tenant_id=tenant_id,
-                                                      b_id=alarm_definition_id).fetchall()]
+            rows = conn.execute(self.get_alarm_metrics_query,
+                                b_tenant_id=tenant_id,
+                                b_id=alarm_definition_id).fetchall()
+            return dimension_sets.resolve(conn, self.md,
+                                          [dict(row) for row in rows],
+                                          'dimensions')
 
     @sql_repository.sql_try_catch_block
-    def delete_alarm_definition(self, tenant_id, alarm_definition_id):
+    def delete_alarm_definition(self, tenant_id, alarm_definition_id,
+                                events=None):
         """Soft delete the alarm definition.
 
         Soft delete the alarm definition and hard delete any associated
@@ -364,6 +391,10 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
 
         :param tenant_id:
         :param alarm_definition_id:
+        :param events: function called with the return value, returning
+                       the events of the deletion as a list of (topic,
+                       message), which are written to the outbox in the
+                       transaction of the deletion
         :returns True: -- if alarm definition exists and was deleted.
         :returns False: -- if the alarm definition does not exists.
         :raises RepositoryException:
@@ -381,6 +412,12 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
                          b_tenant_id=tenant_id,
                          b_id=alarm_definition_id)
 
+            conn.execute(self.delete_add_query,
+                         b_id=alarm_definition_id)
+
+            if events is not None:
+                outbox_repository.insert_events(conn, events(True))
+
             return True
 
     @sql_repository.sql_try_catch_block
@@ -396,7 +433,7 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
     def create_alarm_definition(self, tenant_id, name, expression,
                                 sub_expr_list, description, severity, match_by,
                                 alarm_actions, undetermined_actions,
-                                ok_actions):
+                                ok_actions, events=None):
         with self._db_engine.begin() as conn:
 
             now = datetime.datetime.utcnow()
@@ -442,6 +479,12 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
                                  b_sub_alarm_definition_id=sadi,
                                  b_dimension_name=dimension_name,
                                  b_value=parsed_dimension[1].encode('utf8'))
+                    conn.execute(self.insert_add_query,
+                                 b_tenant_id=tenant_id,
+                                 b_dimension_name=dimension_name,
+                                 b_value=parsed_dimension[1].encode('utf8'),
+                                 b_alarm_definition_id=alarm_definition_id,
+                                 b_sub_alarm_definition_id=sadi)
 
             self._insert_into_alarm_action(conn, alarm_definition_id,
                                            alarm_actions, u"ALARM")
@@ -451,6 +494,9 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
             self._insert_into_alarm_action(conn, alarm_definition_id,
                                            ok_actions, u"OK")
 
+            if events is not None:
+                outbox_repository.insert_events(conn, events(alarm_definition_id))
+
             return alarm_definition_id
 
     @sql_repository.sql_try_catch_block
@@ -459,7 +505,8 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
                                          sub_expr_list, actions_enabled,
                                          description, alarm_actions,
                                          ok_actions, undetermined_actions,
-                                         match_by, severity, patch=False):
+                                         match_by, severity, patch=False,
+                                         events=None):
 
         with self._db_engine.begin() as conn:
             original_row = self._get_alarm_definition(conn,
@@ -570,6 +617,7 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
                 parms.append({'b_id': sub_alarm_def_id.id})
 
             if len(parms) > 0:
+                conn.execute(self.delete_add_sad_query, parms)
                 query = self.update_or_patch_alarm_definition_delete_sad_query
                 conn.execute(query, parms)
 
@@ -587,6 +635,7 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
 
             parms = []
             parms_sadd = []
+            parms_add = []
             for sub_alarm_def in new_sub_alarm_defs_by_id.values():
                 adi = sub_alarm_def.alarm_definition_id
                 function = sub_alarm_def.function.encode('utf8')
@@ -613,6 +662,11 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
                     parms_sadd.append({'b_sub_alarm_definition_id': sadi,
                                        'b_dimension_name': name.encode('utf8'),
                                        'b_value': value.encode('utf8')})
+                    parms_add.append({'b_tenant_id': tenant_id,
+                                      'b_alarm_definition_id': adi,
+                                      'b_sub_alarm_definition_id': sadi,
+                                      'b_dimension_name': name.encode('utf8'),
+                                      'b_value': value.encode('utf8')})
 
             if len(parms) > 0:
                 query = self.update_or_patch_alarm_definition_insert_sad_query
@@ -621,6 +675,7 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
             if len(parms_sadd) > 0:
                 query = self.update_or_patch_alarm_definition_insert_sadd_query
                 conn.execute(query, parms_sadd)
+                conn.execute(self.insert_add_query, parms_add)
 
             # Delete old alarm actions
             if patch:
@@ -669,6 +724,10 @@ class AlarmDefinitionsRepository(sql_repository.SQLRepository,
                                    'new': new_sub_alarm_defs_by_id,
                                    'unchanged': unchanged_sub_alarm_defs_by_id}
 
+            if events is not None:
+                outbox_repository.insert_events(
+                    conn, events((updated_row, sub_alarm_defs_dict)))
+
             # Return the alarm def and the sub alarm defs
             return updated_row, sub_alarm_defs_dict
 
@@ -18,10 +18,13 @@ from time import time
 
 from monasca_api.common.repositories import alarms_repository
 from monasca_api.common.repositories import exceptions
+from monasca_api.common.repositories import keyset_cursor
+from monasca_api.common.repositories.sqla import dimension_sets
 from monasca_api.common.repositories.sqla import models
+from monasca_api.common.repositories.sqla import outbox_repository
 from monasca_api.common.repositories.sqla import sql_repository
 from sqlalchemy import MetaData, update, delete, select, text, bindparam, func, literal_column, asc, desc
-from sqlalchemy import or_
+from sqlalchemy import and_, or_
 
 
 class AlarmsRepository(sql_repository.SQLRepository,
@@ -41,28 +44,20 @@ class AlarmsRepository(sql_repository.SQLRepository,
         self.mde = models.create_mde_model(metadata).alias('mde')
         self.sad = models.create_sad_model(metadata).alias('sad')
         self.sadd = models.create_sadd_model(metadata).alias('sadd')
+        self.amd = models.create_amd_model(metadata).alias('amd')
         a = self.a_du
         self.a = a.alias('a')
         a_s = self.a
         sa = self.sa
         ad = self.ad
         am = self.am
-        md = self.md
         mdd = self.mdd
         mde = self.mde
 
-        gc_columns = [md.c.name + text("'='") + md.c.value]
-
-        mdg = (select([md.c.dimension_set_id,
-                      models.group_concat(gc_columns).label('dimensions')])
-               .select_from(md)
-               .group_by(md.c.dimension_set_id).alias('mdg'))
-
         self.base_query_from = (a_s.join(ad, ad.c.id == a_s.c.alarm_definition_id)
                                 .join(am, am.c.alarm_id == a_s.c.id)
                                 .join(mdd, mdd.c.id == am.c.metric_definition_dimensions_id)
-                                .join(mde, mde.c.id == mdd.c.metric_definition_id)
-                                .outerjoin(mdg, mdg.c.dimension_set_id == mdd.c.metric_dimension_set_id))
+                                .join(mde, mde.c.id == mdd.c.metric_definition_id))
 
         self.base_query = select([a_s.c.id.label('alarm_id'),
                                   a_s.c.state,
@@ -77,11 +72,25 @@ class AlarmsRepository(sql_repository.SQLRepository,
                                   ad.c.description.label('alarm_definition_description'),
                                   ad.c.severity,
                                   mde.c.name.label('metric_name'),
-                                  mdg.c.dimensions.label('metric_dimensions')])
+                                  mdd.c.metric_dimension_set_id.label('dimension_set_id')])
 
         self.base_subquery_list = (select([a_s.c.id])
                                    .select_from(a_s.join(ad, a_s.c.alarm_definition_id == ad.c.id)))
 
+        # sort_by field -> (column, field_sort order of the values or None)
+        self._sort_columns = {
+            'alarm_id': (a_s.c.id, None),
+            'alarm_definition_id': (ad.c.id, None),
+            'alarm_definition_name': (ad.c.name, None),
+            'alarm_definition_description': (ad.c.description, None),
+            'state_updated_timestamp': (a_s.c.state_updated_at, None),
+            'updated_timestamp': (a_s.c.updated_at, None),
+            'created_timestamp': (a_s.c.created_at, None),
+            'severity': (ad.c.severity, ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']),
+            'state': (a_s.c.state, ['OK', 'UNDETERMINED', 'ALARM']),
+            'lifecycle_state': (a_s.c.lifecycle_state, None),
+            'link': (a_s.c.link, None)}
+
         self.get_ad_query = (select([ad])
                              .select_from(ad.join(a, ad.c.id == a.c.alarm_definition_id))
                              .where(ad.c.tenant_id == bindparam('b_tenant_id'))
@@ -89,15 +98,12 @@ class AlarmsRepository(sql_repository.SQLRepository,
 
         self.get_am_query = (select([a_s.c.id.label('alarm_id'),
                                      mde.c.name,
-                                     mdg.c.dimensions])
+                                     mdd.c.metric_dimension_set_id.label('dimension_set_id')])
                              .select_from(a_s.join(am, am.c.alarm_id == a_s.c.id)
                                           .join(mdd,
                                                 mdd.c.id ==
                                                 am.c.metric_definition_dimensions_id)
-                                          .join(mde, mde.c.id == mdd.c.metric_definition_id)
-                                          .outerjoin(mdg,
-                                                     mdg.c.dimension_set_id ==
-                                                     mdd.c.metric_dimension_set_id))
+                                          .join(mde, mde.c.id == mdd.c.metric_definition_id))
                              .where(a_s.c.id == bindparam('b_id'))
                              .order_by(a_s.c.id)
                              .distinct())
@@ -167,7 +173,9 @@ class AlarmsRepository(sql_repository.SQLRepository,
 
         with self._db_engine.connect() as conn:
             rows = conn.execute(self.get_am_query, b_id=alarm_id).fetchall()
-            return [dict(row) for row in rows]
+            return dimension_sets.resolve(conn, self.md,
+                                          [dict(row) for row in rows],
+                                          'dimensions')
 
     @sql_repository.sql_try_catch_block
     def get_sub_alarms(self, tenant_id, alarm_id):
@@ -179,10 +187,11 @@ class AlarmsRepository(sql_repository.SQLRepository,
             return [dict(row) for row in rows]
 
     @sql_repository.sql_try_catch_block
-    def update_alarm(self, tenant_id, _id, state, lifecycle_state, link):
+    def update_alarm(self, tenant_id, _id, state, lifecycle_state, link,
+                     events=None):
 
         time_ms = int(round(time() * 1000.0))
-        with self._db_engine.connect() as conn:
+        with self._db_engine.begin() as conn:
             self.get_a_query.bind = self._db_engine
             prev_alarm = conn.execute(self.get_a_query,
                                       b_tenant_id=tenant_id,
@@ -218,12 +227,15 @@ class AlarmsRepository(sql_repository.SQLRepository,
 
             conn.execute(update_query, parms)
 
+            if events is not None:
+                outbox_repository.insert_events(conn, events((prev_alarm, time_ms)))
+
             return prev_alarm, time_ms
 
     @sql_repository.sql_try_catch_block
-    def delete_alarm(self, tenant_id, _id):
+    def delete_alarm(self, tenant_id, _id, events=None):
 
-        with self._db_engine.connect() as conn:
+        with self._db_engine.begin() as conn:
             cursor = conn.execute(self.delete_alarm_query,
                                   b_tenant_id=tenant_id,
                                   b_id=_id)
@@ -231,6 +243,9 @@ class AlarmsRepository(sql_repository.SQLRepository,
             if cursor.rowcount < 1:
                 raise exceptions.DoesNotExistException
 
+            if events is not None:
+                outbox_repository.insert_events(conn, events(None))
+
     @sql_repository.sql_try_catch_block
     def get_alarm(self, tenant_id, _id):
 
@@ -250,7 +265,50 @@ class AlarmsRepository(sql_repository.SQLRepository,
             if rows is None or len(rows) == 0:
                 raise exceptions.DoesNotExistException
 
-            return [dict(row) for row in rows]
+            return dimension_sets.resolve(conn, self.md,
+                                          [dict(row) for row in rows],
+                                          'metric_dimensions')
+
+    def _metric_dimensions_sub_query(self, metric_dimensions, parms):
+        """Returns a query of the IDs of the alarms with a metric matching metric_dimensions
+
+        alarm_metric_dimension holds a row per tenant, dimension and alarm
+        metric. The rows of the alarm metrics matching one of the
+        dimensions are read from its index, and the alarm metrics with a
+        row for every dimension are kept. The query expects a b_tenant_id
+        parameter.
+        """
+        amd = self.amd
+
+        dimensions_cond = []
+        for i, metric_dimension in enumerate(metric_dimensions.items()):
+
+            md_name = "b_md_name_{}".format(i)
+            dimension_cond = [amd.c.dimension_name == bindparam(md_name)]
+            parms[md_name] = metric_dimension[0].encode('utf8')
+
+            if metric_dimension and metric_dimension[1]:
+                if '|' in metric_dimension[1]:
+                    values = metric_dimension[1].encode('utf8').split('|')
+                    sub_values_cond = []
+                    for j, value in enumerate(values):
+                        sub_md_value = "b_md_value_{}_{}".format(i, j)
+                        sub_values_cond.append(amd.c.value == bindparam(sub_md_value))
+                        parms[sub_md_value] = value
+                    dimension_cond.append(or_(*sub_values_cond))
+                else:
+                    md_value = "b_md_value_{}".format(i)
+                    dimension_cond.append(amd.c.value == bindparam(md_value))
+                    parms[md_value] = metric_dimension[1].encode('utf8')
+
+            dimensions_cond.append(and_(*dimension_cond))
+
+        return (select([amd.c.alarm_id])
+                .select_from(amd)
+                .where(amd.c.tenant_id == bindparam('b_tenant_id'))
+                .where(or_(*dimensions_cond))
+                .group_by(amd.c.alarm_id, amd.c.metric_definition_dimensions_id)
+                .having(func.count() == len(dimensions_cond)))
 
     @sql_repository.sql_try_catch_block
     def get_alarms(self, tenant_id, query_parms=None, offset=None, limit=None):
@@ -260,9 +318,6 @@ class AlarmsRepository(sql_repository.SQLRepository,
         with self._db_engine.connect() as conn:
             parms = {}
             ad = self.ad
-            am = self.am
-            mdd = self.mdd
-            md = self.md
             a = self.a
 
             query = (self.base_subquery_list
@@ -309,76 +364,18 @@ class AlarmsRepository(sql_repository.SQLRepository,
                                                '%Y-%m-%dT%H:%M:%S.%fZ')
                 parms['b_state_updated_at'] = date_param
 
-            if 'metric_dimensions' in query_parms:
-                sub_query = select([a.c.id])
-                sub_query_from = (a.join(am, am.c.alarm_id == a.c.id)
-                                  .join(mdd,
-                                        mdd.c.id ==
-                                        am.c.metric_definition_dimensions_id))
-
-                sub_query_md_base = select([md.c.dimension_set_id]).select_from(md)
-
-                for i, metric_dimension in enumerate(query_parms['metric_dimensions'].items()):
-
-                    md_name = "b_md_name_{}".format(i)
-
-                    values_cond = None
-                    values_cond_flag = False
-
-                    if metric_dimension and metric_dimension[1]:
-                        if '|' in metric_dimension[1]:
-                            values = metric_dimension[1].encode('utf8').split('|')
-                            sub_values_cond = []
-                            for j, value in enumerate(values):
-                                sub_md_value = "b_md_value_{}_{}".format(i, j)
-                                sub_values_cond.append(md.c.value == bindparam(sub_md_value))
-                                parms[sub_md_value] = value
-                            values_cond = or_(*sub_values_cond)
-                            values_cond_flag = True
-                        else:
-                            md_value = "b_md_value_{}".format(i)
-                            values_cond = (md.c.value == bindparam(md_value))
-                            values_cond_flag = True
-                            parms[md_value] = metric_dimension[1]
-
-                    sub_query_md = (sub_query_md_base
-                                    .where(md.c.name == bindparam(md_name)))
-                    if values_cond_flag:
-                        sub_query_md = (sub_query_md
-                                        .where(values_cond))
-
-                    sub_query_md = (sub_query_md
-                                    .distinct()
-                                    .alias('md_{}'.format(i)))
-
-                    sub_query_from = (sub_query_from
-                                      .join(sub_query_md,
-                                            sub_query_md.c.dimension_set_id ==
-                                            mdd.c.metric_dimension_set_id))
-
-                    parms[md_name] = metric_dimension[0].encode('utf8')
-
-                    sub_query = (sub_query
-                                 .select_from(sub_query_from)
-                                 .distinct())
-                    query = query.where(a.c.id.in_(sub_query))
+            if query_parms.get('metric_dimensions'):
+                query = query.where(a.c.id.in_(
+                    self._metric_dimensions_sub_query(query_parms['metric_dimensions'], parms)))
 
             order_columns = []
             if 'sort_by' in query_parms:
-                columns_mapper = {'alarm_id': a.c.id,
-                                  'alarm_definition_id': ad.c.id,
-                                  'alarm_definition_name': ad.c.name,
-                                  'alarm_definition_description': ad.c.description,
-                                  'state_updated_timestamp': a.c.state_updated_at,
-                                  'updated_timestamp': a.c.updated_at,
-                                  'created_timestamp': a.c.created_at,
-                                  'severity': models.field_sort(ad.c.severity, map(text, ["'LOW'",
-                                                                                          "'MEDIUM'",
-                                                                                          "'HIGH'",
-                                                                                          "'CRITICAL'"])),
-                                  'state': models.field_sort(a.c.state, map(text, ["'OK'",
-                                                                                   "'UNDETERMINED'",
-                                                                                   "'ALARM'"]))}
+                columns_mapper = {}
+                for field, (column, order) in self._sort_columns.iteritems():
+                    if order is not None:
+                        column = models.field_sort(column, [text("'{}'".format(value))
+                                                            for value in order])
+                    columns_mapper[field] = column
 
                 order_columns, received_cols = self._remap_columns(query_parms['sort_by'], columns_mapper)
 
@@ -391,7 +388,14 @@ class AlarmsRepository(sql_repository.SQLRepository,
                 query = query.limit(bindparam('b_limit'))
                 parms['b_limit'] = limit + 1
 
-            if offset:
+            if isinstance(offset, list):
+                keys = keyset_cursor.sort_keys(query_parms.get('sort_by'),
+                                               'alarm_id')
+                query = query.where(sql_repository.keyset_predicate(
+                    [(self._sort_columns[field][0], descending,
+                      self._sort_columns[field][1])
+                     for field, descending in keys], offset, conn.dialect))
+            elif offset:
                 query = query.offset(bindparam('b_offset'))
                 parms['b_offset'] = offset
 
@@ -406,7 +410,32 @@ class AlarmsRepository(sql_repository.SQLRepository,
 
             main_query = main_query.order_by(*order_columns)
 
-            return [dict(row) for row in conn.execute(main_query, parms).fetchall()]
+            rows = conn.execute(main_query, parms).fetchall()
+            return dimension_sets.resolve(conn, self.md,
+                                          [dict(row) for row in rows],
+                                          'metric_dimensions')
+
+    @sql_repository.sql_try_catch_block
+    def get_alarm_ids(self, tenant_id, metric_dimensions):
+        """Returns the IDs of the alarms of the tenant with a metric matching metric_dimensions
+
+        Only the alarm IDs are selected, without the joins get_alarms needs
+        to build the alarms.
+        """
+        with self._db_engine.connect() as conn:
+            parms = {'b_tenant_id': tenant_id}
+            a = self.a
+            ad = self.ad
+
+            query = (select([a.c.id])
+                     .select_from(a.join(ad, ad.c.id == a.c.alarm_definition_id))
+                     .where(ad.c.tenant_id == bindparam('b_tenant_id')))
+
+            if metric_dimensions:
+                query = query.where(a.c.id.in_(
+                    self._metric_dimensions_sub_query(metric_dimensions, parms)))
+
+            return [row[0] for row in conn.execute(query, parms)]
 
     def _remap_columns(self, columns, columns_mapper):
         received_cols = {}
@@ -463,12 +492,19 @@ class AlarmsRepository(sql_repository.SQLRepository,
 
                     sub_query_columns.extend(sub_group_by_columns)
 
-                    sub_query_from = (mde.join(mdd, mde.c.id == mdd.c.metric_definition_id)
-                                      .join(md, mdd.c.metric_dimension_set_id == md.c.dimension_set_id)
-                                      .join(am, am.c.metric_definition_dimensions_id == mdd.c.id))
+                    # the metrics of the alarms of the tenant only, which
+                    # the database can read from the tenant_id index
+                    sub_a = a.alias('sub_a')
+                    sub_ad = ad.alias('sub_ad')
+                    sub_query_from = (sub_ad.join(sub_a, sub_a.c.alarm_definition_id == sub_ad.c.id)
+                                      .join(am, am.c.alarm_id == sub_a.c.id)
+                                      .join(mdd, am.c.metric_definition_dimensions_id == mdd.c.id)
+                                      .join(mde, mde.c.id == mdd.c.metric_definition_id)
+                                      .join(md, mdd.c.metric_dimension_set_id == md.c.dimension_set_id))
 
                     sub_query = (select(sub_query_columns)
                                  .select_from(sub_query_from)
+                                 .where(sub_ad.c.tenant_id == bindparam('b_tenant_id'))
                                  .distinct()
                                  .alias('metrics'))
 
@@ -514,37 +550,9 @@ class AlarmsRepository(sql_repository.SQLRepository,
                 query = query.where(a.c.id.in_(self.get_a_am_query))
                 parms['b_md_name'] = query_parms['metric_name'].encode('utf8')
 
-            if 'metric_dimensions' in query_parms:
-                sub_query = select([a.c.id])
-                sub_query_from = (a.join(am, am.c.alarm_id == a.c.id)
-                                  .join(mdd,
-                                        mdd.c.id ==
-                                        am.c.metric_definition_dimensions_id))
-
-                sub_query_md_base = select([md.c.dimension_set_id]).select_from(md)
-
-                for i, metric_dimension in enumerate(query_parms['metric_dimensions'].items()):
-                    md_name = "b_md_name_{}".format(i)
-                    md_value = "b_md_value_{}".format(i)
-
-                    sub_query_md = (sub_query_md_base
-                                    .where(md.c.name == bindparam(md_name))
-                                    .where(md.c.value == bindparam(md_value))
-                                    .distinct()
-                                    .alias('md_{}'.format(i)))
-
-                    sub_query_from = (sub_query_from
-                                      .join(sub_query_md,
-                                            sub_query_md.c.dimension_set_id ==
-                                            mdd.c.metric_dimension_set_id))
-
-                    parms[md_name] = metric_dimension[0].encode('utf8')
-                    parms[md_value] = metric_dimension[1].encode('utf8')
-
-                    sub_query = (sub_query
-                                 .select_from(sub_query_from)
-                                 .distinct())
-                    query = query.where(a.c.id.in_(sub_query))
+            if query_parms.get('metric_dimensions'):
+                query = query.where(a.c.id.in_(
+                    self._metric_dimensions_sub_query(query_parms['metric_dimensions'], parms)))
 
             if group_by_columns:
                 query = (query
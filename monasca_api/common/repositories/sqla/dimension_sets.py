@@ -0,0 +1,105 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Process wide cache of the dimensions of the metrics of alarms
+
+The dimensions of a metric are stored in metric_dimension as a set of
+(name, value) rows identified by dimension_set_id. A dimension set never
+changes once it is created, so the alarm queries select the
+dimension_set_id of each metric only, and the dimensions are read in one
+query for all dimension sets of a page which are not in the cache yet.
+Each dimension set is kept as a single immutable mapping shared by all
+the alarms with a metric of the dimension set.
+"""
+
+import collections
+
+from sqlalchemy import select
+
+from monasca_api.common import lru_cache
+from monasca_api.monitoring import client as monitoring_client
+from monasca_api.monitoring.metrics import DIMENSION_SET_CACHE_HITS
+from monasca_api.monitoring.metrics import DIMENSION_SET_CACHE_MISSES
+
+# Maximum number of dimension sets kept in each process
+MAX_ENTRIES = 100000
+
+# Maximum number of dimension sets read per query
+_QUERY_SIZE = 1000
+
+STATSD_CLIENT = monitoring_client.get_client()
+
+
+class Dimensions(dict):
+    """Dimensions of a dimension set, which must not be modified"""
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('Dimensions of a dimension set are immutable')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _immutable
+
+
+_EMPTY = Dimensions()
+
+# dimension_set_id -> Dimensions
+_dimension_sets = lru_cache.LRUCache(
+    MAX_ENTRIES,
+    STATSD_CLIENT.get_counter(DIMENSION_SET_CACHE_HITS),
+    STATSD_CLIENT.get_counter(DIMENSION_SET_CACHE_MISSES))
+
+
+def resolve(conn, md, rows, dimensions_key):
+    """Replaces the dimension_set_id of each row by its dimensions
+
+    :param conn: connection to read the dimension sets missing in the cache
+    :param md: the metric_dimension table
+    :param rows: dicts with a 'dimension_set_id'
+    :param dimensions_key: key of the dimensions in the rows
+    """
+    dimension_sets = get(conn, md, set(row['dimension_set_id'] for row in rows))
+    for row in rows:
+        row[dimensions_key] = dimension_sets[row.pop('dimension_set_id')]
+    return rows
+
+
+def get(conn, md, dimension_set_ids):
+    """Returns a dict of dimension_set_id -> Dimensions"""
+    dimension_set_ids = list(dimension_set_ids)
+    dimension_sets = _dimension_sets.get_many(dimension_set_ids)
+    missing_ids = [dimension_set_id for dimension_set_id in dimension_set_ids
+                   if dimension_set_id not in dimension_sets]
+    if not missing_ids:
+        return dimension_sets
+
+    loaded = collections.defaultdict(dict)
+    query_ids = [dimension_set_id for dimension_set_id in missing_ids
+                 if dimension_set_id is not None]
+    for i in xrange(0, len(query_ids), _QUERY_SIZE):
+        query = (select([md.c.dimension_set_id, md.c.name, md.c.value])
+                 .where(md.c.dimension_set_id.in_(query_ids[i:i + _QUERY_SIZE])))
+        for dimension_set_id, name, value in conn.execute(query):
+            loaded[dimension_set_id][name] = value
+
+    for dimension_set_id in missing_ids:
+        dimensions = loaded.get(dimension_set_id)
+        dimension_sets[dimension_set_id] = (Dimensions(dimensions)
+                                            if dimensions else _EMPTY)
+    _dimension_sets.set_many((dimension_set_id, dimension_sets[dimension_set_id])
+                             for dimension_set_id in query_ids)
+
+    return dimension_sets
+
+
+def clear():
+    _dimension_sets.clear()
@@ -97,6 +97,24 @@ def create_am_model(metadata=None):
                  Column('metric_definition_dimensions_id', Binary))
 
 
+def create_amd_model(metadata=None):
+    return Table('alarm_metric_dimension', metadata,
+                 Column('tenant_id', String(36)),
+                 Column('dimension_name', String(255)),
+                 Column('value', String(255)),
+                 Column('alarm_id', String(36)),
+                 Column('metric_definition_dimensions_id', Binary))
+
+
+def create_add_model(metadata=None):
+    return Table('alarm_definition_dimension', metadata,
+                 Column('tenant_id', String(36)),
+                 Column('dimension_name', String(255)),
+                 Column('value', String(255)),
+                 Column('alarm_definition_id', String(36)),
+                 Column('sub_alarm_definition_id', String(36)))
+
+
 def create_ad_model(metadata=None):
     return Table('alarm_definition', metadata,
                  Column('id', String(36)),
@@ -137,6 +155,16 @@ def create_sad_model(metadata=None):
                  Column('updated_at', DateTime))
 
 
+def create_eo_model(metadata=None):
+    return Table('event_outbox', metadata,
+                 Column('id', Integer),
+                 Column('topic', String(255)),
+                 Column('message', String),
+                 Column('created_at', DateTime),
+                 Column('claimed_by', String(36)),
+                 Column('claimed_until', DateTime))
+
+
 class group_concat(expression.ColumnElement):
     name = "group_concat"
     order_by = None
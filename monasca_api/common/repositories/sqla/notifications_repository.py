@@ -18,6 +18,7 @@ import datetime
 from oslo_utils import uuidutils
 
 from monasca_api.common.repositories import exceptions
+from monasca_api.common.repositories import keyset_cursor
 from monasca_api.common.repositories import notifications_repository as nr
 from monasca_api.common.repositories.sqla import models
 from monasca_api.common.repositories.sqla import sql_repository
@@ -138,7 +139,12 @@ class NotificationsRepository(sql_repository.SQLRepository,
 
             parms['b_limit'] = limit + 1
 
-            if offset:
+            if isinstance(offset, list):
+                keys = [(nm.c[field], descending, None) for field, descending
+                        in keyset_cursor.sort_keys(sort_by, 'id')]
+                select_nm_query = select_nm_query.where(
+                    sql_repository.keyset_predicate(keys, offset, conn.dialect))
+            elif offset:
                 select_nm_query = select_nm_query.offset(bindparam('b_offset'))
                 parms['b_offset'] = offset
 
@@ -0,0 +1,129 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Outbox of the events of the changes of alarms and alarm definitions
+
+The repositories write the events of a change to event_outbox in the
+transaction of the change, so that the events are kept if and only if
+the change is committed. The relay of each API process publishes the
+events of the outbox to the message queue and deletes them.
+"""
+
+import datetime
+import uuid
+
+from sqlalchemy import MetaData, insert, update, delete, select, bindparam, or_
+
+from monasca_api.common.repositories.sqla import models
+from monasca_api.common.repositories.sqla import sql_repository
+
+_eo = models.create_eo_model(MetaData())
+
+_insert_eo_query = (insert(_eo)
+                    .values(topic=bindparam('b_topic'),
+                            message=bindparam('b_message'),
+                            created_at=bindparam('b_created_at')))
+
+
+def insert_events(conn, events):
+    """Writes events to the outbox in the transaction of conn
+
+    :param conn: connection of the transaction of the change
+    :param events: list of (topic, message), message is the serialized event
+    """
+    if not events:
+        return
+    now = datetime.datetime.utcnow()
+    conn.execute(_insert_eo_query,
+                 [{'b_topic': topic,
+                   'b_message': message,
+                   'b_created_at': now} for topic, message in events])
+
+
+class OutboxRepository(sql_repository.SQLRepository):
+
+    def __init__(self):
+
+        super(OutboxRepository, self).__init__()
+
+        metadata = MetaData()
+        self.eo = models.create_eo_model(metadata)
+
+        eo = self.eo
+
+        self._select_unclaimed_query = (
+            select([eo.c.id])
+            .where(or_(eo.c.claimed_until.is_(None),
+                       eo.c.claimed_until < bindparam('b_now')))
+            .order_by(eo.c.id)
+            .limit(bindparam('b_limit')))
+
+    @sql_repository.sql_try_catch_block
+    def relay_events(self, limit, publish, claim_timeout):
+        """Publishes the oldest events of the outbox and deletes them
+
+        The events are claimed for claim_timeout seconds in a short
+        transaction first, so that the relays of other API processes skip
+        them, and published outside of any transaction. Events of a relay
+        which fails to publish or delete them in time are claimed again by
+        the next relay, so an event may be published more than once.
+        Batches claimed by different relays may be published out of order.
+        If publish raises, the events are released and published again
+        later.
+
+        :param limit: maximum number of events to publish
+        :param publish: function called with the list of (topic, message)
+                        of the events, in the order they were written
+        :param claim_timeout: seconds the events are claimed for
+        :returns: the number of events published
+        """
+        eo = self.eo
+        claim_id = str(uuid.uuid4())
+        now = datetime.datetime.utcnow()
+
+        with self._db_engine.begin() as conn:
+            ids = [row['id'] for row in
+                   conn.execute(self._select_unclaimed_query,
+                                b_now=now, b_limit=limit)]
+            if not ids:
+                return 0
+
+            # Only the events no other relay claimed in the meantime
+            conn.execute(update(eo)
+                         .where(eo.c.id.in_(ids))
+                         .where(or_(eo.c.claimed_until.is_(None),
+                                    eo.c.claimed_until < now))
+                         .values(claimed_by=claim_id,
+                                 claimed_until=now + datetime.timedelta(
+                                     seconds=claim_timeout)))
+
+        claimed = ((eo.c.id.in_(ids)) & (eo.c.claimed_by == claim_id))
+
+        with self._db_engine.connect() as conn:
+            rows = conn.execute(select([eo.c.topic, eo.c.message])
+                                .where(claimed)
+                                .order_by(eo.c.id)).fetchall()
+            if not rows:
+                return 0
+
+            try:
+                publish([(row['topic'], row['message']) for row in rows])
+            except Exception:
+                conn.execute(update(eo).where(claimed)
+                             .values(claimed_by=None, claimed_until=None))
+                raise
+
+            conn.execute(delete(eo).where(claimed))
+
+            return len(rows)
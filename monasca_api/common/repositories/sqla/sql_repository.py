@@ -13,21 +13,138 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+
+import threading
+import time
+
 from oslo_config import cfg
 from oslo_log import log
 
+from sqlalchemy import and_
 from sqlalchemy.engine.url import URL, make_url
+from sqlalchemy import event
+from sqlalchemy import exc
+from sqlalchemy import false
 from sqlalchemy import MetaData
+from sqlalchemy import or_
+from sqlalchemy import pool
+from sqlalchemy import select
 
 from monasca_api.common.repositories import exceptions
 from monasca_api.monitoring import client
 from monasca_api.monitoring.metrics import CONFIGDB_ERRORS, CONFIGDB_TIME
+from monasca_api.monitoring.metrics import CONFIGDB_POOL_IN_USE
+from monasca_api.monitoring.metrics import CONFIGDB_POOL_WAIT_TIME
 
 LOG = log.getLogger(__name__)
 
 STATSD_CLIENT = client.get_client()
 STATSD_TIMER = STATSD_CLIENT.get_timer()
 _statsd_configdb_error_count = STATSD_CLIENT.get_counter(CONFIGDB_ERRORS)
+_statsd_pool_in_use = STATSD_CLIENT.get_gauge()
+
+# [database] options which are parts of the database URL
+_URL_OPTS = ('drivername', 'username', 'password', 'host', 'port',
+             'database', 'query')
+
+# database URL -> engine, shared by all SQL repositories of the process
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+class _TimedQueuePool(pool.QueuePool):
+    """QueuePool reporting how long the checkout of a connection takes"""
+
+    def connect(self):
+        start = time.time()
+        try:
+            return super(_TimedQueuePool, self).connect()
+        finally:
+            STATSD_TIMER.timing(CONFIGDB_POOL_WAIT_TIME,
+                                (time.time() - start) * 1000)
+
+
+def get_engine(database_conf):
+    """Returns the engine of the database, creating it on first use
+
+    All SQL repositories of the process share the engine, and so the
+    pool of connections, of the same database URL.
+
+    :param database_conf: the [database] option group
+    """
+    if database_conf.url is not None:
+        url = make_url(database_conf.url)
+    else:
+        url = URL(**{name: database_conf[name] for name in _URL_OPTS})
+
+    key = str(url)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _engines[key] = _create_engine(url, database_conf)
+        return engine
+
+
+def dispose_engines():
+    """Closes the connections of all engines and forgets the engines"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
+def _create_engine(url, database_conf):
+    from sqlalchemy import create_engine
+
+    kwargs = {'pool_recycle': database_conf.pool_recycle}
+    # SQLite uses pools without size, overflow and timeout
+    if issubclass(url.get_dialect().get_pool_class(url), pool.QueuePool):
+        kwargs.update(poolclass=_TimedQueuePool,
+                      pool_size=database_conf.pool_size,
+                      max_overflow=database_conf.max_overflow,
+                      pool_timeout=database_conf.pool_timeout)
+    engine = create_engine(url, **kwargs)
+
+    _watch_pool_in_use(engine)
+    if database_conf.pool_pre_ping:
+        event.listen(engine, 'engine_connect', _ping_connection)
+    return engine
+
+
+def _watch_pool_in_use(engine):
+    in_use = [0]
+    lock = threading.Lock()
+
+    def update(delta):
+        with lock:
+            in_use[0] += delta
+            count = in_use[0]
+        _statsd_pool_in_use.send(CONFIGDB_POOL_IN_USE, count)
+
+    event.listen(engine, 'checkout', lambda *args: update(1))
+    event.listen(engine, 'checkin', lambda *args: update(-1))
+
+
+def _ping_connection(connection, branch):
+    """Tests the connection before it is used
+
+    A connection closed by the database, e.g. after its wait_timeout, is
+    invalidated by the failing ping, together with all other connections
+    of the pool, and the ping is repeated on a new connection.
+    """
+    if branch:
+        return
+
+    should_close_with_result = connection.should_close_with_result
+    connection.should_close_with_result = False
+    try:
+        connection.scalar(select([1]))
+    except exc.DBAPIError as ex:
+        if not ex.connection_invalidated:
+            raise
+        connection.scalar(select([1]))
+    finally:
+        connection.should_close_with_result = should_close_with_result
 
 
 class SQLRepository(object):
@@ -39,17 +156,7 @@ class SQLRepository(object):
             super(SQLRepository, self).__init__()
 
             self.conf = cfg.CONF
-            url = None
-            if self.conf.database.url is not None:
-                url = make_url(self.conf.database.url)
-            else:
-                database_conf = dict(self.conf.database)
-                if 'url' in database_conf:
-                    del database_conf['url']
-                url = URL(**database_conf)
-
-            from sqlalchemy import create_engine
-            self._db_engine = create_engine(url, pool_recycle=10)
+            self._db_engine = get_engine(self.conf.database)
 
             self.metadata = MetaData()
 
@@ -58,6 +165,52 @@ class SQLRepository(object):
             raise exceptions.RepositoryException(ex)
 
 
+# Dialects sorting NULLs after the other values in ascending order, the
+# others sort them first
+_NULLS_LAST_DIALECTS = ('postgresql', 'oracle')
+
+
+def keyset_predicate(keys, values, dialect):
+    """Returns the condition of the rows sorting after the values
+
+    The condition is (k1 > v1) or (k1 = v1 and k2 > v2) or ..., which the
+    database resolves with ranges of an index on (k1, k2, ...). NULLs are
+    placed where the dialect sorts them, so the ORDER BY clause does not
+    need NULLS FIRST, which MySQL does not support and which would keep
+    the database from reading the rows in the order of the index.
+
+    :param keys: list of (column, descending, order) of the ORDER BY
+                 clause, order is the list of the values of a column
+                 sorted by field_sort, or None
+    :param values: values of the keys in the last row of the previous page
+    :param dialect: dialect of the connection running the query
+    """
+    nulls_last = dialect.name in _NULLS_LAST_DIALECTS
+    conditions = []
+    equal = []
+    for (column, descending, order), value in zip(keys, values):
+        conditions.append(and_(*(equal + [
+            _sorts_after(column, descending, order, value, nulls_last)])))
+        equal.append(column == value)
+    return or_(*conditions)
+
+
+def _sorts_after(column, descending, order, value, nulls_last):
+    if order is not None:
+        index = order.index(value)
+        following = order[:index] if descending else order[index + 1:]
+        return column.in_(following) if following else false()
+    # NULLs sort last in ascending order of a nulls_last dialect and in
+    # descending order of the others
+    nulls_follow = descending != nulls_last
+    if value is None:
+        return false() if nulls_follow else column.isnot(None)
+    following = column < value if descending else column > value
+    if nulls_follow:
+        return or_(following, column.is_(None))
+    return following
+
+
 def sql_try_catch_block(fun):
     @STATSD_TIMER.timed(CONFIGDB_TIME, sample_rate=1)
     def try_it(*args, **kwargs):
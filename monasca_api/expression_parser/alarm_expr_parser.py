@@ -13,6 +13,7 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import string
 import sys
 
 import pyparsing
@@ -197,137 +198,289 @@ class OrSubExpr(BinaryOp):
     pass
 
 
-COMMA = pyparsing.Suppress(pyparsing.Literal(","))
-LPAREN = pyparsing.Suppress(pyparsing.Literal("("))
-RPAREN = pyparsing.Suppress(pyparsing.Literal(")"))
-EQUAL = pyparsing.Literal("=")
-LBRACE = pyparsing.Suppress(pyparsing.Literal("{"))
-RBRACE = pyparsing.Suppress(pyparsing.Literal("}"))
+# Characters of metric names and dimensions besides the non-ascii
+# characters of the Basic Multilingual Plane which are not whitespace.
+# See also validation.py: invalid_chars = "<>={}(),\"\\\\|;&"
+_ASCII_IDENTIFIER_CHARS = frozenset(string.ascii_letters + string.digits +
+                                    r".-_#!$%'*+/:?@[]^`~")
+_MAX_IDENTIFIER_LEN = 255
+_DIGITS = frozenset(string.digits)
+_WHITESPACE = frozenset(' \n\t\r')
 
+# (keyword, upper-cased keyword), matched ignoring case in this order,
+# longer operators first
+_FUNCTIONS = tuple((f, f.upper()) for f in
+                   ('max', 'min', 'avg', 'count', 'sum', 'last'))
+_RELATIONAL_OPS = tuple((op, op.upper()) for op in
+                        ('<=', 'lte', '<', 'lt', '>=', 'gte', '>', 'gt'))
+_AND_OPS = (('and', 'AND'), ('&&', '&&'))
+_OR_OPS = (('or', 'OR'), ('||', '||'))
+_DETERMINISTIC = (('deterministic', 'DETERMINISTIC'),)
+_TIMES = (('times', 'TIMES'),)
 
-def periodValidation(instr, loc, tokens):
-    period = int(tokens[0])
-    if period == 0:
-        raise pyparsing.ParseFatalException(instr, loc,
-                                            "Period must not be 0")
 
-    if (period % 60) != 0:
-        return ((period + 59) / 60) * 60
-        # raise pyparsing.ParseFatalException(instr, loc,
-        #                                    "Period {} must be a multiple of 60"
-        #                                    .format(period))
-    # Must return the string
-    return tokens[0]
+def _is_unicode_identifier_char(char):
+    return (char in _ASCII_IDENTIFIER_CHARS or
+            (u'\x80' <= char <= u'\uffff' and not char.isspace()))
 
 
-def periodsValidation(instr, loc, tokens):
-    periods = int(tokens[0])
-    if periods < 1:
-        raise pyparsing.ParseFatalException(instr, loc,
-                                            "Periods {} must be 1 or greater"
-                                            .format(periods))
-    # Must return the string
-    return tokens[0]
+class _SubExprTokens(object):
+    """Tokens of a sub expression, named as SubExpr expects them"""
 
-# Initialize non-ascii unicode code points in the Basic Multilingual Plane.
-unicode_printables = u''.join(
-    unichr(c) for c in xrange(128, 65536) if not unichr(c).isspace())
+    def __init__(self):
+        self.func = ''
+        self.metric_name = ''
+        self.dimensions_list = []
+        self.deterministic = ''
+        self.period = ''
+        self.relational_op = ''
+        self.threshold = ''
+        self.periods = ''
 
-# Does not like comma. No Literals from above allowed.
-# See also validation.py: invalid_chars = "<>={}(),\"\\\\|;&"
-valid_identifier_chars = (
-    (unicode_printables + pyparsing.alphanums + r".-_#!$%'*+/:?@[]^`~"))
-
-metric_name = (
-    pyparsing.Word(valid_identifier_chars, min=1, max=255)("metric_name"))
-dimension_name = pyparsing.Word(valid_identifier_chars + ' ', min=1, max=255)
-dimension_value = pyparsing.Word(valid_identifier_chars + ' ', min=1, max=255)
-
-MINUS = pyparsing.Literal('-')
-integer_number = pyparsing.Word(pyparsing.nums)
-decimal_number = (pyparsing.Optional(MINUS) + integer_number +
-                  pyparsing.Optional("." + integer_number))
-decimal_number.setParseAction(lambda tokens: "".join(tokens))
-
-max = pyparsing.CaselessLiteral("max")
-min = pyparsing.CaselessLiteral("min")
-avg = pyparsing.CaselessLiteral("avg")
-count = pyparsing.CaselessLiteral("count")
-sum = pyparsing.CaselessLiteral("sum")
-last = pyparsing.CaselessLiteral("last")
-func = (max | min | avg | count | sum | last)("func")
-
-less_than_op = (
-    (pyparsing.CaselessLiteral("<") | pyparsing.CaselessLiteral("lt")))
-less_than_eq_op = (
-    (pyparsing.CaselessLiteral("<=") | pyparsing.CaselessLiteral("lte")))
-greater_than_op = (
-    (pyparsing.CaselessLiteral(">") | pyparsing.CaselessLiteral("gt")))
-greater_than_eq_op = (
-    (pyparsing.CaselessLiteral(">=") | pyparsing.CaselessLiteral("gte")))
-
-# Order is important. Put longer prefix first.
-relational_op = (
-    less_than_eq_op | less_than_op | greater_than_eq_op | greater_than_op)(
-    "relational_op")
-
-AND = pyparsing.CaselessLiteral("and") | pyparsing.CaselessLiteral("&&")
-OR = pyparsing.CaselessLiteral("or") | pyparsing.CaselessLiteral("||")
-logical_op = (AND | OR)("logical_op")
-
-times = pyparsing.CaselessLiteral("times")
-
-dimension = dimension_name + EQUAL + dimension_value
-dimension.setParseAction(lambda tokens: "".join(tokens))
-
-dimension_list = pyparsing.Group((LBRACE + pyparsing.Optional(
-    pyparsing.delimitedList(dimension)) +
-    RBRACE))("dimensions_list")
-
-metric = metric_name + pyparsing.Optional(dimension_list)
-period = integer_number.copy().addParseAction(periodValidation)("period")
-threshold = decimal_number("threshold")
-periods = integer_number.copy().addParseAction(periodsValidation)("periods")
-
-deterministic = (
-    pyparsing.CaselessLiteral('deterministic')
-)('deterministic')
-
-function_and_metric = (
-    func + LPAREN + metric +
-    pyparsing.Optional(COMMA + deterministic) +
-    pyparsing.Optional(COMMA + period) +
-    RPAREN
-)
-
-expression = pyparsing.Forward()
-
-sub_expression = ((function_and_metric | metric) + relational_op + threshold +
-                  pyparsing.Optional(times + periods) |
-                  LPAREN + expression + RPAREN)
-sub_expression.setParseAction(SubExpr)
-
-expression = (
-    pyparsing.operatorPrecedence(sub_expression,
-                                 [(AND, 2, pyparsing.opAssoc.LEFT, AndSubExpr),
-                                  (OR, 2, pyparsing.opAssoc.LEFT, OrSubExpr)]))
+
+class _NoMatch(Exception):
+    """The expression does not match at this location, try an alternative"""
+
+
+class _ExpressionParser(object):
+    """Recursive descent parser of alarm expressions
+
+    Accepts the same expressions as the pyparsing grammar in
+    pyparsing_alarm_expr_parser and builds the same SubExpr, AndSubExpr and
+    OrSubExpr objects: keywords are matched ignoring case, without checking
+    for word boundaries, whitespace is skipped before each token and 'and'
+    binds tighter than 'or'. Invalid expressions raise
+    pyparsing.ParseException or ParseFatalException, like the grammar.
+
+    Each method parses an element of the grammar at loc and returns the
+    element and the location after it, or raises _NoMatch.
+    """
+
+    def __init__(self, expr):
+        self._expr = expr.expandtabs()
+        self._len = len(self._expr)
+        if isinstance(self._expr, unicode):
+            self._is_identifier_char = _is_unicode_identifier_char
+        else:
+            self._is_identifier_char = _ASCII_IDENTIFIER_CHARS.__contains__
+        # Furthest location at which the expression failed to match
+        self._error_loc = -1
+        self._error_expected = None
+
+    def parse(self):
+        try:
+            result, loc = self._or_expression(0)
+            loc = self._skip_whitespace(loc)
+            if loc < self._len:
+                self._no_match(loc, 'end of text')
+        except _NoMatch:
+            raise pyparsing.ParseException(self._expr, self._error_loc,
+                                           'Expected ' + self._error_expected)
+        return result
+
+    def _no_match(self, loc, expected):
+        if loc > self._error_loc:
+            self._error_loc = loc
+            self._error_expected = expected
+        raise _NoMatch()
+
+    def _skip_whitespace(self, loc):
+        expr = self._expr
+        while loc < self._len and expr[loc] in _WHITESPACE:
+            loc += 1
+        return loc
+
+    def _literal(self, loc, char):
+        loc = self._skip_whitespace(loc)
+        if loc < self._len and self._expr[loc] == char:
+            return loc + 1
+        self._no_match(loc, '"{}"'.format(char))
+
+    def _keyword(self, loc, keywords, expected):
+        loc = self._skip_whitespace(loc)
+        for keyword, upper_keyword in keywords:
+            end = loc + len(keyword)
+            if self._expr[loc:end].upper() == upper_keyword:
+                return keyword, end
+        self._no_match(loc, expected)
+
+    def _identifier(self, loc, expected, allow_spaces=False):
+        loc = self._skip_whitespace(loc)
+        expr = self._expr
+        is_identifier_char = self._is_identifier_char
+        start = loc
+        while loc < self._len and (is_identifier_char(expr[loc]) or
+                                   (allow_spaces and expr[loc] == ' ')):
+            loc += 1
+        if loc == start or loc - start > _MAX_IDENTIFIER_LEN:
+            self._no_match(start, expected)
+        return expr[start:loc], loc
+
+    def _digits(self, loc, expected):
+        loc = self._skip_whitespace(loc)
+        expr = self._expr
+        start = loc
+        while loc < self._len and expr[loc] in _DIGITS:
+            loc += 1
+        if loc == start:
+            self._no_match(start, expected)
+        return expr[start:loc], loc
+
+    def _or_expression(self, loc):
+        return self._binary_expression(loc, _OR_OPS, OrSubExpr,
+                                       self._and_expression)
+
+    def _and_expression(self, loc):
+        return self._binary_expression(loc, _AND_OPS, AndSubExpr,
+                                       self._operand)
+
+    def _binary_expression(self, loc, ops, binary_op_class, parse_operand):
+        operand, loc = parse_operand(loc)
+        tokens = [operand]
+        while True:
+            try:
+                op, after = self._keyword(loc, ops, 'logical operator')
+                operand, after = parse_operand(after)
+            except _NoMatch:
+                break
+            tokens += [op, operand]
+            loc = after
+        if len(tokens) == 1:
+            return tokens[0], loc
+        return binary_op_class([tokens]), loc
+
+    def _operand(self, loc):
+        try:
+            return self._sub_expression(loc)
+        except _NoMatch:
+            pass
+        loc = self._literal(loc, '(')
+        result, loc = self._or_expression(loc)
+        return result, self._literal(loc, ')')
+
+    def _sub_expression(self, loc):
+        tokens = _SubExprTokens()
+        try:
+            loc = self._function_and_metric(loc, tokens)
+        except _NoMatch:
+            tokens = _SubExprTokens()
+            loc = self._metric(loc, tokens)
+
+        tokens.relational_op, loc = self._keyword(loc, _RELATIONAL_OPS,
+                                                  'relational operator')
+        tokens.threshold, loc = self._threshold(loc)
+
+        try:
+            _, after = self._keyword(loc, _TIMES, '"times"')
+            tokens.periods, loc = self._periods(after)
+        except _NoMatch:
+            pass
+
+        return SubExpr(tokens), loc
+
+    def _function_and_metric(self, loc, tokens):
+        tokens.func, loc = self._keyword(loc, _FUNCTIONS, 'function')
+        loc = self._literal(loc, '(')
+        loc = self._metric(loc, tokens)
+
+        try:
+            after = self._literal(loc, ',')
+            tokens.deterministic, loc = self._keyword(after, _DETERMINISTIC,
+                                                      '"deterministic"')
+        except _NoMatch:
+            pass
+
+        try:
+            after = self._literal(loc, ',')
+            tokens.period, loc = self._period(after)
+        except _NoMatch:
+            pass
+
+        return self._literal(loc, ')')
+
+    def _metric(self, loc, tokens):
+        tokens.metric_name, loc = self._identifier(loc, 'metric name')
+        try:
+            tokens.dimensions_list, loc = self._dimension_list(loc)
+        except _NoMatch:
+            pass
+        return loc
+
+    def _dimension_list(self, loc):
+        loc = self._literal(loc, '{')
+        dimensions = []
+        try:
+            dimension, loc = self._dimension(loc)
+            dimensions.append(dimension)
+            while True:
+                try:
+                    after = self._literal(loc, ',')
+                    dimension, after = self._dimension(after)
+                except _NoMatch:
+                    break
+                dimensions.append(dimension)
+                loc = after
+        except _NoMatch:
+            pass
+        return dimensions, self._literal(loc, '}')
+
+    def _dimension(self, loc):
+        name, loc = self._identifier(loc, 'dimension name', allow_spaces=True)
+        loc = self._literal(loc, '=')
+        value, loc = self._identifier(loc, 'dimension value', allow_spaces=True)
+        return name + '=' + value, loc
+
+    def _threshold(self, loc):
+        sign = ''
+        after = self._skip_whitespace(loc)
+        if after < self._len and self._expr[after] == '-':
+            sign = '-'
+            loc = after + 1
+        integer, loc = self._digits(loc, 'threshold')
+        try:
+            after = self._literal(loc, '.')
+            fraction, loc = self._digits(after, 'threshold')
+            return sign + integer + '.' + fraction, loc
+        except _NoMatch:
+            return sign + integer, loc
+
+    def _period(self, loc):
+        loc = self._skip_whitespace(loc)
+        digits, end = self._digits(loc, 'period')
+        period = int(digits)
+        if period == 0:
+            raise pyparsing.ParseFatalException(self._expr, loc,
+                                                "Period must not be 0")
+        if (period % 60) != 0:
+            return ((period + 59) // 60) * 60, end
+        return digits, end
+
+    def _periods(self, loc):
+        loc = self._skip_whitespace(loc)
+        digits, end = self._digits(loc, 'periods')
+        periods = int(digits)
+        if periods < 1:
+            raise pyparsing.ParseFatalException(self._expr, loc,
+                                                "Periods {} must be 1 or greater"
+                                                .format(periods))
+        return digits, end
 
 
 class AlarmExprParser(object):
     def __init__(self, expr):
         self._expr = expr
-        self._result = (expression + pyparsing.stringEnd).parseString(self._expr)
+        self._result = self._parse(expr)
+
+    def _parse(self, expr):
+        return _ExpressionParser(expr).parse()
 
     @property
     def sub_expr_list(self):
-        # Remove all spaces before parsing. Simple, quick fix for whitespace
-        # issue with dimension list not allowing whitespace after comma.
-        sub_expr_list = self._result[0].operands_list
-        return sub_expr_list
+        return self._result.operands_list
 
     @property
     def fmtd_expr_str(self):
-        return self._result[0].fmtd_expr_str
+        return self._result.fmtd_expr_str
 
 
 def main():
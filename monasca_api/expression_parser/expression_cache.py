@@ -0,0 +1,55 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Process wide cache of parsed alarm expressions
+
+The same alarm and sub alarm expressions are parsed over and over when
+alarm definitions are shown and alarm events are sent. The parsed
+expressions are kept in a LRU cache keyed by the expression string.
+"""
+
+import monasca_api.expression_parser.alarm_expr_parser
+from monasca_api.common import lru_cache
+from monasca_api.monitoring import client as monitoring_client
+from monasca_api.monitoring.metrics import ALARM_EXPRESSION_CACHE_HITS
+from monasca_api.monitoring.metrics import ALARM_EXPRESSION_CACHE_MISSES
+
+# Maximum number of parsed expressions kept in each process
+MAX_ENTRIES = 10000
+
+STATSD_CLIENT = monitoring_client.get_client()
+
+# expression -> parsed expression
+_parsed_expressions = lru_cache.LRUCache(
+    MAX_ENTRIES,
+    STATSD_CLIENT.get_counter(ALARM_EXPRESSION_CACHE_HITS),
+    STATSD_CLIENT.get_counter(ALARM_EXPRESSION_CACHE_MISSES))
+
+
+def parse(expression):
+    """Returns the AlarmExprParser of the expression, parsing it only once
+
+    The parsed expressions are shared between requests, they must not be
+    modified, e.g. by setting the ids of the sub expressions. Expressions
+    which fail to parse raise the exceptions of the parser and are not
+    cached.
+    """
+    return _parsed_expressions.get_or_load(
+        expression,
+        lambda: (monasca_api.expression_parser.alarm_expr_parser
+                 .AlarmExprParser(expression)))
+
+
+def clear():
+    _parsed_expressions.clear()
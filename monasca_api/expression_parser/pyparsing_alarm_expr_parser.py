@@ -0,0 +1,150 @@
+# (C) Copyright 2015-2017 Hewlett Packard Enterprise LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""pyparsing grammar of the alarm expressions
+
+This is the reference implementation of the alarm expression parser in
+alarm_expr_parser, which is used by the API. Building the grammar takes
+a while, so it is only imported by the tests and benchmarks comparing
+both parsers.
+"""
+
+import pyparsing
+
+from monasca_api.expression_parser.alarm_expr_parser import AlarmExprParser
+from monasca_api.expression_parser.alarm_expr_parser import AndSubExpr
+from monasca_api.expression_parser.alarm_expr_parser import OrSubExpr
+from monasca_api.expression_parser.alarm_expr_parser import SubExpr
+
+COMMA = pyparsing.Suppress(pyparsing.Literal(","))
+LPAREN = pyparsing.Suppress(pyparsing.Literal("("))
+RPAREN = pyparsing.Suppress(pyparsing.Literal(")"))
+EQUAL = pyparsing.Literal("=")
+LBRACE = pyparsing.Suppress(pyparsing.Literal("{"))
+RBRACE = pyparsing.Suppress(pyparsing.Literal("}"))
+
+
+def periodValidation(instr, loc, tokens):
+    period = int(tokens[0])
+    if period == 0:
+        raise pyparsing.ParseFatalException(instr, loc,
+                                            "Period must not be 0")
+
+    if (period % 60) != 0:
+        return ((period + 59) / 60) * 60
+        # raise pyparsing.ParseFatalException(instr, loc,
+        #                                    "Period {} must be a multiple of 60"
+        #                                    .format(period))
+    # Must return the string
+    return tokens[0]
+
+
+def periodsValidation(instr, loc, tokens):
+    periods = int(tokens[0])
+    if periods < 1:
+        raise pyparsing.ParseFatalException(instr, loc,
+                                            "Periods {} must be 1 or greater"
+                                            .format(periods))
+    # Must return the string
+    return tokens[0]
+
+# Initialize non-ascii unicode code points in the Basic Multilingual Plane.
+unicode_printables = u''.join(
+    unichr(c) for c in xrange(128, 65536) if not unichr(c).isspace())
+
+# Does not like comma. No Literals from above allowed.
+# See also validation.py: invalid_chars = "<>={}(),\"\\\\|;&"
+valid_identifier_chars = (
+    (unicode_printables + pyparsing.alphanums + r".-_#!$%'*+/:?@[]^`~"))
+
+metric_name = (
+    pyparsing.Word(valid_identifier_chars, min=1, max=255)("metric_name"))
+dimension_name = pyparsing.Word(valid_identifier_chars + ' ', min=1, max=255)
+dimension_value = pyparsing.Word(valid_identifier_chars + ' ', min=1, max=255)
+
+MINUS = pyparsing.Literal('-')
+integer_number = pyparsing.Word(pyparsing.nums)
+decimal_number = (pyparsing.Optional(MINUS) + integer_number +
+                  pyparsing.Optional("." + integer_number))
+decimal_number.setParseAction(lambda tokens: "".join(tokens))
+
+max = pyparsing.CaselessLiteral("max")
+min = pyparsing.CaselessLiteral("min")
+avg = pyparsing.CaselessLiteral("avg")
+count = pyparsing.CaselessLiteral("count")
+sum = pyparsing.CaselessLiteral("sum")
+last = pyparsing.CaselessLiteral("last")
+func = (max | min | avg | count | sum | last)("func")
+
+less_than_op = (
+    (pyparsing.CaselessLiteral("<") | pyparsing.CaselessLiteral("lt")))
+less_than_eq_op = (
+    (pyparsing.CaselessLiteral("<=") | pyparsing.CaselessLiteral("lte")))
+greater_than_op = (
+    (pyparsing.CaselessLiteral(">") | pyparsing.CaselessLiteral("gt")))
+greater_than_eq_op = (
+    (pyparsing.CaselessLiteral(">=") | pyparsing.CaselessLiteral("gte")))
+
+# Order is important. Put longer prefix first.
+relational_op = (
+    less_than_eq_op | less_than_op | greater_than_eq_op | greater_than_op)(
+    "relational_op")
+
+AND = pyparsing.CaselessLiteral("and") | pyparsing.CaselessLiteral("&&")
+OR = pyparsing.CaselessLiteral("or") | pyparsing.CaselessLiteral("||")
+logical_op = (AND | OR)("logical_op")
+
+times = pyparsing.CaselessLiteral("times")
+
+dimension = dimension_name + EQUAL + dimension_value
+dimension.setParseAction(lambda tokens: "".join(tokens))
+
+dimension_list = pyparsing.Group((LBRACE + pyparsing.Optional(
+    pyparsing.delimitedList(dimension)) +
+    RBRACE))("dimensions_list")
+
+metric = metric_name + pyparsing.Optional(dimension_list)
+period = integer_number.copy().addParseAction(periodValidation)("period")
+threshold = decimal_number("threshold")
+periods = integer_number.copy().addParseAction(periodsValidation)("periods")
+
+deterministic = (
+    pyparsing.CaselessLiteral('deterministic')
+)('deterministic')
+
+function_and_metric = (
+    func + LPAREN + metric +
+    pyparsing.Optional(COMMA + deterministic) +
+    pyparsing.Optional(COMMA + period) +
+    RPAREN
+)
+
+expression = pyparsing.Forward()
+
+sub_expression = ((function_and_metric | metric) + relational_op + threshold +
+                  pyparsing.Optional(times + periods) |
+                  LPAREN + expression + RPAREN)
+sub_expression.setParseAction(SubExpr)
+
+expression = (
+    pyparsing.operatorPrecedence(sub_expression,
+                                 [(AND, 2, pyparsing.opAssoc.LEFT, AndSubExpr),
+                                  (OR, 2, pyparsing.opAssoc.LEFT, OrSubExpr)]))
+
+
+class PyparsingAlarmExprParser(AlarmExprParser):
+    """AlarmExprParser parsing the expression with the pyparsing grammar"""
+
+    def _parse(self, expr):
+        return (expression + pyparsing.stringEnd).parseString(expr)[0]
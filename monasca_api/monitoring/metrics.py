@@ -29,11 +29,47 @@ ALARMS_LIST_TIME = "api.alarms_list_time"
 
 INFLUXDB_QUERY_TIME = "influxdb.query_time"
 """time needed to query data from InfluxDB """
+INFLUXDB_POOL_IN_USE = "influxdb.pool_in_use"
+""" InfluxDB clients of the pool used by a query at the moment """
+INFLUXDB_POOL_WAIT_TIME = "influxdb.pool_wait_time"
+""" time a query waited for a free InfluxDB client of the pool """
+INFLUXDB_QUERY_RETRIES = "influxdb.query_retries"
+""" InfluxDB queries retried after a connection error, timeout or server error """
 TSDB_ERRORS = "tsdb.access_errors"
 """ errors when accessing the TSDB (e.g. InfluxDB) """
 CONFIGDB_ERRORS = "configdb.access_errors"
 """ errors when accessing the configuration DB (e.g. MySQL) """
 CONFIGDB_TIME = "configdb.access_time"
 """ time needed to access the configuration DB (e.g. MySQL) """
+CONFIGDB_POOL_IN_USE = "configdb.pool_in_use"
+""" connections of the configuration DB pool used at the moment """
+CONFIGDB_POOL_WAIT_TIME = "configdb.pool_wait_time"
+""" time needed to check out a connection of the configuration DB pool """
 KAFKA_PRODUCER_ERRORS = "kafka.producer_errors"
 """ errors when publishing a message or message batch to Kafka """
+KAFKA_PRODUCER_QUEUE_FULL = "kafka.producer_queue_full"
+""" messages rejected because the in process Kafka queue is full """
+CASSANDRA_STATEMENT_CACHE_HITS = "cassandra.statement_cache_hits"
+""" queries executed with an already prepared statement """
+CASSANDRA_STATEMENT_CACHE_MISSES = "cassandra.statement_cache_misses"
+""" queries which needed to be prepared first """
+CATALOG_CACHE_HITS = "api.catalog_cache_hits"
+""" metric names and dimensions requests answered from the cache """
+CATALOG_CACHE_MISSES = "api.catalog_cache_misses"
+""" metric names and dimensions requests loaded from the TSDB """
+ALARM_EXPRESSION_CACHE_HITS = "api.alarm_expression_cache_hits"
+""" alarm expressions found already parsed in the cache """
+ALARM_EXPRESSION_CACHE_MISSES = "api.alarm_expression_cache_misses"
+""" alarm expressions which needed to be parsed """
+DESCRIPTION_TEMPLATE_CACHE_HITS = "api.description_template_cache_hits"
+""" alarm descriptions found already compiled in the cache """
+DESCRIPTION_TEMPLATE_CACHE_MISSES = "api.description_template_cache_misses"
+""" alarm descriptions which needed to be compiled """
+DIMENSION_SET_CACHE_HITS = "api.dimension_set_cache_hits"
+""" dimension sets of alarm metrics found in the cache """
+DIMENSION_SET_CACHE_MISSES = "api.dimension_set_cache_misses"
+""" dimension sets of alarm metrics which needed to be read from the DB """
+OUTBOX_EVENTS_RELAYED = "api.outbox_events_relayed"
+""" events of the event outbox published to the message queue """
+OUTBOX_RELAY_ERRORS = "api.outbox_relay_errors"
+""" batches of events of the event outbox which could not be published """
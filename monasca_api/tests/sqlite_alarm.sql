@@ -107,6 +107,77 @@ CREATE TABLE `sub_alarm` (
   PRIMARY KEY (`id`)
 );
 
+CREATE TABLE `alarm_metric_dimension` (
+  `tenant_id` varchar(36) NOT NULL,
+  `dimension_name` varchar(255) NOT NULL,
+  `value` varchar(255) NOT NULL,
+  `alarm_id` varchar(36) NOT NULL,
+  `metric_definition_dimensions_id` binary(20) NOT NULL
+);
+CREATE TABLE `alarm_definition_dimension` (
+  `tenant_id` varchar(36) NOT NULL,
+  `dimension_name` varchar(255) NOT NULL,
+  `value` varchar(255) NOT NULL,
+  `alarm_definition_id` varchar(36) NOT NULL,
+  `sub_alarm_definition_id` varchar(36) NOT NULL
+);
+CREATE TABLE `event_outbox` (
+  `id` INTEGER PRIMARY KEY,
+  `topic` varchar(255) NOT NULL,
+  `message` text NOT NULL,
+  `created_at` datetime NOT NULL,
+  `claimed_by` varchar(36) DEFAULT NULL,
+  `claimed_until` datetime DEFAULT NULL
+);
+CREATE INDEX `alarm_definition_id` ON `alarm` (`alarm_definition_id`);
+CREATE INDEX `alarm_alarm_definition_id_state` ON `alarm` (`alarm_definition_id`, `state`, `lifecycle_state`);
+CREATE INDEX `alarm_action_alarm_state` ON `alarm_action` (`alarm_state`, `alarm_definition_id`, `action_id`);
+CREATE INDEX `deleted_at` ON `alarm_definition` (`deleted_at`);
+CREATE INDEX `tenant_id` ON `alarm_definition` (`tenant_id`);
+CREATE INDEX `alarm_definition_tenant_id_deleted_at` ON `alarm_definition` (`tenant_id`, `deleted_at`);
+CREATE INDEX `alarm_id` ON `alarm_metric` (`alarm_id`);
+CREATE INDEX `metric_definition_dimensions_id` ON `alarm_metric` (`metric_definition_dimensions_id`);
+CREATE INDEX `metric_definition_name` ON `metric_definition` (`name`);
+CREATE INDEX `metric_definition_id` ON `metric_definition_dimensions` (`metric_definition_id`);
+CREATE INDEX `metric_dimension_set_id` ON `metric_definition_dimensions` (`metric_dimension_set_id`);
+CREATE UNIQUE INDEX `metric_dimension_key` ON `metric_dimension` (`dimension_set_id`, `name`);
+CREATE INDEX `dimension_set_id` ON `metric_dimension` (`dimension_set_id`);
+CREATE INDEX `metric_dimension_name_value` ON `metric_dimension` (`name`, `value`);
+CREATE INDEX `notification_method_tenant_id` ON `notification_method` (`tenant_id`);
+CREATE INDEX `fk_sub_alarm_definition` ON `sub_alarm_definition` (`alarm_definition_id`);
+CREATE INDEX `fk_sub_alarm_definition_dimension` ON `sub_alarm_definition_dimension` (`sub_alarm_definition_id`);
+CREATE INDEX `sub_alarm_definition_dimension_name_value` ON `sub_alarm_definition_dimension` (`dimension_name`, `value`);
+CREATE INDEX `fk_sub_alarm` ON `sub_alarm` (`alarm_id`);
+CREATE INDEX `fk_sub_alarm_expr` ON `sub_alarm` (`sub_expression_id`);
+
+CREATE INDEX `alarm_metric_dimension_tenant_id_name_value` ON `alarm_metric_dimension` (`tenant_id`, `dimension_name`, `value`);
+CREATE INDEX `alarm_metric_dimension_alarm_id` ON `alarm_metric_dimension` (`alarm_id`, `metric_definition_dimensions_id`);
+CREATE INDEX `alarm_definition_dimension_tenant_id_name_value` ON `alarm_definition_dimension` (`tenant_id`, `dimension_name`, `value`);
+CREATE INDEX `alarm_definition_dimension_alarm_definition_id` ON `alarm_definition_dimension` (`alarm_definition_id`);
+CREATE INDEX `alarm_definition_dimension_sad_id` ON `alarm_definition_dimension` (`sub_alarm_definition_id`);
+
+CREATE TRIGGER `alarm_metric_insert_dimensions` AFTER INSERT ON `alarm_metric`
+BEGIN
+  INSERT INTO `alarm_metric_dimension`
+    (`tenant_id`, `dimension_name`, `value`, `alarm_id`, `metric_definition_dimensions_id`)
+  SELECT `ad`.`tenant_id`, `md`.`name`, `md`.`value`, NEW.`alarm_id`, NEW.`metric_definition_dimensions_id`
+  FROM `alarm` `a`
+  JOIN `alarm_definition` `ad` ON `ad`.`id` = `a`.`alarm_definition_id`
+  JOIN `metric_definition_dimensions` `mdd` ON `mdd`.`id` = NEW.`metric_definition_dimensions_id`
+  JOIN `metric_dimension` `md` ON `md`.`dimension_set_id` = `mdd`.`metric_dimension_set_id`
+  WHERE `a`.`id` = NEW.`alarm_id`;
+END;
+CREATE TRIGGER `alarm_metric_delete_dimensions` AFTER DELETE ON `alarm_metric`
+BEGIN
+  DELETE FROM `alarm_metric_dimension`
+  WHERE `alarm_id` = OLD.`alarm_id`
+  AND `metric_definition_dimensions_id` = OLD.`metric_definition_dimensions_id`;
+END;
+CREATE TRIGGER `alarm_delete_dimensions` AFTER DELETE ON `alarm`
+BEGIN
+  DELETE FROM `alarm_metric_dimension` WHERE `alarm_id` = OLD.`id`;
+END;
+
 insert into `alarm_state` values ('UNDETERMINED');
 insert into `alarm_state` values ('OK');
 insert into `alarm_state` values ('ALARM');
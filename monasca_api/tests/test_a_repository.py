@@ -22,8 +22,10 @@ from oslo_config import cfg
 from oslo_config import fixture as fixture_config
 import testtools
 
-from sqlalchemy import delete, MetaData, insert, bindparam
+from sqlalchemy import delete, MetaData, insert, bindparam, func, select
+from monasca_api.common.repositories.sqla import dimension_sets
 from monasca_api.common.repositories.sqla import models
+from monasca_api.common.repositories.sqla import sql_repository
 
 CONF = cfg.CONF
 
@@ -167,6 +169,7 @@ class TestAlarmRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
 
     @classmethod
     def tearDownClass(cls):
+        sql_repository.dispose_engines()
         cls.fixture.cleanUp()
 
     def setUp(self):
@@ -179,6 +182,8 @@ class TestAlarmRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
 
         from monasca_api.common.repositories.sqla import alarms_repository as ar
         self.repo = ar.AlarmsRepository()
+        dimension_sets.clear()
+        self.addCleanup(dimension_sets.clear)
 
         timestamp1 = datetime.datetime(2015, 3, 14, 9, 26, 53)
         timestamp2 = datetime.datetime(2015, 3, 14, 9, 26, 54)
@@ -500,7 +505,6 @@ class TestAlarmRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
 
         with self.engine.begin() as conn:
             conn.execute(self._delete_am_query)
-            conn.execute(self._insert_am_query, self.default_ams)
             conn.execute(self._delete_md_query)
             conn.execute(self._insert_md_query, self.default_mds)
             conn.execute(self._delete_mdd_query)
@@ -521,6 +525,9 @@ class TestAlarmRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
             conn.execute(self._insert_nm_query, self.default_nms)
             conn.execute(self._delete_aa_query)
             conn.execute(self._insert_aa_query, self.default_aas)
+            # last, as the threshold engine does, for the triggers filling
+            # alarm_metric_dimension to find the alarms and dimensions
+            conn.execute(self._insert_am_query, self.default_ams)
 
     def helper_builder_result(self, alarm_rows):
         result = []
@@ -556,14 +563,8 @@ class TestAlarmRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
 
                 prev_alarm_id = alarm_row['alarm_id']
 
-            dimensions = {}
             metric = {u'name': alarm_row['metric_name'],
-                      u'dimensions': dimensions}
-
-            if alarm_row['metric_dimensions']:
-                for dimension in alarm_row['metric_dimensions'].split(','):
-                    parsed_dimension = dimension.split('=')
-                    dimensions[parsed_dimension[0]] = parsed_dimension[1]
+                      u'dimensions': alarm_row['metric_dimensions']}
 
             metrics.append(metric)
 
@@ -582,6 +583,20 @@ class TestAlarmRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
         self.assertRaises(exceptions.DoesNotExistException,
                           self.repo.get_alarm, tenant_id, alarm_id)
 
+    def test_should_index_alarm_metric_dimensions(self):
+        amd = models.create_amd_model(MetaData())
+        query = (select([func.count()])
+                 .select_from(amd)
+                 .where(amd.c.alarm_id == bindparam('alarm_id')))
+
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(query, alarm_id='1').scalar(), 3)
+
+        self.repo.delete_alarm('bob', '1')
+
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(query, alarm_id='1').scalar(), 0)
+
     def test_should_throw_exception_on_delete(self):
         tenant_id = 'bob'
         from monasca_api.common.repositories import exceptions
@@ -796,6 +811,47 @@ class TestAlarmRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
 
         self.assertEqual(res, expected)
 
+    def test_should_find_after_keyset_offset(self):
+        query_parms = {'sort_by': ['state desc']}
+        res = self.repo.get_alarms(tenant_id='bob',
+                                   query_parms=query_parms,
+                                   limit=2)
+        res = self.helper_builder_result(res)
+        expected = [self.alarm3,
+                    self.alarm2,
+                    self.alarm_compound]
+
+        self.assertEqual(res, expected)
+
+        res = self.repo.get_alarms(tenant_id='bob',
+                                   query_parms=query_parms,
+                                   offset=['UNDETERMINED', '2'],
+                                   limit=2)
+        res = self.helper_builder_result(res)
+        expected = [self.alarm_compound,
+                    self.alarm1]
+
+        self.assertEqual(res, expected)
+
+    def test_should_get_alarm_ids(self):
+        tenant_id = 'bob'
+
+        res = self.repo.get_alarm_ids(tenant_id, {})
+        self.assertEqual(sorted(res), ['1', '2', '234111', '3'])
+
+        res = self.repo.get_alarm_ids(tenant_id, {'flavor_id': '222'})
+        self.assertEqual(sorted(res), ['1', '3'])
+
+        res = self.repo.get_alarm_ids(tenant_id, {'service': 'monitoring',
+                                                  'hostname': 'roland'})
+        self.assertEqual(res, ['234111'])
+
+        res = self.repo.get_alarm_ids(tenant_id, {'flavor_id': '222|333'})
+        self.assertEqual(sorted(res), ['1', '3'])
+
+        res = self.repo.get_alarm_ids('other_tenant', {})
+        self.assertEqual(res, [])
+
     def test_should_update(self):
         tenant_id = 'bob'
         alarm_id = '2'
@@ -842,6 +898,22 @@ class TestAlarmRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
         alarm_new_tmp = tuple(alarm_new[k] for k in ('state', 'link', 'lifecycle_state'))
         self.assertEqual(alarm_new_tmp, prev_state)
 
+    def test_should_write_events_with_update(self):
+        eo = models.create_eo_model(MetaData())
+        with self.engine.begin() as conn:
+            conn.execute(delete(eo))
+
+        def events(result):
+            prev_alarm, time_ms = result
+            return [(u'events', prev_alarm['state'])]
+
+        self.repo.update_alarm('bob', '1', 'UNDETERMINED', None, None,
+                               events=events)
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(select([eo.c.topic, eo.c.message])).fetchall()
+        self.assertEqual([(u'events', u'OK')], [tuple(row) for row in rows])
+
     def test_should_throw_exception_on_update(self):
         tenant_id = 'bob'
         alarm_id = 'Not real alarm id'
@@ -860,11 +932,25 @@ class TestAlarmRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
         alarm_metrics = self.repo.get_alarm_metrics(alarm_id)
 
         expected = [{'alarm_id': '2',
-                     'dimensions': 'instance_id=123,service=monitoring',
+                     'dimensions': {'instance_id': '123',
+                                    'service': 'monitoring'},
                      'name': 'cpu.idle_perc'}]
 
         self.assertEqual(alarm_metrics, expected)
 
+    def test_should_share_cached_dimension_sets(self):
+        first = self.repo.get_alarm_metrics('2')[0]['dimensions']
+
+        with self.repo._db_engine.begin() as conn:
+            conn.execute(self._delete_md_query)
+        second = self.repo.get_alarm_metrics('2')[0]['dimensions']
+
+        self.assertIs(first, second)
+        self.assertEqual({'instance_id': '123',
+                          'service': 'monitoring'}, second)
+        self.assertRaises(TypeError, second.__setitem__, 'service', 'x')
+        self.assertRaises(TypeError, second.update, {'service': 'x'})
+
     def test_get_subalarms(self):
         tenant_id = 'bob'
         alarm_id = '2'
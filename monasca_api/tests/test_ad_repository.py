@@ -24,13 +24,16 @@ import testtools
 
 from monasca_api.common.repositories import exceptions
 from monasca_api.common.repositories.model import sub_alarm_definition
+from monasca_api.common.repositories.sqla import dimension_sets
 from monasca_api.common.repositories.sqla import models
+from monasca_api.common.repositories.sqla import sql_repository
 from monasca_api.expression_parser import alarm_expr_parser
 
 CONF = cfg.CONF
 ALARM_DEF_123_FIELDS = {'actions_enabled': False,
                         'alarm_actions': u'29387234,77778687',
                         'description': None,
+                        'deterministic': False,
                         'expression': u'AVG(hpcs.compute{flavor_id=777, '
                         'image_id=888, metric_name=cpu, device=1}) > 10',
                         'id': u'123',
@@ -112,6 +115,16 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
                                       dimension_name=bindparam('dimension_name'),
                                       value=bindparam('value')))
 
+        cls.add = models.create_add_model(metadata)
+        cls._delete_add_query = delete(cls.add)
+        cls._insert_add_query = (insert(cls.add)
+                                 .values(
+                                     tenant_id=bindparam('tenant_id'),
+                                     dimension_name=bindparam('dimension_name'),
+                                     value=bindparam('value'),
+                                     alarm_definition_id=bindparam('alarm_definition_id'),
+                                     sub_alarm_definition_id=bindparam('sub_alarm_definition_id')))
+
         cls.nm = models.create_nm_model(metadata)
         cls._delete_nm_query = delete(cls.nm)
         cls._insert_nm_query = (insert(cls.nm)
@@ -126,6 +139,7 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
 
     @classmethod
     def tearDownClass(cls):
+        sql_repository.dispose_engines()
         cls.fixture.cleanUp()
 
     def setUp(self):
@@ -138,6 +152,8 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
 
         from monasca_api.common.repositories.sqla import alarm_definitions_repository as adr
         self.repo = adr.AlarmDefinitionsRepository()
+        dimension_sets.clear()
+        self.addCleanup(dimension_sets.clear)
         self.default_ads = [{'id': '123',
                              'tenant_id': 'bob',
                              'name': '90% CPU',
@@ -219,6 +235,17 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
                                'dimension_name': 'metric_name',
                                'value': 'mem'}]
 
+        # the rows of alarm_definition_dimension the API writes with the
+        # sub alarm definition dimensions
+        tenant_ids = {ad['id']: ad['tenant_id'] for ad in self.default_ads}
+        ad_ids = {sad['id']: sad['alarm_definition_id'] for sad in self.default_sads}
+        self.default_adds = [{'tenant_id': tenant_ids[ad_ids[sadd['sub_alarm_definition_id']]],
+                              'dimension_name': sadd['dimension_name'],
+                              'value': sadd['value'],
+                              'alarm_definition_id': ad_ids[sadd['sub_alarm_definition_id']],
+                              'sub_alarm_definition_id': sadd['sub_alarm_definition_id']}
+                             for sadd in self.default_sadds]
+
         self.default_nms = [{'id': '29387234',
                              'tenant_id': 'alarm-test',
                              'name': 'MyEmail',
@@ -254,6 +281,8 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
             conn.execute(self._insert_sad_query, self.default_sads)
             conn.execute(self._delete_sadd_query)
             conn.execute(self._insert_sadd_query, self.default_sadds)
+            conn.execute(self._delete_add_query)
+            conn.execute(self._insert_add_query, self.default_adds)
             conn.execute(self._delete_nm_query)
             conn.execute(self._insert_nm_query, self.default_nms)
             conn.execute(self._delete_aa_query)
@@ -295,6 +324,63 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
             count_sadd = conn.execute(query_sadd, id=count_sad[0][0]).fetchone()
             self.assertEqual(count_sadd[0], 3)
 
+    def test_should_index_dimensions(self):
+        expression = ('AVG(hpcs.compute{flavor_id=777, image_id=888,'
+                      ' metric_name=cpu}) > 10')
+        sub_expr_list = (alarm_expr_parser.AlarmExprParser(expression).sub_expr_list)
+        alarm_def_id = self.repo.create_alarm_definition('555',
+                                                         '90% CPU',
+                                                         expression,
+                                                         sub_expr_list,
+                                                         '',
+                                                         'LOW',
+                                                         [],
+                                                         [],
+                                                         None,
+                                                         None)
+
+        query = (select([self.add.c.tenant_id,
+                         self.add.c.dimension_name,
+                         self.add.c.value])
+                 .where(self.add.c.alarm_definition_id == bindparam('id'))
+                 .order_by(self.add.c.dimension_name))
+
+        with self.engine.connect() as conn:
+            rows = [tuple(row) for row in conn.execute(query, id=alarm_def_id)]
+        self.assertEqual([('555', 'flavor_id', '777'),
+                          ('555', 'image_id', '888'),
+                          ('555', 'metric_name', 'cpu')], rows)
+
+        self.repo.delete_alarm_definition('555', alarm_def_id)
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(query, id=alarm_def_id).fetchall()
+        self.assertEqual([], rows)
+
+    def test_should_find_deterministic(self):
+        expression = ('count(log.error{service=monitoring}, deterministic) > 1 and '
+                      'count(log.warning{service=monitoring}, deterministic) > 10')
+        sub_expr_list = (alarm_expr_parser.AlarmExprParser(expression).sub_expr_list)
+        alarm_def_id = self.repo.create_alarm_definition('555',
+                                                         'Errors',
+                                                         expression,
+                                                         sub_expr_list,
+                                                         '',
+                                                         'LOW',
+                                                         [],
+                                                         [],
+                                                         None,
+                                                         None)
+
+        alarm_def = self.repo.get_alarm_definition('555', alarm_def_id)
+        self.assertTrue(alarm_def['deterministic'])
+
+        alarm_defs = self.repo.get_alarm_definitions('555')
+        self.assertEqual([True], [bool(ad['deterministic']) for ad in alarm_defs])
+
+        alarm_def = self.repo.get_alarm_definition('bob', '234')
+        self.assertFalse(alarm_def['deterministic'])
+
     def test_should_update(self):
         expression = ''.join(['AVG(hpcs.compute{flavor_id=777, image_id=888,',
                               ' metric_name=mem}) > 20 and',
@@ -313,6 +399,7 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
         expected = {'actions_enabled': False,
                     'alarm_actions': '29387234,77778687',
                     'description': '',
+                    'deterministic': False,
                     'expression': 'AVG(hpcs.compute{flavor_id=777, '
                     'image_id=888, metric_name=mem}) > 20 and'
                     ' AVG(hpcs.compute) < 100',
@@ -366,6 +453,7 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
         expected = [{'actions_enabled': False,
                      'alarm_actions': '29387234,77778687',
                      'description': None,
+                     'deterministic': False,
                      'expression': 'AVG(hpcs.compute{flavor_id=777, '
                      'image_id=888, metric_name=cpu, device=1}) > 10',
                      'id': '123',
@@ -377,6 +465,7 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
                     {'actions_enabled': False,
                      'alarm_actions': '29387234,77778687',
                      'description': '',
+                     'deterministic': False,
                      'expression': 'AVG(hpcs.compute{flavor_id=777, '
                      'image_id=888, metric_name=mem}) > 20 and'
                      ' AVG(hpcs.compute) < 100',
@@ -392,6 +481,7 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
         expected = [{'actions_enabled': False,
                      'alarm_actions': '29387234,77778687',
                      'description': None,
+                     'deterministic': False,
                      'expression': 'AVG(hpcs.compute{flavor_id=777, '
                      'image_id=888, metric_name=cpu, device=1}) > 10',
                      'id': '123',
@@ -403,6 +493,7 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
                     {'actions_enabled': False,
                      'alarm_actions': '29387234,77778687',
                      'description': '',
+                     'deterministic': False,
                      'expression': 'AVG(hpcs.compute{flavor_id=777, '
                      'image_id=888, metric_name=mem}) > 20 and'
                      ' AVG(hpcs.compute) < 100',
@@ -486,6 +577,7 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
         expected = {'actions_enabled': False,
                     'alarm_actions': '29387234,77778687',
                     'description': None,
+                    'deterministic': False,
                     'expression': 'AVG(hpcs.compute{flavor_id=777, '
                     'image_id=888, metric_name=cpu, device=1}) > 10',
                     'id': '123',
@@ -565,6 +657,7 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
         expected = {'actions_enabled': False,
                     'alarm_actions': '29387234,77778687',
                     'description': None,
+                    'deterministic': False,
                     'expression': 'AVG(hpcs.compute{flavor_id=777, '
                     'image_id=888, metric_name=cpu, device=1}) > 10',
                     'id': '123',
@@ -585,6 +678,7 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
         expected = [{'actions_enabled': False,
                      'alarm_actions': '29387234,77778687',
                      'description': None,
+                     'deterministic': False,
                      'expression': 'AVG(hpcs.compute{flavor_id=777, '
                      'image_id=888, metric_name=cpu, device=1}) > 10',
                      'id': '123',
@@ -596,6 +690,7 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
                     {'actions_enabled': False,
                      'alarm_actions': '29387234,77778687',
                      'description': None,
+                     'deterministic': False,
                      'expression': 'AVG(hpcs.compute{flavor_id=777, '
                      'image_id=888, metric_name=mem}) > 20 and '
                      'AVG(hpcs.compute) < 100',
@@ -625,10 +720,25 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
                                                     limit=1)
         self.assertEqual(alarmDef3, [])
 
+    def test_should_find_after_keyset_offset(self):
+        alarmDef1 = self.repo.get_alarm_definitions(tenant_id='bob',
+                                                    sort_by=['name'],
+                                                    offset=['50% CPU', '234'],
+                                                    limit=1)
+        self.assertEqual(['123'], [ad['id'] for ad in alarmDef1])
+
+        alarmDef2 = self.repo.get_alarm_definitions(tenant_id='bob',
+                                                    sort_by=['created_at desc'],
+                                                    limit=1)
+        self.assertEqual(['234', '123'], [ad['id'] for ad in alarmDef2])
+        self.assertEqual(self.default_ads[1]['created_at'],
+                         alarmDef2[0]['created_at'])
+
     def test_should_find_by_dimension(self):
         expected = [{'actions_enabled': False,
                      'alarm_actions': '29387234,77778687',
                      'description': None,
+                     'deterministic': False,
                      'expression': 'AVG(hpcs.compute{flavor_id=777,'
                      ' image_id=888, metric_name=mem}) > 20 '
                      'and AVG(hpcs.compute) < 100',
@@ -648,6 +758,7 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
         expected = [{'actions_enabled': False,
                      'alarm_actions': '29387234,77778687',
                      'description': None,
+                     'deterministic': False,
                      'expression': 'AVG(hpcs.compute{flavor_id=777, '
                      'image_id=888, metric_name=cpu, device=1}) > 10',
                      'id': '123',
@@ -659,6 +770,7 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
                     {'actions_enabled': False,
                      'alarm_actions': '29387234,77778687',
                      'description': None,
+                     'deterministic': False,
                      'expression': 'AVG(hpcs.compute{flavor_id=777, '
                      'image_id=888, metric_name=mem}) > 20 and '
                      'AVG(hpcs.compute) < 100',
@@ -678,6 +790,7 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
         expected = [{'actions_enabled': False,
                      'alarm_actions': '29387234,77778687',
                      'description': None,
+                     'deterministic': False,
                      'expression': 'AVG(hpcs.compute{flavor_id=777, '
                      'image_id=888, metric_name=cpu, device=1}) > 10',
                      'id': '123',
@@ -710,6 +823,7 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
         expected = [{'actions_enabled': False,
                      'alarm_actions': '29387234,77778687',
                      'description': None,
+                     'deterministic': False,
                      'expression': 'AVG(hpcs.compute{flavor_id=777, '
                      'image_id=888, metric_name=mem}) > 20 '
                      'and AVG(hpcs.compute) < 100',
@@ -724,6 +838,28 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
                                                     limit=1)
         self.assertEqual(alarmDef1, expected)
 
+    def test_should_write_events_with_delete(self):
+        eo = models.create_eo_model(MetaData())
+        with self.engine.begin() as conn:
+            conn.execute(delete(eo))
+
+        self.repo.delete_alarm_definition(
+            'bob', '123', events=lambda result: [(u'events', u'deleted')])
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(select([eo.c.topic, eo.c.message])).fetchall()
+        self.assertEqual([(u'events', u'deleted')], [tuple(row) for row in rows])
+
+    def test_should_not_delete_when_events_fail(self):
+        def events(result):
+            raise ValueError()
+
+        self.assertRaises(ValueError, self.repo.delete_alarm_definition,
+                          'bob', '123', events=events)
+
+        alarm_definition = self.repo.get_alarm_definition('bob', '123')
+        self.assertEqual('123', alarm_definition['id'])
+
     def test_should_patch_name(self):
         self.run_patch_test(name=u'90% CPU New')
 
@@ -811,7 +947,8 @@ class TestAlarmDefinitionRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
                          u','.join(alarm_actions) if alarm_actions else ALARM_DEF_123_FIELDS['alarm_actions'],
                          u','.join(ok_actions) if ok_actions else ALARM_DEF_123_FIELDS['ok_actions'],
                          (u','.join(undetermined_actions) if undetermined_actions else
-                          ALARM_DEF_123_FIELDS['undetermined_actions']))
+                          ALARM_DEF_123_FIELDS['undetermined_actions']),
+                         ALARM_DEF_123_FIELDS['deterministic'])
 
         sad = self.default_sads[0]
         if expression and ALARM_DEF_123_FIELDS['expression'] != expression:
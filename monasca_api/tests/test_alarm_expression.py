@@ -1,3 +1,4 @@
+# -*- coding: utf-8 -*-
 # (C) Copyright 2016-2017 Hewlett Packard Enterprise Development LP
 #
 # Licensed under the Apache License, Version 2.0 (the "License"); you may
@@ -12,10 +13,13 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from mock import patch
 import pyparsing
 import unittest
 
 from monasca_api.expression_parser import alarm_expr_parser
+from monasca_api.expression_parser import expression_cache
+from monasca_api.expression_parser import pyparsing_alarm_expr_parser
 
 
 class TestAlarmExpression(unittest.TestCase):
@@ -57,3 +61,112 @@ class TestAlarmExpression(unittest.TestCase):
     def test_zero_periods(self):
         expression = self.good_simple_expression.replace('times 4', 'times 0')
         self._ensure_parse_fails(expression)
+
+
+class TestExpressionCache(unittest.TestCase):
+
+    def setUp(self):
+        expression_cache.clear()
+        self.addCleanup(expression_cache.clear)
+
+    @patch.object(expression_cache._parsed_expressions, 'max_entries', 2)
+    def test_expressions_are_parsed_once(self):
+        with patch('monasca_api.expression_parser.alarm_expr_parser.AlarmExprParser',
+                   wraps=alarm_expr_parser.AlarmExprParser) as parser_mock:
+            first = expression_cache.parse(u'max(cpu.idle_perc) > 10')
+            second = expression_cache.parse(u'max(cpu.idle_perc) > 10')
+            self.assertIs(first, second)
+            self.assertEqual(1, parser_mock.call_count)
+
+            expression_cache.parse(u'min(cpu.idle_perc) < 10')
+            expression_cache.parse(u'max(cpu.idle_perc) > 10')
+            # The least recently used expression is evicted
+            expression_cache.parse(u'avg(cpu.idle_perc) < 10')
+            expression_cache.parse(u'max(cpu.idle_perc) > 10')
+            self.assertEqual(3, parser_mock.call_count)
+            expression_cache.parse(u'min(cpu.idle_perc) < 10')
+            self.assertEqual(4, parser_mock.call_count)
+
+    def test_parse_errors_are_not_cached(self):
+        for _ in range(2):
+            self.assertRaises((pyparsing.ParseException,
+                               pyparsing.ParseFatalException),
+                              expression_cache.parse, u'max(cpu.idle_perc) >')
+
+
+class TestAlarmExprParserDifferential(unittest.TestCase):
+    """Compares the parser with the pyparsing reference implementation"""
+
+    corpus = [
+        "max(cpu.idle_perc{hostname=fred}, 60) > 10 times 4",
+        u"max(-_.千幸福的笑脸{घोड़ा=馬,  dn2=dv2,千幸福的笑脸घ=千幸福的笑脸घ}) gte 100 "
+        u"times 3 && (min(ເຮືອນ{dn3=dv3,家=дом}) < 10 or sum(biz{dn5=dv5}) >99 and "
+        u"count(fizzle) lt 0or count(baz) > 1)",
+        u"max(foo{hostname=mini-mon,千=千}, 120) > 100 and (max(bar)>100 or max(biz)>100)",
+        "千{千=千} > 1",
+        "max(foo)>=100",
+        "test_metric{this=that, that =  this} < 1",
+        "max  (  3test_metric5  {  this  =  that  })  lt  5 times    3",
+        "ntp.offset > 1 or ntp.offset < -5",
+        "max(3test_metric5{it's this=that's it}) lt 5 times 3",
+        "count(log.error{test=1}, deterministic) > 1.0",
+        "count(log.error{test=1}, DETERMINISTIC, 120) > 1.0",
+        "last(test_metric{hold=here}) < 13",
+        "count(log.error{test=1}, deterministic, 130) > 1.0",
+        "count(log.error{test=1}, deterministic) > 1.0 times 0",
+        "a > 1 and b > 2 and c > 3 or d <= 4 && e GTE 5.25 || (f lte -6 and (g < 7))",
+        "AVG(hpcs.compute{flavor_id=777, image_id=888, metric_name=cpu, device=1}) > 10",
+        "avg(cpu{}) > - 3 . 5 TIMES 2",
+        "avg(cpu{a=b,}) > 1",
+        "max(cpu, 0) > 1",
+        "max(cpu, 59) > 1 times 1",
+        "max(cpu)\t>\t1",
+        "a > 1 andrew > 2",
+        "max > 1",
+        "max(cpu) > 1 times -1",
+        "max(cpu) > 1 and",
+        "(max(cpu) > 1",
+        "max(" + "x" * 255 + ") > 1",
+        "max(" + "x" * 256 + ") > 1",
+        "max(cpu{a=" + "v" * 256 + "}) > 1",
+        "",
+    ]
+
+    @staticmethod
+    def _describe(parser_class, expression):
+        try:
+            parser = parser_class(expression)
+        except pyparsing.ParseFatalException as ex:
+            return 'fatal', ex.msg, ex.column
+        except pyparsing.ParseException:
+            return 'error'
+
+        return [parser.fmtd_expr_str] + [
+            (type(sub_expr), sub_expr.fmtd_sub_expr_str, sub_expr.func,
+             sub_expr.metric_name, sub_expr.dimensions_as_list and list(sub_expr.dimensions_as_list),
+             sub_expr.operator, sub_expr.normalized_operator, sub_expr.threshold,
+             sub_expr.period, sub_expr.periods, sub_expr.deterministic)
+            for sub_expr in parser.sub_expr_list]
+
+    def _assert_same_result(self, expression):
+        self.assertEqual(
+            self._describe(pyparsing_alarm_expr_parser.PyparsingAlarmExprParser, expression),
+            self._describe(alarm_expr_parser.AlarmExprParser, expression),
+            repr(expression))
+
+    def test_corpus(self):
+        for expression in self.corpus:
+            self._assert_same_result(expression)
+
+    def test_corpus_with_deleted_characters(self):
+        for expression in (self.corpus[0], self.corpus[2], self.corpus[14]):
+            for index in range(len(expression)):
+                self._assert_same_result(expression[:index] + expression[index + 1:])
+
+    def test_parse_error(self):
+        self.assertRaises(pyparsing.ParseException,
+                          alarm_expr_parser.AlarmExprParser, u'max(cpu.idle_perc) 10')
+        with self.assertRaises(pyparsing.ParseFatalException) as context:
+            alarm_expr_parser.AlarmExprParser(u'max(cpu.idle_perc, 0) > 10')
+        self.assertEqual('Period must not be 0', context.exception.msg)
+        self.assertEqual(20, context.exception.column)
@@ -17,18 +17,23 @@
 
 from collections import OrderedDict
 import copy
+import datetime
 import json
 
 import falcon.testing
 import fixtures
+import jinja2
+import jinja2.sandbox
+import mock
 import testtools.matchers as matchers
 
-from mock import Mock
 
+from monasca_api.common.repositories import exceptions
 from monasca_api.common.repositories.model import sub_alarm_definition
 from monasca_api.tests import base
 from monasca_api.v2.reference import alarm_definitions
 from monasca_api.v2.reference import alarms
+from monasca_api.v2.reference import template_cache
 
 import oslo_config.fixture
 import oslotest.base as oslotest
@@ -127,9 +132,13 @@ class InfluxClientAlarmHistoryResponseFixture(fixtures.MockPatch):
         mock_data[u"sub_alarms"] = json.dumps(mock_data[u"sub_alarms"])
         mock_data[u"metrics"] = json.dumps(mock_data[u"metrics"])
 
-        self.mock.return_value.query.return_value.raw = {
-            "series": [self._build_series("alarm_state_history", mock_data)]
-        }
+        response = self.mock.return_value._session.get.return_value
+        response.status_code = 200
+        response.iter_lines.return_value = [json.dumps({
+            "results": [{
+                "series": [self._build_series("alarm_state_history", mock_data)]
+            }]
+        })]
 
 
 class RESTResponseEquals(object):
@@ -168,6 +177,11 @@ class AlarmTestBase(falcon.testing.TestBase, oslotest.BaseTestCase):
 
         self.useFixture(fixtures.MockPatch(
             'monasca_api.common.messaging.kafka_publisher.KafkaPublisher'))
+        # The relay of the event outbox is started by the first event
+        self.useFixture(fixtures.MockPatch(
+            'monasca_api.v2.reference.outbox_relay.OutboxRelay'))
+        self.useFixture(fixtures.MockPatch(
+            'monasca_api.v2.reference.outbox_relay._relay', None))
 
         self.CONF = self.useFixture(MonascaApiConfigFixture(CONF)).conf
 
@@ -178,7 +192,7 @@ class TestAlarmsStateHistory(AlarmTestBase):
         super(TestAlarmsStateHistory, self).setUp()
 
         self.useFixture(InfluxClientAlarmHistoryResponseFixture(
-            'monasca_api.common.repositories.influxdb.metrics_repository.client.InfluxDBClient'))
+            'monasca_api.common.repositories.influxdb.transport.client.InfluxDBClient'))
         self.useFixture(fixtures.MockPatch(
             'monasca_api.common.repositories.sqla.alarms_repository.AlarmsRepository'))
 
@@ -203,6 +217,117 @@ class TestAlarmsStateHistory(AlarmTestBase):
         self.assertThat(response, RESTResponseEquals(expected_elements))
 
 
+class TestAlarms(AlarmTestBase):
+
+    def setUp(self):
+        super(TestAlarms, self).setUp()
+
+        self.alarms_repo_mock = self.useFixture(fixtures.MockPatch(
+            'monasca_api.common.repositories.sqla.alarms_repository.AlarmsRepository'
+        )).mock
+
+        self.alarms_resource = alarms.Alarms()
+        self.api.add_route('/v2.0/alarms/{alarm_id}', self.alarms_resource)
+
+        timestamp = datetime.datetime(2015, 1, 1)
+        self.alarms_repo_mock.return_value.get_alarm.return_value = [{
+            'alarm_id': u'1', 'state': u'ALARM', 'lifecycle_state': None,
+            'link': None, 'state_updated_timestamp': timestamp,
+            'updated_timestamp': timestamp, 'created_timestamp': timestamp,
+            'alarm_definition_id': u'2', 'alarm_definition_name': u'host down',
+            'alarm_definition_description': u'{{ hostname }} is down',
+            'severity': u'HIGH', 'metric_name': u'host_alive_status',
+            'metric_dimensions': {u'hostname': u'host1'}}]
+
+    def _get_description(self, query_string=''):
+        response = self.simulate_request(
+            u'/v2.0/alarms/1', query_string=query_string,
+            headers={'X-Roles': 'admin', 'X-Tenant-Id': TENANT_ID})
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_200)
+        return json.loads(response[0])['alarm_definition']['description']
+
+    def test_alarm_description_is_rendered(self):
+        self.assertEqual(u'host1 is down', self._get_description())
+
+    def test_alarm_update_unknown_alarm(self):
+        repo = self.alarms_repo_mock.return_value
+        repo.get_alarm_metrics.return_value = []
+        repo.get_sub_alarms.return_value = []
+        repo.update_alarm.side_effect = exceptions.DoesNotExistException
+
+        self.simulate_request(
+            u'/v2.0/alarms/unknown', method='PUT',
+            headers={'X-Roles': 'admin', 'X-Tenant-Id': TENANT_ID,
+                     'Content-Type': 'application/json'},
+            body=json.dumps({u'state': u'OK', u'lifecycle_state': u'OPEN',
+                             u'link': u'http://example.com'}))
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_404)
+
+    def test_alarm_delete_unknown_alarm(self):
+        repo = self.alarms_repo_mock.return_value
+        repo.get_alarm_metrics.return_value = []
+        repo.get_sub_alarms.return_value = []
+        repo.delete_alarm.side_effect = exceptions.DoesNotExistException
+
+        self.simulate_request(
+            u'/v2.0/alarms/unknown', method='DELETE',
+            headers={'X-Roles': 'admin', 'X-Tenant-Id': TENANT_ID})
+
+        self.assertEqual(self.srmock.status, falcon.HTTP_404)
+
+    def test_alarm_update_reads_definition_on_state_change(self):
+        repo = self.alarms_repo_mock.return_value
+        repo.get_alarm_metrics.return_value = []
+        repo.get_sub_alarms.return_value = [{'alarm_definition_id': u'2'}]
+        repo.get_alarm_definition.side_effect = exceptions.DoesNotExistException
+
+        alarm = self.alarms_resource
+        for old_state, definition_reads in ((u'OK', 0), (u'ALARM', 1)):
+            repo.update_alarm.side_effect = (
+                lambda *args, **kwargs: kwargs['events'](({'state': old_state}, 0)))
+            alarm._alarm_update(TENANT_ID, u'1', u'OK', u'OPEN', None)
+            self.assertEqual(definition_reads,
+                             repo.get_alarm_definition.call_count)
+
+    def test_alarm_description_rendering_can_be_skipped(self):
+        self.assertEqual(u'{{ hostname }} is down',
+                         self._get_description('render_description=false'))
+
+
+class TestDescriptionTemplateCache(oslotest.BaseTestCase):
+
+    def setUp(self):
+        super(TestDescriptionTemplateCache, self).setUp()
+        template_cache.clear()
+        self.addCleanup(template_cache.clear)
+
+    def test_templates_are_compiled_once(self):
+        with mock.patch.object(template_cache._environment, 'from_string',
+                               wraps=template_cache._environment.from_string) as from_string:
+            first = template_cache.get(u'{{ hostname }} is down')
+            second = template_cache.get(u'{{ hostname }} is down')
+
+            self.assertIs(first, second)
+            self.assertEqual(1, from_string.call_count)
+            self.assertEqual(u'host1 is down', first.render(hostname=u'host1'))
+
+    def test_syntax_errors_are_cached(self):
+        with mock.patch.object(template_cache._environment, 'from_string',
+                               wraps=template_cache._environment.from_string) as from_string:
+            for _ in range(2):
+                self.assertRaises(jinja2.TemplateSyntaxError,
+                                  template_cache.get, u'{{ hostname is down')
+            self.assertEqual(1, from_string.call_count)
+
+    def test_templates_are_sandboxed(self):
+        template = template_cache.get(u'{{ hostname.__class__.__mro__ }}')
+
+        self.assertRaises(jinja2.sandbox.SecurityError,
+                          template.render, hostname=u'host1')
+
+
 class TestAlarmDefinition(AlarmTestBase):
     def setUp(self):
         super(TestAlarmDefinition, self).setUp()
@@ -212,8 +337,6 @@ class TestAlarmDefinition(AlarmTestBase):
         )).mock
 
         self.alarm_definition_resource = alarm_definitions.AlarmDefinitions()
-        self.alarm_definition_resource.send_event = Mock()
-        self._send_event = self.alarm_definition_resource.send_event
 
         self.api.add_route("/v2.0/alarm-definitions/",
                            self.alarm_definition_resource)
@@ -495,7 +618,11 @@ class TestAlarmDefinition(AlarmTestBase):
         # and pass that value onto the Notification Engine which will not
         # create a notification even actions_enabled is True in the
         # database. So, ensure all fields are set correctly
-        ((_, event), _) = self._send_event.call_args
+        update_or_patch = self.alarm_def_repo_mock.return_value.update_or_patch_alarm_definition
+        events = update_or_patch.call_args[1]['events']
+        [(topic, message)] = events(update_or_patch.return_value)
+        self.assertEqual(u'events', topic)
+        event = json.loads(message)
         expr = u'max(test.metric{hostname=host}, 60) gte 1 times 1'
         sub_expression = {'11111': {u'expression': expr,
                                     u'function': 'max',
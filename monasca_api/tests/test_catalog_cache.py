@@ -0,0 +1,97 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from mock import Mock
+from mock import patch
+from oslo_config import cfg
+from oslo_config import fixture as fixture_config
+import testtools
+
+from monasca_api.common import catalog_cache
+
+
+class TestCatalogCache(testtools.TestCase):
+
+    def setUp(self):
+        super(TestCatalogCache, self).setUp()
+        self._fixture_config = self.useFixture(fixture_config.Config(cfg.CONF))
+        self._fixture_config.config(max_entries=2, group='catalog_cache')
+        self.addCleanup(setattr, catalog_cache, '_cache', None)
+
+    def test_disabled_cache_always_loads(self):
+        cache = catalog_cache.get_cache()
+        load = Mock(return_value=[{u'name': u'cpu.idle_perc'}])
+
+        cache.get('metric_names', 'tenant', 'region', {'dimensions': None}, load)
+        cache.get('metric_names', 'tenant', 'region', {'dimensions': None}, load)
+
+        self.assertEqual(2, load.call_count)
+
+    def test_results_are_cached_per_query(self):
+        self._fixture_config.config(enabled=True, group='catalog_cache')
+        cache = catalog_cache.get_cache()
+        self.assertIs(cache, catalog_cache.get_cache())
+
+        load = Mock(side_effect=lambda: [{u'name': u'cpu.idle_perc'}])
+
+        first = cache.get('metric_names', 'tenant', 'region',
+                          {'dimensions': {'hostname': 'host0', 'service': 'a'}}, load)
+        second = cache.get('metric_names', 'tenant', 'region',
+                           {'dimensions': {'service': 'a', 'hostname': 'host0'}}, load)
+        self.assertIs(first, second)
+        self.assertEqual(1, load.call_count)
+
+        cache.get('metric_names', 'other_tenant', 'region',
+                  {'dimensions': {'hostname': 'host0', 'service': 'a'}}, load)
+        cache.get('dimension_names', 'tenant', 'region',
+                  {'metric_name': None}, load)
+        self.assertEqual(3, load.call_count)
+
+    @patch('monasca_api.common.catalog_cache.time.time')
+    def test_in_process_backend_expiry_and_eviction(self, time_mock):
+        time_mock.return_value = 1000.0
+        backend = catalog_cache.InProcessBackend()
+
+        backend.set('a', [1], 60)
+        backend.set('b', [2], 10)
+        self.assertEqual([1], backend.get('a'))
+        # b is the least recently used entry
+        backend.set('c', [3], 100)
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual([1], backend.get('a'))
+
+        time_mock.return_value = 1060.0
+        self.assertIsNone(backend.get('a'))
+        self.assertEqual([3], backend.get('c'))
+
+    @patch('monasca_api.common.catalog_cache.memcache.Client')
+    def test_memcached_backend(self, memcached_client_mock):
+        self._fixture_config.config(
+            enabled=True,
+            backend='monasca_api.common.catalog_cache:MemcachedBackend',
+            ttl=30, memcached_servers=['10.0.0.1:11211'],
+            group='catalog_cache')
+        client = memcached_client_mock.return_value
+        client.get.return_value = None
+
+        cache = catalog_cache.get_cache()
+        result = cache.get('dimension_values', 'tenant', 'region',
+                           {'metric_name': None, 'dimension_name': 'hostname'},
+                           lambda: {u'values': [u'host0']})
+
+        self.assertEqual({u'values': [u'host0']}, result)
+        memcached_client_mock.assert_called_once_with(['10.0.0.1:11211'])
+        key = client.get.call_args[0][0]
+        self.assertNotIn(' ', key)
+        client.set.assert_called_once_with(key, result, time=30)
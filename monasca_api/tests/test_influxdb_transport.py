@@ -0,0 +1,164 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+
+from influxdb.exceptions import InfluxDBClientError
+from mock import Mock
+from mock import patch
+from oslo_config import cfg
+from oslo_config import fixture as fixture_config
+import requests
+import testtools
+
+from monasca_api.common.repositories.influxdb import transport
+import monasca_api.v2.reference  # noqa: registers the influxdb options
+
+
+@patch('monasca_api.common.repositories.influxdb.transport.time.sleep')
+@patch('monasca_api.common.repositories.influxdb.transport.client.InfluxDBClient')
+class TestTransport(testtools.TestCase):
+
+    def setUp(self):
+        super(TestTransport, self).setUp()
+        self._fixture_config = self.useFixture(fixture_config.Config(cfg.CONF))
+        self._fixture_config.config(ip_address='10.0.0.1', port='8086',
+                                    pool_size=2, connect_timeout=1.0,
+                                    read_timeout=10.0, max_retries=2,
+                                    group='influxdb')
+
+    def test_pool_reuses_clients(self, influxdb_client_mock, sleep_mock):
+        influxdb_client_mock.side_effect = lambda *args, **kwargs: Mock()
+        pool = transport.Transport(cfg.CONF.influxdb)
+
+        with pool.client() as first:
+            with pool.client() as second:
+                self.assertIsNot(first, second)
+        with pool.client() as third:
+            # the most recently used client is reused first
+            self.assertIs(first, third)
+
+        self.assertEqual(2, influxdb_client_mock.call_count)
+        influxdb_client_mock.assert_called_with(
+            '10.0.0.1', '8086', None, None, None, timeout=(1.0, 10.0))
+
+    def test_thread_mode_creates_client_per_thread(self, influxdb_client_mock,
+                                                   sleep_mock):
+        self._fixture_config.config(session_mode='thread', group='influxdb')
+        influxdb_client_mock.side_effect = lambda *args, **kwargs: Mock()
+        sessions = transport.Transport(cfg.CONF.influxdb)
+
+        clients = []
+
+        def use_client():
+            for _ in range(2):
+                with sessions.client() as influxdb_client:
+                    clients.append(influxdb_client)
+
+        thread = threading.Thread(target=use_client)
+        thread.start()
+        thread.join()
+        use_client()
+
+        self.assertIs(clients[0], clients[1])
+        self.assertIs(clients[2], clients[3])
+        self.assertIsNot(clients[0], clients[2])
+
+    def test_gzip_can_be_disabled(self, influxdb_client_mock, sleep_mock):
+        self._fixture_config.config(gzip=False, group='influxdb')
+        influxdb_client = influxdb_client_mock.return_value
+        influxdb_client._session.headers = {}
+
+        with transport.Transport(cfg.CONF.influxdb).client():
+            pass
+
+        self.assertEqual('identity',
+                         influxdb_client._session.headers['Accept-Encoding'])
+
+    def test_select_is_retried(self, influxdb_client_mock, sleep_mock):
+        influxdb_client = influxdb_client_mock.return_value
+        influxdb_client.query.side_effect = [
+            requests.exceptions.ConnectionError(),
+            InfluxDBClientError('timeout', 503),
+            'result']
+
+        result = transport.Transport(cfg.CONF.influxdb).query(
+            'select value from "cpu.idle_perc"')
+
+        self.assertEqual('result', result)
+        self.assertEqual(3, influxdb_client.query.call_count)
+        self.assertEqual(2, sleep_mock.call_count)
+        for (backoff,), _ in sleep_mock.call_args_list:
+            self.assertLessEqual(0, backoff)
+            self.assertGreaterEqual(0.2, backoff)
+
+    def test_retries_are_limited(self, influxdb_client_mock, sleep_mock):
+        influxdb_client = influxdb_client_mock.return_value
+        influxdb_client.query.side_effect = requests.exceptions.Timeout()
+
+        self.assertRaises(requests.exceptions.Timeout,
+                          transport.Transport(cfg.CONF.influxdb).query,
+                          'show series')
+        self.assertEqual(3, influxdb_client.query.call_count)
+
+    def test_client_errors_are_not_retried(self, influxdb_client_mock,
+                                           sleep_mock):
+        influxdb_client = influxdb_client_mock.return_value
+        influxdb_client.query.side_effect = InfluxDBClientError('bad', 400)
+
+        self.assertRaises(InfluxDBClientError,
+                          transport.Transport(cfg.CONF.influxdb).query,
+                          'select value from "cpu.idle_perc"')
+        self.assertEqual(1, influxdb_client.query.call_count)
+        sleep_mock.assert_not_called()
+
+    def test_other_statements_are_not_retried(self, influxdb_client_mock,
+                                              sleep_mock):
+        influxdb_client = influxdb_client_mock.return_value
+        influxdb_client.query.side_effect = requests.exceptions.ConnectionError()
+
+        self.assertRaises(requests.exceptions.ConnectionError,
+                          transport.Transport(cfg.CONF.influxdb).query,
+                          'drop series from "cpu.idle_perc"')
+        self.assertEqual(1, influxdb_client.query.call_count)
+
+    def test_query_series_reads_chunks(self, influxdb_client_mock, sleep_mock):
+        influxdb_client = influxdb_client_mock.return_value
+        response = influxdb_client._session.get.return_value
+        response.status_code = 200
+        response.iter_lines.return_value = [
+            '{"results": [{"series": [{"name": "cpu", "partial": true}]}]}',
+            '',
+            '{"results": [{"series": [{"name": "cpu"}, {"name": "mem"}]}]}',
+            '{"results": [{"error": "max-select-point limit exceeded"}]}']
+
+        series = transport.Transport(cfg.CONF.influxdb).query_series(
+            'select value from /.*/')
+
+        self.assertEqual([u'cpu', u'cpu', u'mem'],
+                         [next(series)['name'] for _ in range(3)])
+        self.assertRaises(InfluxDBClientError, next, series)
+        response.close.assert_called_once_with()
+
+    def test_query_series_without_chunks(self, influxdb_client_mock,
+                                         sleep_mock):
+        self._fixture_config.config(chunk_size=0, group='influxdb')
+        influxdb_client = influxdb_client_mock.return_value
+        influxdb_client.query.return_value.raw = {'series': [{'name': 'cpu'}]}
+
+        series = list(transport.Transport(cfg.CONF.influxdb).query_series(
+            'select value from "cpu"'))
+
+        self.assertEqual([{'name': 'cpu'}], series)
+        influxdb_client._session.get.assert_not_called()
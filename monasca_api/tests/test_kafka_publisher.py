@@ -0,0 +1,143 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+
+from mock import patch
+from oslo_config import cfg
+from oslo_config import fixture as fixture_config
+import testtools
+
+from monasca_api.common.messaging import exceptions
+from monasca_api.common.messaging import kafka_publisher
+
+
+class TestMessageBatcher(testtools.TestCase):
+
+    def setUp(self):
+        super(TestMessageBatcher, self).setUp()
+        self.batches = []
+        self.sending = threading.Event()
+        self.sending.set()
+
+    def _send(self, batch):
+        self.sending.wait()
+        self.batches.append(batch)
+
+    def test_coalesces_requests_into_batches(self):
+        batcher = kafka_publisher.MessageBatcher(self._send, max_queue_size=100,
+                                                 max_batch_bytes=10, linger=10,
+                                                 retry_after=1)
+        batcher.put(['aaaa', 'bbbb'])
+        batcher.put('cccc')
+        batcher.put(['dd'])
+        batcher.close()
+
+        self.assertEqual([['aaaa', 'bbbb'], ['cccc', 'dd']], self.batches)
+
+    def test_rejects_requests_when_queue_is_full(self):
+        self.sending.clear()
+        batcher = kafka_publisher.MessageBatcher(self._send, max_queue_size=3,
+                                                 max_batch_bytes=1, linger=0,
+                                                 retry_after=5)
+        batcher.put(['a'])
+        batcher.put(['b', 'c'])
+
+        ex = self.assertRaises(exceptions.MessageQueueFullException,
+                               batcher.put, ['d', 'e'])
+        self.assertEqual(5, ex.retry_after)
+
+        self.sending.set()
+        batcher.close()
+        self.assertEqual(['a', 'b', 'c'], [m for batch in self.batches for m in batch])
+
+    def test_rejects_requests_after_close(self):
+        batcher = kafka_publisher.MessageBatcher(self._send, max_queue_size=10,
+                                                 max_batch_bytes=10, linger=0,
+                                                 retry_after=1)
+        batcher.close()
+
+        self.assertRaises(exceptions.MessageQueueException,
+                          batcher.put, ['a'])
+
+    @patch('monasca_api.common.messaging.kafka_publisher.os.getpid')
+    def test_starts_thread_on_first_put_and_after_fork(self, getpid_mock):
+        getpid_mock.return_value = 1
+        batcher = kafka_publisher.MessageBatcher(self._send, max_queue_size=10,
+                                                 max_batch_bytes=10, linger=0,
+                                                 retry_after=1)
+        self.assertIsNone(batcher._thread)
+
+        batcher.put(['a'])
+        thread = batcher._thread
+        self.assertTrue(thread.is_alive())
+
+        # The thread of the parent process does not run in a forked process
+        getpid_mock.return_value = 2
+        batcher.put(['b'])
+        self.assertIsNot(thread, batcher._thread)
+        self.assertTrue(batcher._thread.is_alive())
+
+        batcher.close()
+        self.assertIn(['b'], self.batches)
+
+
+class TestKafkaPublisher(testtools.TestCase):
+
+    def setUp(self):
+        super(TestKafkaPublisher, self).setUp()
+        self._fixture_config = self.useFixture(fixture_config.Config(cfg.CONF))
+        self._fixture_config.config(uri='127.0.0.1:9092', partitions=[0], group='kafka')
+
+    @patch('monasca_api.common.messaging.kafka_publisher.kafka_producer.KafkaProducer')
+    def test_sync_publish(self, producer_mock):
+        publisher = kafka_publisher.KafkaPublisher('metrics')
+        publisher.send_message(['a', 'b'])
+
+        producer_mock.return_value.publish.assert_called_once_with('metrics', ['a', 'b'])
+
+    @patch('monasca_api.common.messaging.kafka_publisher.kafka_producer.KafkaProducer')
+    def test_async_publish_flushes_on_close(self, producer_mock):
+        self._fixture_config.config(async=True, batch_linger_ms=10000, group='kafka')
+
+        publisher = kafka_publisher.KafkaPublisher('metrics')
+        publisher.send_message(['a', 'b'])
+        publisher.send_message(['c'])
+        publisher.close()
+
+        producer_mock.return_value.publish.assert_called_once_with('metrics', ['a', 'b', 'c'])
+
+    @patch('monasca_api.common.messaging.kafka_publisher.time.sleep')
+    @patch('monasca_api.common.messaging.kafka_publisher.kafka_producer.KafkaProducer')
+    def test_async_publish_retries(self, producer_mock, sleep_mock):
+        self._fixture_config.config(async=True, max_retry=2, group='kafka')
+        publish_mock = producer_mock.return_value.publish
+        publish_mock.side_effect = [Exception(), None]
+
+        publisher = kafka_publisher.KafkaPublisher('metrics')
+        publisher.send_message(['a'])
+        publisher.close()
+
+        self.assertEqual(2, publish_mock.call_count)
+        sleep_mock.assert_called_once_with(1)
+
+    @patch('monasca_api.common.messaging.kafka_publisher.kafka_producer.KafkaProducer')
+    def test_send_messages_publishes_before_returning(self, producer_mock):
+        self._fixture_config.config(async=True, batch_linger_ms=10000, group='kafka')
+
+        publisher = kafka_publisher.KafkaPublisher('events')
+        publisher.send_messages(['a', 'b'])
+
+        producer_mock.return_value.publish.assert_called_once_with('events', ['a', 'b'])
+        publisher.close()
@@ -0,0 +1,60 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import unittest
+
+from mock import Mock
+
+from monasca_api.common import lru_cache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_lru_eviction_and_counters(self):
+        hit_counter = Mock()
+        miss_counter = Mock()
+        cache = lru_cache.LRUCache(2, hit_counter, miss_counter)
+
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        # b is the least recently used value
+        cache.set('c', 3)
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual({'a': 1, 'c': 3}, cache.get_many(['a', 'b', 'c']))
+
+        self.assertEqual(3, sum(args[0][0] for args in hit_counter.increment.call_args_list))
+        self.assertEqual(2, sum(args[0][0] for args in miss_counter.increment.call_args_list))
+
+    def test_get_or_load(self):
+        cache = lru_cache.LRUCache(10)
+        load = Mock(return_value=[1])
+
+        self.assertIs(load.return_value, cache.get_or_load('a', load))
+        self.assertIs(load.return_value, cache.get_or_load('a', load))
+        self.assertEqual(1, load.call_count)
+
+        self.assertRaises(ValueError, cache.get_or_load, 'b',
+                          Mock(side_effect=ValueError))
+        self.assertIsNone(cache.get('b'))
+
+    def test_pop_and_clear(self):
+        cache = lru_cache.LRUCache(10)
+        cache.set_many([('a', 1), ('b', 2)])
+
+        self.assertEqual(1, cache.pop('a'))
+        self.assertIsNone(cache.pop('a'))
+        cache.clear()
+        self.assertEqual(0, len(cache))
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import unittest
+
+from mock import patch
+
+from monasca_api.common.messaging.message_formats import metrics
+
+
+class TestMetricsMessageFormat(unittest.TestCase):
+
+    metric = {u'name': u'cpu.idle_perc',
+              u'dimensions': {u'hostname': u'host0', u'service': u'fire"fox'},
+              u'timestamp': 1490012345000,
+              u'value': 0.30000000000000004,
+              u'value_meta': {u'reason': u'日本'}}
+
+    def _expected(self, metric, region=u'useast'):
+        return {u'metric': metric,
+                u'meta': {u'tenantId': u'tenant', u'region': region},
+                u'creation_time': 1490012345}
+
+    @patch('monasca_api.common.messaging.message_formats.metrics.timeutils.utcnow_ts')
+    def test_transform_list(self, utcnow_ts_mock):
+        utcnow_ts_mock.return_value = 1490012345
+
+        messages = metrics.transform([self.metric, self.metric], u'tenant', u'useast')
+
+        self.assertEqual(2, len(messages))
+        for message in messages:
+            self.assertEqual(self._expected(self.metric), json.loads(message))
+
+    @patch('monasca_api.common.messaging.message_formats.metrics.timeutils.utcnow_ts')
+    def test_transform_single_metric_without_region(self, utcnow_ts_mock):
+        utcnow_ts_mock.return_value = 1490012345
+
+        messages = metrics.transform(self.metric, u'tenant', None)
+
+        self.assertEqual(1, len(messages))
+        self.assertEqual(self._expected(self.metric, region=None), json.loads(messages[0]))
+
+    @patch('monasca_api.common.messaging.message_formats.metrics.timeutils.utcnow_ts')
+    def test_transform_encoded(self, utcnow_ts_mock):
+        utcnow_ts_mock.return_value = 1490012345
+        encoded_metric = json.dumps(self.metric, ensure_ascii=False).encode('utf8')
+
+        messages = metrics.transform_encoded([encoded_metric], u'tenant', u'useast')
+
+        self.assertEqual(1, len(messages))
+        self.assertEqual(self._expected(self.metric), json.loads(messages[0]))
@@ -22,7 +22,9 @@ from oslo_config import fixture as fixture_config
 from sqlalchemy import delete, MetaData, insert, bindparam
 import testtools
 
+from monasca_api.common.repositories import keyset_cursor
 from monasca_api.common.repositories.sqla import models
+from monasca_api.common.repositories.sqla import sql_repository
 
 CONF = cfg.CONF
 
@@ -64,6 +66,7 @@ class TestNotificationMethodRepoDB(testtools.TestCase, fixtures.TestWithFixtures
 
     @classmethod
     def tearDownClass(cls):
+        sql_repository.dispose_engines()
         cls.fixture.cleanUp()
 
     def setUp(self):
@@ -108,9 +111,12 @@ class TestNotificationMethodRepoDB(testtools.TestCase, fixtures.TestWithFixtures
         expected_list_tables = ['alarm',
                                 'alarm_action',
                                 'alarm_definition',
+                                'alarm_definition_dimension',
                                 'alarm_definition_severity',
                                 'alarm_metric',
+                                'alarm_metric_dimension',
                                 'alarm_state',
+                                'event_outbox',
                                 'metric_definition',
                                 'metric_definition_dimensions',
                                 'metric_dimension',
@@ -162,6 +168,17 @@ class TestNotificationMethodRepoDB(testtools.TestCase, fixtures.TestWithFixtures
         nms = self.repo.list_notifications('444', None, 2, 1)
         self.assertEqual(nms, [])
 
+    def test_should_find_after_keyset_offset(self):
+        nms = self.repo.list_notifications('444', ['name desc'],
+                                           ['OtherEmail', '124'], 1)
+        self.assertEqual(nms, [self.default_nms[0]])
+
+        keys = keyset_cursor.sort_keys(['created_at'], 'id')
+        offset = keyset_cursor.decode(
+            keyset_cursor.encode(self.default_nms[0], keys), keys)
+        nms = self.repo.list_notifications('444', ['created_at'], offset, 1)
+        self.assertEqual(nms, [self.default_nms[1]])
+
     def test_update(self):
         import copy
         self.repo.update_notification('123', '444', 'Foo', 'EMAIL', 'abc', 0)
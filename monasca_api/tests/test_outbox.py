@@ -0,0 +1,232 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import datetime
+import threading
+
+import falcon
+from falcon import testing
+import fixtures
+from mock import Mock
+from mock import patch
+from oslo_config import cfg
+from oslo_config import fixture as fixture_config
+from sqlalchemy import delete, MetaData, select
+import testtools
+
+from monasca_api.common.messaging import exceptions
+from monasca_api.common.repositories.sqla import models
+from monasca_api.common.repositories.sqla import outbox_repository
+from monasca_api.common.repositories.sqla import sql_repository
+from monasca_api.v2.reference import outbox_relay
+
+
+class TestOutboxRepoDB(testtools.TestCase, fixtures.TestWithFixtures):
+
+    @classmethod
+    def setUpClass(cls):
+        from sqlalchemy import engine_from_config
+
+        engine = engine_from_config({'url': 'sqlite://'}, prefix='')
+
+        qry = open('monasca_api/tests/sqlite_alarm.sql', 'r').read()
+        sconn = engine.raw_connection()
+        c = sconn.cursor()
+        c.executescript(qry)
+        sconn.commit()
+        c.close()
+        cls.engine = engine
+
+        def _fake_engine_from_config(*args, **kw):
+            return cls.engine
+        cls.fixture = fixtures.MonkeyPatch(
+            'sqlalchemy.create_engine', _fake_engine_from_config)
+        cls.fixture.setUp()
+
+        cls.eo = models.create_eo_model(MetaData())
+
+    @classmethod
+    def tearDownClass(cls):
+        sql_repository.dispose_engines()
+        cls.fixture.cleanUp()
+
+    def setUp(self):
+        super(TestOutboxRepoDB, self).setUp()
+
+        self._fixture_config = self.useFixture(
+            fixture_config.Config(cfg.CONF))
+        self._fixture_config.config(url='sqlite://',
+                                    group='database')
+
+        self.repo = outbox_repository.OutboxRepository()
+
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.eo))
+            outbox_repository.insert_events(conn, [(u'events', u'1'),
+                                                   (u'alarm-state-transitions', u'2'),
+                                                   (u'events', u'3')])
+
+    def _outbox(self):
+        with self.engine.connect() as conn:
+            return [(row['topic'], row['message']) for row in
+                    conn.execute(select([self.eo]).order_by(self.eo.c.id))]
+
+    def test_should_relay_events_in_order(self):
+        published = []
+
+        self.assertEqual(2, self.repo.relay_events(2, published.extend, 60))
+        self.assertEqual([(u'events', u'1'),
+                          (u'alarm-state-transitions', u'2')], published)
+        self.assertEqual([(u'events', u'3')], self._outbox())
+
+        self.assertEqual(1, self.repo.relay_events(2, published.extend, 60))
+        self.assertEqual(0, self.repo.relay_events(2, published.extend, 60))
+        self.assertEqual([], self._outbox())
+
+    def test_should_keep_events_not_published(self):
+        def publish(events):
+            raise exceptions.MessageQueueException()
+
+        self.assertRaises(exceptions.MessageQueueException,
+                          self.repo.relay_events, 10, publish, 60)
+        self.assertEqual(3, len(self._outbox()))
+
+        # The events are released to be published again at once
+        published = []
+        self.assertEqual(3, self.repo.relay_events(10, published.extend, 60))
+        self.assertEqual(3, len(published))
+
+    def test_should_skip_events_claimed_by_other_relays(self):
+        claimed = []
+
+        def publish(events):
+            # Another relay runs while the first batch is being published
+            self.assertEqual(1, self.repo.relay_events(10, claimed.extend, 60))
+
+        self.assertEqual(2, self.repo.relay_events(2, publish, 60))
+        self.assertEqual([(u'events', u'3')], claimed)
+        self.assertEqual([], self._outbox())
+
+    @patch('monasca_api.common.repositories.sqla.outbox_repository.datetime')
+    def test_should_claim_events_again_after_timeout(self, datetime_mock):
+        now = datetime.datetime(2017, 3, 1)
+        datetime_mock.datetime.utcnow.return_value = now
+        datetime_mock.timedelta = datetime.timedelta
+
+        def publish(events):
+            # The relay publishing the batch is stuck past the timeout
+            datetime_mock.datetime.utcnow.return_value = (
+                now + datetime.timedelta(seconds=61))
+            self.assertEqual(3, self.repo.relay_events(10, published.extend, 60))
+
+        # Both relays publish the events, they are deleted once
+        published = []
+        self.assertEqual(3, self.repo.relay_events(10, publish, 60))
+        self.assertEqual(3, len(published))
+        self.assertEqual([], self._outbox())
+
+
+class TestOutboxRelay(testtools.TestCase):
+
+    def setUp(self):
+        super(TestOutboxRelay, self).setUp()
+
+        self.outbox_repo_mock = self.useFixture(fixtures.MockPatch(
+            'monasca_api.common.repositories.sqla.outbox_repository.OutboxRepository'
+        )).mock.return_value
+        self.driver_mock = self.useFixture(fixtures.MockPatch(
+            'monasca_api.v2.reference.outbox_relay.simport.load'
+        )).mock.return_value
+
+    def test_should_publish_events_by_topic(self):
+        def relay_events(limit, publish, claim_timeout):
+            publish([(u'events', u'1'),
+                     (u'alarm-state-transitions', u'2'),
+                     (u'events', u'3')])
+            return 3
+
+        self.outbox_repo_mock.relay_events.side_effect = relay_events
+
+        with patch.object(outbox_relay.OutboxRelay, '_run'):
+            relay = outbox_relay.OutboxRelay(batch_size=10, poll_interval=60,
+                                             claim_timeout=60)
+        self.assertEqual(3, relay.relay())
+
+        self.assertEqual([((u'events',),), ((u'alarm-state-transitions',),)],
+                         self.driver_mock.call_args_list)
+        publisher = self.driver_mock.return_value
+        self.assertEqual([((['1', '3'],),), ((['2'],),)],
+                         publisher.send_messages.call_args_list)
+
+    def test_should_relay_when_notified(self):
+        polled = threading.Event()
+        relayed = threading.Event()
+
+        def relay_events(limit, publish, claim_timeout):
+            if polled.is_set():
+                relayed.set()
+            polled.set()
+            return 0
+
+        self.outbox_repo_mock.relay_events.side_effect = relay_events
+
+        relay = outbox_relay.OutboxRelay(batch_size=10, poll_interval=60,
+                                         claim_timeout=60)
+        self.assertTrue(polled.wait(10))
+        relay.notify()
+
+        self.assertTrue(relayed.wait(10))
+
+    @patch('monasca_api.v2.reference.outbox_relay.os.getpid')
+    @patch('monasca_api.v2.reference.outbox_relay.OutboxRelay')
+    def test_should_start_relay_on_notify_and_after_fork(self, relay_mock, getpid_mock):
+        self.useFixture(fixtures.MockPatch(
+            'monasca_api.v2.reference.outbox_relay._relay', None))
+        relay_mock.side_effect = lambda *args: Mock()
+        getpid_mock.return_value = 1
+
+        outbox_relay.notify()
+        relay = outbox_relay._relay
+        outbox_relay.notify()
+        self.assertIs(relay, outbox_relay._relay)
+        self.assertEqual(2, relay.notify.call_count)
+
+        # The thread of the relay does not run in a forked process
+        getpid_mock.return_value = 2
+        outbox_relay.notify()
+        self.assertIsNot(relay, outbox_relay._relay)
+        self.assertEqual(1, outbox_relay._relay.notify.call_count)
+        self.assertEqual(2, relay_mock.call_count)
+
+    def test_should_relay_pending_events_on_first_request(self):
+        self.useFixture(fixtures.MockPatch(
+            'monasca_api.v2.reference.outbox_relay._relay', None))
+        relayed = threading.Event()
+
+        def relay_events(limit, publish, claim_timeout):
+            # Written by a process which stopped before publishing them
+            if not relayed.is_set():
+                publish([(u'events', u'1')])
+                relayed.set()
+                return 1
+            return 0
+
+        self.outbox_repo_mock.relay_events.side_effect = relay_events
+
+        app = falcon.API(middleware=[outbox_relay.RelayStarter()])
+        testing.TestClient(app).simulate_get('/')
+
+        self.assertTrue(relayed.wait(10))
+        publisher = self.driver_mock.return_value
+        publisher.send_messages.assert_called_once_with(['1'])
@@ -13,10 +13,14 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import datetime
+import io
 import unittest
 
+import falcon
 from mock import Mock
 
+from monasca_api.common.repositories import keyset_cursor
 from monasca_api.v2.common.exceptions import HTTPUnprocessableEntityError
 import monasca_api.v2.reference.helpers as helpers
 
@@ -131,3 +135,124 @@ class TestGetOldQueryParams(unittest.TestCase):
 
         helpers._get_old_query_params_except_offset(result, uri)
         self.assertEqual(result, ["foo=spam%3Dham"])
+
+
+class TestReadJsonArrayInChunks(unittest.TestCase):
+
+    def _read(self, body, chunk_size=2, max_body_size=0, read_size=3):
+        req = Mock()
+        req.content_length = None
+        req.stream = io.BytesIO(body)
+        return list(helpers.read_json_array_in_chunks(req, chunk_size,
+                                                      max_body_size,
+                                                      read_size))
+
+    def test_array(self):
+        body = b' [{"name": "a", "value": 1.5} ,{"name": "b"},\n{"name": "c"}] '
+
+        result = self._read(body)
+
+        self.assertEqual([
+            [({u'name': u'a', u'value': 1.5}, b'{"name": "a", "value": 1.5}'),
+             ({u'name': u'b'}, b'{"name": "b"}')],
+            [({u'name': u'c'}, b'{"name": "c"}')]
+        ], result)
+
+    def test_object(self):
+        body = b'{"name": "a", "dimensions": {"key": "\xc3\xa4"}}'
+
+        result = self._read(body)
+
+        self.assertEqual([[({u'name': u'a', u'dimensions': {u'key': u'\xe4'}}, body)]],
+                         result)
+
+    def test_number_split_between_reads(self):
+        self.assertEqual([[(12345, b'12345')]], self._read(b'[12345]'))
+
+    def test_empty_array(self):
+        self.assertEqual([], self._read(b'[ ]'))
+
+    def test_invalid_json(self):
+        for body in (b'', b'[', b'[{"name": "a"}', b'[{"name": "a"},]',
+                     b'[{"name": "a"} {"name": "b"}]', b'[{"name": "a"}] x',
+                     b'"name"', b'{"name": "a"', b'{"name": "a"}}'):
+            self.assertRaises(HTTPUnprocessableEntityError, self._read, body)
+
+    def test_body_too_large(self):
+        body = b'[{"name": "a"}, {"name": "b"}]'
+
+        self.assertRaises(falcon.HTTPRequestEntityTooLarge, self._read, body,
+                          max_body_size=len(body) - 1)
+        self.assertEqual(1, len(self._read(body, max_body_size=len(body))))
+
+
+class TestReadHttpResource(unittest.TestCase):
+
+    def _read(self, body, max_body_size=0):
+        req = Mock()
+        req.content_length = None
+        req.stream = io.BytesIO(body)
+        return helpers.read_http_resource(req, max_body_size)
+
+    def test_body_without_content_length_too_large(self):
+        body = b'[{"name": "a"}, {"name": "b"}]'
+
+        self.assertRaises(falcon.HTTPRequestEntityTooLarge, self._read, body,
+                          max_body_size=len(body) - 1)
+        self.assertEqual(2, len(self._read(body, max_body_size=len(body))))
+        self.assertEqual(2, len(self._read(body)))
+
+
+class TestPaginateMeasurements(unittest.TestCase):
+
+    def test_next_offset_is_series_cursor(self):
+        measurements = [
+            {u'name': u'cpu', u'id': u'3', u'dimensions': {u'hostname': u'host3'},
+             u'columns': [u'timestamp', u'value', u'value_meta'],
+             u'measurements': [[u'2017-03-01T00:00:00.000Z', 1, {}]]},
+            {u'name': u'cpu', u'id': u'4', u'dimensions': {u'hostname': u'host4'},
+             u'columns': [u'timestamp', u'value', u'value_meta'],
+             u'measurements': [[u'2017-03-01T00:00:00.000Z', 2, {}],
+                               [u'2017-03-01T00:00:30.000Z', 3, {}]]}]
+
+        result = helpers.paginate_measurements(
+            measurements, u'http://host/v2.0/metrics/measurements?group_by=*&limit=2', 2)
+
+        self.assertEqual([u'3', u'4'], [element[u'id'] for element in result[u'elements']])
+        self.assertEqual(1, len(result[u'elements'][1][u'measurements']))
+        next_link = [link[u'href'] for link in result[u'links'] if link[u'rel'] == u'next'][0]
+        self.assertIn(u'offset=4_2017-03-01T00%3A00%3A00.000Z', next_link)
+
+
+class TestGetQueryKeysetOffset(unittest.TestCase):
+
+    KEYS = keyset_cursor.sort_keys([u'created_at desc'], u'id')
+
+    def _offset(self, query_string):
+        req = Mock()
+        req.query_string = query_string
+        return helpers.get_query_keyset_offset(req, self.KEYS)
+
+    def test_keys(self):
+        self.assertEqual([(u'created_at', True), (u'id', False)], self.KEYS)
+        self.assertEqual([(u'id', True)],
+                         keyset_cursor.sort_keys([u'id desc'], u'id'))
+
+    def test_numeric_offset(self):
+        self.assertIsNone(self._offset("limit=10"))
+        self.assertEqual(20, self._offset("offset=20"))
+
+    def test_cursor(self):
+        created_at = datetime.datetime(2017, 3, 1, 12, 30, 0, 123000)
+        cursor = keyset_cursor.encode({u'id': u'123', u'created_at': created_at,
+                                       u'name': u'ignored'}, self.KEYS)
+
+        self.assertEqual([created_at, u'123'], self._offset("offset=" + cursor))
+
+    def test_invalid_offset(self):
+        cursor = keyset_cursor.encode({u'id': u'123'},
+                                      keyset_cursor.sort_keys(None, u'id'))
+
+        for offset in (u'-1', u'abc', cursor):
+            self.assertRaises(HTTPUnprocessableEntityError,
+                              self._offset, "offset=" + offset)
@@ -0,0 +1,200 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import re
+
+import fixtures
+from oslo_config import cfg
+from oslo_config import fixture as fixture_config
+from sqlalchemy import event
+import testtools
+
+from monasca_api.common.repositories.sqla import sql_repository
+import monasca_api.v2.reference  # noqa: registers the database options
+
+# Lines of a SQLite query plan reading every row of a table or subquery,
+# 'SCAN alarm' since SQLite 3.36, 'SCAN TABLE alarm' before. Subqueries
+# were numbered before 3.36, their scans are 'SCAN SUBQUERY 1'.
+_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+_SUBQUERY_SCAN = re.compile(r'^SCAN SUBQUERY \d+')
+# Lines of a SQLite query plan computing a subquery, which may then be
+# scanned as a whole, 'MATERIALIZE sub' or 'MATERIALIZE 1' before 3.36
+_SUBQUERY = re.compile(r'^(?:MATERIALIZE|CO-ROUTINE) (\w+)$')
+
+
+def _full_scans(plan):
+    """Returns the tables read as a whole by the query plan"""
+    subqueries = {'CONSTANT'}
+    scans = []
+    for line in plan:
+        match = _SUBQUERY.match(line)
+        if match:
+            subqueries.add(match.group(1))
+            continue
+        if _SUBQUERY_SCAN.match(line):
+            continue
+        match = _SCAN.match(line)
+        if match and match.group(1) not in subqueries:
+            scans.append(match.group(1))
+    return scans
+
+
+class TestQueryPlans(testtools.TestCase, fixtures.TestWithFixtures):
+    """Checks the indexes of the schema serve the queries of the repositories
+
+    Each query the repositories issue is explained by SQLite with the
+    schema of sqlite_alarm.sql, which has the indexes of mon_mysql.sql.
+    A query reading a whole table fails the test.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        from sqlalchemy import engine_from_config
+
+        engine = engine_from_config({'url': 'sqlite://'}, prefix='')
+
+        qry = open('monasca_api/tests/sqlite_alarm.sql', 'r').read()
+        sconn = engine.raw_connection()
+        c = sconn.cursor()
+        c.executescript(qry)
+        sconn.commit()
+        c.close()
+        cls.engine = engine
+
+        def _fake_engine_from_config(*args, **kw):
+            return cls.engine
+        cls.fixture = fixtures.MonkeyPatch(
+            'sqlalchemy.create_engine', _fake_engine_from_config)
+        cls.fixture.setUp()
+
+        cls.statements = []
+
+        def _capture(conn, cursor, statement, parameters, context, executemany):
+            cls.statements.append((statement, parameters))
+        event.listen(engine, 'before_cursor_execute', _capture)
+
+    @classmethod
+    def tearDownClass(cls):
+        sql_repository.dispose_engines()
+        cls.fixture.cleanUp()
+
+    def setUp(self):
+        super(TestQueryPlans, self).setUp()
+
+        self._fixture_config = self.useFixture(
+            fixture_config.Config(cfg.CONF))
+        self._fixture_config.config(url='sqlite://', pool_pre_ping=False,
+                                    group='database')
+
+        from monasca_api.common.repositories.sqla import alarm_definitions_repository as adr
+        from monasca_api.common.repositories.sqla import alarms_repository as ar
+        from monasca_api.common.repositories.sqla import notifications_repository as nr
+        self.alarms_repo = ar.AlarmsRepository()
+        self.alarm_definitions_repo = adr.AlarmDefinitionsRepository()
+        self.notifications_repo = nr.NotificationsRepository()
+
+        del self.statements[:]
+
+    def _query_plan(self, statement, parameters):
+        sconn = self.engine.raw_connection()
+        try:
+            c = sconn.cursor()
+            c.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            return [row[-1] for row in c.fetchall()]
+        finally:
+            sconn.close()
+
+    def assert_no_full_scan(self):
+        statements = [(statement, parameters)
+                      for statement, parameters in self.statements
+                      if statement.lstrip().upper().startswith('SELECT')]
+        self.assertNotEqual([], statements)
+
+        for statement, parameters in statements:
+            plan = self._query_plan(statement, parameters)
+            scans = _full_scans(plan)
+            if scans:
+                self.fail('Full scan of {} in\n{}\n{}'.format(
+                    ', '.join(scans), statement, '\n'.join(plan)))
+
+    def test_query_plan_formats(self):
+        # SQLite 3.36 and later
+        self.assertEqual([], _full_scans([
+            'MATERIALIZE sub', 'SEARCH a USING INDEX tenant_id (tenant_id=?)',
+            'SCAN sub', 'SCAN CONSTANT ROW']))
+        self.assertEqual(['alarm'], _full_scans(['SCAN alarm']))
+        # Earlier versions
+        self.assertEqual([], _full_scans([
+            'MATERIALIZE 1', 'SEARCH TABLE alarm AS a USING INDEX tenant_id (tenant_id=?)',
+            'SCAN SUBQUERY 1 AS sub', 'SCAN SUBQUERY 2']))
+        self.assertEqual(['alarm'], _full_scans(['SCAN TABLE alarm AS a']))
+
+    def test_get_alarms(self):
+        self.alarms_repo.get_alarms('bob', {}, None, 10)
+        self.assert_no_full_scan()
+
+    def test_get_alarms_filtered(self):
+        query_parms = {'alarm_definition_id': u'1',
+                       'state': u'ALARM',
+                       'lifecycle_state': u'OPEN',
+                       'severity': u'LOW|HIGH',
+                       'state_updated_start_time': u'2015-03-14T09:26:53.000Z',
+                       'sort_by': ['state_updated_timestamp desc']}
+        self.alarms_repo.get_alarms('bob', query_parms, None, 10)
+        self.assert_no_full_scan()
+
+    def test_get_alarms_by_metric(self):
+        query_parms = {'metric_name': u'cpu.idle_perc',
+                       'metric_dimensions': {u'instance_id': u'123',
+                                             u'service': u'monitoring|compute'}}
+        self.alarms_repo.get_alarms('bob', query_parms, None, 10)
+        self.assert_no_full_scan()
+
+    def test_get_alarms_count(self):
+        self.alarms_repo.get_alarms_count('bob', {})
+        self.assert_no_full_scan()
+
+    def test_get_alarms_count_filtered(self):
+        query_parms = {'state': u'ALARM',
+                       'severity': u'LOW',
+                       'lifecycle_state': u'OPEN',
+                       'metric_name': u'cpu.idle_perc',
+                       'metric_dimensions': {u'instance_id': u'123'}}
+        self.alarms_repo.get_alarms_count('bob', query_parms)
+        self.assert_no_full_scan()
+
+    def test_get_alarms_count_group_by(self):
+        query_parms = {'group_by': ['state', 'metric_name',
+                                    'dimension_name', 'dimension_value']}
+        self.alarms_repo.get_alarms_count('bob', query_parms)
+        self.assert_no_full_scan()
+
+    def test_get_alarm_definitions(self):
+        self.alarm_definitions_repo.get_alarm_definitions('bob', limit=10)
+        self.assert_no_full_scan()
+
+    def test_get_alarm_definitions_filtered(self):
+        self.alarm_definitions_repo.get_alarm_definitions(
+            'bob', u'90% CPU', {u'image_id': u'888'}, u'LOW|HIGH',
+            ['name'], None, 10)
+        self.assert_no_full_scan()
+
+    def test_list_notifications(self):
+        self.notifications_repo.list_notifications('bob', None, None, 10)
+        self.assert_no_full_scan()
+
+    def test_list_notifications_sorted(self):
+        self.notifications_repo.list_notifications('bob', ['name desc'],
+                                                   None, 10)
+        self.assert_no_full_scan()
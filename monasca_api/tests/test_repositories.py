@@ -16,11 +16,20 @@
 import binascii
 from collections import namedtuple
 from datetime import datetime
+import json
 import unittest
 
+from mock import Mock
 from mock import patch
+import simplejson
+
+from cassandra.concurrent import ExecutionResult
+from cassandra import cqltypes
+from cassandra.protocol import ColumnMetadata
+from cassandra.query import PreparedStatement
 
 import monasca_api.common.repositories.cassandra.metrics_repository as cassandra_repo
+from monasca_api.common.repositories.cassandra import rollups
 import monasca_api.common.repositories.influxdb.metrics_repository as influxdb_repo
 
 from oslo_config import cfg
@@ -31,27 +40,34 @@ import testtools
 CONF = cfg.CONF
 
 
+def influxdb_chunked_response(*series):
+    """Mocks a chunked response of InfluxDB with a chunk per serie"""
+    response = Mock(status_code=200)
+    response.iter_lines.return_value = [
+        json.dumps({u'results': [{u'statement_id': 0, u'series': [serie]}]})
+        for serie in series]
+    return response
+
+
 class TestRepoMetricsInfluxDB(unittest.TestCase):
 
     def setUp(self):
         super(TestRepoMetricsInfluxDB, self).setUp()
 
-    @patch("monasca_api.common.repositories.influxdb.metrics_repository.client.InfluxDBClient")
+    @patch("monasca_api.common.repositories.influxdb.transport.client.InfluxDBClient")
     def test_measurement_list(self, influxdb_client_mock):
         mock_client = influxdb_client_mock.return_value
-        mock_client.query.return_value.raw = {
-            "series": [
-                {
-                    "name": "dummy.series",
-                    "values": [
-                        ["2015-03-14T09:26:53.59Z", 2, None],
-                        ["2015-03-14T09:26:53.591Z", 2.5, ''],
-                        ["2015-03-14T09:26:53.6Z", 4.0, '{}'],
-                        ["2015-03-14T09:26:54Z", 4, '{"key": "value"}']
-                    ]
-                }
-            ]
-        }
+        mock_client._session.get.return_value = influxdb_chunked_response(
+            {
+                "name": "dummy.series",
+                "values": [
+                    [1426325213590, 2, None],
+                    [1426325213591, 2.5, ''],
+                    [1426325213600, 4.0, '{}'],
+                    [1426325214000, 4, '{"key": "value"}']
+                ]
+            }
+        )
 
         repo = influxdb_repo.MetricsRepository()
         result = repo.measurement_list(
@@ -62,7 +78,7 @@ class TestRepoMetricsInfluxDB(unittest.TestCase):
             start_timestamp=1,
             end_timestamp=2,
             offset=None,
-            limit=1,
+            limit=10,
             merge_metrics_flag=True,
             group_by=None)
 
@@ -72,7 +88,8 @@ class TestRepoMetricsInfluxDB(unittest.TestCase):
         self.assertEqual(result[0]['columns'],
                          ['timestamp', 'value', 'value_meta'])
 
-        measurements = result[0]['measurements']
+        # value_meta is passed through as raw JSON
+        measurements = json.loads(simplejson.dumps(result[0]['measurements']))
 
         self.assertEqual(
             [["2015-03-14T09:26:53.590Z", 2, {}],
@@ -82,7 +99,105 @@ class TestRepoMetricsInfluxDB(unittest.TestCase):
             measurements
         )
 
-    @patch("monasca_api.common.repositories.influxdb.metrics_repository.client.InfluxDBClient")
+    @patch("monasca_api.common.repositories.influxdb.transport.client.InfluxDBClient")
+    def test_measurement_list_stops_after_page(self, influxdb_client_mock):
+        mock_client = influxdb_client_mock.return_value
+        response = influxdb_chunked_response(
+            {u'name': u'cpu', u'tags': {u'hostname': u'host0'}, u'partial': True,
+             u'values': [[1488326400000, 1, None],
+                         [1488326401000, 2, None]]},
+            {u'name': u'cpu', u'tags': {u'hostname': u'host0'},
+             u'values': [[1488326402000, 3, None]]},
+            {u'name': u'cpu', u'tags': {u'hostname': u'host1'},
+             u'values': [[1488326400000, 4, None],
+                         [1488326401000, 5, None]]},
+            {u'name': u'cpu', u'tags': {u'hostname': u'host2'},
+             u'values': [[1488326400000, 6, None]]})
+        mock_client._session.get.return_value = response
+
+        repo = influxdb_repo.MetricsRepository()
+        result = repo.measurement_list(
+            u'tenant_id', u'region', name=u'cpu', dimensions=None,
+            start_timestamp=1, end_timestamp=None, offset=None, limit=3,
+            merge_metrics_flag=True, group_by=u'*')
+
+        self.assertEqual([{u'hostname': u'host0'}, {u'hostname': u'host1'}],
+                         [measurement[u'dimensions'] for measurement in result])
+        self.assertEqual([[1, 2, 3], [4]],
+                         [[point[1] for point in measurement[u'measurements']]
+                          for measurement in result])
+        response.close.assert_called_once_with()
+        params = mock_client._session.get.call_args[1]['params']
+        self.assertEqual('true', params['chunked'])
+        self.assertEqual(10000, params['chunk_size'])
+        self.assertEqual('ms', params['epoch'])
+
+    @patch("monasca_api.common.repositories.influxdb.transport.client.InfluxDBClient")
+    def test_measurement_list_group_by_offset(self, influxdb_client_mock):
+        def get(url, params, **kwargs):
+            if 'soffset 1' in params['q']:
+                return influxdb_chunked_response(
+                    {u'name': u'cpu', u'tags': {u'hostname': u'host1'},
+                     u'values': [[1488326430000, 2, None]]})
+            return influxdb_chunked_response(
+                {u'name': u'cpu', u'tags': {u'hostname': u'host2'},
+                 u'values': [[1488326400000, 3, None]]},
+                {u'name': u'cpu', u'tags': {u'hostname': u'host3'},
+                 u'values': [[1488326400000, 4, None]]})
+
+        mock_client = influxdb_client_mock.return_value
+        mock_client._session.get.side_effect = get
+
+        repo = influxdb_repo.MetricsRepository()
+        result = repo.measurement_list(
+            u'tenant_id', u'region', name=u'cpu', dimensions=None,
+            start_timestamp=1, end_timestamp=None,
+            offset=u'1_2017-03-01T00:00:00.000Z', limit=2,
+            merge_metrics_flag=True, group_by=u'*')
+
+        self.assertEqual([u'1', u'2', u'3'], [measurement[u'id'] for measurement in result])
+        self.assertEqual([{u'hostname': u'host1'}, {u'hostname': u'host2'},
+                          {u'hostname': u'host3'}],
+                         [measurement[u'dimensions'] for measurement in result])
+
+        first, following = [call_args[1]['params']['q']
+                            for call_args in mock_client._session.get.call_args_list]
+        self.assertIn("time > '2017-03-01T00:00:00.000Z'", first)
+        self.assertTrue(first.endswith(' slimit 1 soffset 1'))
+        self.assertNotIn("time > '", following)
+        self.assertTrue(following.endswith(' slimit 3 soffset 2'))
+
+    @patch("monasca_api.common.repositories.influxdb.transport.client.InfluxDBClient")
+    def test_metrics_statistics(self, influxdb_client_mock):
+        mock_client = influxdb_client_mock.return_value
+        mock_client._session.get.return_value = influxdb_chunked_response(
+            {u'name': u'cpu', u'tags': {u'hostname': u'host0'},
+             u'columns': [u'time', u'mean', u'count'],
+             u'values': [[1488326400000, 1.5, 2],
+                         [1488326700000, None, None],
+                         [1488327000500, 3.0, 1]]})
+
+        repo = influxdb_repo.MetricsRepository()
+        result = repo.metrics_statistics(
+            u'tenant_id', u'region', name=u'cpu', dimensions=None,
+            start_timestamp=1, end_timestamp=None,
+            statistics=[u'avg', u'count'], period=u'300', offset=None,
+            limit=10, merge_metrics_flag=True, group_by=u'*')
+
+        self.assertEqual(1, len(result))
+        self.assertEqual([u'timestamp', u'avg', u'count'], result[0][u'columns'])
+        self.assertEqual([[u'2017-03-01T00:00:00Z', 1.5, 2],
+                          [u'2017-03-01T00:10:00Z', 3.0, 1]],
+                         result[0][u'statistics'])
+
+    def test_format_millis(self):
+        self.assertEqual([u'2017-03-01T00:00:04.250Z', u'2017-03-01T23:59:59.999Z',
+                          u'1969-12-31T23:59:59.000Z'],
+                         influxdb_repo._format_millis([1488326404250, 1488412799999, -1000]))
+        self.assertEqual([u'2017-03-01T00:00:04Z'],
+                         influxdb_repo._format_millis([1488326404250], False))
+
+    @patch("monasca_api.common.repositories.influxdb.transport.client.InfluxDBClient")
     def test_list_metrics(self, influxdb_client_mock):
         mock_client = influxdb_client_mock.return_value
         mock_client.query.return_value.raw = {
@@ -130,7 +245,77 @@ class TestRepoMetricsInfluxDB(unittest.TestCase):
             },
         }])
 
-    @patch("monasca_api.common.repositories.influxdb.metrics_repository.client.InfluxDBClient")
+    @patch("monasca_api.common.repositories.influxdb.transport.client.InfluxDBClient")
+    def test_list_metrics_with_start_time(self, influxdb_client_mock):
+        mock_client = influxdb_client_mock.return_value
+
+        series_result = Mock()
+        series_result.raw = {
+            u'series': [{
+                u'values': [
+                    [u'cpu.idle_perc,_region=region,_tenant_id=tenant,hostname=host0',
+                     u'region', u'tenant', u'host0'],
+                    [u'cpu.idle_perc,_region=region,_tenant_id=tenant,hostname=host1',
+                     u'region', u'tenant', u'host1'],
+                    [u'cpu.idle_perc,_region=region,_tenant_id=tenant,hostname=host2',
+                     u'region', u'tenant', u'host2']
+                ],
+                u'name': u'cpu.idle_perc',
+                u'columns': [u'_key', u'_region', u'_tenant_id', u'hostname']
+            }]
+        }
+
+        last_result = Mock()
+        last_result.raw = {
+            u'series': [
+                {
+                    u'name': u'cpu.idle_perc',
+                    u'tags': {u'_region': u'region', u'_tenant_id': u'tenant',
+                              u'hostname': u'host0'},
+                    u'columns': [u'time', u'last'],
+                    u'values': [[u'2015-03-14T09:26:53.59Z', 98.5]]
+                },
+                {
+                    u'name': u'cpu.idle_perc',
+                    u'tags': {u'_region': u'region', u'_tenant_id': u'tenant',
+                              u'hostname': u'host2'},
+                    u'columns': [u'time', u'last'],
+                    u'values': [[u'2015-03-14T09:26:53.59Z', 97.5]]
+                }
+            ]
+        }
+
+        mock_client.query.side_effect = [series_result, last_result]
+
+        repo = influxdb_repo.MetricsRepository()
+
+        result = repo.list_metrics(
+            "tenant",
+            "region",
+            name="cpu.idle_perc",
+            dimensions=None,
+            offset=None,
+            limit=10,
+            start_timestamp=1,
+            end_timestamp=2)
+
+        self.assertEqual([
+            {u'id': '0',
+             u'name': u'cpu.idle_perc',
+             u'dimensions': {u'hostname': u'host0'}},
+            {u'id': '1',
+             u'name': u'cpu.idle_perc',
+             u'dimensions': {u'hostname': u'host2'}}
+        ], result)
+
+        # one query for the series and a single one for their measurements
+        self.assertEqual(2, mock_client.query.call_count)
+        last_query = mock_client.query.call_args[0][0]
+        self.assertIn('select last(value) from "cpu.idle_perc"', last_query)
+        self.assertIn('group by *', last_query)
+        self.assertIn("(\"hostname\" = 'host1')", last_query)
+
+    @patch("monasca_api.common.repositories.influxdb.transport.client.InfluxDBClient")
     def test_list_dimension_values(self, influxdb_client_mock):
         mock_client = influxdb_client_mock.return_value
         mock_client.query.return_value.raw = {
@@ -152,7 +337,7 @@ class TestRepoMetricsInfluxDB(unittest.TestCase):
 
         self.assertEqual(result, [{u'dimension_value': u'custom_host'}])
 
-    @patch("monasca_api.common.repositories.influxdb.metrics_repository.client.InfluxDBClient")
+    @patch("monasca_api.common.repositories.influxdb.transport.client.InfluxDBClient")
     def test_list_dimension_names(self, influxdb_client_mock):
         mock_client = influxdb_client_mock.return_value
         mock_client.query.return_value.raw = {
@@ -177,6 +362,59 @@ class TestRepoMetricsInfluxDB(unittest.TestCase):
                              {u'dimension_name': u'service'}
                          ])
 
+    @patch("monasca_api.common.repositories.influxdb.metrics_repository.ALARM_HISTORY_CHUNK_SIZE", 2)
+    @patch("monasca_api.common.repositories.influxdb.transport.client.InfluxDBClient")
+    def test_alarm_history_in_chunks(self, influxdb_client_mock):
+        columns = [u'time', u'alarm_id', u'metrics', u'new_state', u'old_state',
+                   u'reason', u'reason_data', u'sub_alarms', u'tenant_id']
+
+        def history(*points):
+            return influxdb_chunked_response({
+                u'name': u'alarm_state_history',
+                u'columns': columns,
+                u'values': [[time, alarm_id, u'[]', u'ALARM', u'OK', u'', u'{}',
+                             u'[]', u'tenant'] for (time, alarm_id) in points]})
+
+        def get(url, params, **kwargs):
+            query_string = params['q']
+            if "alarm_id = 'a1'" in query_string:
+                return history((u'2017-03-01T00:00:04Z', u'a2'),
+                               (u'2017-03-01T00:00:01Z', u'a1'),
+                               (u'2017-03-01T00:00:00Z', u'a1'))
+            return history((u'2017-03-01T00:00:03.5Z', u'a3'))
+
+        mock_client = influxdb_client_mock.return_value
+        mock_client._session.get.side_effect = get
+
+        repo = influxdb_repo.MetricsRepository()
+        result = repo.alarm_history(u'tenant', [u'a1', u'a2', u'a3'], None, 2)
+
+        self.assertEqual(3, len(result))
+        self.assertEqual([u'a2', u'a3', u'a1'],
+                         [point[u'alarm_id'] for point in result])
+        self.assertEqual(u'1488326401000', result[2][u'id'])
+
+        queries = [call_args[1]['params']['q']
+                   for call_args in mock_client._session.get.call_args_list]
+        self.assertEqual(2, len(queries))
+        for query_string in queries:
+            self.assertIn("tenant_id = 'tenant'", query_string)
+            self.assertIn('limit 3', query_string)
+        first, second = sorted(queries, key=lambda query_string: "alarm_id = 'a3'" in query_string)
+        self.assertIn("alarm_id = 'a2'", first)
+        self.assertNotIn("alarm_id = 'a3'", first)
+        self.assertNotIn("alarm_id = 'a1'", second)
+
+    @patch("monasca_api.common.repositories.influxdb.metrics_repository.os.getpid")
+    def test_alarm_history_pool_is_shared(self, getpid_mock):
+        getpid_mock.return_value = 1
+        pool = influxdb_repo._get_alarm_history_pool()
+        self.assertIs(pool, influxdb_repo._get_alarm_history_pool())
+
+        # A forked process creates its own pool
+        getpid_mock.return_value = 2
+        self.assertIsNot(pool, influxdb_repo._get_alarm_history_pool())
+
 
 class TestRepoMetricsCassandra(testtools.TestCase):
 
@@ -228,6 +466,49 @@ class TestRepoMetricsCassandra(testtools.TestCase):
                 u'hosttype': u'native'
             }}], result)
 
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.execute_concurrent")
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
+    def test_list_metrics_with_alternative_dimension_values(
+            self, cassandra_connect_mock, execute_concurrent_mock):
+        self._fixture_config.config(concurrent_queries=4, group='cassandra')
+
+        def row(metric_hash, hostname, service):
+            return ["0b5e7d8c43f74430add94fba09ffd66e", "region",
+                    binascii.unhexlify(metric_hash),
+                    {"__name__": "cpu.idle_perc", "hostname": hostname, "service": service}]
+
+        execute_concurrent_mock.return_value = [
+            ExecutionResult(True, iter([row(b"01", "host0", "a"), row(b"05", "host0", "a")])),
+            ExecutionResult(True, iter([row(b"03", "host0", "b")])),
+            ExecutionResult(True, iter([])),
+            ExecutionResult(True, iter([row(b"02", "host1", "b"), row(b"04", "host1", "b")])),
+        ]
+
+        repo = cassandra_repo.MetricsRepository()
+
+        result = repo.list_metrics(
+            "0b5e7d8c43f74430add94fba09ffd66e",
+            "region",
+            name="cpu.idle_perc",
+            dimensions={"hostname": "host0|host1", "service": "a|b"},
+            offset=None,
+            limit=2)
+
+        # Merged in metric hash order and cut after limit + 1 metrics
+        self.assertEqual([u'01', u'02', u'03'], [metric[u'id'] for metric in result])
+        self.assertEqual({u'hostname': u'host1', u'service': u'b'}, result[1][u'dimensions'])
+
+        session, statements = execute_concurrent_mock.call_args[0]
+        self.assertEqual(4, len(statements))
+        self.assertEqual(4, execute_concurrent_mock.call_args[1]['concurrency'])
+        bind_mock = cassandra_connect_mock.return_value.prepare.return_value.bind
+        bound_dimensions = [dict(zip(args[0][0][4:8:2], args[0][0][5:8:2]))
+                            for args in bind_mock.call_args_list]
+        self.assertItemsEqual([{'hostname': 'host0', 'service': 'a'},
+                               {'hostname': 'host0', 'service': 'b'},
+                               {'hostname': 'host1', 'service': 'a'},
+                               {'hostname': 'host1', 'service': 'b'}], bound_dimensions)
+
     @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
     def test_list_metric_names(self, cassandra_connect_mock):
 
@@ -272,6 +553,27 @@ class TestRepoMetricsCassandra(testtools.TestCase):
             }
         ], result)
 
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
+    def test_queries_are_paged(self, cassandra_connect_mock):
+        self._fixture_config.config(page_size=100, group='cassandra')
+
+        Metric_map = namedtuple('Metric_map', 'metric_map')
+
+        cassandra_session_mock = cassandra_connect_mock.return_value
+        cassandra_session_mock.execute.return_value = iter([
+            Metric_map({"__name__": "cpu.idle_perc", "hostname": "host0"}),
+            Metric_map({"__name__": "cpu.idle_perc", "hostname": "host1"})
+        ])
+
+        repo = cassandra_repo.MetricsRepository()
+        result = repo.list_metric_names("0b5e7d8c43f74430add94fba09ffd66e",
+                                        "region", dimensions=None)
+
+        self.assertEqual([{u'name': u'cpu.idle_perc'}], result)
+        stmt = cassandra_session_mock.execute.call_args[0][0]
+        self.assertIs(cassandra_session_mock.prepare.return_value.bind.return_value, stmt)
+        self.assertEqual(100, stmt.fetch_size)
+
     @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
     def test_measurement_list(self, cassandra_connect_mock):
 
@@ -329,6 +631,82 @@ class TestRepoMetricsCassandra(testtools.TestCase):
             measurements
         )
 
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
+    def test_measurement_list_is_not_paged(self, cassandra_connect_mock):
+        self._fixture_config.config(page_size=100, group='cassandra')
+
+        def prepare(cql):
+            prepared = Mock()
+            prepared.bind.side_effect = lambda parms: Mock(cql=cql, parms=parms)
+            return prepared
+
+        cassandra_session_mock = cassandra_connect_mock.return_value
+        cassandra_session_mock.prepare.side_effect = prepare
+        cassandra_session_mock.execute.side_effect = [
+            [["0b5e7d8c43f74430add94fba09ffd66e", "region",
+              binascii.unhexlify(b"01d39f19798ed27bbf458300bf843edd17654614"),
+              {"__name__": "cpu.idle_perc", "hostname": "host0"}],
+             ["0b5e7d8c43f74430add94fba09ffd66e", "region",
+              binascii.unhexlify(b"02d39f19798ed27bbf458300bf843edd17654614"),
+              {"__name__": "cpu.idle_perc", "hostname": "host1"}]],
+            []
+        ]
+
+        repo = cassandra_repo.MetricsRepository()
+        repo.measurement_list("tenant_id", "region", name="cpu.idle_perc",
+                              dimensions=None, start_timestamp=1,
+                              end_timestamp=2, offset=None, limit=10,
+                              merge_metrics_flag=True)
+
+        metrics_stmt, measurements_stmt = [
+            args[0][0] for args in cassandra_session_mock.execute.call_args_list]
+        self.assertEqual(100, metrics_stmt.fetch_size)
+        self.assertIn('metric_hash in (?,?)', measurements_stmt.cql)
+        self.assertIn('order by time_stamp', measurements_stmt.cql)
+        self.assertIsNone(measurements_stmt.fetch_size)
+
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
+    def test_measurement_list_with_offset(self, cassandra_connect_mock):
+
+        Measurement = namedtuple('Measurement', 'time_stamp value value_meta')
+
+        # The measurements query is bound by the driver as Cassandra would
+        # prepare it: tenant_id, region, metric_hash, the offset and end
+        # timestamps and the limit
+        column_types = [cqltypes.UTF8Type, cqltypes.UTF8Type, cqltypes.BytesType,
+                        cqltypes.DateType, cqltypes.DateType, cqltypes.Int32Type]
+
+        def prepare(cql):
+            if 'from measurements' not in cql:
+                return Mock()
+            return PreparedStatement(
+                [ColumnMetadata('monasca', 'measurements', 'c{}'.format(index),
+                                column_type)
+                 for index, column_type in enumerate(column_types)],
+                b'id', None, cql, 'monasca', 4, None, None)
+
+        cassandra_session_mock = cassandra_connect_mock.return_value
+        cassandra_session_mock.prepare.side_effect = prepare
+        cassandra_session_mock.execute.side_effect = [
+            [["0b5e7d8c43f74430add94fba09ffd66e", "region",
+              binascii.unhexlify(b"01d39f19798ed27bbf458300bf843edd17654614"),
+              {"__name__": "cpu.idle_perc", "hostname": "host0"}]],
+            [Measurement(self._convert_time_string("2015-03-14T09:26:54Z"), 4, '{}')]
+        ]
+
+        repo = cassandra_repo.MetricsRepository()
+        result = repo.measurement_list(
+            "tenant_id", "region", name="cpu.idle_perc", dimensions=None,
+            start_timestamp=1, end_timestamp=1426325214,
+            offset="0_2015-03-14T09:26:53.591Z", limit=10,
+            merge_metrics_flag=True)
+
+        self.assertEqual([["2015-03-14T09:26:54.000Z", 4, {}]],
+                         result[0]['measurements'])
+        measurements_stmt = cassandra_session_mock.execute.call_args[0][0]
+        self.assertEqual(datetime(2015, 3, 14, 9, 26, 53, 591000),
+                         cqltypes.DateType.deserialize(measurements_stmt.values[3], 4))
+
     @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
     def test_metrics_statistics(self, cassandra_connect_mock):
 
@@ -380,10 +758,213 @@ class TestRepoMetricsCassandra(testtools.TestCase):
                 u'statistics': [[u'2016-05-19T11:58:24Z', 95.5, 94, 97, 4, 382]],
                 u'name': u'cpu.idle_perc',
                 u'columns': [u'timestamp', u'avg', u'min', u'max', u'count', u'sum'],
-                u'id': u'2016-05-19T11:58:24Z'
+                u'id': u'0'
             }
         ], result)
 
+    def _metrics_statistics_with_gaps(self, cassandra_connect_mock):
+
+        Measurement = namedtuple('Measurement', 'time_stamp value value_meta')
+
+        cassandra_session_mock = cassandra_connect_mock.return_value
+        cassandra_session_mock.execute.side_effect = [
+            [[
+                "0b5e7d8c43f74430add94fba09ffd66e",
+                "region",
+                binascii.unhexlify(b"01d39f19798ed27bbf458300bf843edd17654614"),
+                {
+                    "__name__": "cpu.idle_perc",
+                    "hostname": "host0",
+                }
+            ]],
+            [
+                Measurement(self._convert_time_string("2016-05-19T11:58:24.500Z"), 95.0, '{}'),
+                Measurement(self._convert_time_string("2016-05-19T12:03:25Z"), 97.0, '{}'),
+                Measurement(self._convert_time_string("2016-05-19T12:13:23Z"), 93.0, '{}'),
+                Measurement(self._convert_time_string("2016-05-19T12:13:24Z"), 94.0, '{}'),
+                # More than a day after the previous measurement
+                Measurement(self._convert_time_string("2016-05-20T12:13:25Z"), 96.0, '{}'),
+            ]
+        ]
+
+        start_timestamp = (self._convert_time_string("2016-05-19T11:58:24Z") -
+                           datetime(1970, 1, 1)).total_seconds()
+        end_timestamp = (self._convert_time_string("2016-05-20T12:18:25Z") -
+                         datetime(1970, 1, 1)).total_seconds()
+
+        repo = cassandra_repo.MetricsRepository()
+        result = repo.metrics_statistics(
+            "tenant_id",
+            "region",
+            name="cpu.idle_perc",
+            dimensions=None,
+            start_timestamp=start_timestamp,
+            end_timestamp=end_timestamp,
+            statistics=['sum', 'count', 'max', 'min', 'avg'],
+            period=300,
+            offset=None,
+            limit=None,
+            merge_metrics_flag=True)
+
+        self.assertEqual(1, len(result))
+        self.assertEqual([u'timestamp', u'avg', u'min', u'max', u'count', u'sum'],
+                         result[0]['columns'])
+        statistics = result[0]['statistics']
+        # 5 minute periods from the start time up to the end time
+        self.assertEqual(24 * 12 + 5, len(statistics))
+        self.assertEqual([u'2016-05-19T11:58:24Z', 95.0, 95.0, 95.0, 1, 95.0], statistics[0])
+        self.assertEqual([u'2016-05-19T12:03:24Z', 97.0, 97.0, 97.0, 1, 97.0], statistics[1])
+        self.assertEqual([u'2016-05-19T12:08:24Z', 93.0, 93.0, 93.0, 1, 93.0], statistics[2])
+        self.assertEqual([u'2016-05-19T12:13:24Z', 94.0, 94.0, 94.0, 1, 94.0], statistics[3])
+        self.assertEqual([u'2016-05-19T12:18:24Z', 0, 0, 0, 0, 0], statistics[4])
+        self.assertEqual([u'2016-05-20T12:13:24Z', 96.0, 96.0, 96.0, 1, 96.0], statistics[-2])
+        self.assertEqual([u'2016-05-20T12:18:24Z', 0, 0, 0, 0, 0], statistics[-1])
+        self.assertEqual(u'0', result[0]['id'])
+
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
+    def test_metrics_statistics_with_gaps(self, cassandra_connect_mock):
+        self._metrics_statistics_with_gaps(cassandra_connect_mock)
+
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.np", None)
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
+    def test_metrics_statistics_with_gaps_without_numpy(self, cassandra_connect_mock):
+        self._metrics_statistics_with_gaps(cassandra_connect_mock)
+
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.AGGREGATION_CHUNK_SIZE", 2)
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
+    def test_metrics_statistics_with_gaps_in_chunks(self, cassandra_connect_mock):
+        self._metrics_statistics_with_gaps(cassandra_connect_mock)
+
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
+    def test_metrics_statistics_from_rollups(self, cassandra_connect_mock):
+        self._fixture_config.config(rollup_granularities=['60', '300', '3600'],
+                                    group='cassandra')
+
+        Rollup = namedtuple('Rollup', 'time_stamp value_count value_sum value_min value_max')
+        Measurement = namedtuple('Measurement', 'time_stamp value value_meta')
+
+        cassandra_session_mock = cassandra_connect_mock.return_value
+        cassandra_session_mock.execute.side_effect = [
+            [[
+                "0b5e7d8c43f74430add94fba09ffd66e",
+                "region",
+                binascii.unhexlify(b"01d39f19798ed27bbf458300bf843edd17654614"),
+                {"__name__": "cpu.idle_perc", "hostname": "host0"}
+            ], [
+                "0b5e7d8c43f74430add94fba09ffd66e",
+                "region",
+                binascii.unhexlify(b"02d39f19798ed27bbf458300bf843edd17654614"),
+                {"__name__": "cpu.idle_perc", "hostname": "host1"}
+            ]],
+            [(self._convert_time_string("2016-05-19T00:00:00Z"),
+              self._convert_time_string("2016-05-19T13:00:00Z"))],
+            [
+                Rollup(self._convert_time_string("2016-05-19T12:00:00Z"), 10, 950.0, 90.0, 99.0),
+                Rollup(self._convert_time_string("2016-05-19T12:00:00Z"), 5, 500.0, 95.0, 100.0),
+                Rollup(self._convert_time_string("2016-05-19T12:10:00Z"), 2, 180.0, 80.0, 100.0),
+            ],
+            [
+                Measurement(self._convert_time_string("2016-05-19T12:15:00Z"), 70.0, '{}'),
+                Measurement(self._convert_time_string("2016-05-19T12:16:00Z"), 110.0, '{}'),
+            ]
+        ]
+
+        start_timestamp = (self._convert_time_string("2016-05-19T12:00:00Z") -
+                           datetime(1970, 1, 1)).total_seconds()
+        end_timestamp = (self._convert_time_string("2016-05-19T12:17:30Z") -
+                         datetime(1970, 1, 1)).total_seconds()
+
+        repo = cassandra_repo.MetricsRepository()
+        result = repo.metrics_statistics(
+            "tenant_id",
+            "region",
+            name="cpu.idle_perc",
+            dimensions=None,
+            start_timestamp=start_timestamp,
+            end_timestamp=end_timestamp,
+            statistics=['avg', 'min', 'max', 'count', 'sum'],
+            period=600,
+            offset=None,
+            limit=None,
+            merge_metrics_flag=True)
+
+        self.assertEqual([
+            [u'2016-05-19T12:00:00Z', 1450.0 / 15, 90.0, 100.0, 15, 1450.0],
+            [u'2016-05-19T12:10:00Z', 90.0, 70.0, 110.0, 4, 360.0],
+        ], result[0]['statistics'])
+
+        # Whole 5 minute rollups up to 12:15, raw measurements afterwards
+        bind_mock = cassandra_session_mock.prepare.return_value.bind
+        self.assertEqual([300], bind_mock.call_args_list[1][0][0])
+        rollup_parms = bind_mock.call_args_list[2][0][0]
+        self.assertEqual([300, 1463659200000, 1463660100000], rollup_parms[-3:])
+        raw_parms = bind_mock.call_args_list[3][0][0]
+        self.assertEqual([1463660100000, 1463660250000], raw_parms[-2:])
+
+    def _metrics_statistics_from_rollups_within_watermark(self, cassandra_connect_mock,
+                                                          watermark):
+        self._fixture_config.config(rollup_granularities=['300'],
+                                    group='cassandra')
+
+        cassandra_session_mock = cassandra_connect_mock.return_value
+        cassandra_session_mock.execute.side_effect = [
+            [["0b5e7d8c43f74430add94fba09ffd66e", "region",
+              binascii.unhexlify(b"01d39f19798ed27bbf458300bf843edd17654614"),
+              {"__name__": "cpu.idle_perc", "hostname": "host0"}]],
+            watermark, [], [], []
+        ]
+
+        start_timestamp = (self._convert_time_string("2016-05-19T12:00:00Z") -
+                           datetime(1970, 1, 1)).total_seconds()
+        end_timestamp = (self._convert_time_string("2016-05-19T12:17:30Z") -
+                         datetime(1970, 1, 1)).total_seconds()
+
+        repo = cassandra_repo.MetricsRepository()
+        repo.metrics_statistics(
+            "tenant_id", "region", name="cpu.idle_perc", dimensions=None,
+            start_timestamp=start_timestamp, end_timestamp=end_timestamp,
+            statistics=['avg'], period=600, offset=None, limit=None,
+            merge_metrics_flag=True)
+
+        bind_mock = cassandra_session_mock.prepare.return_value.bind
+        return [args[0][0][-2:] for args in bind_mock.call_args_list[2:]]
+
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
+    def test_metrics_statistics_from_rollups_within_watermark(self, cassandra_connect_mock):
+        # Rollups were backfilled from 12:05 to 12:10 only
+        intervals = self._metrics_statistics_from_rollups_within_watermark(
+            cassandra_connect_mock,
+            [(self._convert_time_string("2016-05-19T12:05:00Z"),
+              self._convert_time_string("2016-05-19T12:10:00Z"))])
+
+        self.assertEqual([[1463659500000, 1463659800000],
+                          [1463659200000, 1463659499999],
+                          [1463659800000, 1463660250000]], intervals)
+
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
+    def test_metrics_statistics_without_rollup_watermark(self, cassandra_connect_mock):
+        # Rollups were never backfilled
+        intervals = self._metrics_statistics_from_rollups_within_watermark(
+            cassandra_connect_mock, [])
+
+        self.assertEqual([[1463659200000, 1463660250000]], intervals)
+
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
+    def test_rollup_granularity(self, cassandra_connect_mock):
+        self._fixture_config.config(rollup_granularities=['60', '300', '3600'],
+                                    group='cassandra')
+        repo = cassandra_repo.MetricsRepository()
+
+        self.assertEqual(3600, repo._rollup_granularity(7200, 1463659200000))
+        self.assertEqual(300, repo._rollup_granularity(7200, 1463659500000))
+        self.assertEqual(60, repo._rollup_granularity(120, 1463659200000))
+        # Periods starting in the middle of a rollup bucket
+        self.assertIsNone(repo._rollup_granularity(300, 1463659201000))
+        self.assertIsNone(repo._rollup_granularity(90, 1463659200000))
+
+        self._fixture_config.config(rollup_granularities=[], group='cassandra')
+        self.assertIsNone(repo._rollup_granularity(300, 1463659200000))
+
     @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
     def test_alarm_history(self, cassandra_connect_mock):
 
@@ -469,8 +1050,135 @@ class TestRepoMetricsCassandra(testtools.TestCase):
                 ]
             }], result)
 
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.ALARM_HISTORY_CHUNK_SIZE", 2)
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.execute_concurrent")
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
+    def test_alarm_history_in_chunks(self, cassandra_connect_mock, execute_concurrent_mock):
+        AlarmHistory = namedtuple('AlarmHistory', 'alarm_id, time_stamp, metrics, '
+                                                  'new_state, old_state, reason, '
+                                                  'reason_data, sub_alarms, tenant_id')
+
+        def row(alarm_id, time_string):
+            return AlarmHistory(alarm_id, self._convert_time_string(time_string), '[]',
+                                'ALARM', 'OK', '', '{}', '[]', 'tenant')
+
+        execute_concurrent_mock.return_value = [
+            ExecutionResult(True, iter([row('a1', '2017-03-01T00:00:03Z'),
+                                        row('a2', '2017-03-01T00:00:01Z')])),
+            ExecutionResult(True, iter([row('a3', '2017-03-01T00:00:02Z'),
+                                        row('a3', '2017-03-01T00:00:04Z')])),
+        ]
+
+        repo = cassandra_repo.MetricsRepository()
+        result = repo.alarm_history('tenant', ['a1', 'a2', 'a3'], None, 2)
+
+        self.assertEqual(['a2', 'a3', 'a1'], [alarm[u'alarm_id'] for alarm in result])
+
+        session, statements = execute_concurrent_mock.call_args[0]
+        self.assertEqual(2, len(statements))
+        bind_mock = cassandra_connect_mock.return_value.prepare.return_value.bind
+        self.assertEqual([['tenant', 'a1', 'a2', 3], ['tenant', 'a3', 3]],
+                         [args[0][0] for args in bind_mock.call_args_list])
+
     @staticmethod
     def _convert_time_string(date_time_string):
         dt = timeutils.parse_isotime(date_time_string)
         dt = timeutils.normalize_time(dt)
         return dt
+
+
+class TestCassandraPreparedStatementCache(testtools.TestCase):
+
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.STATSD_CLIENT")
+    def test_lru_eviction_and_counters(self, statsd_client_mock):
+        hit_counter = Mock()
+        miss_counter = Mock()
+        statsd_client_mock.get_counter.side_effect = (
+            lambda name: hit_counter if name.endswith('hits') else miss_counter)
+
+        session_mock = Mock()
+        session_mock.prepare.side_effect = lambda cql: 'prepared ' + cql
+
+        cache = cassandra_repo.PreparedStatementCache(session_mock, max_size=2)
+
+        self.assertEqual('prepared q1', cache.get('q1'))
+        self.assertEqual('prepared q2', cache.get('q2'))
+        self.assertEqual('prepared q1', cache.get('q1'))
+        # q2 is the least recently used statement
+        self.assertEqual('prepared q3', cache.get('q3'))
+        self.assertEqual(2, len(cache))
+        self.assertEqual('prepared q1', cache.get('q1'))
+        self.assertEqual('prepared q2', cache.get('q2'))
+
+        self.assertEqual(['q1', 'q2', 'q3', 'q2'],
+                         [args[0][0] for args in session_mock.prepare.call_args_list])
+        self.assertEqual(2, hit_counter.increment.call_count)
+        self.assertEqual(4, miss_counter.increment.call_count)
+
+    @patch("monasca_api.common.repositories.cassandra.metrics_repository.Cluster.connect")
+    def test_queries_are_prepared_once_per_shape(self, cassandra_connect_mock):
+        fixture = self.useFixture(fixture_config.Config(cfg.CONF))
+        fixture.config(cluster_ip_addresses='127.0.0.1', group='cassandra')
+
+        cassandra_session_mock = cassandra_connect_mock.return_value
+        cassandra_session_mock.execute.return_value = []
+
+        repo = cassandra_repo.MetricsRepository()
+        repo.list_metric_names("tenant", "region", {"hostname": "host0"})
+        repo.list_metric_names("tenant", "region", {"hostname": "host1"})
+        repo.list_metric_names("tenant", "region", {"hostname": "host0", "service": "monitoring"})
+
+        self.assertEqual(2, cassandra_session_mock.prepare.call_count)
+        cql = cassandra_session_mock.prepare.call_args_list[0][0][0]
+        self.assertNotIn('%s', cql)
+        self.assertIn('metric_map[?] = ?', cql)
+        self.assertEqual(["tenant", "region", "hostname", "host1"],
+                         cassandra_session_mock.prepare.return_value.bind.call_args_list[1][0][0])
+
+
+class TestCassandraRollupBackfill(testtools.TestCase):
+
+    @patch("monasca_api.common.repositories.cassandra.rollups.execute_concurrent_with_args")
+    def test_backfill(self, execute_concurrent_mock):
+        metric_hash = binascii.unhexlify(b"01d39f19798ed27bbf458300bf843edd17654614")
+
+        session_mock = Mock()
+        session_mock.execute.side_effect = [
+            [("tenant", "region", metric_hash)],
+            [(datetime(2016, 5, 19, 11, 59, 30), 1.0),
+             (datetime(2016, 5, 19, 12, 0, 0), 2.0),
+             (datetime(2016, 5, 19, 12, 0, 59), 4.0),
+             (datetime(2016, 5, 19, 12, 4, 0), 3.0),
+             (datetime(2016, 5, 19, 12, 5, 0), 5.0)],
+            # Watermarks of the minute rollups, up to 12:00, and of the 5
+            # minute rollups, from 13:00
+            [(datetime(2016, 5, 19, 0, 0, 0), datetime(2016, 5, 19, 12, 0, 0))], None,
+            [(datetime(2016, 5, 19, 13, 0, 0), datetime(2016, 5, 19, 14, 0, 0))]
+        ]
+
+        # 11:59:30 to 12:05:30
+        rollup_count = rollups.backfill(session_mock, [60, 300],
+                                        1463659170000, 1463659530000)
+
+        insert_rollup = session_mock.prepare.return_value
+        self.assertEqual(3, rollup_count)
+        self.assertEqual(2, execute_concurrent_mock.call_count)
+
+        minute_rollups = sorted(execute_concurrent_mock.call_args_list[0][0][2])
+        self.assertIs(insert_rollup, execute_concurrent_mock.call_args_list[0][0][1])
+        self.assertEqual([
+            ("tenant", "region", bytearray(metric_hash), 60, 1463659200000, 2, 6.0, 2.0, 4.0),
+            ("tenant", "region", bytearray(metric_hash), 60, 1463659440000, 1, 3.0, 3.0, 3.0),
+        ], minute_rollups)
+
+        # The rollups starting at 11:59 and 12:05 are not within the interval
+        five_minute_rollups = sorted(execute_concurrent_mock.call_args_list[1][0][2])
+        self.assertEqual([
+            ("tenant", "region", bytearray(metric_hash), 300, 1463659200000, 3, 9.0, 2.0, 4.0),
+        ], five_minute_rollups)
+
+        # The watermark of the minute rollups is extended up to 12:05, the
+        # one of the 5 minute rollups is kept as there is a gap
+        self.assertEqual([1463616000000, 1463659500000],
+                         session_mock.execute.call_args_list[3][0][1][1:])
+        self.assertEqual(5, session_mock.execute.call_count)
@@ -20,6 +20,7 @@ from falcon import testing
 
 from monasca_api.api.core import request
 from monasca_api.v2.common import exceptions
+from monasca_api.v2.reference import helpers
 
 
 class TestRequest(testing.TestBase):
@@ -103,3 +104,41 @@ class TestRequestLimit(testing.TestBase):
             )
         )
         self.assertEqual(page_limit, req.limit)
+
+
+class TestRequestQueryParams(testing.TestBase):
+    def setUp(self):
+        super(TestRequestQueryParams, self).setUp()
+        self.useFixture(oo_cfg.Config())
+        self.useFixture(oo_ctx.ClearRequestContext())
+
+    def test_query_params_are_shared(self):
+        req = request.Request(
+            testing.create_environ(
+                path='/',
+                query_string='name=cpu.idle_perc&dimensions=hostname:host0&limit=5',
+                headers={
+                    'X_AUTH_TOKEN': '111',
+                    'X_USER_ID': '222',
+                    'X_PROJECT_ID': '333',
+                    'X_ROLES': 'terminator,predator'
+                }
+            )
+        )
+
+        self.assertIs(req.query_params, helpers.get_query_params(req))
+        self.assertEqual('cpu.idle_perc', req.query_params['name'])
+        self.assertEqual(5, req.limit)
+
+        build = mock.Mock(return_value={'hostname': 'host0'})
+        self.assertEqual({'hostname': 'host0'},
+                         req.query_params.value('dimensions', build))
+        self.assertEqual({'hostname': 'host0'},
+                         req.query_params.value('dimensions', build))
+        build.assert_called_once_with(req.params)
+
+        # the dimensions returned to the resources may be modified
+        dimensions = helpers.get_query_dimensions(req)
+        dimensions['service'] = 'monitoring'
+        self.assertEqual({'hostname': 'host0'},
+                         helpers.get_query_dimensions(req))
@@ -0,0 +1,134 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from mock import Mock
+from mock import patch
+from oslo_config import cfg
+from oslo_config import fixture as fixture_config
+from sqlalchemy import Column, create_engine, Integer, MetaData, select, Table
+import testtools
+
+from monasca_api.common.repositories.sqla import sql_repository
+import monasca_api.v2.reference  # noqa: registers the database options
+
+
+class TestEngineRegistry(testtools.TestCase):
+
+    def setUp(self):
+        super(TestEngineRegistry, self).setUp()
+        self._fixture_config = self.useFixture(fixture_config.Config(cfg.CONF))
+        self.addCleanup(sql_repository.dispose_engines)
+
+    def test_repositories_share_engine(self):
+        self._fixture_config.config(url='sqlite://', group='database')
+
+        first = sql_repository.SQLRepository()
+        second = sql_repository.SQLRepository()
+
+        self.assertIs(first._db_engine, second._db_engine)
+
+    @patch('sqlalchemy.create_engine')
+    def test_pool_options(self, create_engine_mock):
+        self._fixture_config.config(url='mysql+pymysql://monapi:pwd@db/mon',
+                                    pool_size=20, max_overflow=5,
+                                    pool_timeout=3, pool_recycle=600,
+                                    pool_pre_ping=False, group='database')
+
+        engine = sql_repository.get_engine(cfg.CONF.database)
+
+        self.assertIs(create_engine_mock.return_value, engine)
+        (url,), kwargs = create_engine_mock.call_args
+        self.assertEqual('mysql+pymysql://monapi:pwd@db/mon', str(url))
+        self.assertEqual({'poolclass': sql_repository._TimedQueuePool,
+                          'pool_size': 20, 'max_overflow': 5,
+                          'pool_timeout': 3, 'pool_recycle': 600}, kwargs)
+
+    @patch('sqlalchemy.create_engine')
+    def test_url_from_options(self, create_engine_mock):
+        self._fixture_config.config(drivername='mysql+pymysql',
+                                    username='monapi', password='pwd',
+                                    host='db', port=3306, database='mon',
+                                    pool_pre_ping=False,
+                                    group='database')
+
+        sql_repository.get_engine(cfg.CONF.database)
+
+        (url,), _ = create_engine_mock.call_args
+        self.assertEqual('mysql+pymysql://monapi:pwd@db:3306/mon', str(url))
+
+    def test_sqlite_pool(self):
+        self._fixture_config.config(url='sqlite://', group='database')
+
+        engine = sql_repository.get_engine(cfg.CONF.database)
+
+        self.assertNotIsInstance(engine.pool, sql_repository._TimedQueuePool)
+        with engine.connect() as conn:
+            self.assertEqual(1, conn.scalar('select 1'))
+
+    @patch('monasca_api.common.repositories.sqla.sql_repository.'
+           '_statsd_pool_in_use')
+    def test_pool_in_use(self, pool_in_use_mock):
+        self._fixture_config.config(url='sqlite://', group='database')
+        engine = sql_repository.get_engine(cfg.CONF.database)
+
+        with engine.connect():
+            pool_in_use_mock.send.assert_called_with('configdb.pool_in_use', 1)
+        pool_in_use_mock.send.assert_called_with('configdb.pool_in_use', 0)
+
+
+class TestKeysetPredicate(testtools.TestCase):
+
+    def setUp(self):
+        super(TestKeysetPredicate, self).setUp()
+        self.engine = create_engine('sqlite://')
+        self.t = Table('t', MetaData(),
+                       Column('id', Integer, primary_key=True),
+                       Column('value', Integer, nullable=True))
+        self.t.create(self.engine)
+        self.engine.execute(self.t.insert(), [
+            {'id': 1, 'value': 2}, {'id': 2, 'value': None},
+            {'id': 3, 'value': 1}, {'id': 4, 'value': None},
+            {'id': 5, 'value': 2}])
+
+    def _pages(self, order_by, descending, dialect):
+        keys = [(self.t.c.value, descending, None), (self.t.c.id, False, None)]
+        ids = []
+        offset = None
+        while True:
+            query = select([self.t]).order_by(order_by, self.t.c.id).limit(2)
+            if offset is not None:
+                query = query.where(sql_repository.keyset_predicate(
+                    keys, offset, dialect))
+            rows = self.engine.execute(query).fetchall()
+            if not rows:
+                return ids
+            ids.extend(row['id'] for row in rows)
+            offset = [rows[-1]['value'], rows[-1]['id']]
+
+    def _check_pages(self, order_by, descending, dialect):
+        expected = [row['id'] for row in self.engine.execute(
+            select([self.t]).order_by(order_by, self.t.c.id))]
+        self.assertEqual(expected, self._pages(order_by, descending, dialect))
+
+    def test_nulls_first_in_ascending_order(self):
+        # SQLite sorts NULLs first in ascending order, as MySQL does
+        self._check_pages(self.t.c.value, False, self.engine.dialect)
+        self._check_pages(self.t.c.value.desc(), True, self.engine.dialect)
+
+    def test_nulls_last_in_ascending_order(self):
+        # The NULL ordering of PostgreSQL
+        dialect = Mock()
+        dialect.name = 'postgresql'
+        self._check_pages(self.t.c.value.nullslast(), False, dialect)
+        self._check_pages(self.t.c.value.desc().nullsfirst(), True, dialect)
@@ -66,6 +66,66 @@ messaging_group = cfg.OptGroup(name='messaging', title='messaging')
 cfg.CONF.register_group(messaging_group)
 cfg.CONF.register_opts(messaging_opts, messaging_group)
 
+outbox_opts = [cfg.IntOpt('batch_size', default=1000, min=1,
+                          help='Maximum number of events of the event outbox '
+                               'published to the message queue at once'),
+               cfg.FloatOpt('poll_interval', default=1.0, min=0.01,
+                            help='Seconds to wait before reading the event '
+                                 'outbox again when it is empty or could not '
+                                 'be published. Events written by the API '
+                                 'process itself are published at once'),
+               cfg.IntOpt('claim_timeout', default=300, min=1,
+                          help='Seconds the events being published by an '
+                               'API process are reserved for it. Events '
+                               'not published in time are published again '
+                               'by another process')]
+
+outbox_group = cfg.OptGroup(name='outbox', title='outbox')
+cfg.CONF.register_group(outbox_group)
+cfg.CONF.register_opts(outbox_opts, outbox_group)
+
+metrics_opts = [cfg.BoolOpt('streaming_post', default=False,
+                            help='If True, the body of POST /v2.0/metrics is '
+                                 'parsed, validated and published in chunks '
+                                 'while it is read, so that only a chunk of '
+                                 'the request is held in memory. Metrics of '
+                                 'chunks published before an invalid metric '
+                                 'is found are not rolled back.'),
+                cfg.IntOpt('post_chunk_size', default=1000,
+                           help='Number of metrics published at a time when '
+                                'streaming_post is enabled'),
+                cfg.IntOpt('max_post_body_size', default=0,
+                           help='Maximum size in bytes of the body of '
+                                'POST /v2.0/metrics, 0 for no limit')]
+
+metrics_group = cfg.OptGroup(name='metrics', title='metrics')
+cfg.CONF.register_group(metrics_group)
+cfg.CONF.register_opts(metrics_opts, metrics_group)
+
+catalog_cache_opts = [cfg.BoolOpt('enabled', default=False,
+                                  help='Cache the results of the metric names, '
+                                       'dimension names and dimension values '
+                                       'endpoints'),
+                      cfg.StrOpt('backend',
+                                 default='monasca_api.common.catalog_cache:'
+                                         'InProcessBackend',
+                                 help='Backend of the cache, InProcessBackend '
+                                      'or MemcachedBackend'),
+                      cfg.IntOpt('ttl', default=60, min=1,
+                                 help='Number of seconds a result is cached. '
+                                      'New metrics and dimensions show up '
+                                      'after at most this long.'),
+                      cfg.IntOpt('max_entries', default=10000, min=1,
+                                 help='Maximum number of results cached by '
+                                      'the InProcessBackend in each process'),
+                      cfg.ListOpt('memcached_servers',
+                                  default=['127.0.0.1:11211'],
+                                  help='Servers of the MemcachedBackend')]
+
+catalog_cache_group = cfg.OptGroup(name='catalog_cache', title='catalog_cache')
+cfg.CONF.register_group(catalog_cache_group)
+cfg.CONF.register_opts(catalog_cache_opts, catalog_cache_group)
+
 base_sqla_path = 'monasca_api.common.repositories.sqla.'
 repositories_opts = [
     cfg.StrOpt('metrics_driver',
@@ -107,7 +167,24 @@ kafka_opts = [cfg.StrOpt('uri', help='Address to kafka server. For example: '
               cfg.BoolOpt('auto_commit', default=False,
                           help='If automatically commmit when consume '
                                'messages.'),
-              cfg.BoolOpt('async', default=True, help='The type of posting.'),
+              cfg.BoolOpt('async', default=False, help=(
+                  'The type of posting. If True, messages are queued in '
+                  'process and published to kafka in batches by a '
+                  'background thread, otherwise every request publishes '
+                  'its messages synchronously.')),
+              cfg.IntOpt('queue_size', default=100000, help=(
+                  'Maximum number of messages waiting in the in process '
+                  'queue in async mode. Requests are rejected with 503 '
+                  'when the queue is full.')),
+              cfg.IntOpt('batch_max_bytes', default=1048576, help=(
+                  'Maximum size in bytes of a batch of messages published '
+                  'to kafka in async mode.')),
+              cfg.IntOpt('batch_linger_ms', default=50, help=(
+                  'Time in milliseconds to wait for more messages before '
+                  'publishing a batch which is not full in async mode.')),
+              cfg.IntOpt('retry_after', default=1, help=(
+                  'Value of the Retry-After header in seconds returned '
+                  'when the in process queue is full.')),
               cfg.BoolOpt('compact', default=True, help=(
                   'Specify if the message received should be parsed.'
                   'If True, message will not be parsed, otherwise '
@@ -128,13 +205,64 @@ cfg.CONF.register_opts(kafka_opts, kafka_group)
 
 influxdb_opts = [cfg.StrOpt('database_name'), cfg.StrOpt('ip_address'),
                  cfg.StrOpt('port'), cfg.StrOpt('user'),
-                 cfg.StrOpt('password', secret=True)]
+                 cfg.StrOpt('password', secret=True),
+                 cfg.StrOpt('session_mode', default='pool',
+                            choices=['pool', 'thread'], help=(
+                                'How the HTTP sessions to InfluxDB are shared '
+                                'by the threads of an API process, pool for a '
+                                'pool of pool_size sessions, thread for a '
+                                'session per thread.')),
+                 cfg.IntOpt('pool_size', default=10, min=1, help=(
+                     'Number of HTTP sessions to InfluxDB in the pool of each '
+                     'API process. Queries wait for a free session when all '
+                     'of them are in use.')),
+                 cfg.FloatOpt('connect_timeout', default=5.0, help=(
+                     'Seconds to wait for a connection to InfluxDB.')),
+                 cfg.FloatOpt('read_timeout', default=60.0, help=(
+                     'Seconds to wait for InfluxDB to send a response.')),
+                 cfg.BoolOpt('gzip', default=True, help=(
+                     'Ask InfluxDB for gzip compressed responses.')),
+                 cfg.IntOpt('max_retries', default=2, min=0, help=(
+                     'Number of times SHOW and SELECT queries are retried '
+                     'after a connection error, timeout or server error.')),
+                 cfg.FloatOpt('retry_backoff', default=0.1, help=(
+                     'Base of the exponential backoff in seconds between '
+                     'retries. The actual backoff is randomized.')),
+                 cfg.IntOpt('chunk_size', default=10000, min=0, help=(
+                     'Number of points InfluxDB sends per chunk of the '
+                     'results of measurement, statistics and alarm history '
+                     'queries, which are processed chunk by chunk. 0 to read '
+                     'the results in one piece.'))]
 
 influxdb_group = cfg.OptGroup(name='influxdb', title='influxdb')
 cfg.CONF.register_group(influxdb_group)
 cfg.CONF.register_opts(influxdb_opts, influxdb_group)
 
-cassandra_opts = [cfg.StrOpt('cluster_ip_addresses'), cfg.StrOpt('keyspace')]
+cassandra_opts = [cfg.StrOpt('cluster_ip_addresses'), cfg.StrOpt('keyspace'),
+                  cfg.ListOpt('rollup_granularities', default=[], help=(
+                      'Granularities in seconds of the pre-aggregated '
+                      'measurements in the measurements_rollup table, for '
+                      'example 60,300,3600. Statistics for periods which are '
+                      'a multiple of a granularity are computed from the '
+                      'rollups written by monasca-cassandra-rollup-backfill, '
+                      'and from the raw measurements outside of the '
+                      'backfilled interval. Measurements stored after the '
+                      'backfill with timestamps within its interval are '
+                      'not part of these statistics until the interval is '
+                      'backfilled again. Empty to always use the raw '
+                      'measurements.')),
+                  cfg.IntOpt('page_size', default=5000, help=(
+                      'Number of rows fetched from Cassandra per page. Rows are '
+                      'read page by page, so this bounds the memory used by a '
+                      'query. Measurement lists of several metrics cannot be '
+                      'paged and are bounded by their limit instead.')),
+                  cfg.IntOpt('statement_cache_size', default=500, min=1, help=(
+                      'Maximum number of prepared statements kept per API '
+                      'process. Least recently used statements are evicted.')),
+                  cfg.IntOpt('concurrent_queries', default=16, min=1, help=(
+                      'Maximum number of queries sent to Cassandra at once '
+                      'when a dimension filter with alternative values '
+                      '(a|b|c) is split into several queries.'))]
 
 cassandra_group = cfg.OptGroup(name='cassandra', title='cassandra')
 cfg.CONF.register_group(cassandra_group)
@@ -147,7 +275,23 @@ sql_opts = [cfg.StrOpt('url', default=None),
             cfg.StrOpt('drivername', default=None),
             cfg.IntOpt('port', default=None),
             cfg.StrOpt('database', default=None),
-            cfg.StrOpt('query', default=None)]
+            cfg.StrOpt('query', default=None),
+            cfg.IntOpt('pool_size', default=5, min=1, help=(
+                'Number of connections to the database kept open in the pool '
+                'of each API process.')),
+            cfg.IntOpt('max_overflow', default=10, min=-1, help=(
+                'Number of connections opened in addition to pool_size when '
+                'all connections of the pool are in use, -1 for no limit.')),
+            cfg.IntOpt('pool_timeout', default=30, min=0, help=(
+                'Seconds to wait for a free connection when pool_size + '
+                'max_overflow connections are in use.')),
+            cfg.IntOpt('pool_recycle', default=3600, min=-1, help=(
+                'Seconds after which a connection is replaced by a new one, '
+                'must be shorter than the wait_timeout of MySQL. -1 to keep '
+                'connections open forever.')),
+            cfg.BoolOpt('pool_pre_ping', default=True, help=(
+                'Test connections with SELECT 1 before they are used and '
+                'reconnect if the database closed them.'))]
 sql_group = cfg.OptGroup(name='database', title='sql')
 
 cfg.CONF.register_group(sql_group)
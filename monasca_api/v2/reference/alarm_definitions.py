@@ -23,7 +23,9 @@ import pyparsing
 
 from monasca_api.api import alarm_definitions_api_v2
 from monasca_api.common.repositories import exceptions
+from monasca_api.common.repositories import keyset_cursor
 import monasca_api.expression_parser.alarm_expr_parser
+from monasca_api.expression_parser import expression_cache
 from monasca_api.v2.common.exceptions import HTTPUnprocessableEntityError
 from monasca_api.v2.common.schemas import (
     alarm_definition_request_body_schema as schema_alarms)
@@ -103,13 +105,8 @@ class AlarmDefinitions(alarm_definitions_api_v2.AlarmDefinitionsV2API,
 
                 validation.validate_sort_by(sort_by, allowed_sort_by)
 
-            offset = helpers.get_query_param(req, 'offset')
-            if offset is not None and not isinstance(offset, int):
-                try:
-                    offset = int(offset)
-                except Exception:
-                    raise HTTPUnprocessableEntityError('Unprocessable Entity',
-                                                       'Offset value {} must be an integer'.format(offset))
+            offset = helpers.get_query_keyset_offset(
+                req, keyset_cursor.sort_keys(sort_by, 'id'))
             result = self._alarm_definition_list(req.project_id, name,
                                                  dimensions, severity,
                                                  req.uri, sort_by,
@@ -267,7 +264,7 @@ class AlarmDefinitions(alarm_definitions_api_v2.AlarmDefinitionsV2API,
                        if alarm_definition_row['description'] is not None else None)
 
         expression = alarm_definition_row['expression'].decode('utf8')
-        is_deterministic = is_definition_deterministic(expression)
+        is_deterministic = is_row_deterministic(alarm_definition_row, expression)
 
         result = {
             u'actions_enabled': alarm_definition_row['actions_enabled'] == 1,
@@ -294,15 +291,17 @@ class AlarmDefinitions(alarm_definitions_api_v2.AlarmDefinitionsV2API,
         sub_alarm_rows = self._alarm_definitions_repo.get_sub_alarms(
             tenant_id, id)
 
+        events = [self._build_alarm_definition_deleted_event(
+            id, sub_alarm_definition_rows)]
+        events.extend(self._build_alarm_events(u'alarm-deleted', tenant_id, id,
+                                               alarm_metric_rows, sub_alarm_rows,
+                                               None, None))
+
         if not self._alarm_definitions_repo.delete_alarm_definition(
-                tenant_id, id):
+                tenant_id, id, events=lambda result: events):
             raise falcon.HTTPNotFound
 
-        self._send_alarm_definition_deleted_event(id,
-                                                  sub_alarm_definition_rows)
-
-        self._send_alarm_event(u'alarm-deleted', tenant_id, id,
-                               alarm_metric_rows, sub_alarm_rows, None, None)
+        self._events_written()
 
     def _alarm_definition_list(self, tenant_id, name, dimensions, severity, req_uri, sort_by,
                                offset, limit):
@@ -327,7 +326,7 @@ class AlarmDefinitions(alarm_definitions_api_v2.AlarmDefinitionsV2API,
                 alarm_definition_row['undetermined_actions'])
 
             expression = alarm_definition_row['expression']
-            is_deterministic = is_definition_deterministic(expression)
+            is_deterministic = is_row_deterministic(alarm_definition_row, expression)
             ad = {u'id': alarm_definition_row['id'],
                   u'name': alarm_definition_row['name'],
                   u'description': alarm_definition_row['description'] if (
@@ -345,7 +344,12 @@ class AlarmDefinitions(alarm_definitions_api_v2.AlarmDefinitionsV2API,
             helpers.add_links_to_resource(ad, req_uri)
             result.append(ad)
 
-        result = helpers.paginate_alarming(result, req_uri, limit)
+        next_offset = None
+        if len(alarm_definition_rows) > limit:
+            next_offset = keyset_cursor.encode(alarm_definition_rows[limit - 1],
+                                               keyset_cursor.sort_keys(sort_by, 'id'))
+
+        result = helpers.paginate_alarming(result, req_uri, limit, next_offset)
 
         return result
 
@@ -395,6 +399,11 @@ class AlarmDefinitions(alarm_definitions_api_v2.AlarmDefinitionsV2API,
         if name:
             self._validate_name_not_conflicting(tenant_id, name, expected_id=definition_id)
 
+        def events(result):
+            alarm_def_row, sub_alarm_def_dicts = result
+            return [self._build_alarm_definition_updated_event(
+                tenant_id, definition_id, alarm_def_row, sub_alarm_def_dicts)]
+
         alarm_def_row, sub_alarm_def_dicts = (
             self._alarm_definitions_repo.update_or_patch_alarm_definition(
                 tenant_id,
@@ -409,7 +418,16 @@ class AlarmDefinitions(alarm_definitions_api_v2.AlarmDefinitionsV2API,
                 undetermined_actions,
                 match_by,
                 severity,
-                patch))
+                patch,
+                events=events))
+
+        self._events_written()
+
+        return self._build_alarm_definition_show_result(alarm_def_row)
+
+    def _build_alarm_definition_updated_event(self, tenant_id, definition_id,
+                                              alarm_def_row,
+                                              sub_alarm_def_dicts):
 
         old_sub_alarm_def_event_dict = (
             self._build_sub_alarm_def_update_dict(
@@ -449,10 +467,8 @@ class AlarmDefinitions(alarm_definitions_api_v2.AlarmDefinitionsV2API,
         alarm_definition_updated_event = (
             {u'alarm-definition-updated': alarm_def_event_dict})
 
-        self.send_event(self.events_message_queue,
-                        alarm_definition_updated_event)
-
-        return result
+        return self._outbox_event(alarming.EVENTS_TOPIC,
+                                  alarm_definition_updated_event)
 
     def _build_sub_alarm_def_update_dict(self, sub_alarm_def_dict):
 
@@ -498,6 +514,11 @@ class AlarmDefinitions(alarm_definitions_api_v2.AlarmDefinitionsV2API,
         self._validate_name_not_conflicting(tenant_id, name)
         fmtd_expression = parsed_adef.fmtd_expr_str
 
+        def events(alarm_definition_id):
+            return [self._build_alarm_definition_created_event(
+                tenant_id, alarm_definition_id, name, fmtd_expression,
+                sub_expr_list, description, match_by)]
+
         alarm_definition_id = (
             self._alarm_definitions_repo.
             create_alarm_definition(tenant_id,
@@ -509,26 +530,24 @@ class AlarmDefinitions(alarm_definitions_api_v2.AlarmDefinitionsV2API,
                                     match_by,
                                     alarm_actions,
                                     undetermined_actions,
-                                    ok_actions))
+                                    ok_actions,
+                                    events=events))
+
+        self._events_written()
 
-        self._send_alarm_definition_created_event(tenant_id,
-                                                  alarm_definition_id,
-                                                  name, fmtd_expression,
-                                                  sub_expr_list,
-                                                  description, match_by)
         result = (
             {u'alarm_actions': alarm_actions, u'ok_actions': ok_actions,
              u'description': description, u'match_by': match_by,
              u'severity': severity, u'actions_enabled': u'true',
              u'undetermined_actions': undetermined_actions,
              u'expression': fmtd_expression, u'id': alarm_definition_id,
-             u'deterministic': is_definition_deterministic(fmtd_expression),
+             u'deterministic': all(sub_expr.deterministic for sub_expr in sub_expr_list),
              u'name': name})
 
         return result
 
-    def _send_alarm_definition_deleted_event(self, alarm_definition_id,
-                                             sub_alarm_definition_rows):
+    def _build_alarm_definition_deleted_event(self, alarm_definition_id,
+                                              sub_alarm_definition_rows):
 
         sub_alarm_definition_deleted_event_msg = {}
         alarm_definition_deleted_event_msg = {u"alarm-definition-deleted": {
@@ -548,13 +567,13 @@ class AlarmDefinitions(alarm_definitions_api_v2.AlarmDefinitionsV2API,
                     parsed_dimension = dimension.split('=')
                     dimensions[parsed_dimension[0]] = parsed_dimension[1]
 
-        self.send_event(self.events_message_queue,
-                        alarm_definition_deleted_event_msg)
+        return self._outbox_event(alarming.EVENTS_TOPIC,
+                                  alarm_definition_deleted_event_msg)
 
-    def _send_alarm_definition_created_event(self, tenant_id,
-                                             alarm_definition_id, name,
-                                             expression, sub_expr_list,
-                                             description, match_by):
+    def _build_alarm_definition_created_event(self, tenant_id,
+                                              alarm_definition_id, name,
+                                              expression, sub_expr_list,
+                                              description, match_by):
 
         alarm_definition_created_event_msg = {
             u'alarm-definition-created': {u'tenantId': tenant_id,
@@ -588,8 +607,8 @@ class AlarmDefinitions(alarm_definitions_api_v2.AlarmDefinitionsV2API,
         alarm_definition_created_event_msg[u'alarm-definition-created'][
             u'alarmSubExpressions'] = sub_expr_event_msg
 
-        self.send_event(self.events_message_queue,
-                        alarm_definition_created_event_msg)
+        return self._outbox_event(alarming.EVENTS_TOPIC,
+                                  alarm_definition_created_event_msg)
 
 
 def get_query_alarm_definition_name(alarm_definition, return_none=False):
@@ -733,12 +752,23 @@ def is_definition_deterministic(expression):
     :return: true/false
     :rtype: bool
     """
-    expr_parser = (monasca_api.expression_parser
-                   .alarm_expr_parser.AlarmExprParser(expression))
-    sub_expressions = expr_parser.sub_expr_list
+    sub_expressions = expression_cache.parse(expression).sub_expr_list
 
     for sub_expr in sub_expressions:
         if not sub_expr.deterministic:
             return False
 
     return True
+
+
+def is_row_deterministic(alarm_definition_row, expression):
+    """Returns the deterministic flag of the alarm definition row
+
+    The repository returns the flag stored with the sub alarm definitions
+    in the 'deterministic' column, the expression is only parsed for rows
+    without it.
+    """
+    deterministic = alarm_definition_row.get('deterministic')
+    if deterministic is None:
+        return is_definition_deterministic(expression)
+    return bool(deterministic)
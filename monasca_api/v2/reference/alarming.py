@@ -12,41 +12,38 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import falcon
-from monasca_common.simport import simport
-from oslo_config import cfg
 from oslo_log import log
 
-from monasca_api.common.messaging import (
-    exceptions as message_queue_exceptions)
-import monasca_api.expression_parser.alarm_expr_parser
+from monasca_api.expression_parser import expression_cache
 from monasca_api.v2.reference import helpers
+from monasca_api.v2.reference import outbox_relay
 
 LOG = log.getLogger(__name__)
 
+EVENTS_TOPIC = u'events'
+ALARM_STATE_TRANSITIONS_TOPIC = u'alarm-state-transitions'
+
 
 class Alarming(object):
     """Super class for Alarms and AlarmDefinitions.
 
     Shared attributes and methods for classes Alarms and AlarmDefinitions.
+
+    The events of the changes are not sent to the message queue by the
+    requests. The repositories write them to the event outbox in the
+    transaction of the change, and the outbox relay publishes them.
     """
 
     def __init__(self):
 
         super(Alarming, self).__init__()
 
-        self.events_message_queue = simport.load(
-            cfg.CONF.messaging.driver)('events')
-
-        self.alarm_state_transitions_message_queue = simport.load(
-            cfg.CONF.messaging.driver)('alarm-state-transitions')
-
-    def _send_alarm_transitioned_event(self, tenant_id, alarm_id,
-                                       alarm_definition_row,
-                                       alarm_metric_rows,
-                                       old_state, new_state,
-                                       link, lifecycle_state,
-                                       time_ms):
+    def _build_alarm_transitioned_event(self, tenant_id, alarm_id,
+                                        alarm_definition_row,
+                                        alarm_metric_rows,
+                                        old_state, new_state,
+                                        link, lifecycle_state,
+                                        time_ms):
 
         # This is a change via the API, so there is no SubAlarm info to add
         sub_alarms = []
@@ -73,29 +70,23 @@ class Alarming(object):
             metric = self._build_metric(alarm_metric_row)
             metrics.append(metric)
 
-        self.send_event(self.alarm_state_transitions_message_queue,
-                        alarm_transitioned_event_msg)
+        return self._outbox_event(ALARM_STATE_TRANSITIONS_TOPIC,
+                                  alarm_transitioned_event_msg)
 
     def _build_metric(self, alarm_metric_row):
 
-        dimensions = {}
-
         metric = {u'name': alarm_metric_row['name'],
-                  u'dimensions': dimensions}
-
-        if alarm_metric_row['dimensions']:
-            for dimension in alarm_metric_row['dimensions'].split(','):
-                parsed_dimension = dimension.split('=')
-                dimensions[parsed_dimension[0]] = parsed_dimension[1]
+                  u'dimensions': alarm_metric_row['dimensions']}
 
         return metric
 
-    def _send_alarm_event(self, event_type, tenant_id, alarm_definition_id,
-                          alarm_metric_rows, sub_alarm_rows, link, lifecycle_state,
-                          extra_info=None):
+    def _build_alarm_events(self, event_type, tenant_id, alarm_definition_id,
+                            alarm_metric_rows, sub_alarm_rows, link, lifecycle_state,
+                            extra_info=None):
 
+        events = []
         if not alarm_metric_rows:
-            return
+            return events
 
         # Build a dict mapping alarm id -> list of sub alarms.
         sub_alarm_dict = {}
@@ -115,8 +106,8 @@ class Alarming(object):
                         self._build_sub_alarm_event_msg(sub_alarm_dict,
                                                         prev_alarm_id))
                     alarm_event_msg[event_type][u'subAlarms'] = sub_alarms_event_msg
-                    self.send_event(self.events_message_queue,
-                                    alarm_event_msg)
+                    events.append(self._outbox_event(EVENTS_TOPIC,
+                                                     alarm_event_msg))
 
                 alarm_metrics_event_msg = []
                 alarm_event_msg = {event_type: {u'tenantId': tenant_id,
@@ -140,9 +131,9 @@ class Alarming(object):
         sub_alarms_event_msg = self._build_sub_alarm_event_msg(sub_alarm_dict,
                                                                prev_alarm_id)
         alarm_event_msg[event_type][u'subAlarms'] = sub_alarms_event_msg
+        events.append(self._outbox_event(EVENTS_TOPIC, alarm_event_msg))
 
-        self.send_event(self.events_message_queue,
-                        alarm_event_msg)
+        return events
 
     def _build_sub_alarm_event_msg(self, sub_alarm_dict, alarm_id):
 
@@ -153,9 +144,8 @@ class Alarming(object):
 
         for sub_alarm in sub_alarm_dict[alarm_id]:
             # There's only one expr in a sub alarm, so just take the first.
-            sub_expr = (
-                monasca_api.expression_parser.alarm_expr_parser.
-                AlarmExprParser(sub_alarm['expression']).sub_expr_list[0])
+            sub_expr = expression_cache.parse(
+                sub_alarm['expression']).sub_expr_list[0]
             dimensions = {}
             sub_alarms_event_msg[sub_alarm['sub_alarm_id']] = {
                 u'function': sub_expr.normalized_func,
@@ -172,12 +162,10 @@ class Alarming(object):
 
         return sub_alarms_event_msg
 
-    def send_event(self, message_queue, event_msg):
-        try:
-            message_queue.send_message(
-                helpers.dumpit_utf8(event_msg))
-        except message_queue_exceptions.MessageQueueException as ex:
-            LOG.exception(ex)
-            raise falcon.HTTPInternalServerError(
-                'Message queue service unavailable'.encode('utf8'),
-                ex.message.encode('utf8'))
+    def _outbox_event(self, topic, event_msg):
+        """Returns the (topic, message) of an event for the event outbox"""
+        return topic, helpers.dumpit_utf8(event_msg)
+
+    def _events_written(self):
+        """Wakes up the outbox relay to publish the events of a request"""
+        outbox_relay.notify()
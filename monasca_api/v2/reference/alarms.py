@@ -16,7 +16,7 @@ import re
 
 import datetime
 import falcon
-from jinja2 import Template, TemplateSyntaxError
+from jinja2 import TemplateSyntaxError
 from monasca_common.simport import simport
 from oslo_config import cfg
 from oslo_log import log
@@ -24,6 +24,7 @@ import time
 
 from monasca_api.api import alarms_api_v2
 from monasca_api.common.repositories import exceptions
+from monasca_api.common.repositories import keyset_cursor
 from monasca_api.monitoring import client
 from monasca_api.monitoring.metrics import ALARMS_LIST_TIME
 from monasca_api.v2.common.exceptions import HTTPUnprocessableEntityError
@@ -32,6 +33,7 @@ from monasca_api.v2.common import validation
 from monasca_api.v2.reference import alarming
 from monasca_api.v2.reference import helpers
 from monasca_api.v2.reference import resource
+from monasca_api.v2.reference import template_cache
 
 LOG = log.getLogger(__name__)
 
@@ -123,8 +125,12 @@ class Alarms(alarms_api_v2.AlarmsV2API,
     def on_get(self, req, res, alarm_id=None):
         helpers.validate_authorization(req, self._get_alarms_authorized_roles)
 
+        render_description = helpers.str_2_bool(
+            helpers.get_query_param(req, 'render_description', default_val=u'true'))
+
         if alarm_id is None:
-            query_parms = falcon.uri.parse_query_string(req.query_string)
+            query_parms = helpers.get_query_params(req).to_dict()
+            query_parms.pop('render_description', None)
             if 'state' in query_parms:
                 validation.validate_alarm_state(query_parms['state'])
                 query_parms['state'] = query_parms['state'].upper()
@@ -145,24 +151,19 @@ class Alarms(alarms_api_v2.AlarmsV2API,
             query_parms['metric_dimensions'] = helpers.get_query_dimensions(req, 'metric_dimensions')
             helpers.validate_query_dimensions(query_parms['metric_dimensions'])
 
-            offset = helpers.get_query_param(req, 'offset')
-            if offset is not None and not isinstance(offset, int):
-                try:
-                    offset = int(offset)
-                except Exception as ex:
-                    LOG.exception(ex)
-                    raise HTTPUnprocessableEntityError("Unprocessable Entity",
-                                                       "Offset value {} must be an integer".format(offset))
+            offset = helpers.get_query_keyset_offset(
+                req, keyset_cursor.sort_keys(query_parms.get('sort_by'), 'alarm_id'))
 
             result = self._alarm_list(req.uri, req.project_id,
                                       query_parms, offset,
-                                      req.limit)
+                                      req.limit, render_description)
 
             res.body = helpers.dumpit_utf8(result)
             res.status = falcon.HTTP_200
 
         else:
-            result = self._alarm_show(req.uri, req.project_id, alarm_id)
+            result = self._alarm_show(req.uri, req.project_id, alarm_id,
+                                      render_description)
 
             res.body = helpers.dumpit_utf8(result)
             res.status = falcon.HTTP_200
@@ -208,7 +209,7 @@ class Alarms(alarms_api_v2.AlarmsV2API,
         template_vars['_state'] = alarm['state']
         desc = alarm[u'alarm_definition'][u'description']
         try:
-            alarm[u'alarm_definition'][u'description'] = Template(desc).render(**template_vars)
+            alarm[u'alarm_definition'][u'description'] = template_cache.get(desc).render(**template_vars)
         except TemplateSyntaxError as ex:
             LOG.debug('alarm-definition %s does not follow Jinja2 syntax: %s', alarm[u'alarm_definition'][u'id'],
                       ex.message)
@@ -219,90 +220,82 @@ class Alarms(alarms_api_v2.AlarmsV2API,
     def _alarm_update(self, tenant_id, alarm_id, new_state, lifecycle_state,
                       link):
 
-        alarm_metric_rows = self._alarms_repo.get_alarm_metrics(alarm_id)
-        sub_alarm_rows = self._alarms_repo.get_sub_alarms(tenant_id, alarm_id)
+        events = self._alarm_updated_events(tenant_id, alarm_id, new_state,
+                                            lifecycle_state, link)
 
-        old_alarm, time_ms = self._alarms_repo.update_alarm(tenant_id, alarm_id,
-                                                            new_state,
-                                                            lifecycle_state, link)
-        old_state = old_alarm['state']
-        # alarm_definition_id is the same for all rows.
-        alarm_definition_id = sub_alarm_rows[0]['alarm_definition_id']
+        self._alarms_repo.update_alarm(tenant_id, alarm_id, new_state,
+                                       lifecycle_state, link, events=events)
+        self._events_written()
 
-        state_info = {u'alarmState': new_state, u'oldAlarmState': old_state}
+    def _alarm_patch(self, tenant_id, alarm_id, new_state, lifecycle_state,
+                     link):
 
-        self._send_alarm_event(u'alarm-updated', tenant_id,
-                               alarm_definition_id, alarm_metric_rows,
-                               sub_alarm_rows, link, lifecycle_state, state_info)
+        self._alarm_update(tenant_id, alarm_id, new_state, lifecycle_state,
+                           link)
 
-        if old_state != new_state:
-            try:
-                alarm_definition_row = self._alarms_repo.get_alarm_definition(
-                    tenant_id, alarm_id)
-            except exceptions.DoesNotExistException:
-                # Alarm definition does not exist. May have been deleted
-                # in another transaction. In that case, all associated
-                # alarms were also deleted, so don't send transition events.
-                pass
-            else:
-                self._send_alarm_transitioned_event(tenant_id, alarm_id,
-                                                    alarm_definition_row,
-                                                    alarm_metric_rows,
-                                                    old_state, new_state,
-                                                    link, lifecycle_state,
-                                                    time_ms)
+    def _alarm_updated_events(self, tenant_id, alarm_id, new_state,
+                              lifecycle_state, link):
+        """Returns the function building the events of an alarm update
 
-    def _alarm_patch(self, tenant_id, alarm_id, new_state, lifecycle_state,
-                     link):
+        The function is called by update_alarm with the previous alarm
+        and the time of the update, once the alarm is known to exist.
+        """
 
         alarm_metric_rows = self._alarms_repo.get_alarm_metrics(alarm_id)
         sub_alarm_rows = self._alarms_repo.get_sub_alarms(tenant_id, alarm_id)
 
-        old_alarm, time_ms = self._alarms_repo.update_alarm(tenant_id, alarm_id,
-                                                            new_state,
-                                                            lifecycle_state, link)
+        def events(result):
+            old_alarm, time_ms = result
+            old_state = old_alarm['state']
+            # alarm_definition_id is the same for all rows.
+            alarm_definition_id = sub_alarm_rows[0]['alarm_definition_id']
 
-        # alarm_definition_id is the same for all rows.
-        alarm_definition_id = sub_alarm_rows[0]['alarm_definition_id']
+            state_info = {u'alarmState': new_state, u'oldAlarmState': old_state}
 
-        state_info = {u'alarmState': new_state, u'oldAlarmState': old_alarm['state']}
+            alarm_events = self._build_alarm_events(u'alarm-updated', tenant_id,
+                                                    alarm_definition_id,
+                                                    alarm_metric_rows,
+                                                    sub_alarm_rows, link,
+                                                    lifecycle_state, state_info)
 
-        self._send_alarm_event(u'alarm-updated', tenant_id,
-                               alarm_definition_id, alarm_metric_rows,
-                               sub_alarm_rows, link, lifecycle_state, state_info)
+            if old_state != new_state:
+                try:
+                    alarm_definition_row = self._alarms_repo.get_alarm_definition(
+                        tenant_id, alarm_id)
+                except exceptions.DoesNotExistException:
+                    # Alarm definition does not exist. May have been deleted
+                    # in another transaction. In that case, all associated
+                    # alarms were also deleted, so don't send transition events.
+                    pass
+                else:
+                    alarm_events.append(self._build_alarm_transitioned_event(
+                        tenant_id, alarm_id, alarm_definition_row,
+                        alarm_metric_rows, old_state, new_state, link,
+                        lifecycle_state, time_ms))
 
-        if old_alarm['state'] != new_state:
-            try:
-                alarm_definition_row = self._alarms_repo.get_alarm_definition(
-                    tenant_id, alarm_id)
-            except exceptions.DoesNotExistException:
-                # Alarm definition does not exist. May have been deleted
-                # in another transaction. In that case, all associated
-                # alarms were also deleted, so don't send transition events.
-                pass
-            else:
-                self._send_alarm_transitioned_event(tenant_id, alarm_id,
-                                                    alarm_definition_row,
-                                                    alarm_metric_rows,
-                                                    old_alarm['state'], new_state,
-                                                    link, lifecycle_state,
-                                                    time_ms)
+            return alarm_events
+
+        return events
 
     def _alarm_delete(self, tenant_id, id):
 
         alarm_metric_rows = self._alarms_repo.get_alarm_metrics(id)
         sub_alarm_rows = self._alarms_repo.get_sub_alarms(tenant_id, id)
 
-        self._alarms_repo.delete_alarm(tenant_id, id)
+        def events(result):
+            # alarm_definition_id is the same for all rows.
+            alarm_definition_id = sub_alarm_rows[0]['alarm_definition_id']
 
-        # alarm_definition_id is the same for all rows.
-        alarm_definition_id = sub_alarm_rows[0]['alarm_definition_id']
+            return self._build_alarm_events(u'alarm-deleted', tenant_id,
+                                            alarm_definition_id,
+                                            alarm_metric_rows, sub_alarm_rows,
+                                            None, None)
 
-        self._send_alarm_event(u'alarm-deleted', tenant_id,
-                               alarm_definition_id, alarm_metric_rows,
-                               sub_alarm_rows, None, None)
+        self._alarms_repo.delete_alarm(tenant_id, id, events=events)
+        self._events_written()
 
-    def _alarm_show(self, req_uri, tenant_id, alarm_id):
+    def _alarm_show(self, req_uri, tenant_id, alarm_id,
+                    render_description=True):
 
         alarm_rows = self._alarms_repo.get_alarm(tenant_id, alarm_id)
 
@@ -336,24 +329,20 @@ class Alarms(alarms_api_v2.AlarmsV2API,
 
                 first_row = False
 
-            dimensions = {}
             metric = {u'name': alarm_row['metric_name'],
-                      u'dimensions': dimensions}
-
-            if alarm_row['metric_dimensions']:
-                for dimension in alarm_row['metric_dimensions'].split(','):
-                    parsed_dimension = dimension.split('=')
-                    dimensions[parsed_dimension[0]] = parsed_dimension[1]
+                      u'dimensions': alarm_row['metric_dimensions']}
 
             metrics.append(metric)
 
-        Alarms._render_alarm(alarm)
+        if render_description:
+            Alarms._render_alarm(alarm)
 
         return alarm
 
     @STATSD_TIMER.timed(ALARMS_LIST_TIME, sample_rate=0.1)
     @resource.resource_try_catch_block
-    def _alarm_list(self, req_uri, tenant_id, query_parms, offset, limit):
+    def _alarm_list(self, req_uri, tenant_id, query_parms, offset, limit,
+                    render_description=True):
 
         alarm_rows = self._alarms_repo.get_alarms(tenant_id, query_parms,
                                                   offset, limit)
@@ -365,12 +354,16 @@ class Alarms(alarms_api_v2.AlarmsV2API,
         # Forward declaration
         alarm = {}
         prev_alarm_id = None
+        first_alarm_rows = []
         for alarm_row in alarm_rows:
             if prev_alarm_id != alarm_row['alarm_id']:
                 if prev_alarm_id is not None:
-                    Alarms._render_alarm(alarm)
+                    if render_description:
+                        Alarms._render_alarm(alarm)
                     result.append(alarm)
 
+                first_alarm_rows.append(alarm_row)
+
                 ad = {u'id': alarm_row['alarm_definition_id'],
                       u'name': alarm_row['alarm_definition_name'],
                       u'description': alarm_row['alarm_definition_description'],
@@ -397,22 +390,23 @@ class Alarms(alarms_api_v2.AlarmsV2API,
 
                 prev_alarm_id = alarm_row['alarm_id']
 
-            dimensions = {}
             metric = {u'name': alarm_row['metric_name'],
-                      u'dimensions': dimensions}
-
-            if alarm_row['metric_dimensions']:
-                for dimension in alarm_row['metric_dimensions'].split(','):
-                    parsed_dimension = dimension.split('=')
-                    dimensions[parsed_dimension[0]] = parsed_dimension[1]
+                      u'dimensions': alarm_row['metric_dimensions']}
 
             metrics.append(metric)
 
-        Alarms._render_alarm(alarm)
+        if render_description:
+            Alarms._render_alarm(alarm)
 
         result.append(alarm)
 
-        return helpers.paginate_alarming(result, req_uri, limit)
+        next_offset = None
+        if len(first_alarm_rows) > limit:
+            next_offset = keyset_cursor.encode(
+                first_alarm_rows[limit - 1],
+                keyset_cursor.sort_keys(query_parms.get('sort_by'), 'alarm_id'))
+
+        return helpers.paginate_alarming(result, req_uri, limit, next_offset)
 
 
 class AlarmsCount(alarms_api_v2.AlarmsCountV2API, alarming.Alarming):
@@ -434,7 +428,7 @@ class AlarmsCount(alarms_api_v2.AlarmsCountV2API, alarming.Alarming):
     @resource.resource_try_catch_block
     def on_get(self, req, res):
         helpers.validate_authorization(req, self._get_alarms_authorized_roles)
-        query_parms = falcon.uri.parse_query_string(req.query_string)
+        query_parms = helpers.get_query_params(req).to_dict()
 
         if 'state' in query_parms:
             validation.validate_alarm_state(query_parms['state'])
@@ -568,12 +562,7 @@ class AlarmsStateHistory(alarms_api_v2.AlarmsStateHistoryV2API,
                             end_timestamp, dimensions, req_uri, offset,
                             limit):
 
-        # get_alarms expects 'metric_dimensions' for dimensions key.
-        new_query_parms = {'metric_dimensions': dimensions}
-
-        alarm_rows = self._alarms_repo.get_alarms(tenant_id, new_query_parms,
-                                                  None, None)
-        alarm_id_list = [alarm_row['alarm_id'] for alarm_row in alarm_rows]
+        alarm_id_list = self._alarms_repo.get_alarm_ids(tenant_id, dimensions)
 
         result = self._metrics_repo.alarm_history(tenant_id, alarm_id_list,
                                                   offset, limit,
@@ -24,10 +24,15 @@ import simplejson
 import six
 import six.moves.urllib.parse as urlparse
 
+from monasca_api.api.core import request
+from monasca_api.common.repositories import keyset_cursor
+from monasca_api.common.repositories import series_cursor
 from monasca_api.v2.common.exceptions import HTTPUnprocessableEntityError
 
 LOG = log.getLogger(__name__)
 
+_VALID_STATISTICS = frozenset(['avg', 'min', 'max', 'count', 'sum'])
+
 
 def read_json_msg_body(req):
     """Read the json_msg from the http request body and return them as JSON.
@@ -83,6 +88,18 @@ def validate_authorization(req, authorized_roles):
                                   challenge)
 
 
+def get_query_params(req):
+    """Returns the query params of the request, parsed once per request.
+
+    :param req: HTTP request object.
+    :rtype: monasca_api.api.core.request.QueryParams
+    """
+    if isinstance(req, request.Request):
+        return req.query_params
+    return request.QueryParams(
+        falcon.uri.parse_query_string(req.query_string))
+
+
 def get_x_tenant_or_tenant_id(req, delegate_authorized_roles):
     """Evaluates whether the tenant ID or cross tenant ID should be returned.
 
@@ -92,7 +109,7 @@ def get_x_tenant_or_tenant_id(req, delegate_authorized_roles):
     :returns: Returns the cross tenant or tenant ID.
     """
     if any(x in set(delegate_authorized_roles) for x in req.roles):
-        params = falcon.uri.parse_query_string(req.query_string)
+        params = get_query_params(req)
         if 'tenant_id' in params:
             tenant_id = params['tenant_id']
             return tenant_id
@@ -101,7 +118,7 @@ def get_x_tenant_or_tenant_id(req, delegate_authorized_roles):
 
 def get_query_param(req, param_name, required=False, default_val=None):
     try:
-        params = falcon.uri.parse_query_string(req.query_string)
+        params = get_query_params(req)
         if param_name in params:
             if isinstance(params[param_name], list):
                 param_val = params[param_name][0].decode('utf8')
@@ -119,13 +136,37 @@ def get_query_param(req, param_name, required=False, default_val=None):
         raise HTTPUnprocessableEntityError('Unprocessable Entity', ex.message)
 
 
+def get_query_keyset_offset(req, keys):
+    """Returns the query param "offset" of alarms, alarm definitions and notification methods
+
+    :param req: HTTP request object.
+    :param keys: sort keys of the resource, see keyset_cursor.sort_keys
+    :return: None, a numeric offset or the values of the sort keys held by
+             the keyset cursor of the offset
+    :raises HTTPUnprocessableEntityError: if the offset is neither a
+            number nor a cursor of the sort keys
+    """
+    offset = get_query_param(req, 'offset')
+    if offset is None or isinstance(offset, int):
+        return offset
+    if offset.isdigit():
+        return int(offset)
+    try:
+        return keyset_cursor.decode(offset, keys)
+    except ValueError as ex:
+        LOG.debug(ex)
+        raise HTTPUnprocessableEntityError('Unprocessable Entity',
+                                           'Offset value {} must be an integer or the '
+                                           'offset of a next link'.format(offset))
+
+
 def get_query_name(req, name_required=False):
     """Returns the query param "name" if supplied.
 
     :param req: HTTP request object.
     """
     try:
-        params = falcon.uri.parse_query_string(req.query_string)
+        params = get_query_params(req)
         if 'name' in params:
             name = params['name']
             return name
@@ -148,38 +189,43 @@ def get_query_dimensions(req, param_key='dimensions'):
     :raises falcon.HTTPBadRequest: If dimensions are malformed.
     """
     try:
-        params = falcon.uri.parse_query_string(req.query_string)
-        dimensions = {}
-        if param_key not in params:
-            return dimensions
-
-        dimensions_param = params[param_key]
-        if isinstance(dimensions_param, basestring):
-            dimensions_str_array = dimensions_param.split(',')
-        elif isinstance(dimensions_param, list):
-            dimensions_str_array = []
-            for sublist in dimensions_param:
-                dimensions_str_array.extend(sublist.split(","))
-        else:
-            raise Exception("Error parsing dimensions, unknown format")
-
-        for dimension in dimensions_str_array:
-            dimension_name_value = dimension.split(':')
-            if len(dimension_name_value) == 2:
-                dimensions[dimension_name_value[0]] = dimension_name_value[1]
-            elif len(dimension_name_value) == 1:
-                dimensions[dimension_name_value[0]] = ""
-            else:
-                raise Exception('Dimensions are malformed')
-        return dimensions
+        return dict(get_query_params(req).value(
+            ('dimensions', param_key),
+            lambda params: _parse_query_dimensions(params, param_key)))
     except Exception as ex:
         LOG.debug(ex)
         raise HTTPUnprocessableEntityError('Unprocessable Entity', ex.message)
 
 
+def _parse_query_dimensions(params, param_key):
+    dimensions = {}
+    if param_key not in params:
+        return dimensions
+
+    dimensions_param = params[param_key]
+    if isinstance(dimensions_param, basestring):
+        dimensions_str_array = dimensions_param.split(',')
+    elif isinstance(dimensions_param, list):
+        dimensions_str_array = []
+        for sublist in dimensions_param:
+            dimensions_str_array.extend(sublist.split(","))
+    else:
+        raise Exception("Error parsing dimensions, unknown format")
+
+    for dimension in dimensions_str_array:
+        dimension_name_value = dimension.split(':')
+        if len(dimension_name_value) == 2:
+            dimensions[dimension_name_value[0]] = dimension_name_value[1]
+        elif len(dimension_name_value) == 1:
+            dimensions[dimension_name_value[0]] = ""
+        else:
+            raise Exception('Dimensions are malformed')
+    return dimensions
+
+
 def get_query_starttime_timestamp(req, required=True):
     try:
-        params = falcon.uri.parse_query_string(req.query_string)
+        params = get_query_params(req)
         if 'start_time' in params:
             return _convert_time_string(params['start_time'])
         else:
@@ -194,7 +240,7 @@ def get_query_starttime_timestamp(req, required=True):
 
 def get_query_endtime_timestamp(req, required=True):
     try:
-        params = falcon.uri.parse_query_string(req.query_string)
+        params = get_query_params(req)
         if 'end_time' in params:
             return _convert_time_string(params['end_time'])
         else:
@@ -223,7 +269,7 @@ def _convert_time_string(date_time_string):
 
 def get_query_statistics(req):
     try:
-        params = falcon.uri.parse_query_string(req.query_string)
+        params = get_query_params(req)
         if 'statistics' in params:
             statistics = []
             # falcon may return this as a list or as a string
@@ -232,8 +278,7 @@ def get_query_statistics(req):
             else:
                 statistics.extend(params['statistics'].split(','))
             statistics = [statistic.lower() for statistic in statistics]
-            if not all(statistic in ['avg', 'min', 'max', 'count', 'sum'] for
-                       statistic in statistics):
+            if not _VALID_STATISTICS.issuperset(statistics):
                 raise Exception("Invalid statistic")
             return statistics
         else:
@@ -245,7 +290,7 @@ def get_query_statistics(req):
 
 def get_query_period(req):
     try:
-        params = falcon.uri.parse_query_string(req.query_string)
+        params = get_query_params(req)
         if 'period' in params:
             period = params['period']
             try:
@@ -264,7 +309,7 @@ def get_query_period(req):
 
 def get_query_group_by(req):
     try:
-        params = falcon.uri.parse_query_string(req.query_string)
+        params = get_query_params(req)
         if 'group_by' in params:
             group_by = params['group_by']
             if not isinstance(group_by, list):
@@ -422,7 +467,12 @@ def _truncate_with_offset(resource, value_list, offset):
     return []
 
 
-def paginate_alarming(resource, uri, limit):
+def paginate_alarming(resource, uri, limit, next_offset=None):
+    """Returns the page of the resource with its self and next links
+
+    :param next_offset: offset of the next page, by default the numeric
+                        offset of the page plus limit
+    """
     parsed_uri = urlparse.urlparse(uri)
 
     self_link = build_base_uri(parsed_uri)
@@ -434,11 +484,14 @@ def paginate_alarming(resource, uri, limit):
 
     if resource and len(resource) > limit:
 
-        old_offset = 0
-        for param in old_query_params:
-            if param.find('offset') >= 0:
-                old_offset = int(param.split('=')[-1])
-        new_offset = str(limit + old_offset)
+        if next_offset is not None:
+            new_offset = next_offset
+        else:
+            old_offset = 0
+            for param in old_query_params:
+                if param.find('offset') >= 0:
+                    old_offset = int(param.split('=')[-1])
+            new_offset = str(limit + old_offset)
 
         next_link = build_base_uri(parsed_uri)
 
@@ -538,7 +591,8 @@ def paginate_measurements(measurements, uri, limit):
         for measurement in measurements:
             if len(measurement['measurements']) >= limit:
 
-                new_offset = measurement['measurements'][limit - 1][0]
+                new_offset = series_cursor.encode(
+                    measurement['id'], measurement['measurements'][limit - 1][0])
 
                 next_link = build_base_uri(parsed_uri)
 
@@ -623,8 +677,8 @@ def paginate_statistics(statistics, uri, limit):
         for statistic in statistics:
             if len(statistic['statistics']) >= limit:
 
-                new_offset = (
-                    statistic['statistics'][limit - 1][0])
+                new_offset = series_cursor.encode(
+                    statistic['id'], statistic['statistics'][limit - 1][0])
 
                 next_link = build_base_uri(parsed_uri)
 
@@ -720,13 +774,24 @@ def add_links_to_resource_list(resourcelist, uri):
     return resourcelist
 
 
-def read_http_resource(req):
+def read_http_resource(req, max_body_size=0):
     """Read from http request and return json.
 
+    The body is checked against max_body_size while it is read, so a body
+    sent without Content-Length, e.g. chunked, cannot exceed it either.
+
     :param req: the http request.
+    :param max_body_size: maximum body size in bytes, 0 for no limit.
+    :raises falcon.HTTPRequestEntityTooLarge: body is larger than
+            max_body_size
     """
     try:
-        msg = req.stream.read()
+        if max_body_size:
+            msg = req.stream.read(max_body_size + 1)
+            if len(msg) > max_body_size:
+                _raise_payload_too_large(max_body_size)
+        else:
+            msg = req.stream.read()
         json_msg = simplejson.loads(msg)
         return json_msg
     except ValueError as ex:
@@ -734,6 +799,147 @@ def read_http_resource(req):
         raise HTTPUnprocessableEntityError('Unprocessable Entity', 'Request body is not valid JSON')
 
 
+def validate_payload_size(req, max_body_size):
+    """Rejects the request if the declared body size is too large.
+
+    :param req: the http request.
+    :param max_body_size: maximum body size in bytes, 0 for no limit.
+    :raises falcon.HTTPRequestEntityTooLarge
+    """
+    if max_body_size and req.content_length and req.content_length > max_body_size:
+        _raise_payload_too_large(max_body_size)
+
+
+def _raise_payload_too_large(max_body_size):
+    raise falcon.HTTPRequestEntityTooLarge(
+        'Request Entity Too Large',
+        'Request body must not be larger than {} bytes'.format(max_body_size))
+
+
+def read_json_array_in_chunks(req, chunk_size, max_body_size=0,
+                              read_size=65536):
+    """Read a JSON array from the http request element by element.
+
+    The body is read from the request stream read_size bytes at a time and
+    only the elements of the current chunk are kept in memory. A body that
+    is a single JSON object is returned as a chunk with one element.
+
+    :param req: the http request.
+    :param chunk_size: maximum number of elements in a chunk.
+    :param max_body_size: maximum body size in bytes, 0 for no limit.
+    :param read_size: number of bytes read from the stream at a time.
+    :return: generator of lists of (element, element JSON) tuples, where
+             element JSON is the slice of the body the element was
+             decoded from.
+    :raises HTTPUnprocessableEntityError: body is not valid JSON
+    :raises falcon.HTTPRequestEntityTooLarge: body is larger than
+            max_body_size
+    """
+    validate_payload_size(req, max_body_size)
+    reader = _JSONStreamReader(req.stream, read_size, max_body_size)
+
+    first = reader.next_char()
+    if first == '{':
+        element, encoded_element = reader.read_object()
+        reader.expect_end()
+        yield [(element, encoded_element)]
+        return
+    if first != '[':
+        reader.invalid()
+    reader.skip(1)
+
+    chunk = []
+    if reader.next_char() == ']':
+        reader.skip(1)
+    else:
+        while True:
+            chunk.append(reader.read_value())
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+
+            separator = reader.next_char()
+            reader.skip(1)
+            if separator == ']':
+                break
+            if separator != ',':
+                reader.invalid()
+
+    reader.expect_end()
+    if chunk:
+        yield chunk
+
+
+class _JSONStreamReader(object):
+    """Decodes JSON values one at a time from a stream."""
+
+    def __init__(self, stream, read_size, max_body_size):
+        self._stream = stream
+        self._read_size = read_size
+        self._max_body_size = max_body_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._body_size = 0
+        self._eof = False
+
+    def _fill(self, size=None):
+        data = self._stream.read(size or self._read_size)
+        if not data:
+            self._eof = True
+            return
+        self._body_size += len(data)
+        if self._max_body_size and self._body_size > self._max_body_size:
+            _raise_payload_too_large(self._max_body_size)
+        self._buffer = self._buffer[self._pos:] + data
+        self._pos = 0
+
+    def next_char(self):
+        """Skips whitespace and returns the next character, '' at the end."""
+        while True:
+            self._pos = json.decoder.WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer) or self._eof:
+                return self._buffer[self._pos:self._pos + 1]
+            self._fill()
+
+    def skip(self, count):
+        self._pos += count
+
+    def read_value(self):
+        self.next_char()
+        start = self._pos
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, start)
+                # A value ending at the end of the buffer, e.g. a number,
+                # might continue in the data not read yet
+                if end < len(self._buffer) or self._eof:
+                    break
+            except ValueError:
+                if self._eof:
+                    self.invalid()
+            # Read at least as much as is buffered for the value, so that
+            # a large value is not decoded over and over again
+            self._fill(max(self._read_size, len(self._buffer) - start))
+            start = self._pos
+        self._pos = end
+        return value, self._buffer[start:end]
+
+    def read_object(self):
+        value, encoded_value = self.read_value()
+        if not isinstance(value, dict):
+            self.invalid()
+        return value, encoded_value
+
+    def expect_end(self):
+        if self.next_char():
+            self.invalid()
+
+    def invalid(self):
+        raise HTTPUnprocessableEntityError('Unprocessable Entity',
+                                           'Request body is not valid JSON')
+
+
 def raise_not_found_exception(resource_name, resource_id, tenant_id):
     """Provides exception for not found requests (update, delete, list).
 
@@ -751,7 +957,10 @@ def raise_not_found_exception(resource_name, resource_id, tenant_id):
 
 
 def dumpit_utf8(thingy):
-    return json.dumps(thingy, ensure_ascii=False).encode('utf8')
+    # simplejson writes the simplejson.RawJSON fragments of the
+    # repositories as they are. Non ASCII characters are escaped, which
+    # keeps simplejson on its C encoder.
+    return simplejson.dumps(thingy, namedtuple_as_object=False).encode('utf8')
 
 
 def str_2_bool(s):
@@ -22,6 +22,7 @@ from oslo_config import cfg
 from oslo_log import log
 
 from monasca_api.api import metrics_api_v2
+from monasca_api.common import catalog_cache
 from monasca_api.common.messaging import (
     exceptions as message_queue_exceptions)
 from monasca_api.common.messaging.message_formats import (
@@ -78,11 +79,19 @@ class Metrics(metrics_api_v2.MetricsV2API):
             raise falcon.HTTPInternalServerError('Service unavailable',
                                                  ex.message)
 
+        self._streaming_post = cfg.CONF.metrics.streaming_post
+        self._post_chunk_size = cfg.CONF.metrics.post_chunk_size
+        self._max_post_body_size = cfg.CONF.metrics.max_post_body_size
+
         self._statsd_rejected_count = STATSD_CLIENT.get_counter(METRICS_REJECTED_COUNT)
 
     def _send_metrics(self, metrics):
         try:
             self._message_queue.send_message(metrics)
+        except message_queue_exceptions.MessageQueueFullException as ex:
+            LOG.warning(ex.message)
+            raise falcon.HTTPServiceUnavailable('Service unavailable',
+                                                ex.message, ex.retry_after)
         except message_queue_exceptions.MessageQueueException as ex:
             LOG.exception(ex)
             raise falcon.HTTPServiceUnavailable('Service unavailable',
@@ -107,7 +116,34 @@ class Metrics(metrics_api_v2.MetricsV2API):
         helpers.validate_json_content_type(req)
         helpers.validate_authorization(req,
                                        self._post_metrics_authorized_roles)
-        metrics = helpers.read_http_resource(req)
+        tenant_id = (
+            helpers.get_x_tenant_or_tenant_id(req,
+                                              self._delegate_authorized_roles))
+
+        if self._streaming_post:
+            self._post_metrics_in_chunks(req, tenant_id)
+        else:
+            helpers.validate_payload_size(req, self._max_post_body_size)
+            metrics = helpers.read_http_resource(req,
+                                                 self._max_post_body_size)
+            self._validate_metrics(metrics)
+            transformed_metrics = metrics_message.transform(
+                metrics, tenant_id, self._region)
+            self._send_metrics(transformed_metrics)
+
+        res.status = falcon.HTTP_204
+
+    def _post_metrics_in_chunks(self, req, tenant_id):
+        for chunk in helpers.read_json_array_in_chunks(req,
+                                                       self._post_chunk_size,
+                                                       self._max_post_body_size):
+            self._validate_metrics([metric for metric, _ in chunk])
+            transformed_metrics = metrics_message.transform_encoded(
+                [encoded_metric for _, encoded_metric in chunk],
+                tenant_id, self._region)
+            self._send_metrics(transformed_metrics)
+
+    def _validate_metrics(self, metrics):
         try:
             metric_validation.validate(metrics)
         except Exception as ex:
@@ -115,14 +151,6 @@ class Metrics(metrics_api_v2.MetricsV2API):
             self._statsd_rejected_count.increment(1)
             raise HTTPUnprocessableEntityError("Unprocessable Entity", ex.message)
 
-        tenant_id = (
-            helpers.get_x_tenant_or_tenant_id(req,
-                                              self._delegate_authorized_roles))
-        transformed_metrics = metrics_message.transform(
-            metrics, tenant_id, self._region)
-        self._send_metrics(transformed_metrics)
-        res.status = falcon.HTTP_204
-
     @resource.resource_try_catch_block
     @STATSD_TIMER.timed(METRICS_LIST_TIME)
     def on_get(self, req, res):
@@ -290,6 +318,7 @@ class MetricsNames(metrics_api_v2.MetricsNamesV2API):
                 cfg.CONF.security.read_only_authorized_roles)
             self._metrics_repo = simport.load(
                 cfg.CONF.repositories.metrics_driver)()
+            self._catalog_cache = catalog_cache.get_cache()
 
         except Exception as ex:
             LOG.exception(ex)
@@ -313,9 +342,14 @@ class MetricsNames(metrics_api_v2.MetricsNamesV2API):
     def _list_metric_names(self, tenant_id, dimensions, req_uri, offset,
                            limit):
 
-        result = self._metrics_repo.list_metric_names(tenant_id,
-                                                      self._region,
-                                                      dimensions)
+        def load():
+            return self._metrics_repo.list_metric_names(tenant_id,
+                                                        self._region,
+                                                        dimensions)
+
+        result = self._catalog_cache.get('metric_names', tenant_id,
+                                         self._region,
+                                         {'dimensions': dimensions}, load)
 
         return helpers.paginate_with_no_id(result, req_uri, offset, limit)
 
@@ -332,6 +366,7 @@ class DimensionValues(metrics_api_v2.DimensionValuesV2API):
                 cfg.CONF.security.read_only_authorized_roles)
             self._metrics_repo = simport.load(
                 cfg.CONF.repositories.metrics_driver)()
+            self._catalog_cache = catalog_cache.get_cache()
 
         except Exception as ex:
             LOG.exception(ex)
@@ -357,10 +392,17 @@ class DimensionValues(metrics_api_v2.DimensionValuesV2API):
     def _dimension_values(self, tenant_id, req_uri, metric_name,
                           dimension_name, offset, limit):
 
-        result = self._metrics_repo.list_dimension_values(tenant_id,
-                                                          self._region,
-                                                          metric_name,
-                                                          dimension_name)
+        def load():
+            return self._metrics_repo.list_dimension_values(tenant_id,
+                                                            self._region,
+                                                            metric_name,
+                                                            dimension_name)
+
+        result = self._catalog_cache.get('dimension_values', tenant_id,
+                                         self._region,
+                                         {'metric_name': metric_name,
+                                          'dimension_name': dimension_name},
+                                         load)
 
         return helpers.paginate_with_no_id(result, req_uri, offset, limit)
 
@@ -377,6 +419,7 @@ class DimensionNames(metrics_api_v2.DimensionNamesV2API):
                 cfg.CONF.security.read_only_authorized_roles)
             self._metrics_repo = simport.load(
                 cfg.CONF.repositories.metrics_driver)()
+            self._catalog_cache = catalog_cache.get_cache()
 
         except Exception as ex:
             LOG.exception(ex)
@@ -398,8 +441,13 @@ class DimensionNames(metrics_api_v2.DimensionNamesV2API):
 
     def _dimension_names(self, tenant_id, req_uri, metric_name, offset, limit):
 
-        result = self._metrics_repo.list_dimension_names(tenant_id,
-                                                         self._region,
-                                                         metric_name)
+        def load():
+            return self._metrics_repo.list_dimension_names(tenant_id,
+                                                           self._region,
+                                                           metric_name)
+
+        result = self._catalog_cache.get('dimension_names', tenant_id,
+                                         self._region,
+                                         {'metric_name': metric_name}, load)
 
         return helpers.paginate_with_no_id(result, req_uri, offset, limit)
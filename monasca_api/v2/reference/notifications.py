@@ -19,7 +19,7 @@ from oslo_log import log
 
 from monasca_api.api import notifications_api_v2
 from monasca_api.common.repositories import exceptions
-from monasca_api.v2.common.exceptions import HTTPUnprocessableEntityError
+from monasca_api.common.repositories import keyset_cursor
 from monasca_api.v2.common.schemas import (
     notifications_request_body_schema as schemas_notifications)
 from monasca_api.v2.common.schemas import exceptions as schemas_exceptions
@@ -152,7 +152,12 @@ class Notifications(notifications_api_v2.NotificationsV2API):
         result = [self._build_notification_result(row,
                                                   uri) for row in rows]
 
-        return helpers.paginate(result, uri, limit)
+        next_offset = None
+        if len(rows) > limit:
+            next_offset = keyset_cursor.encode(rows[limit - 1],
+                                               keyset_cursor.sort_keys(sort_by, 'id'))
+
+        return helpers.paginate_alarming(result, uri, limit, next_offset)
 
     def _list_notification(self, tenant_id, notification_id, uri):
 
@@ -217,14 +222,8 @@ class Notifications(notifications_api_v2.NotificationsV2API):
 
                 validation.validate_sort_by(sort_by, allowed_sort_by)
 
-            offset = helpers.get_query_param(req, 'offset')
-            if offset is not None and not isinstance(offset, int):
-                try:
-                    offset = int(offset)
-                except Exception:
-                    raise HTTPUnprocessableEntityError('Unprocessable Entity',
-                                                       'Offset value {} must be an integer'
-                                                       .format(offset))
+            offset = helpers.get_query_keyset_offset(
+                req, keyset_cursor.sort_keys(sort_by, 'id'))
 
             result = self._list_notifications(req.project_id, req.uri, sort_by,
                                               offset, req.limit)
@@ -0,0 +1,149 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Relay of the event outbox to the message queue
+
+The events of the changes of alarms and alarm definitions are written to
+the event outbox in the transaction of the change, see
+outbox_repository. A background thread of each API process publishes
+them in batches of [outbox] batch_size events and deletes them once
+published. Each batch is claimed by the relay for [outbox] claim_timeout
+seconds while it is published. The thread is started by the first
+request of the process, see RelayStarter, and woken up by the requests
+writing events. Otherwise it polls the outbox every [outbox]
+poll_interval seconds for the events of other processes, of processes
+which stopped before publishing them, or of failed batches.
+"""
+
+import collections
+import os
+import threading
+
+from monasca_common.simport import simport
+from oslo_config import cfg
+from oslo_log import log
+
+from monasca_api.common.repositories.sqla import outbox_repository
+from monasca_api.monitoring import client as monitoring_client
+from monasca_api.monitoring.metrics import OUTBOX_EVENTS_RELAYED
+from monasca_api.monitoring.metrics import OUTBOX_RELAY_ERRORS
+
+LOG = log.getLogger(__name__)
+
+STATSD_CLIENT = monitoring_client.get_client()
+
+_statsd_relayed_count = STATSD_CLIENT.get_counter(OUTBOX_EVENTS_RELAYED)
+_statsd_error_count = STATSD_CLIENT.get_counter(OUTBOX_RELAY_ERRORS)
+
+_relay = None
+_relay_pid = None
+_lock = threading.Lock()
+
+
+class OutboxRelay(object):
+
+    def __init__(self, batch_size, poll_interval, claim_timeout):
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._claim_timeout = claim_timeout
+
+        self._outbox_repo = None
+        self._publishers = {}
+        self._wake_up = threading.Event()
+
+        self._thread = threading.Thread(target=self._run, name='outbox-relay')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def notify(self):
+        """Wakes up the relay to publish events written by a request"""
+        self._wake_up.set()
+
+    def relay(self):
+        """Publishes a batch of events of the outbox
+
+        :returns: the number of events published
+        """
+        if self._outbox_repo is None:
+            self._outbox_repo = outbox_repository.OutboxRepository()
+
+        count = self._outbox_repo.relay_events(self._batch_size, self._publish,
+                                               self._claim_timeout)
+        if count:
+            _statsd_relayed_count.increment(count)
+        return count
+
+    def _publish(self, events):
+        messages_by_topic = collections.OrderedDict()
+        for topic, message in events:
+            messages_by_topic.setdefault(topic, []).append(message)
+
+        for topic, messages in messages_by_topic.items():
+            publisher = self._publishers.get(topic)
+            if publisher is None:
+                publisher = self._publishers[topic] = simport.load(
+                    cfg.CONF.messaging.driver)(topic)
+            publisher.send_messages(messages)
+
+    def _run(self):
+        while True:
+            self._wake_up.clear()
+            try:
+                count = self.relay()
+            except Exception:
+                LOG.exception('Error occurred while publishing the events of the outbox.')
+                _statsd_error_count.increment(1)
+                count = 0
+
+            if count < self._batch_size:
+                self._wake_up.wait(self._poll_interval)
+
+
+def start():
+    """Starts the relay of the process, if it is not running yet
+
+    The thread of a relay started before the process was forked, e.g. by
+    a server preloading the application, does not run in the child
+    process, so a relay is started again there.
+
+    :returns: the relay of the process
+    """
+    global _relay, _relay_pid
+    relay = _relay
+    if relay is not None and _relay_pid == os.getpid():
+        return relay
+    with _lock:
+        if _relay is None or _relay_pid != os.getpid():
+            _relay = OutboxRelay(cfg.CONF.outbox.batch_size,
+                                 cfg.CONF.outbox.poll_interval,
+                                 cfg.CONF.outbox.claim_timeout)
+            _relay_pid = os.getpid()
+        return _relay
+
+
+def notify():
+    """Wakes up the relay of the process, starting it on first use"""
+    start().notify()
+
+
+class RelayStarter(object):
+    """Falcon middleware starting the relay of the process
+
+    The relay is started by the first request of each process rather than
+    when the application is built, as the thread would not run in the
+    processes forked by a server preloading the application.
+    """
+
+    def process_request(self, req, res):
+        start()
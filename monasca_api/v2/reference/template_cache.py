@@ -0,0 +1,70 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Process wide cache of compiled alarm description templates
+
+The descriptions of alarm definitions are Jinja2 templates rendered with
+the dimensions of the metrics of each alarm. Compiling a template costs
+far more than rendering it, and the alarms of a page mostly share a few
+alarm definitions. The compiled templates are kept in a LRU cache keyed
+by the description. Descriptions which are not valid Jinja2 are cached
+as well, with their TemplateSyntaxError.
+
+The templates are compiled in a sandboxed environment, as the
+descriptions are written by the users of the API.
+"""
+
+from jinja2 import sandbox
+from jinja2 import TemplateSyntaxError
+
+from monasca_api.common import lru_cache
+from monasca_api.monitoring import client as monitoring_client
+from monasca_api.monitoring.metrics import DESCRIPTION_TEMPLATE_CACHE_HITS
+from monasca_api.monitoring.metrics import DESCRIPTION_TEMPLATE_CACHE_MISSES
+
+# Maximum number of compiled templates kept in each process
+MAX_ENTRIES = 1000
+
+STATSD_CLIENT = monitoring_client.get_client()
+
+_environment = sandbox.SandboxedEnvironment()
+
+# description -> compiled template or TemplateSyntaxError
+_templates = lru_cache.LRUCache(
+    MAX_ENTRIES,
+    STATSD_CLIENT.get_counter(DESCRIPTION_TEMPLATE_CACHE_HITS),
+    STATSD_CLIENT.get_counter(DESCRIPTION_TEMPLATE_CACHE_MISSES))
+
+
+def _compile(description):
+    try:
+        return _environment.from_string(description)
+    except TemplateSyntaxError as ex:
+        return ex
+
+
+def get(description):
+    """Returns the compiled template of the description
+
+    :raises TemplateSyntaxError: if the description is not valid Jinja2
+    """
+    template = _templates.get_or_load(description,
+                                      lambda: _compile(description))
+    if isinstance(template, TemplateSyntaxError):
+        raise template
+    return template
+
+
+def clear():
+    _templates.clear()
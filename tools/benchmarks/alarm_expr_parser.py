@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Micro-benchmark of the alarm expression parsers
+
+Measures the import time of the recursive descent parser in
+monasca_api.expression_parser.alarm_expr_parser and of the pyparsing
+grammar in monasca_api.expression_parser.pyparsing_alarm_expr_parser,
+each in a new interpreter, and the number of expressions each of them
+parses per second.
+
+Usage: python tools/benchmarks/alarm_expr_parser.py [expressions]
+"""
+
+from __future__ import print_function
+
+import subprocess
+import sys
+import time
+
+EXPRESSIONS = [
+    u"max(cpu.idle_perc{hostname=fred}, 60) > 10 times 4",
+    u"avg(hpcs.compute{flavor_id=777, image_id=888, metric_name=cpu, device=1}) > 10",
+    u"count(log.error{service=monitoring}, deterministic) > 1.0",
+    u"max(foo{hostname=mini-mon,千=千}, 120) > 100 and (max(bar)>100 or max(biz)>100)",
+    u"avg(disk.space_used_perc{hostname=host0, mount_point=/}) > 90 times 3 or "
+    u"avg(disk.inode_used_perc{hostname=host0, mount_point=/}) > 90 times 3",
+]
+
+IMPORT_TIME = """
+import time
+start = time.time()
+import monasca_api.expression_parser.{}
+print(time.time() - start)
+"""
+
+
+def import_time(module):
+    output = subprocess.check_output([sys.executable, '-c',
+                                      IMPORT_TIME.format(module)])
+    return float(output)
+
+
+def parse_rate(parser_class, count):
+    start = time.time()
+    for i in xrange(count):
+        parser_class(EXPRESSIONS[i % len(EXPRESSIONS)]).sub_expr_list
+    return count / (time.time() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print('import: recursive descent {:.3f} s, pyparsing {:.3f} s'.format(
+        import_time('alarm_expr_parser'),
+        import_time('pyparsing_alarm_expr_parser')))
+
+    from monasca_api.expression_parser import alarm_expr_parser
+    from monasca_api.expression_parser import pyparsing_alarm_expr_parser
+
+    print('parse:  recursive descent {:.0f} expressions/s, '
+          'pyparsing {:.0f} expressions/s'.format(
+              parse_rate(alarm_expr_parser.AlarmExprParser, count),
+              parse_rate(pyparsing_alarm_expr_parser.PyparsingAlarmExprParser,
+                         count)))
+
+
+if __name__ == '__main__':
+    main()
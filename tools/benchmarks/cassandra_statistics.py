@@ -0,0 +1,61 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Micro-benchmark of the statistics aggregation of the Cassandra driver
+
+Aggregates measurements taken every second into 5 minute periods with the
+NumPy and the pure Python implementation of
+monasca_api.common.repositories.cassandra.metrics_repository.
+
+Usage: python tools/benchmarks/cassandra_statistics.py [measurements]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+import numpy as np
+
+from monasca_api.common.repositories.cassandra import metrics_repository
+
+ORIGIN_MS = 1490012345000
+PERIOD_MS = 300 * 1000
+
+
+def measure(func, time_stamps, values):
+    start = time.time()
+    buckets = func(time_stamps, values, ORIGIN_MS, PERIOD_MS)
+    return time.time() - start, len(buckets)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10 * 1000 * 1000
+
+    time_stamps = np.arange(ORIGIN_MS, ORIGIN_MS + count * 1000, 1000, dtype=np.int64)
+    values = np.random.random(count) * 100
+
+    seconds, buckets = measure(metrics_repository._aggregate_statistics_numpy,
+                               time_stamps, values)
+    print('numpy:  {} measurements into {} periods in {:.3f} s'.format(
+        count, buckets, seconds))
+
+    seconds, buckets = measure(metrics_repository._aggregate_statistics_python,
+                               time_stamps.tolist(), values.tolist())
+    print('python: {} measurements into {} periods in {:.3f} s'.format(
+        count, buckets, seconds))
+
+
+if __name__ == '__main__':
+    main()
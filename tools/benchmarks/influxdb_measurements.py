@@ -0,0 +1,111 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Micro-benchmark of the InfluxDB measurement result pipeline
+
+Times the conversion of a chunked InfluxDB response of GET
+/v2.0/metrics/measurements into the response body, by
+MetricsRepository.measurement_list with epoch timestamps and raw
+value_meta, and by the former pipeline, which reformatted the RFC3339
+timestamps of InfluxDB and decoded and encoded value_meta again.
+
+Usage: python tools/benchmarks/influxdb_measurements.py [points]
+"""
+
+from __future__ import print_function
+
+import json
+import sys
+import time
+
+import mock
+
+from monasca_api.common.repositories.influxdb import metrics_repository
+from monasca_api.v2.reference import helpers
+
+CHUNK_SIZE = 10000
+START_MS = 1488326400000
+
+
+def build_chunks(point_count, epoch):
+    chunks = []
+    for start in xrange(0, point_count, CHUNK_SIZE):
+        values = []
+        for i in xrange(start, min(start + CHUNK_SIZE, point_count)):
+            millis = START_MS + i * 30000 + i % 1000
+            if not epoch:
+                millis = '{}.{:03d}Z'.format(
+                    metrics_repository._format_millis([millis], False)[0][:-1],
+                    millis % 1000)
+            values.append([millis, float(i),
+                           '{"host": "host0", "index": %d}' % i if i % 2 else ''])
+        serie = {u'name': u'cpu.idle_perc', u'columns': [u'time', u'value', u'value_meta'],
+                 u'values': values}
+        if start + CHUNK_SIZE < point_count:
+            serie[u'partial'] = True
+        chunks.append(json.dumps({u'results': [{u'statement_id': 0, u'series': [serie]}]}))
+    return chunks
+
+
+def read_series(chunks):
+    for chunk in chunks:
+        for serie in json.loads(chunk)[u'results'][0][u'series']:
+            yield serie
+
+
+def former_pipeline(chunks):
+    measurements_list = []
+    for serie in read_series(chunks):
+        for point in serie['values']:
+            value_meta = json.loads(point[2]) if point[2] else {}
+            timestamp = point[0][:19] + '.' + point[0][20:-1].ljust(3, '0') + 'Z'
+            measurements_list.append([timestamp, point[1], value_meta])
+    measurement = {u'name': u'cpu.idle_perc', u'id': u'0', u'dimensions': None,
+                   u'columns': [u'timestamp', u'value', u'value_meta'],
+                   u'measurements': measurements_list}
+    return json.dumps([measurement], ensure_ascii=False).encode('utf8')
+
+
+def repository_pipeline(repo, chunks, point_count):
+    repo._transport.query_series = lambda query, epoch=None: read_series(chunks)
+    result = repo.measurement_list(u'tenant', u'region', u'cpu.idle_perc', None,
+                                   None, None, None, point_count, True, None)
+    return helpers.dumpit_utf8(result)
+
+
+def timed(function, *args):
+    start = time.time()
+    body = function(*args)
+    return time.time() - start, body
+
+
+def main():
+    point_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    with mock.patch('monasca_api.common.repositories.influxdb.transport.client.'
+                    'InfluxDBClient') as influxdb_client_mock:
+        influxdb_client_mock.return_value.request.return_value.headers = {}
+        repo = metrics_repository.MetricsRepository()
+
+    former_time, former_body = timed(former_pipeline, build_chunks(point_count, False))
+    new_time, new_body = timed(repository_pipeline, repo,
+                               build_chunks(point_count, True), point_count)
+
+    assert json.loads(former_body)[0][u'measurements'] == json.loads(new_body)[0][u'measurements']
+    print('{} points: epoch timestamps and raw value_meta {:.3f} s, '
+          'former pipeline {:.3f} s'.format(point_count, new_time, former_time))
+
+
+if __name__ == '__main__':
+    main()
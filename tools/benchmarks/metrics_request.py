@@ -0,0 +1,85 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Micro-benchmark of the query param handling of the metrics endpoints
+
+Times the helper calls of GET /v2.0/metrics/statistics against a
+monasca_api.api.core.request.Request, which shares its parsed query
+params between the helpers, and against a plain request object, for
+which every helper parses the query string again, as all helpers did
+before.
+
+Usage: python tools/benchmarks/metrics_request.py [requests]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+from falcon import testing
+
+from monasca_api.api.core import request
+from monasca_api.v2.reference import helpers
+
+QUERY_STRING = ('name=cpu.idle_perc&dimensions=hostname:host0,service:monitoring'
+                '&start_time=2017-01-01T00:00:00Z&end_time=2017-01-02T00:00:00Z'
+                '&statistics=avg,min,max&period=300&group_by=*&merge_metrics=true'
+                '&offset=2017-01-01T12:00:00Z&limit=1000&tenant_id=other')
+
+HEADERS = {'X_PROJECT_ID': 'tenant', 'X_ROLES': 'admin,monasca-user'}
+
+
+class PlainRequest(object):
+
+    def __init__(self, env):
+        self.query_string = env['QUERY_STRING']
+        self.roles = ['admin', 'monasca-user']
+        self.project_id = 'tenant'
+
+
+def handle(req):
+    helpers.get_query_param(req, 'merge_metrics', default_val=False)
+    helpers.get_x_tenant_or_tenant_id(req, ['admin'])
+    helpers.validate_query_name(helpers.get_query_name(req, True))
+    helpers.validate_query_dimensions(helpers.get_query_dimensions(req))
+    helpers.validate_start_end_timestamps(
+        helpers.get_query_starttime_timestamp(req),
+        helpers.get_query_endtime_timestamp(req, False))
+    helpers.get_query_statistics(req)
+    helpers.get_query_period(req)
+    helpers.get_query_param(req, 'offset')
+    helpers.get_query_group_by(req)
+
+
+def request_rate(request_class, count):
+    env = testing.create_environ(path='/v2.0/metrics/statistics',
+                                 query_string=QUERY_STRING, headers=HEADERS)
+    requests = [request_class(dict(env)) for _ in xrange(count)]
+    start = time.time()
+    for req in requests:
+        handle(req)
+    return count / (time.time() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print('shared query params {:.0f} requests/s, '
+          'parsed by every helper {:.0f} requests/s'.format(
+              request_rate(request.Request, count),
+              request_rate(PlainRequest, count)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# Copyright 2017 Hewlett Packard Enterprise Development LP
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Micro-benchmark of the metrics message envelope serialization
+
+Compares monasca_api.common.messaging.message_formats.metrics.transform
+and transform_encoded with the previous implementation, which dumped the
+whole envelope for every metric, for POST bodies of 1, 100 and 10,000
+metrics.
+
+Usage: python tools/benchmarks/metrics_transform.py
+"""
+
+from __future__ import print_function
+
+import json
+import timeit
+
+from oslo_utils import timeutils
+
+from monasca_api.common.messaging.message_formats import metrics
+
+TENANT_ID = '0b5e7d8c43f74430add94fba09ffd66e'
+REGION = 'useast'
+
+
+def legacy_transform(metrics, tenant_id, region):
+    transformed_metric = {'metric': {},
+                          'meta': {'tenantId': tenant_id, 'region': region},
+                          'creation_time': timeutils.utcnow_ts()}
+
+    if isinstance(metrics, list):
+        transformed_metrics = []
+        for metric in metrics:
+            transformed_metric['metric'] = metric
+            transformed_metrics.append(json.dumps(transformed_metric))
+        return transformed_metrics
+    else:
+        transformed_metric['metric'] = metrics
+        return [json.dumps(transformed_metric)]
+
+
+def build_metrics(count):
+    return [{'name': 'cpu.idle_perc',
+             'dimensions': {'hostname': 'host%d' % index,
+                            'service': 'monitoring',
+                            'component': 'monasca-agent'},
+             'timestamp': 1490012345000 + index,
+             'value': 97.5,
+             'value_meta': {'reason': 'benchmark'}}
+            for index in range(count)]
+
+
+def main():
+    print('{:>8} {:>14} {:>14} {:>14}'.format(
+        'metrics', 'legacy [m/s]', 'dumps [m/s]', 'encoded [m/s]'))
+    for count in (1, 100, 10000):
+        body = build_metrics(count)
+        encoded_body = [json.dumps(metric) for metric in body]
+        number = max(1, 100000 // count)
+
+        def measure(func, metric_list):
+            seconds = min(timeit.repeat(
+                lambda: func(metric_list, TENANT_ID, REGION),
+                number=number, repeat=7))
+            return count * number / seconds
+
+        print('{:>8} {:>14.0f} {:>14.0f} {:>14.0f}'.format(
+            count,
+            measure(legacy_transform, body),
+            measure(metrics.transform, body),
+            measure(metrics.transform_encoded, encoded_body)))
+
+
+if __name__ == '__main__':
+    main()